@@ -1,38 +1,152 @@
-from fastapi import Request, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, Request, HTTPException
+from sqlalchemy import or_, select, update
+from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
+
+from app.core.cache import TTLCache
+from app.core.cognito_jwt import TokenInvalido, obtener_verificador
+from app.core.config import settings
+from app.core.database import SessionLocal
 from app.models.user import Usuario
-from starlette.status import HTTP_401_UNAUTHORIZED
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> Usuario:
+@dataclass(frozen=True)
+class Principal:
     """
-    Dependency to obtain the current user from headers for now.
-    It looks for `X-User-Id` (preferred) or `X-User-Email` headers and
-    returns the corresponding `Usuario` from the database.
+    Authenticated user resolved from a Cognito token.
 
-    NOTE: This is a lightweight placeholder for proper token-based
-    authentication (Cognito JWT validation). Replace with a full
-    implementation when integrating auth tokens.
+    Exposes the `Usuario` fields endpoints need (`id_usuario`,
+    `correo_electronico`, `tipo_usuario`) plus the Cognito `sub` and groups.
+    It is an immutable snapshot: load the `Usuario` row to modify it.
     """
-    user_id = request.headers.get("x-user-id")
-    email = request.headers.get("x-user-email")
+    id_usuario: int
+    correo_electronico: str
+    tipo_usuario: str
+    sub: str
+    grupos: tuple = ()
 
-    if user_id:
-        try:
-            uid = int(user_id)
-        except ValueError:
-            raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Invalid X-User-Id header")
 
-        user = db.query(Usuario).filter(Usuario.id_usuario == uid).first()
-        if not user:
-            raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="User not found")
-        return user
+# sub -> Principal
+_principales = TTLCache(maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE, ttl=settings.AUTH_PRINCIPAL_CACHE_TTL)
+
+
+def _token_de(request: Request) -> str:
+    esquema, _, token = request.headers.get("authorization", "").partition(" ")
+    if esquema.lower() != "bearer" or not token:
+        raise HTTPException(
+            status_code=HTTP_401_UNAUTHORIZED,
+            detail="Authentication required (Authorization: Bearer <token>)",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return token.strip()
+
+
+def _email_verificado(claims: dict) -> Optional[str]:
+    # Solo los ID tokens traen `email`, y solo cuenta si Cognito lo verificó: un
+    # correo sin verificar (o el username de un access token) puede coincidir
+    # con el de otra persona
+    email = claims.get("email")
+    return email if email and claims.get("email_verified") is True else None
+
 
+def _cargar_principal(claims: dict) -> Optional[Principal]:
+    """
+    Resolve the local user for a token (the only DB hit, on cache misses).
+
+    Matches `google_id == sub`; a verified email (ID tokens only) is the
+    fallback. A row found by email without a `google_id` is linked to the
+    `sub`, so its access tokens resolve from then on.
+    """
+    sub = claims["sub"]
+    email = _email_verificado(claims)
+    condiciones = [Usuario.google_id == sub]
     if email:
-        user = db.query(Usuario).filter(Usuario.correo_electronico == email).first()
-        if not user:
+        condiciones.append(Usuario.correo_electronico == email)
+
+    db = SessionLocal()
+    try:
+        fila = db.execute(
+            select(Usuario.id_usuario, Usuario.correo_electronico, Usuario.tipo_usuario, Usuario.google_id)
+            .where(or_(*condiciones))
+            .order_by((Usuario.google_id == sub).desc())
+            .limit(1)
+        ).first()
+        if fila is not None and fila.google_id is None:
+            db.execute(
+                update(Usuario)
+                .where(Usuario.id_usuario == fila.id_usuario, Usuario.google_id.is_(None))
+                .values(google_id=sub)
+            )
+            db.commit()
+    finally:
+        db.close()
+
+    if fila is None:
+        return None
+    return Principal(
+        id_usuario=fila.id_usuario,
+        correo_electronico=fila.correo_electronico,
+        tipo_usuario=fila.tipo_usuario,
+        sub=sub,
+        grupos=tuple(claims.get("cognito:groups") or ()),
+    )
+
+
+def invalidar_principal(sub: str) -> None:
+    """Forget the cached principal of a Cognito user (after changing its row)."""
+    _principales.pop(sub, None)
+
+
+def principal_de_token(token: Optional[str]) -> Principal:
+    """
+    Verify a Cognito access or ID token and resolve its local user.
+
+    Raises 401 when the token is missing or invalid, or its user does not
+    exist. May hit the database on a cache miss (blocking).
+    """
+    if not token:
+        raise HTTPException(
+            status_code=HTTP_401_UNAUTHORIZED,
+            detail="Authentication required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        claims = obtener_verificador().verificar(token)
+    except TokenInvalido as e:
+        raise HTTPException(
+            status_code=HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid token: {e}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    principal = _principales.get(claims["sub"])
+    if principal is None:
+        principal = _cargar_principal(claims)
+        if principal is None:
             raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="User not found")
-        return user
+        _principales.set(claims["sub"], principal)
+    return principal
+
 
-    raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Authentication required (provide X-User-Id or X-User-Email header)")
+def get_current_user(request: Request) -> Principal:
+    """
+    Dependency that authenticates the request with a Cognito access or ID
+    token (`Authorization: Bearer <token>`).
+
+    The signature is verified locally against the cached JWKS and the
+    resolved user is cached by `sub`, so authenticating needs neither a
+    network call nor a database query on the hot path.
+    """
+    return principal_de_token(_token_de(request))
+
+
+def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    """
+    Dependency for moderation endpoints: the authenticated user must be an
+    administrator (local `tipo_usuario` or the Cognito `Admin` group).
+    """
+    if current_user.tipo_usuario != "administrador" and "Admin" not in current_user.grupos:
+        raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="Administrator role required")
+    return current_user
@@ -1,54 +1,130 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select, func, tuple_, update, delete
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
  
-from app.core.database import get_db
+from app.api.v1.deps import get_current_user, principal_de_token, Principal
+from app.core.database import get_db, get_async_db
+from app.core.pagination import (
+    LIMITE_POR_DEFECTO, LIMITE_MAXIMO, encode_cursor, decode_cursor, parse_datetime, parse_int,
+)
 from app.models.alerta_sistema import Alerta_Sistema
 from app.models.servicio_contratado import Servicio_Contratado
 from app.models.user import Proveedor_Servicio
-from app.models.reseña_servicio import Reseña_Servicio
+from app.core.config import settings
+from app.services import alertas_push_service
 from app.services.s3_service import s3_service
  
 router = APIRouter(
     prefix="/alertas",
     tags=["Alertas del sistema"]
 )
+
+# Máximo de ids por petición al marcar alertas en lote
+MAX_IDS_POR_LOTE = 500
+
+
+class MarcarTodasLeidasRequest(BaseModel):
+    hasta: Optional[datetime] = Field(
+        None, description="Solo alertas enviadas hasta este momento (por defecto, todas)"
+    )
+
+
+class MarcarLeidasRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_IDS_POR_LOTE)
+
+
+def _verificar_propietario(current_user: Principal, id_usuario: int) -> None:
+    """Solo el propio usuario lee o modifica sus alertas."""
+    if current_user.id_usuario != id_usuario:
+        raise HTTPException(status_code=403, detail="No puedes acceder a las alertas de otro usuario.")
+
+
+def _alertas_visibles(id_usuario: int):
+    """Condiciones del feed: alertas del usuario asociadas a un servicio."""
+    return (
+        Alerta_Sistema.id_usuario == id_usuario,
+        Alerta_Sistema.id_servicio_contratado.isnot(None),
+    )
+
  
 @router.get(
     "/usuario/{id_usuario}",
     summary="Devuelve las alertas del cliente"
 )
-def obtener_alertas(
+async def obtener_alertas(
     id_usuario: int,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto como 'next_cursor'"),
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Alertas por página"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Retorna todas las alertas para el usuario
+    Retorna las alertas del usuario, de la más reciente a la más antigua.
+
+    Paginación por cursor (keyset sobre fecha_envio, id_alerta): la respuesta
+    incluye `next_cursor`, que se envía como `cursor` para obtener la
+    siguiente página (null cuando ya no hay más alertas).
     """
- 
-    resenas_count = {
-        row.id_proveedor: row.total_resenas
-        for row in (
-            db.query(
-                Reseña_Servicio.id_proveedor.label("id_proveedor"),
-                func.count(Reseña_Servicio.id_reseña).label("total_resenas")
+    _verificar_propietario(current_user, id_usuario)
+    valores_cursor = decode_cursor(cursor)
+
+    claves = (Alerta_Sistema.fecha_envio, Alerta_Sistema.id_alerta)
+    consulta = select(Alerta_Sistema).where(*_alertas_visibles(id_usuario))
+    if valores_cursor is not None:
+        ultimos = (parse_datetime(valores_cursor.get("f")), parse_int(valores_cursor.get("id")))
+        consulta = consulta.where(tuple_(*claves) < tuple_(*ultimos))
+
+    # Con AsyncSession no hay carga perezosa: servicio, proveedor, su usuario y
+    # su estadística (total de reseñas) se cargan en lote solo para esta página
+    alertas = (await db.scalars(
+        consulta
+        .options(
+            selectinload(Alerta_Sistema.servicio_contratado)
+            .selectinload(Servicio_Contratado.proveedor_servicio)
+            .options(
+                selectinload(Proveedor_Servicio.estadistica_proveedor),
+                selectinload(Proveedor_Servicio.usuario),
             )
-            .group_by(Reseña_Servicio.id_proveedor)
-            .all()
         )
-    }
+        .order_by(*[clave.desc() for clave in claves])
+        # Una fila extra para saber si existe una página siguiente
+        .limit(limite + 1)
+    )).all()
+    hay_mas = len(alertas) > limite
+    alertas = alertas[:limite]
+
+    next_cursor = None
+    if hay_mas and alertas:
+        ultima = alertas[-1]
+        next_cursor = encode_cursor({"f": ultima.fecha_envio, "id": ultima.id_alerta})
  
-    alertas = (
-    db.query(Alerta_Sistema)
-    .join(
-        Servicio_Contratado,
-        Alerta_Sistema.id_servicio_contratado == Servicio_Contratado.id_servicio_contratado,
-        isouter=True
-        )
-        .filter(Alerta_Sistema.id_usuario == id_usuario)
-        .filter(Servicio_Contratado.id_servicio_contratado.isnot(None))
-        .order_by(Alerta_Sistema.fecha_envio.desc())
-        .all()
+    def foto_de(proveedor):
+        """S3 key (o URL absoluta) de la foto del proveedor, con fallback a su usuario."""
+        if proveedor.foto_perfil:
+            return proveedor.foto_perfil
+        usuario = getattr(proveedor, "usuario", None)
+        return usuario.foto_perfil if usuario else None
+ 
+    def es_url(foto):
+        return isinstance(foto, str) and foto.startswith(("http://", "https://"))
+ 
+    # Fotos de los proveedores firmadas en lote
+    proveedores = [
+        alerta.servicio_contratado.proveedor_servicio
+        for alerta in alertas
+        if alerta.servicio_contratado and alerta.servicio_contratado.proveedor_servicio
+    ]
+    urls = s3_service.get_presigned_urls(
+        foto for foto in map(foto_de, proveedores) if not es_url(foto)
     )
  
     respuesta = []
@@ -63,33 +139,24 @@ def obtener_alertas(
                 proveedor = getattr(servicio, "proveedor_servicio", None)
  
                 if proveedor:
-                    foto_url = None
-                    if proveedor.foto_perfil:
-                        try:
-                            foto_url = s3_service.get_presigned_url(proveedor.foto_perfil)
-                        except Exception:
-                            foto_url = proveedor.foto_perfil
-                    elif getattr(proveedor, "usuario", None) and proveedor.usuario.foto_perfil:
-                        foto_usuario = proveedor.usuario.foto_perfil
-                        if isinstance(foto_usuario, str) and foto_usuario.startswith(("http://", "https://")):
-                            foto_url = foto_usuario
-                        else:
-                            try:
-                                foto_url = s3_service.get_presigned_url(foto_usuario)
-                            except Exception:
-                                foto_url = foto_usuario
+                    foto = foto_de(proveedor)
+                    foto_url = foto if es_url(foto) else urls.get(foto, foto)
  
                     nombre_proveedor = proveedor.nombre_completo
                     if not nombre_proveedor and getattr(proveedor, "usuario", None):
                         nombre_proveedor = proveedor.usuario.nombre
  
+                    # Calificación y total de reseñas desde el agregado precalculado
+                    estadistica = proveedor.estadistica_proveedor
+                    calificacion = estadistica.calificacion_promedio if estadistica else None
+ 
                     proveedor_info = {
                         "idProveedor": proveedor.id_proveedor,
                         "nombreCompleto": nombre_proveedor or "Proveedor",
                         "fotoPerfil": foto_url,
-                        "calificacionPromedio": float(proveedor.calificacion_promedio)
-                        if proveedor.calificacion_promedio is not None else None,
-                        "totalResenas": int(resenas_count.get(proveedor.id_proveedor, 0)),
+                        "calificacionPromedio": float(calificacion)
+                        if calificacion is not None else None,
+                        "totalResenas": estadistica.total_reseñas if estadistica else 0,
                     }
  
         respuesta.append({
@@ -102,19 +169,252 @@ def obtener_alertas(
             "proveedor": proveedor_info
         })
  
-    return respuesta
+    return {
+        "alertas": respuesta,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get(
+    "/usuario/{id_usuario}/no-leidas/count",
+    summary="Cuenta las alertas no leídas del usuario"
+)
+async def contar_alertas_no_leidas(
+    id_usuario: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Número de alertas no leídas (para el badge). Se resuelve solo con el
+    índice parcial idx_alerta_usuario_no_leidas, sin cargar el feed.
+    """
+    _verificar_propietario(current_user, id_usuario)
+    total = await db.scalar(
+        select(func.count())
+        .select_from(Alerta_Sistema)
+        .where(*_alertas_visibles(id_usuario), ~Alerta_Sistema.leida)
+    )
+    return {"no_leidas": total or 0}
+
+
+
+# -----------------------------------------------------------------
+# --- Canal push: SSE (y variante WebSocket) ----------------------
+# -----------------------------------------------------------------
+# Tiempo (ms) que EventSource espera antes de reconectarse
+SSE_RETRY_MS = 5000
+
+
+def _verificar_canal_push():
+    if not settings.ALERTAS_PUSH_ENABLED:
+        raise HTTPException(status_code=404, detail="Canal push de alertas desactivado")
+
+
+async def _autenticar_canal(id_usuario: int, token: Optional[str]):
+    """
+    EventSource y WebSocket no envían el header Authorization: el token de
+    Cognito llega como query param. Solo el propio usuario escucha su canal.
+    """
+    # En un fallo de caché se resuelve el usuario en la BD (bloqueante)
+    principal = await run_in_threadpool(principal_de_token, token)
+    if principal.id_usuario != id_usuario:
+        raise HTTPException(status_code=403, detail="No puedes escuchar las alertas de otro usuario.")
+    return principal
+
+
+def _evento_sse(evento: dict) -> str:
+    lineas = [f"event: {evento['evento']}"]
+    id_alerta = evento["datos"].get("id_alerta")
+    if id_alerta is not None:
+        lineas.append(f"id: {id_alerta}")
+    lineas.append(f"data: {json.dumps(evento['datos'])}")
+    return "\n".join(lineas) + "\n\n"
+
+
+async def _stream_sse(id_usuario: int, heartbeat: float):
+    with alertas_push_service.suscripcion(id_usuario) as cola:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            try:
+                evento = await asyncio.wait_for(cola.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión en proxies y balanceadores
+                yield ": ping\n\n"
+                continue
+            yield _evento_sse(evento)
+
+
+@router.get(
+    "/usuario/{id_usuario}/stream",
+    summary="Alertas nuevas del usuario en tiempo real (server-sent events)"
+)
+async def stream_alertas(
+    id_usuario: int,
+    token: Optional[str] = Query(None, description="Access o ID token de Cognito"),
+):
+    """
+    Mantiene abierta una respuesta `text/event-stream` con un evento `alerta`
+    por cada alerta nueva del usuario (identificadores y tipo; el detalle se
+    lee del feed) y un evento `resync` cuando pudieron perderse avisos.
+
+    El canal no tiene historial: al conectarse o reconectarse el cliente
+    debe pedir la primera página de `/alertas/usuario/{id_usuario}`.
+    No retiene conexión a la base de datos. El token se verifica al conectar;
+    al reconectarse el cliente debe enviar uno vigente.
+    """
+    _verificar_canal_push()
+    await _autenticar_canal(id_usuario, token)
+    return StreamingResponse(
+        _stream_sse(id_usuario, settings.ALERTAS_PUSH_HEARTBEAT),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Evita que nginx/ALB acumulen los eventos en su buffer
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.websocket("/usuario/{id_usuario}/ws")
+async def websocket_alertas(websocket: WebSocket, id_usuario: int):
+    """
+    Variante WebSocket del stream: envía `{"evento", "datos"}` en JSON con
+    la misma semántica que el SSE (incluido `resync`). Se autentica igual
+    (`?token=`); sin token válido se cierra con 1008 antes de aceptarla.
+    """
+    if not settings.ALERTAS_PUSH_ENABLED:
+        await websocket.close(code=1013)
+        return
+    try:
+        await _autenticar_canal(id_usuario, websocket.query_params.get("token"))
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    await websocket.accept()
+    heartbeat = settings.ALERTAS_PUSH_HEARTBEAT
+    with alertas_push_service.suscripcion(id_usuario) as cola:
+        try:
+            while True:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    evento = {"evento": "ping", "datos": {}}
+                await websocket.send_json(evento)
+        except WebSocketDisconnect:
+            pass
+
  
 @router.put("/{id_alerta}/marcar-leida")
 def marcar_alerta_leida(
     id_alerta: int,
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    alerta = db.query(Alerta_Sistema).filter(Alerta_Sistema.id_alerta == id_alerta).first()
+    # Un solo UPDATE; fecha_lectura conserva la primera lectura. Las alertas
+    # de otros usuarios responden 404, igual que las inexistentes
+    marcada = db.execute(
+        update(Alerta_Sistema)
+        .where(Alerta_Sistema.id_alerta == id_alerta, Alerta_Sistema.id_usuario == current_user.id_usuario)
+        .values(leida=True, fecha_lectura=func.coalesce(Alerta_Sistema.fecha_lectura, func.now()))
+        .returning(Alerta_Sistema.id_alerta)
+    ).first()
  
-    if not alerta:
+    if not marcada:
         raise HTTPException(status_code=404, detail="Alerta no encontrada.")
  
-    alerta.leida = True
     db.commit()
  
-    return {"message": "Alerta marcada como leída"}
\ No newline at end of file
+    return {"message": "Alerta marcada como leída"}
+
+
+def _marcar_leidas(db: Session, *condiciones) -> List[int]:
+    """UPDATE ... RETURNING de las alertas no leídas que cumplen las condiciones."""
+    ids = db.scalars(
+        update(Alerta_Sistema)
+        .where(~Alerta_Sistema.leida, *condiciones)
+        .values(leida=True, fecha_lectura=func.now())
+        .returning(Alerta_Sistema.id_alerta)
+    ).all()
+    db.commit()
+    return sorted(ids)
+
+
+@router.put(
+    "/usuario/{id_usuario}/marcar-todas-leidas",
+    summary="Marca como leídas todas las alertas del usuario"
+)
+def marcar_todas_leidas(
+    id_usuario: int,
+    payload: Optional[MarcarTodasLeidasRequest] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Marca como leídas las alertas no leídas del usuario enviadas hasta
+    `hasta` (todas si no se indica). Enviar como `hasta` la fecha_envio de
+    la alerta más reciente que se mostró evita marcar alertas que llegaron
+    después. Devuelve los ids marcados.
+    """
+    _verificar_propietario(current_user, id_usuario)
+    condiciones = [Alerta_Sistema.id_usuario == id_usuario]
+    if payload is not None and payload.hasta is not None:
+        hasta = payload.hasta
+        if hasta.tzinfo is not None:
+            # fecha_envio se guarda sin zona horaria (UTC)
+            hasta = hasta.astimezone(timezone.utc).replace(tzinfo=None)
+        condiciones.append(Alerta_Sistema.fecha_envio <= hasta)
+
+    ids = _marcar_leidas(db, *condiciones)
+    return {"marcadas": len(ids), "ids": ids}
+
+
+@router.put(
+    "/usuario/{id_usuario}/marcar-leidas",
+    summary="Marca como leídas una lista de alertas del usuario"
+)
+def marcar_leidas(
+    id_usuario: int,
+    payload: MarcarLeidasRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Marca como leídas las alertas indicadas (hasta 500 por petición). Los
+    ids de otros usuarios o ya leídos se ignoran; se devuelven los marcados.
+    """
+    _verificar_propietario(current_user, id_usuario)
+    ids = _marcar_leidas(
+        db,
+        Alerta_Sistema.id_usuario == id_usuario,
+        Alerta_Sistema.id_alerta.in_(set(payload.ids)),
+    )
+    return {"marcadas": len(ids), "ids": ids}
+
+
+@router.delete(
+    "/usuario/{id_usuario}/leidas",
+    summary="Elimina las alertas leídas antiguas del usuario"
+)
+def eliminar_alertas_leidas(
+    id_usuario: int,
+    dias: int = Query(30, ge=1, description="Antigüedad mínima (días desde fecha_envio)"),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Elimina en un solo DELETE las alertas ya leídas del usuario enviadas
+    hace más de `dias` días. Las no leídas nunca se eliminan.
+    """
+    _verificar_propietario(current_user, id_usuario)
+    limite = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=dias)
+    eliminadas = db.scalars(
+        delete(Alerta_Sistema)
+        .where(
+            Alerta_Sistema.id_usuario == id_usuario,
+            Alerta_Sistema.leida,
+            Alerta_Sistema.fecha_envio < limite,
+        )
+        .returning(Alerta_Sistema.id_alerta)
+    ).all()
+    db.commit()
+    return {"eliminadas": len(eliminadas)}
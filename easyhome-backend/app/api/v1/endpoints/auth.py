@@ -1,11 +1,18 @@
 # app/api/v1/endpoints/auth.py
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Boolean, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.user import Usuario, Proveedor_Servicio
-from app.services.cognito_service import cognito_service
+from app.services.cognito_service import cognito_service, tipo_usuario_de_grupos
+from app.services import catalogo_service, identidad_service, ultima_sesion_service
+from app.api.v1.deps import invalidar_principal
 import logging
 
 router = APIRouter()
@@ -20,18 +27,166 @@ class CognitoUserSync(BaseModel):
     cognito_groups: list[str] = []
 
 
+def _consultar_cognito(email: str, grupos: list[str]) -> tuple[dict, list[str]]:
+    """Atributos del usuario en Cognito y sus grupos (asigna el grupo por defecto si no tiene)."""
+    cognito_attrs = cognito_service.get_user_by_email(email)
+
+    groups_assigned = cognito_service.ensure_user_has_default_group(
+        username=email,
+        current_groups=grupos
+    )
+    if groups_assigned and not grupos:
+        grupos = cognito_service.get_user_groups(email) or [settings.COGNITO_DEFAULT_GROUP]
+        logger.info(f"Usuario {email} asignado al grupo por defecto")
+
+    return cognito_attrs, grupos
+
+
+def _sincronizar_usuario(db: Session, user_data: CognitoUserSync) -> tuple[int, bool]:
+    """
+    Crea o actualiza el usuario local (y su Proveedor_Servicio) con `user_data`
+    en una sola transacción. Es idempotente. Devuelve (id_usuario, es_nuevo).
+
+    El usuario se escribe con un único INSERT ... ON CONFLICT (correo) DO UPDATE
+    ... WHERE <algo cambió> RETURNING; la CTE `anterior` lee la fila previa en
+    el mismo snapshot para saber qué cambió. Si solo cambiaría la última
+    sesión no se escribe nada: el timestamp va al write-behind de
+    ultima_sesion_service. Dos logins simultáneos del mismo usuario ya no
+    chocan con la restricción única del correo.
+    """
+    ahora = datetime.now()
+    tipo_usuario = tipo_usuario_de_grupos(user_data.cognito_groups)
+    tabla = Usuario.__table__
+
+    anterior = (
+        select(tabla.c.id_usuario, tabla.c.nombre, tabla.c.numero_telefono, tabla.c.tipo_usuario)
+        .where(tabla.c.correo_electronico == user_data.email)
+        .cte("anterior")
+    )
+
+    stmt = pg_insert(tabla).values(
+        nombre=(user_data.name or user_data.email.split('@')[0]).strip(),
+        correo_electronico=user_data.email,
+        contraseña="",  # No se necesita contraseña (usa Cognito)
+        numero_telefono=user_data.phone,
+        tipo_usuario=tipo_usuario or "cliente",
+        estado_cuenta="activo",
+        metodo_autenticacion="cognito",
+        google_id=user_data.cognito_sub,
+        fecha_registro=ahora,
+        ultima_sesion=ahora,
+    )
+    # Al usuario existente solo se le sobrescribe lo que Cognito trae
+    valores_update = {}
+    if user_data.name:
+        valores_update["nombre"] = stmt.excluded.nombre
+    if user_data.phone:
+        valores_update["numero_telefono"] = stmt.excluded.numero_telefono
+    if tipo_usuario:
+        valores_update["tipo_usuario"] = stmt.excluded.tipo_usuario
+    if valores_update:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabla.c.correo_electronico],
+            set_=valores_update,
+            where=or_(*(tabla.c[nombre].is_distinct_from(valor) for nombre, valor in valores_update.items())),
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[tabla.c.correo_electronico])
+    upsert = stmt.returning(
+        tabla.c.id_usuario,
+        tabla.c.nombre,
+        tabla.c.numero_telefono,
+        tabla.c.tipo_usuario,
+        # xmax = 0 solo en filas recién insertadas
+        literal_column("xmax = 0", Boolean).label("insertado"),
+    ).cte("upsert")
+
+    try:
+        # Nuevo: solo `upsert`; modificado: ambas; sin cambios: solo `anterior`
+        fila = db.execute(
+            select(
+                upsert,
+                anterior.c.id_usuario.label("id_anterior"),
+                anterior.c.nombre.label("nombre_anterior"),
+                anterior.c.numero_telefono.label("telefono_anterior"),
+                anterior.c.tipo_usuario.label("tipo_anterior"),
+            ).select_from(upsert.outerjoin(anterior, anterior.c.id_usuario == upsert.c.id_usuario, full=True))
+        ).first()
+        if fila is None:
+            # Otro login insertó al usuario después de nuestro snapshot y no hubo cambios
+            fila = db.execute(
+                select(
+                    literal_column("NULL").label("id_usuario"),
+                    tabla.c.id_usuario.label("id_anterior"),
+                    tabla.c.tipo_usuario.label("tipo_anterior"),
+                ).where(tabla.c.correo_electronico == user_data.email)
+            ).one()
+
+        escrito = fila.id_usuario is not None
+        insertado = escrito and fila.insertado
+        id_usuario = fila.id_usuario if escrito else fila.id_anterior
+
+        if escrito and not insertado and fila.tipo_anterior != fila.tipo_usuario:
+            logger.info(f"Usuario {user_data.email} cambió de '{fila.tipo_anterior}' a '{fila.tipo_usuario}'")
+
+        # Quien pasa a ser proveedor por Cognito: Proveedor_Servicio auto-aprobado si no existe
+        if escrito and fila.tipo_usuario == "proveedor" and (insertado or fila.tipo_anterior != "proveedor"):
+            creado = db.execute(
+                pg_insert(Proveedor_Servicio.__table__)
+                .values(
+                    id_proveedor=id_usuario,
+                    nombre_completo=fila.nombre,
+                    estado_solicitud="aprobado",
+                    fecha_solicitud=ahora,
+                )
+                .on_conflict_do_nothing(index_elements=["id_proveedor"])
+            ).rowcount
+            if creado:
+                logger.info(f"Creado registro de Proveedor_Servicio para usuario {user_data.email}")
+
+        # Nombre y teléfono aparecen en las tarjetas del catálogo del proveedor
+        if (
+            escrito and not insertado
+            and (fila.nombre, fila.numero_telefono) != (fila.nombre_anterior, fila.telefono_anterior)
+        ):
+            catalogo_service.refrescar_tarjetas(db, ids_proveedor=[id_usuario])
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if not insertado:
+        ultima_sesion_service.registrar(id_usuario, ahora)
+    if escrito:
+        # Nombre, teléfono o tipo de usuario cambiaron
+        identidad_service.invalidar_usuario(id_usuario, user_data.email)
+        identidad_service.invalidar_proveedor(id_usuario)
+        invalidar_principal(user_data.cognito_sub)
+
+    return id_usuario, insertado
+
+
 @router.post("/sync-cognito-user")
-def sync_cognito_user(user_data: CognitoUserSync, db: Session = Depends(get_db)):
+async def sync_cognito_user(user_data: CognitoUserSync, db: Session = Depends(get_db)):
     """
     Sincroniza un usuario de Cognito con la base de datos local.
     Si el usuario ya existe, actualiza su última sesión.
     Si no existe, lo crea.
     
     IMPORTANTE: Si el usuario no tiene grupos en Cognito, se le asigna automáticamente al grupo "Clientes"
+
+    Las llamadas a Cognito y la escritura en la BD corren en paralelo: la BD se
+    actualiza con los datos del token y solo se vuelve a escribir si Cognito
+    los corrige (nombre, teléfono, sub o grupos distintos).
     """
+    datos_token = user_data.model_copy(deep=True)
+    (cognito_attrs, grupos), (user_id, is_new) = await asyncio.gather(
+        run_in_threadpool(_consultar_cognito, user_data.email, list(user_data.cognito_groups)),
+        run_in_threadpool(_sincronizar_usuario, db, datos_token),
+    )
 
-    # NUEVO: obtener atributos directamente desde Cognito (email → nombre, teléfono, sub)
-    cognito_attrs = cognito_service.get_user_by_email(user_data.email)
+    # NUEVO: atributos directamente desde Cognito (email → nombre, teléfono, sub)
     if cognito_attrs:
         user_data.name = cognito_attrs.get("name") or user_data.name
         user_data.phone = cognito_attrs.get("phone_number") or user_data.phone
@@ -39,117 +194,15 @@ def sync_cognito_user(user_data: CognitoUserSync, db: Session = Depends(get_db))
         logger.info(f"Atributos sincronizados desde Cognito para {user_data.email}: {cognito_attrs}")
     else:
         logger.warning(f"No se pudieron obtener atributos para {user_data.email}")
+    user_data.cognito_groups = grupos
 
-    # ORIGINAL: búsqueda del usuario en la base de datos
-    existing_user = db.query(Usuario).filter(
-        (Usuario.correo_electronico == user_data.email) |
-        (Usuario.google_id == user_data.cognito_sub)
-    ).first()
-
-    # ORIGINAL: asegurar grupo por defecto
-    groups_assigned = cognito_service.ensure_user_has_default_group(
-        username=user_data.email,
-        current_groups=user_data.cognito_groups
-    )
-    
-    if groups_assigned and not user_data.cognito_groups:
-        user_data.cognito_groups = [cognito_service.client and 
-                                     cognito_service.get_user_groups(user_data.email) or 
-                                     ["Clientes"]]
-        logger.info(f"Usuario {user_data.email} asignado al grupo por defecto")
-
-    if existing_user:
-        # ORIGINAL: actualizar última sesión
-        existing_user.ultima_sesion = datetime.now()
-
-        # NUEVO: sincronizar nombre/teléfono si Cognito los tiene
-        if user_data.name:
-            existing_user.nombre = user_data.name.strip()
-        if user_data.phone:
-            existing_user.numero_telefono = user_data.phone
-
-        # NUEVO: actualizar tipo_usuario basado en grupos actuales de Cognito
-        tipo_usuario_anterior = existing_user.tipo_usuario
-        if "Admin" in user_data.cognito_groups:
-            existing_user.tipo_usuario = "administrador"
-        elif "Trabajadores" in user_data.cognito_groups:
-            existing_user.tipo_usuario = "proveedor"
-        elif "Clientes" in user_data.cognito_groups:
-            existing_user.tipo_usuario = "cliente"
-
-        # Log cambio de tipo si hubo
-        if tipo_usuario_anterior != existing_user.tipo_usuario:
-            logger.info(f"Usuario {existing_user.correo_electronico} cambió de '{tipo_usuario_anterior}' a '{existing_user.tipo_usuario}'")
-
-        # NUEVO: Si el usuario es proveedor, crear registro en Proveedor_Servicio si no existe
-        if existing_user.tipo_usuario == "proveedor":
-            proveedor_existente = db.query(Proveedor_Servicio).filter(
-                Proveedor_Servicio.id_proveedor == existing_user.id_usuario
-            ).first()
-
-            if not proveedor_existente:
-                nuevo_proveedor = Proveedor_Servicio(
-                    id_proveedor=existing_user.id_usuario,
-                    nombre_completo=existing_user.nombre,
-                    estado_solicitud="aprobado",  # Auto-aprobar usuarios de Cognito
-                    fecha_solicitud=datetime.now()
-                )
-                db.add(nuevo_proveedor)
-                logger.info(f"Creado registro de Proveedor_Servicio para usuario {existing_user.correo_electronico}")
-
-        db.commit()
-        db.refresh(existing_user)
-
-        return {
-            "message": "Usuario actualizado",
-            "user_id": existing_user.id_usuario,
-            "is_new": False,
-            "groups": user_data.cognito_groups
-        }
-    
-    # ORIGINAL: determinar tipo de usuario basado en grupos
-    tipo_usuario = "cliente"
-    if "Admin" in user_data.cognito_groups:
-        tipo_usuario = "administrador"
-    elif "Trabajadores" in user_data.cognito_groups:
-        tipo_usuario = "proveedor"
-    elif "Clientes" in user_data.cognito_groups:
-        tipo_usuario = "cliente"
-    
-    # ORIGINAL + AJUSTE: creación del nuevo usuario
-    new_user = Usuario(
-        nombre=(user_data.name or user_data.email.split('@')[0]).strip(),  # NUEVO: strip()
-        correo_electronico=user_data.email,
-        contraseña="",  # No se necesita contraseña (usa Cognito)
-        numero_telefono=user_data.phone,
-        tipo_usuario=tipo_usuario,
-        estado_cuenta="activo",
-        metodo_autenticacion="cognito",
-        google_id=user_data.cognito_sub,
-        fecha_registro=datetime.now(),
-        ultima_sesion=datetime.now()
-    )
-
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-    # NUEVO: Si el usuario es proveedor, crear registro en Proveedor_Servicio automáticamente
-    if tipo_usuario == "proveedor":
-        nuevo_proveedor = Proveedor_Servicio(
-            id_proveedor=new_user.id_usuario,
-            nombre_completo=new_user.nombre,
-            estado_solicitud="aprobado",  # Auto-aprobar usuarios de Cognito con grupo Trabajadores
-            fecha_solicitud=datetime.now()
-        )
-        db.add(nuevo_proveedor)
-        db.commit()
-        logger.info(f"Creado registro de Proveedor_Servicio para nuevo usuario {new_user.correo_electronico}")
+    if user_data != datos_token:
+        await run_in_threadpool(_sincronizar_usuario, db, user_data)
 
     return {
-        "message": "Usuario creado exitosamente",
-        "user_id": new_user.id_usuario,
-        "is_new": True,
+        "message": "Usuario creado exitosamente" if is_new else "Usuario actualizado",
+        "user_id": user_id,
+        "is_new": is_new,
         "groups": user_data.cognito_groups
     }
 
@@ -160,17 +213,16 @@ def get_user_info(email: str, db: Session = Depends(get_db)):
     Obtiene información del usuario por email.
     Incluye id_proveedor si el usuario es un trabajador aprobado.
     """
-    # ORIGINAL: búsqueda de usuario
-    user = db.query(Usuario).filter(Usuario.correo_electronico == email).first()
+    # Usuario y proveedor desde la caché de identidad
+    user = identidad_service.usuario_por_correo(db, email)
     
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    # ORIGINAL: búsqueda de proveedor aprobado
-    proveedor = db.query(Proveedor_Servicio).filter(
-        Proveedor_Servicio.id_proveedor == user.id_usuario,
-        Proveedor_Servicio.estado_solicitud == "aprobado"
-    ).first()
+    # Solo cuenta el proveedor aprobado
+    proveedor = identidad_service.proveedor_de(db, user.id_usuario)
+    if proveedor and proveedor.estado_solicitud != "aprobado":
+        proveedor = None
     
     response = {
         "id_usuario": user.id_usuario,
@@ -4,6 +4,7 @@ from typing import List
 from pydantic import BaseModel
 from app.core.database import get_db
 from app.models import Categoria_Servicio
+from app.services import catalogo_service
 
 router = APIRouter()
 
@@ -136,6 +137,8 @@ def update_category(category_id: int, category_update: CategoryUpdate, db: Sessi
         # Actualizar solo los campos proporcionados
         if category_update.nombre_categoria is not None:
             category.nombre_categoria = category_update.nombre_categoria
+            # El nombre de la categoría se muestra en las tarjetas del catálogo
+            catalogo_service.refrescar_tarjetas(db, id_categoria=category.id_categoria)
         if category_update.descripcion is not None:
             category.descripcion = category_update.descripcion
         if category_update.icono_url is not None:
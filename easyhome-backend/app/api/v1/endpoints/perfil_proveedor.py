@@ -1,13 +1,15 @@
 # app/api/v1/endpoints/perfil_proveedor.py
 from app.services.s3_service import s3_service
+from app.services import imagenes_service
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session, joinedload, aliased
-from sqlalchemy import func, cast, DECIMAL
+from sqlalchemy.orm import Session, joinedload, selectinload, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, cast, DECIMAL
 from datetime import datetime, timezone
 from typing import List
 from pydantic import BaseModel
-from app.api.v1.deps import get_current_user
+from app.api.v1.deps import get_current_user, Principal
 
 # --- Imports de Esquemas ---
 from app.schemas.proveedor import (
@@ -18,16 +20,15 @@ from app.schemas.proveedor import (
 )
 
 # --- Imports de Modelos ---
-from app.models.user import Proveedor_Servicio, Usuario
+from app.models.user import Proveedor_Servicio
 from app.models.property import Publicacion_Servicio, Imagen_Publicacion
 from app.models.servicio_contratado import Servicio_Contratado
 from app.models.reseña_servicio import Reseña_Servicio
 from app.models.imagen_reseña import Imagen_Reseña
 from app.models.alerta_sistema import Alerta_Sistema
-from app.models.user import Usuario
 
 # --- Import de DB ---
-from app.core.database import get_db 
+from app.core.database import get_db, get_async_db
 
 router = APIRouter(
     prefix="/proveedores",
@@ -38,16 +39,20 @@ router = APIRouter(
 # --- Endpoint 1: Pestaña "Acerca de" ---
 # -----------------------------------------------------------------
 @router.get("/{id_proveedor}/perfil-about", response_model=ProveedorPerfilAboutSchema)
-def get_perfil_about(id_proveedor: int, db: Session = Depends(get_db)):
+async def get_perfil_about(id_proveedor: int, db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene la información principal del perfil de un proveedor
     para la pestaña "Acerca de".
     """
     
-    proveedor = db.query(Proveedor_Servicio)\
-                  .options(joinedload(Proveedor_Servicio.usuario))\
-                  .filter(Proveedor_Servicio.id_proveedor == id_proveedor)\
-                  .first()
+    proveedor = await db.scalar(
+        select(Proveedor_Servicio)
+        .options(
+            joinedload(Proveedor_Servicio.usuario),
+            joinedload(Proveedor_Servicio.estadistica_proveedor)
+        )
+        .where(Proveedor_Servicio.id_proveedor == id_proveedor)
+    )
 
     if not proveedor:
         raise HTTPException(
@@ -55,9 +60,9 @@ def get_perfil_about(id_proveedor: int, db: Session = Depends(get_db)):
             detail=f"Proveedor con id {id_proveedor} no encontrado"
         )
 
-    total_reseñas = db.query(func.count(Reseña_Servicio.id_reseña))\
-                       .filter(Reseña_Servicio.id_proveedor == id_proveedor)\
-                       .scalar() or 0
+    # Total de reseñas desde el agregado precalculado (sin COUNT por petición)
+    estadistica = proveedor.estadistica_proveedor
+    total_reseñas = estadistica.total_reseñas if estadistica else 0
     
     años_activo = 0
     if proveedor.tiempo_activo_desde:
@@ -74,17 +79,21 @@ def get_perfil_about(id_proveedor: int, db: Session = Depends(get_db)):
 # --- Endpoint adicional: Datos para la alerta de contratación -----
 # -----------------------------------------------------------------
 @router.get("/{id_proveedor}/alerta", response_model=None)
-def get_proveedor_alerta(id_proveedor: int, db: Session = Depends(get_db)):
+async def get_proveedor_alerta(id_proveedor: int, db: AsyncSession = Depends(get_async_db)):
     """
     Devuelve un resumen ligero del proveedor para la ventana de
     "alerta de contratación" usada en el frontend. Retorna la URL
     pre-firmada de la foto de perfil (si existe), nombre, calificación
     y total de reseñas.
     """
-    proveedor = db.query(Proveedor_Servicio)\
-                  .options(joinedload(Proveedor_Servicio.usuario))\
-                  .filter(Proveedor_Servicio.id_proveedor == id_proveedor)\
-                  .first()
+    proveedor = await db.scalar(
+        select(Proveedor_Servicio)
+        .options(
+            joinedload(Proveedor_Servicio.usuario),
+            joinedload(Proveedor_Servicio.estadistica_proveedor)
+        )
+        .where(Proveedor_Servicio.id_proveedor == id_proveedor)
+    )
 
     if not proveedor:
         raise HTTPException(
@@ -92,14 +101,11 @@ def get_proveedor_alerta(id_proveedor: int, db: Session = Depends(get_db)):
             detail=f"Proveedor con id {id_proveedor} no encontrado"
         )
 
-    # Contar reseñas asociadas
-    total_reseñas = db.query(func.count(Reseña_Servicio.id_reseña))\
-                       .filter(Reseña_Servicio.id_proveedor == id_proveedor)\
-                       .scalar() or 0
+    # Total de reseñas y promedio desde el agregado precalculado
+    estadistica = proveedor.estadistica_proveedor
+    total_reseñas = estadistica.total_reseñas if estadistica else 0
 
     # Generar URL pre-firmada para la foto de perfil (si existe)
-    from app.services.s3_service import s3_service
-
     foto_key = proveedor.foto_perfil or (proveedor.usuario.foto_perfil if getattr(proveedor, 'usuario', None) else None)
     foto_url = None
     if foto_key:
@@ -114,7 +120,7 @@ def get_proveedor_alerta(id_proveedor: int, db: Session = Depends(get_db)):
         "id": proveedor.id_proveedor,
         "nombreCompleto": nombre,
         "fotoPerfil": foto_url,
-        "calificacionPromedio": proveedor.calificacion_promedio or 0,
+        "calificacionPromedio": (estadistica.calificacion_promedio if estadistica else None) or 0,
         "totalResenas": total_reseñas
     }
 
@@ -135,61 +141,60 @@ class AlertaResultadoBodySchema(BaseModel):
     "/{id_proveedor}/servicios",
     response_model=None
 )
-def get_perfil_servicios(id_proveedor: int, db: Session = Depends(get_db)):
+async def get_perfil_servicios(id_proveedor: int, db: AsyncSession = Depends(get_async_db)):
     """
     Devuelve todas las publicaciones del proveedor con:
     - Nombre correcto del proveedor
     - Foto de perfil firmada desde S3
     - Todas las imágenes de la publicación con URL firmada
     """
-    proveedor = db.query(Proveedor_Servicio).filter(
-        Proveedor_Servicio.id_proveedor == id_proveedor
-    ).first()
+    proveedor = await db.scalar(
+        select(Proveedor_Servicio)
+        .options(joinedload(Proveedor_Servicio.usuario))
+        .where(Proveedor_Servicio.id_proveedor == id_proveedor)
+    )
 
     if not proveedor:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
 
     usuario = proveedor.usuario
 
-    # ===========================
-    # OBTENER FOTO DE PERFIL
-    # ===========================
-    foto_perfil_url = None
     foto_key = proveedor.foto_perfil or (usuario.foto_perfil if usuario else None)
 
-    if foto_key:
-        try:
-            foto_perfil_url = s3_service.get_presigned_url(foto_key)
-        except:
-            foto_perfil_url = None
-
     # ===========================
     # PUBLICACIONES DEL PROVEEDOR
     # ===========================
-    publicaciones = (
-        db.query(Publicacion_Servicio)
-        .filter(Publicacion_Servicio.id_proveedor == id_proveedor)
-        .filter(Publicacion_Servicio.estado == "activo")
-        .options(joinedload(Publicacion_Servicio.imagen_publicacion))
+    publicaciones = (await db.scalars(
+        select(Publicacion_Servicio)
+        .where(Publicacion_Servicio.id_proveedor == id_proveedor)
+        .where(Publicacion_Servicio.estado == "activo")
+        .options(selectinload(Publicacion_Servicio.imagen_publicacion))
         .order_by(Publicacion_Servicio.fecha_publicacion.desc())
-        .all()
-    )
+    )).all()
+
+    # ===========================
+    # URLs PRE-FIRMADAS EN LOTE (miniatura de perfil + galerías en tamaño medio;
+    # el original mientras las variantes no estén listas)
+    # ===========================
+    originales = [img.url_imagen for pub in publicaciones for img in pub.imagen_publicacion]
+    listas = await imagenes_service.variantes_listas_async(db, [foto_key] + originales)
+    foto_key = imagenes_service.clave_vista(foto_key, "thumb", listas)
+    medianas = {key: imagenes_service.clave_vista(key, "medium", listas) for key in originales}
+
+    urls = s3_service.get_presigned_urls([foto_key] + list(medianas.values()))
+    foto_perfil_url = urls.get(foto_key)
 
     resultado = []
 
     for pub in publicaciones:
         # Galería completa
-        imagenes = []
-        for img in sorted(pub.imagen_publicacion, key=lambda x: x.orden):
-            try:
-                img_url = s3_service.get_presigned_url(img.url_imagen)
-            except:
-                img_url = None
-
-            imagenes.append({
+        imagenes = [
+            {
                 "id_imagen": img.id_imagen,
-                "url_imagen": img_url
-            })
+                "url_imagen": urls.get(medianas[img.url_imagen])
+            }
+            for img in sorted(pub.imagen_publicacion, key=lambda x: x.orden)
+        ]
 
         # Agregar al resultado final
         resultado.append({
@@ -220,31 +225,35 @@ def get_perfil_servicios(id_proveedor: int, db: Session = Depends(get_db)):
     "/{id_proveedor}/portafolio",
     response_model=List[ImagenPublicacionSchema]
 )
-def get_perfil_portafolio(id_proveedor: int, db: Session = Depends(get_db)):
+async def get_perfil_portafolio(id_proveedor: int, db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene una galería de todas las imágenes de todas las
     publicaciones activas de un proveedor, devolviendo URL firmadas.
     """
     
-    fotos = (
-        db.query(Imagen_Publicacion)
+    fotos = (await db.scalars(
+        select(Imagen_Publicacion)
         .join(Publicacion_Servicio, Publicacion_Servicio.id_publicacion == Imagen_Publicacion.id_publicacion)
-        .filter(Publicacion_Servicio.id_proveedor == id_proveedor)
-        .filter(Publicacion_Servicio.estado == "activo")
+        .where(Publicacion_Servicio.id_proveedor == id_proveedor)
+        .where(Publicacion_Servicio.estado == "activo")
         .order_by(Imagen_Publicacion.fecha_subida.desc())
-        .all()
-    )
+    )).all()
 
-    # 🚀 Convertir key → presigned URL
-    from app.services.s3_service import s3_service
+    # 🚀 Convertir key → presigned URL (en lote), usando la variante
+    # mediana cuando ya está generada
+    listas = await imagenes_service.variantes_listas_async(db, (foto.url_imagen for foto in fotos))
+    medianas = {foto.url_imagen: imagenes_service.clave_vista(foto.url_imagen, "medium", listas) for foto in fotos}
+    urls = s3_service.get_presigned_urls(medianas.values())
     fotos_con_url = []
 
     for foto in fotos:
-        presigned_url = s3_service.get_presigned_url(foto.url_imagen)
-        
+        key = medianas[foto.url_imagen]
+        if key not in urls:
+            continue  # No se pudo firmar (ya quedó en el log)
+
         fotos_con_url.append({
             "id_imagen": foto.id_imagen,
-            "url_imagen": presigned_url,   # ⬅️ YA ES URL REAL
+            "url_imagen": urls[key],   # ⬅️ YA ES URL REAL
             "orden": foto.orden
         })
 
@@ -257,24 +266,23 @@ def get_perfil_portafolio(id_proveedor: int, db: Session = Depends(get_db)):
     "/{id_proveedor}/resenas",
     response_model=List[ReseñaPublicaSchema]
 )
-def get_perfil_resenas(id_proveedor: int, db: Session = Depends(get_db)):
+async def get_perfil_resenas(id_proveedor: int, db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene la lista de todas las reseñas que ha recibido
     un proveedor, incluyendo las imágenes adjuntas y el
     nombre del cliente.
     """
-    resenas = (
-        db.query(Reseña_Servicio)
+    resenas = (await db.scalars(
+        select(Reseña_Servicio)
         .options(
             joinedload(Reseña_Servicio.usuario),
             joinedload(Reseña_Servicio.servicio_contratado),
-            joinedload(Reseña_Servicio.imagen_reseña)
+            selectinload(Reseña_Servicio.imagen_reseña)
         )
-        .filter(Reseña_Servicio.id_proveedor == id_proveedor)
-        .filter(Reseña_Servicio.estado == "activa")
+        .where(Reseña_Servicio.id_proveedor == id_proveedor)
+        .where(Reseña_Servicio.estado == "activa")
         .order_by(Reseña_Servicio.fecha_reseña.desc())
-        .all()
-    )
+    )).all()
     return resenas
 
 # -----------------------------------------------------------------
@@ -318,7 +326,7 @@ def registrar_resultado_alerta(
     id_proveedor: int,
     payload: AlertaResultadoSchema,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Registra en la base de datos el resultado de la alerta que se muestra
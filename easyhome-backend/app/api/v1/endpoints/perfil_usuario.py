@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_db, liberar_conexion
+from app.core.uploads import recibir_imagen
 from app.models.user import Usuario
 from app.services.s3_service import s3_service
+from app.services import catalogo_service, imagenes_service, eliminaciones_service, identidad_service
+import uuid
 import logging
-import io
 
 router = APIRouter(
     prefix="/usuarios",
@@ -13,92 +16,120 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
-ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
 MAX_FILE_SIZE = 5 * 1024 * 1024
 
 
-def validate_image_file(file: UploadFile, file_size: int):
-    if not file.filename:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Nombre de archivo inválido"
-        )
-
-    file_ext = file.filename.split('.')[-1].lower()
-    if file_ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Tipo de archivo no permitido. Permitidos: {', '.join(ALLOWED_EXTENSIONS)}"
-        )
-
-    if not file.content_type or not file.content_type.startswith('image/'):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El archivo debe ser una imagen"
-        )
+def _verificar_usuario(db: Session, id_usuario: int) -> None:
+    """404 si el usuario no existe; devuelve la conexión al pool antes de la subida."""
+    existe = db.query(Usuario.id_usuario).filter(Usuario.id_usuario == id_usuario).first()
+    liberar_conexion(db)
+    if not existe:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Archivo muy grande. Tamaño máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
 
-    if file_size == 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El archivo está vacío"
-        )
+def _guardar_foto_perfil(db: Session, id_usuario: int, uploaded_key: str) -> None:
+    """
+    Registra la nueva foto de perfil ya subida a S3 (bloqueante: se ejecuta
+    en el threadpool). La anterior va a la bandeja de eliminaciones de S3.
+    """
+    try:
+        usuario = db.query(Usuario).filter(Usuario.id_usuario == id_usuario).first()
+        if not usuario:
+            # Se eliminó durante la subida: la foto nueva queda sin referencia
+            eliminaciones_service.encolar_eliminaciones(db, [uploaded_key])
+            db.commit()
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+        anterior = usuario.foto_perfil
+        usuario.foto_perfil = uploaded_key
+        if anterior:
+            # La foto anterior (y sus variantes) va a la bandeja de eliminaciones de S3
+            eliminaciones_service.encolar_eliminaciones(
+                db, [anterior] + imagenes_service.descartar_variantes(db, [anterior])
+            )
+        catalogo_service.refrescar_tarjetas(db, ids_proveedor=[usuario.id_usuario])
+        db.commit()
+        identidad_service.invalidar_usuario(id_usuario)
+    except Exception:
+        db.rollback()
+        raise
 
 
-@router.put("/{id_usuario}/foto-perfil")
+def _descartar_foto_subida(db: Session, uploaded_key: str) -> None:
+    """
+    La foto ya está en S3 pero no se pudo registrar: va a la bandeja de
+    eliminaciones (en el threadpool). Si ni eso es posible se borra directo.
+    """
+    try:
+        eliminaciones_service.encolar_eliminaciones(db, [uploaded_key])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"No se pudo encolar la eliminación de {uploaded_key}: {e}")
+        s3_service.delete_files([uploaded_key])
+
+
+@router.put(
+    "/{id_usuario}/foto-perfil",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
+)
 async def actualizar_foto_perfil(
     id_usuario: int,
-    file: UploadFile = File(...),
+    request: Request,
     db: Session = Depends(get_db)
 ):
-    usuario = db.query(Usuario).filter(Usuario.id_usuario == id_usuario).first()
-    if not usuario:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    """
+    Actualiza la foto de perfil (campo multipart `file`).
 
-    try:
-        file_contents = await file.read()
-        file_size = len(file_contents)
-    except Exception as e:
-        logger.error(f"Error al leer el archivo: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No se pudo leer el archivo"
-        )
-    finally:
-        await file.close()
+    El cuerpo se procesa en streaming: el límite de MAX_FILE_SIZE y el
+    formato (magic bytes) se validan mientras llegan los chunks, el archivo
+    se acumula en un temporal acotado en memoria y se entrega tal cual a S3.
+    La sesión es síncrona: los accesos a la BD van al threadpool y la
+    conexión no se retiene durante la recepción ni la subida.
+    """
+    await run_in_threadpool(_verificar_usuario, db, id_usuario)
 
-    validate_image_file(file, file_size)
+    imagen = await recibir_imagen(request, max_bytes=MAX_FILE_SIZE)
 
     try:
-        if usuario.foto_perfil:
-            try:
-                s3_service.delete_file(usuario.foto_perfil)
-                logger.info(f"Foto anterior eliminada: {usuario.foto_perfil}")
-            except Exception as e:
-                logger.warning(f"No se pudo eliminar foto anterior: {e}")
-
-        file_extension = file.filename.split('.')[-1].lower()
-        s3_key = f"profile-images/{id_usuario}_{file.filename}"
+        # Key única por subida: la foto anterior se elimina en segundo plano y
+        # nunca debe coincidir con la nueva
+        nombre = imagen.filename.rsplit('/', 1)[-1] if imagen.filename else f"foto.{imagen.extension}"
+        s3_key = f"profile-images/{id_usuario}_{uuid.uuid4().hex[:8]}_{nombre}"
 
         try:
-            with io.BytesIO(file_contents) as file_obj:
-                uploaded_key = s3_service.upload_file(
-                    file_obj=file_obj,
-                    object_name=s3_key,
-                    content_type=file.content_type
-                )
+            uploaded_key = await run_in_threadpool(
+                s3_service.upload_file,
+                file_obj=imagen.archivo,
+                object_name=s3_key,
+                content_type=imagen.content_type
+            )
         except Exception as upload_error:
             logger.error(f"Error en s3_service.upload_file: {upload_error}")
             raise HTTPException(status_code=500, detail="Error al contactar S3")
 
-        usuario.foto_perfil = uploaded_key
-        db.commit()
-        db.refresh(usuario)
+        try:
+            await run_in_threadpool(_guardar_foto_perfil, db, id_usuario, uploaded_key)
+        except HTTPException:
+            # 404: _guardar_foto_perfil ya encoló la foto subida
+            raise
+        except Exception:
+            await run_in_threadpool(_descartar_foto_subida, db, uploaded_key)
+            raise
+        imagenes_service.encolar_variantes([uploaded_key])
 
         presigned_url = s3_service.get_presigned_url(uploaded_key)
 
@@ -116,6 +147,8 @@ async def actualizar_foto_perfil(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al subir la foto de perfil"
         )
+    finally:
+        imagen.cerrar()
 
 
 @router.get("/{id_usuario}/foto-perfil")
@@ -135,9 +168,15 @@ def eliminar_foto_perfil(id_usuario: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Foto de perfil no encontrada")
 
     try:
-        s3_service.delete_file(usuario.foto_perfil)
+        # El objeto de S3 (y sus variantes) se elimina en segundo plano,
+        # en la misma transacción que limpia la referencia
+        eliminaciones_service.encolar_eliminaciones(
+            db, [usuario.foto_perfil] + imagenes_service.descartar_variantes(db, [usuario.foto_perfil])
+        )
         usuario.foto_perfil = None
+        catalogo_service.refrescar_tarjetas(db, ids_proveedor=[usuario.id_usuario])
         db.commit()
+        identidad_service.invalidar_usuario(id_usuario)
         logger.info(f"Foto de perfil eliminada para usuario {id_usuario}")
         return {"message": "Foto de perfil eliminada correctamente"}
     except Exception as e:
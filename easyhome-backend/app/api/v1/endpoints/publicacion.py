@@ -1,21 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status, Query, Header
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, tuple_, select, literal_column, insert
 from typing import List, Optional
 from datetime import datetime
 import uuid
 import logging
 
 # --- Importaciones de tu proyecto ---
-from app.core.database import get_db
-from app.models.user import Usuario, Proveedor_Servicio
+from app.core.database import get_db, get_async_db, liberar_conexion
+from app.core.pagination import (
+    LIMITE_POR_DEFECTO, LIMITE_MAXIMO,
+    encode_cursor, decode_cursor, parse_datetime, parse_int, parse_decimal, parse_float,
+)
 # Ajusta esta importación si tus modelos están en archivos separados
 from app.models.property import Publicacion_Servicio, Categoria_Servicio, Imagen_Publicacion
+from app.models.tarjeta_catalogo import Tarjeta_Catalogo
 # from app.models.etiqueta import Etiqueta 
 
 # --- Importaciones de Servicios ---
 from app.services.s3_service import s3_service # Usamos el mismo servicio S3
 from app.services.cognito_service import cognito_service # Servicio de Cognito
+from app.services import catalogo_service, imagenes_service, eliminaciones_service, identidad_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/publicaciones", tags=["Publicaciones de Servicios"])
@@ -25,27 +32,14 @@ router = APIRouter(prefix="/publicaciones", tags=["Publicaciones de Servicios"])
 # 1️⃣ CREAR PUBLICACIÓN DE SERVICIO (Proveedor)
 # (Coincide con el formulario "Publica tu servicio")
 # =========================================================
-@router.post("/", status_code=status.HTTP_201_CREATED)
-async def crear_publicacion(
-    # --- Datos del Formulario ---
-    titulo: str = Form(...),
-    id_categoria: int = Form(..., description="El ID de la categoría seleccionada"),
-    descripcion: str = Form(...),
-    rango_precio_min: float = Form(...),
-    rango_precio_max: float = Form(...),
-    fotos: List[UploadFile] = File(..., description="Máximo 10 fotos"),
-    user_email: str = Form(..., description="Email del usuario autenticado"),
-    
-    # --- Datos de autenticación y BD ---
-    db: Session = Depends(get_db)
-):
+def _reservar_publicacion(db: Session, user_email: str, total_fotos: int, datos: dict) -> int:
     """
-    Permite a un PROVEEDOR autenticado crear una nueva publicación de servicio.
-    Sube las fotos de referencia a S3 y guarda la S3 Key.
+    Fase de BD inicial de `crear_publicacion` (bloqueante: se ejecuta en el
+    threadpool). Valida al proveedor y la categoría, crea la publicación
+    para reservar su ID y devuelve la conexión al pool.
     """
-    
-    # 🔹 1. Obtener el usuario desde la BD por email
-    current_user = db.query(Usuario).filter(Usuario.correo_electronico == user_email).first()
+    # 🔹 1. Obtener el usuario por email (caché de identidad)
+    current_user = identidad_service.usuario_por_correo(db, user_email)
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -53,101 +47,219 @@ async def crear_publicacion(
         )
     
     # 🔹 2. Verificar que el usuario sea un Proveedor
-    if not current_user.tipo_usuario == "proveedor" or not current_user.proveedor_servicio:
+    proveedor = identidad_service.proveedor_de(db, current_user.id_usuario)
+    if not current_user.tipo_usuario == "proveedor" or not proveedor:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Solo los proveedores de servicio pueden crear publicaciones."
         )
     
     # 🔹 3. Verificar límite de fotos (Máximo 10)
-    if len(fotos) > 10:
+    if total_fotos > 10:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Se permite un máximo de 10 fotos por publicación."
         )
 
     # 🔹 3. Verificar que la categoría exista
-    categoria = db.query(Categoria_Servicio).filter(Categoria_Servicio.id_categoria == id_categoria).first()
+    categoria = db.query(Categoria_Servicio).filter(Categoria_Servicio.id_categoria == datos["id_categoria"]).first()
     if not categoria:
         raise HTTPException(status_code=404, detail="La categoría seleccionada no existe.")
 
-    try:
-        proveedor = current_user.proveedor_servicio
+    id_usuario = current_user.id_usuario
 
-        if not proveedor:
-            raise HTTPException(
-                status_code=403,
-                detail="Tu cuenta debe estar registrada como proveedor para crear publicaciones."
-            )
-        # 🔹 4. Crear la publicación en la BD
+    # 🔹 4. FASE BD: crear la publicación para reservar su ID.
+    # La conexión se devuelve al pool antes de subir a S3.
+    try:
         nueva_publicacion = Publicacion_Servicio(
             id_proveedor=proveedor.id_proveedor,
-            id_categoria=id_categoria,
-            titulo=titulo,
-            descripcion=descripcion,
-            rango_precio_min=rango_precio_min,
-            rango_precio_max=rango_precio_max,
             estado="activo",
-            fecha_publicacion=datetime.utcnow()
+            fecha_publicacion=datetime.utcnow(),
+            **datos
         )
-        
         db.add(nueva_publicacion)
+        db.flush() # Para obtener el 'id_publicacion' generado
+        id_publicacion = nueva_publicacion.id_publicacion
+        liberar_conexion(db)
+        return id_publicacion
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error al crear publicación para proveedor {id_usuario}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno al crear la publicación: {e}")
+
+
+def _registrar_fotos_publicacion(db: Session, id_publicacion: int, filas: list) -> None:
+    """
+    Fase de BD final de `crear_publicacion` (en el threadpool): guarda las
+    S3 KEYS con un solo INSERT y crea la tarjeta del catálogo. Si falla,
+    elimina la publicación reservada y relanza el error.
+    """
+    try:
+        if filas:
+            db.execute(insert(Imagen_Publicacion), filas)
+        catalogo_service.refrescar_tarjetas(db, ids_publicacion=[id_publicacion])
         db.commit()
-        db.refresh(nueva_publicacion) # Para obtener el 'id_publicacion' generado
-
-        # 🔹 5. Subir fotos a S3 (MISMA LÓGICA DE SOLICITUD.PY)
-        urls_fotos_guardadas = []
-        for index, file in enumerate(fotos):
-            try:
-                # Generar S3 key (ruta en S3)
-                file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-                # Carpeta 'publicaciones/' -> 'id_publicacion' -> 'uuid.jpg'
-                s3_key = f"publicaciones/{nueva_publicacion.id_publicacion}/{uuid.uuid4()}.{file_extension}"
-                content_type = file.content_type
-                
-                # Subir a S3
-                s3_service.upload_file(
-                    file_obj=file.file,
-                    object_name=s3_key,
-                    content_type=content_type
-                )
-                
-                # Guardar S3 KEY en la tabla Imagen_Publicacion
-                nueva_foto = Imagen_Publicacion(
-                    id_publicacion=nueva_publicacion.id_publicacion,
-                    url_imagen=s3_key, # <-- Guardamos la S3 key, NO la URL
-                    orden=index + 1
-                )
-                db.add(nueva_foto)
-                urls_fotos_guardadas.append(s3_key)
-                
-            except Exception as e:
-                logger.error(f"Error al subir foto {file.filename} para pub {nueva_publicacion.id_publicacion}: {e}")
-                continue 
-        
-        db.commit()
-        
-        return {
-            "message": "Publicación creada exitosamente",
-            "id_publicacion": nueva_publicacion.id_publicacion,
-            "titulo": nueva_publicacion.titulo,
-            "fotos_guardadas_keys": urls_fotos_guardadas
-        }
+    except Exception:
+        db.rollback()
+        # Compensación: quitar la publicación reservada
+        try:
+            db.query(Publicacion_Servicio).filter(Publicacion_Servicio.id_publicacion == id_publicacion).delete()
+            liberar_conexion(db)
+        except Exception as error_compensacion:
+            db.rollback()
+            logger.error(f"No se pudo eliminar la publicación {id_publicacion} tras el error: {error_compensacion}")
+        raise
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def crear_publicacion(
+    # --- Datos del Formulario ---
+    titulo: str = Form(...),
+    id_categoria: int = Form(..., description="El ID de la categoría seleccionada"),
+    descripcion: str = Form(...),
+    rango_precio_min: float = Form(...),
+    rango_precio_max: float = Form(...),
+    fotos: List[UploadFile] = File(default=[], description="Máximo 10 fotos (o subirlas después vía /subidas)"),
+    user_email: str = Form(..., description="Email del usuario autenticado"),
+    
+    # --- Datos de autenticación y BD ---
+    db: Session = Depends(get_db)
+):
+    """
+    Permite a un PROVEEDOR autenticado crear una nueva publicación de servicio.
+    Sube las fotos de referencia a S3 y guarda la S3 Key.
 
+    La conexión a la BD no se retiene durante las subidas: se reserva la
+    publicación, se sube a S3 y después se registran las fotos. Si el
+    registro falla se eliminan la publicación y las fotos subidas. La
+    sesión es síncrona, así que las fases de BD corren en el threadpool.
+    """
+    datos = {
+        "id_categoria": id_categoria,
+        "titulo": titulo,
+        "descripcion": descripcion,
+        "rango_precio_min": rango_precio_min,
+        "rango_precio_max": rango_precio_max,
+    }
+    id_publicacion = await run_in_threadpool(_reservar_publicacion, db, user_email, len(fotos), datos)
+
+    # 🔹 5. FASE S3 (sin conexión a la BD): subir fotos en paralelo, fuera del event loop
+    subidas = []
+    for file in fotos:
+        # Generar S3 key (ruta en S3)
+        file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
+        # Carpeta 'publicaciones/' -> 'id_publicacion' -> 'uuid.jpg'
+        subidas.append({
+            "file_obj": file.file,
+            "object_name": f"publicaciones/{id_publicacion}/{uuid.uuid4()}.{file_extension}",
+            "content_type": file.content_type,
+        })
+    resultados = await run_in_threadpool(s3_service.upload_files, subidas)
+
+    # (el orden se conserva aunque alguna foto falle)
+    filas = []
+    for index, (file, resultado) in enumerate(zip(fotos, resultados)):
+        if not resultado["ok"]:
+            logger.error(f"Error al subir foto {file.filename} para pub {id_publicacion}: {resultado['error']}")
+            continue
+        filas.append({
+            "id_publicacion": id_publicacion,
+            "url_imagen": resultado["object_name"], # <-- Guardamos la S3 key, NO la URL
+            "orden": index + 1,
+        })
+    urls_fotos_guardadas = [fila["url_imagen"] for fila in filas]
+
+    # 🔹 6. FASE BD: guardar las S3 KEYS y crear la tarjeta del catálogo
+    # (publicación + fotos + proveedor)
+    try:
+        await run_in_threadpool(_registrar_fotos_publicacion, db, id_publicacion, filas)
     except Exception as e:
-        db.rollback()
-        logger.error(f"Error al crear publicación para proveedor {current_user.id_usuario}: {e}")
+        logger.error(f"Error al registrar las fotos de la publicación {id_publicacion}: {e}")
+        # Compensación: la publicación ya se quitó; eliminar las fotos ya subidas
+        await run_in_threadpool(s3_service.delete_files, urls_fotos_guardadas)
         raise HTTPException(status_code=500, detail=f"Error interno al crear la publicación: {e}")
 
+    # 🔹 7. Miniaturas/variantes WebP en segundo plano
+    imagenes_service.encolar_variantes(urls_fotos_guardadas)
+
+    return {
+        "message": "Publicación creada exitosamente",
+        "id_publicacion": id_publicacion,
+        "titulo": titulo,
+        "fotos_guardadas_keys": urls_fotos_guardadas
+    }
+
+
+async def _armar_tarjetas(db: AsyncSession, tarjetas: list) -> list:
+    """
+    Convierte filas de Tarjeta_Catalogo en las tarjetas que devuelve el catálogo.
+    Sirve la miniatura de la foto de perfil y la variante mediana de las
+    imágenes (o el original si aún no se generan) y firma todas las URLs
+    de la página en un solo lote.
+    """
+    originales = []
+    for tarjeta in tarjetas:
+        originales.append(tarjeta.foto_perfil_key)
+        originales.extend(img["url_imagen"] for img in tarjeta.imagenes)
+    listas = await imagenes_service.variantes_listas_async(db, originales)
+
+    def thumb(key):
+        return imagenes_service.clave_vista(key, "thumb", listas)
+
+    def medium(key):
+        return imagenes_service.clave_vista(key, "medium", listas)
+
+    keys = []
+    for tarjeta in tarjetas:
+        keys.append(thumb(tarjeta.foto_perfil_key))
+        keys.extend(medium(img["url_imagen"]) for img in tarjeta.imagenes)
+    urls = s3_service.get_presigned_urls(keys)
+
+    resultado = []
+    for tarjeta in tarjetas:
+        calificacion = tarjeta.calificacion_promedio
+        resultado.append({
+            "id_publicacion": tarjeta.id_publicacion,
+            "titulo": tarjeta.titulo,
+            "descripcion_completa": tarjeta.descripcion,
+            "id_proveedor": tarjeta.id_proveedor,
+
+            "nombre_proveedor": tarjeta.nombre_proveedor,
+            "foto_perfil_proveedor": urls.get(thumb(tarjeta.foto_perfil_key)),
+            "calificacion_proveedor": round(float(calificacion), 1) if calificacion is not None else 0.0,
+            "correo_proveedor": tarjeta.correo_proveedor,
+            "telefono_proveedor": tarjeta.telefono_proveedor,
+
+            "rango_precio_min": tarjeta.rango_precio_min,
+            "rango_precio_max": tarjeta.rango_precio_max,
+
+            "categoria": tarjeta.categoria,
+
+            "url_imagen_portada": urls.get(medium(tarjeta.imagen_portada_key)),
+            "fecha_publicacion": tarjeta.fecha_publicacion.isoformat() if tarjeta.fecha_publicacion else None,
+            "imagen_publicacion": [
+                {
+                    "id_imagen": img["id_imagen"],
+                    "url_imagen": urls.get(medium(img["url_imagen"]))
+                }
+                for img in tarjeta.imagenes
+            ],
+        })
+
+    return resultado
+
+
 # =========================================================
 # 2️⃣ MOSTRAR TODAS LAS PUBLICACIONES (FEED COMPLETO)
 # =========================================================
 @router.get("/", response_model=None)
-def listar_publicaciones(
-    db: Session = Depends(get_db),
+async def listar_publicaciones(
+    db: AsyncSession = Depends(get_async_db),
     categorias: Optional[List[int]] = Query(None),
     suscriptores: Optional[bool] = Query(False),
-    ordenar_por: Optional[str] = Query(None)
+    ordenar_por: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto como 'next_cursor'"),
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Publicaciones por página")
 ):
     """
     Devuelve publicaciones con:
@@ -157,152 +269,180 @@ def listar_publicaciones(
     - Portada de publicación (URL prefirmada)
     - TODAS las imágenes de la publicación (galería completa)
     - CORREO Y TELÉFONO DEL PROVEEDOR (¡NUEVO!)
+
+    Paginación por cursor (keyset): la respuesta incluye `next_cursor`,
+    que se envía como `cursor` para obtener la siguiente página
+    (null cuando ya no hay más resultados).
     """
+    por_calificacion = ordenar_por == "mejor_calificados"
+    orden = "calificacion" if por_calificacion else "fecha"
+
+    # Validar el cursor antes de consultar (400 si es inválido): fuera del
+    # try, para que un cursor mal formado nunca se convierta en un 500
+    valores_cursor = decode_cursor(cursor)
+    ultimos = None
+    if valores_cursor is not None:
+        if valores_cursor.get("o") != orden:
+            raise HTTPException(status_code=400, detail="El cursor no corresponde al ordenamiento solicitado.")
+        ultimos = [parse_datetime(valores_cursor.get("f")), parse_int(valores_cursor.get("id"))]
+        if por_calificacion:
+            ultimos.insert(0, parse_decimal(valores_cursor.get("c")))
 
     try:
         # =====================================================
         # 🟦 BASE QUERY + FILTROS
         # =====================================================
-        query = (
-            db.query(Publicacion_Servicio)
-            .options(joinedload(Publicacion_Servicio.proveedor_servicio).joinedload(Proveedor_Servicio.usuario))
-            .options(joinedload(Publicacion_Servicio.imagen_publicacion))
-            .options(joinedload(Publicacion_Servicio.categoria_servicio)) # Asegúrate de cargar la categoría
-            .filter(Publicacion_Servicio.estado == "activo")
-        )
+        # Una sola tabla: Tarjeta_Catalogo ya trae proveedor, categoría,
+        # calificación y galería de cada publicación
+        query = select(Tarjeta_Catalogo).where(Tarjeta_Catalogo.estado == "activo")
 
         # 🟧 FILTRO POR CATEGORÍAS
         if categorias:
-            query = query.filter(Publicacion_Servicio.id_categoria.in_(categorias))
+            query = query.where(Tarjeta_Catalogo.id_categoria.in_(categorias))
 
         # 🟩 FILTRO POR SUSCRIPTORES
         if suscriptores:
-            query = query.join(Proveedor_Servicio).filter(
-                Proveedor_Servicio.id_plan_suscripcion.isnot(None)
-            )
-
-        # 🟨 ORDENAMIENTO
-        if ordenar_por == "mas_recientes":
-            query = query.order_by(Publicacion_Servicio.fecha_publicacion.desc())
-
-        elif ordenar_por == "mejor_calificados":
-            query = query.join(Proveedor_Servicio).order_by(
-                Proveedor_Servicio.calificacion_promedio.desc().nullslast()
-            )
-
-        # Obtener publicaciones finales
-        publicaciones = query.limit(100).all()
+            query = query.where(Tarjeta_Catalogo.es_suscriptor.is_(True))
+
+        # 🟨 ORDENAMIENTO (siempre determinista para poder paginar)
+        # Los proveedores sin calificación van al final (-1 < cualquier promedio)
+        calificacion = func.coalesce(Tarjeta_Catalogo.calificacion_promedio, -1)
+        if por_calificacion:
+            claves = (calificacion, Tarjeta_Catalogo.fecha_publicacion, Tarjeta_Catalogo.id_publicacion)
+        else:
+            claves = (Tarjeta_Catalogo.fecha_publicacion, Tarjeta_Catalogo.id_publicacion)
+
+        # 🟪 KEYSET: continuar justo después de la última fila de la página anterior
+        if ultimos is not None:
+            query = query.where(tuple_(*claves) < tuple_(*ultimos))
+
+        query = query.order_by(*[clave.desc() for clave in claves])
+
+        # Pedimos una fila extra para saber si existe una página siguiente
+        tarjetas = (await db.scalars(query.limit(limite + 1))).all()
+        hay_mas = len(tarjetas) > limite
+        tarjetas = tarjetas[:limite]
+
+        next_cursor = None
+        if hay_mas and tarjetas:
+            ultima = tarjetas[-1]
+            valores = {"o": orden, "f": ultima.fecha_publicacion, "id": ultima.id_publicacion}
+            if por_calificacion:
+                promedio = ultima.calificacion_promedio
+                valores["c"] = promedio if promedio is not None else -1
+            next_cursor = encode_cursor(valores)
 
         # =====================================================
         # 🔄 ARMAR RESPUESTA
         # =====================================================
-        resultado = []
+        resultado = await _armar_tarjetas(db, tarjetas)
 
-        for pub in publicaciones:
-            prov = pub.proveedor_servicio
-            usuario = prov.usuario if prov else None
-
-            # ===========================
-            # FOTO DE PERFIL
-            # ===========================
-            foto_perfil_url = None
-            foto_key = None
-
-            if prov:
-                foto_key = prov.foto_perfil or (
-                    usuario.foto_perfil if usuario else None
-                )
-
-            if foto_key:
-                try:
-                    foto_perfil_url = s3_service.get_presigned_url(foto_key)
-                except:
-                    foto_perfil_url = None
-
-            # ===========================
-            # PORTADA (primera imagen)
-            # ===========================
-            url_imagen_portada = None
-            if pub.imagen_publicacion:
-                portada = sorted(pub.imagen_publicacion, key=lambda x: x.orden)[0]
-                try:
-                    url_imagen_portada = s3_service.get_presigned_url(portada.url_imagen)
-                except:
-                    url_imagen_portada = None
-
-            # ===========================
-            # CALCULAR CALIFICACIÓN PROMEDIO DEL PROVEEDOR
-            # ===========================
-            calificacion_promedio = 0.0
-            if prov:
-                # Calcular promedio de reseñas activas del proveedor
-                from app.models.reseña_servicio import Reseña_Servicio
-                avg_result = db.query(func.avg(Reseña_Servicio.calificacion_general))\
-                    .filter(Reseña_Servicio.id_proveedor == prov.id_proveedor)\
-                    .filter(Reseña_Servicio.estado == "activa")\
-                    .scalar()
-                
-                if avg_result is not None:
-                    calificacion_promedio = round(float(avg_result), 1)
-            
-            # ===========================
-            # AGREGAR PUBLICACIÓN AL RESULTADO
-            # GALERÍA COMPLETA
-            # ===========================
-            imagenes = []
-            for img in sorted(pub.imagen_publicacion, key=lambda x: x.orden):
-                try:
-                    img_url = s3_service.get_presigned_url(img.url_imagen)
-                except:
-                    img_url = None
-
-                imagenes.append({
-                    "id_imagen": img.id_imagen,
-                    "url_imagen": img_url
-                })
-
-            # ===========================
-            # ARMAR RESPUESTA FINAL
-            # ===========================
-            resultado.append({
-                "id_publicacion": pub.id_publicacion,
-                "titulo": pub.titulo,
-                "descripcion_completa": pub.descripcion,
-                "id_proveedor": pub.id_proveedor,
-
-                "nombre_proveedor": (
-                    prov.nombre_completo if prov and getattr(prov, "nombre_completo", None)
-                    else usuario.nombre if usuario and getattr(usuario, "nombre", None)
-                    else "Sin nombre"
-                ),
-
-                "foto_perfil_proveedor": foto_perfil_url,
-                "calificacion_proveedor": calificacion_promedio,
-
-                # --- 👇 AQUÍ ESTÁ LA SOLUCIÓN 👇 ---
-                # Agregamos los datos del 'usuario' asociado al proveedor
-                
-                "correo_proveedor": usuario.correo_electronico if usuario else None,
-                "telefono_proveedor": usuario.numero_telefono if usuario else None,
-                
-                # --- 👆 FIN DE LA SOLUCIÓN 👆 ---
-
-                "rango_precio_min": pub.rango_precio_min,
-                "rango_precio_max": pub.rango_precio_max,
-
-                "categoria": pub.categoria_servicio.nombre_categoria if pub.categoria_servicio else None,
-
-                "url_imagen_portada": url_imagen_portada,
-                "fecha_publicacion": pub.fecha_publicacion.isoformat() if pub.fecha_publicacion else None,
-                "imagen_publicacion": imagenes,
-            })
-
-        return resultado
+        return {
+            "publicaciones": resultado,
+            "next_cursor": next_cursor,
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al listar publicaciones: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
+# =========================================================
+# 🔎 BÚSQUEDA DE TEXTO COMPLETO
+# =========================================================
+# Configuración de texto de Postgres usada en el documento y en la consulta
+CONFIG_BUSQUEDA = literal_column("'spanish'::regconfig")
+OPCIONES_FRAGMENTO = "StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2"
+
+
+@router.get("/buscar", response_model=None)
+async def buscar_publicaciones(
+    q: str = Query(..., min_length=2, max_length=200, description="Texto a buscar (admite \"frases\", OR y -exclusión)"),
+    db: AsyncSession = Depends(get_async_db),
+    categorias: Optional[List[int]] = Query(None),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto como 'next_cursor'"),
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Publicaciones por página")
+):
+    """
+    Busca publicaciones activas por título, categoría, especializaciones del
+    proveedor y descripción (índice GIN sobre `documento_busqueda`).
+
+    Los resultados se ordenan por relevancia (ts_rank) y se paginan por cursor.
+    Cada resultado incluye la tarjeta del catálogo más `relevancia` y los
+    fragmentos `fragmento_titulo` / `fragmento_descripcion` con las
+    coincidencias marcadas entre <mark></mark>.
+    """
+    valores_cursor = decode_cursor(cursor)
+    ultimos = None
+    if valores_cursor is not None:
+        if valores_cursor.get("o") != "relevancia":
+            raise HTTPException(status_code=400, detail="El cursor no corresponde a una búsqueda.")
+        ultimos = (parse_float(valores_cursor.get("r")), parse_int(valores_cursor.get("id")))
+
+    try:
+        consulta = func.websearch_to_tsquery(CONFIG_BUSQUEDA, q)
+        relevancia = func.ts_rank(Publicacion_Servicio.documento_busqueda, consulta)
+
+        # 1) Página de ids: usa el índice GIN y solo calcula el ranking
+        pagina = (
+            select(Publicacion_Servicio.id_publicacion.label("id"), relevancia.label("relevancia"))
+            .where(Publicacion_Servicio.documento_busqueda.op("@@")(consulta))
+            .where(Publicacion_Servicio.estado == "activo")
+        )
+        if categorias:
+            pagina = pagina.where(Publicacion_Servicio.id_categoria.in_(categorias))
+        if ultimos is not None:
+            pagina = pagina.where(tuple_(relevancia, Publicacion_Servicio.id_publicacion) < tuple_(*ultimos))
+        pagina = (
+            pagina.order_by(relevancia.desc(), Publicacion_Servicio.id_publicacion.desc())
+            .limit(limite + 1)
+            .subquery()
+        )
+
+        # 2) Tarjetas y fragmentos (ts_headline) solo para las filas de la página.
+        # LEFT JOIN: una publicación aún sin tarjeta cuenta para `hay_mas` y
+        # el cursor (que salen de la página de ids) aunque no se devuelva
+        filas = (await db.execute(
+            select(
+                pagina.c.id,
+                pagina.c.relevancia,
+                Tarjeta_Catalogo,
+                func.ts_headline(CONFIG_BUSQUEDA, Tarjeta_Catalogo.titulo, consulta, OPCIONES_FRAGMENTO),
+                func.ts_headline(CONFIG_BUSQUEDA, Tarjeta_Catalogo.descripcion, consulta, OPCIONES_FRAGMENTO),
+            )
+            .select_from(pagina)
+            .outerjoin(Tarjeta_Catalogo, Tarjeta_Catalogo.id_publicacion == pagina.c.id)
+            .order_by(pagina.c.relevancia.desc(), pagina.c.id.desc())
+        )).all()
+
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+
+        next_cursor = None
+        if hay_mas and filas:
+            id_ultima, rango, _, _, _ = filas[-1]
+            next_cursor = encode_cursor({"o": "relevancia", "r": rango, "id": id_ultima})
+
+        filas = [fila for fila in filas if fila[2] is not None]
+        tarjetas = await _armar_tarjetas(db, [tarjeta for _, _, tarjeta, _, _ in filas])
+        for tarjeta, (_, rango, _, fragmento_titulo, fragmento_descripcion) in zip(tarjetas, filas):
+            tarjeta["relevancia"] = round(rango, 4)
+            tarjeta["fragmento_titulo"] = fragmento_titulo
+            tarjeta["fragmento_descripcion"] = fragmento_descripcion
+
+        return {
+            "publicaciones": tarjetas,
+            "next_cursor": next_cursor,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al buscar publicaciones ('{q}'): {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # =========================================================
 # ELIMINAR PUBLICACIÓN POR ID (versión sencilla, SIN headers)
 # =========================================================
@@ -327,25 +467,23 @@ def eliminar_publicacion(
     if not publicacion:
         raise HTTPException(status_code=404, detail="La publicación no existe")
 
-    # 2. Obtener imágenes asociadas
-    imagenes = db.query(Imagen_Publicacion).filter(
-        Imagen_Publicacion.id_publicacion == id_publicacion
-    ).all()
-
-    # 3. Intentar eliminar archivos en S3 (si truena, solo se registra)
-    for img in imagenes:
-        try:
-            s3_service.delete_file(img.url_imagen)
-        except Exception as e:
-            logger.error(f"Error al eliminar archivo S3 {img.url_imagen}: {e}")
+    # 2. Obtener las keys de las imágenes asociadas (y de sus variantes)
+    keys = [
+        url for (url,) in db.query(Imagen_Publicacion.url_imagen).filter(
+            Imagen_Publicacion.id_publicacion == id_publicacion
+        )
+    ]
+    keys += imagenes_service.descartar_variantes(db, keys)
 
-    # 4. Eliminar registros de imágenes
+    # 3. Eliminar registros de imágenes
     db.query(Imagen_Publicacion).filter(
         Imagen_Publicacion.id_publicacion == id_publicacion
     ).delete()
 
-    # 5. Eliminar la publicación
+    # 4. Eliminar la publicación y encolar los archivos de S3 en la misma
+    # transacción (el drenador en segundo plano los elimina en lote)
     db.delete(publicacion)
+    eliminaciones_service.encolar_eliminaciones(db, keys)
     db.commit()
 
     return {"message": "Publicación eliminada exitosamente"}
@@ -356,9 +494,9 @@ def eliminar_publicacion(
 # (Para la barra lateral)
 # =========================================================
 @router.get("/miembros-premium", response_model=None)
-def listar_miembros_premium(
+async def listar_miembros_premium(
     limit: int = Query(3, description="Número de miembros a mostrar (default: 3)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene una lista de los proveedores suscritos ("Premium"),
@@ -366,43 +504,32 @@ def listar_miembros_premium(
     para mostrar en la barra lateral[cite: 96].
     """
     try:
-        # 🔹 1. Query para buscar Proveedores Premium
-        # Hacemos 'join' con Usuario para verificar que la cuenta esté activa
-        query = db.query(Proveedor_Servicio)\
-            .join(Proveedor_Servicio.usuario)\
-            .filter(
-                # Tienen que tener un plan de suscripción (RF-15) 
-                Proveedor_Servicio.id_plan_suscripcion != None, 
-                # Tienen que estar 'aprobados'
-                Proveedor_Servicio.estado_solicitud == 'aprobado',
-                # Y su cuenta de 'usuario' debe estar 'activa' [cite: 451]
-                Usuario.estado_cuenta == 'activo'
-            )\
-            .order_by(
-                # Ordenar por mejor calificación (RF-15) 
-                Proveedor_Servicio.calificacion_promedio.desc().nullslast()
-            )\
+        # 🔹 1. Proveedores Premium desde el catálogo desnormalizado:
+        # suscritos (RF-15), aprobados y con cuenta de usuario activa [cite: 451],
+        # ordenados por mejor calificación (RF-15)
+        proveedores_premium = (await db.execute(
+            select(
+                Tarjeta_Catalogo.id_proveedor,
+                Tarjeta_Catalogo.nombre_proveedor,
+                Tarjeta_Catalogo.calificacion_promedio,
+                Tarjeta_Catalogo.foto_perfil_key,
+            )
+            .where(Tarjeta_Catalogo.es_suscriptor.is_(True), Tarjeta_Catalogo.proveedor_activo.is_(True))
+            .distinct()
+            .order_by(Tarjeta_Catalogo.calificacion_promedio.desc().nullslast(), Tarjeta_Catalogo.id_proveedor)
             .limit(limit) # Limitar a los 3 (o N) primeros
+        )).all()
 
-        proveedores_premium = query.all()
+        # 🔹 2. Construir respuesta con URLs pre-firmadas (en lote)
+        urls = s3_service.get_presigned_urls(prov.foto_perfil_key for prov in proveedores_premium)
 
-        # 🔹 2. Construir respuesta con URLs pre-firmadas
         resultado = []
         for prov in proveedores_premium:
-            url_foto = None
-            # Generar URL pre-firmada para la foto de perfil (fallback a Usuario.foto_perfil)
-            foto_key = prov.foto_perfil or (prov.usuario.foto_perfil if getattr(prov, 'usuario', None) else None)
-            if foto_key:
-                try:
-                    url_foto = s3_service.get_presigned_url(foto_key)
-                except Exception as e:
-                    logger.error(f"Error S3 URL para foto de perfil {foto_key}: {e}")
-            
             resultado.append({
                 "id_proveedor": prov.id_proveedor,
-                "nombre_completo": prov.nombre_completo,
+                "nombre_completo": prov.nombre_proveedor,
                 "calificacion_promedio": prov.calificacion_promedio,
-                "foto_perfil_url": url_foto # URL Temporal
+                "foto_perfil_url": urls.get(prov.foto_perfil_key) # URL Temporal
             })
             
         return resultado
@@ -8,8 +8,8 @@ from typing import Optional
 
 # --- Imports de Modelos ---
 from app.models.reporte_usuario import Reporte_Usuario
-from app.models.user import Usuario, Proveedor_Servicio
-from app.api.v1.deps import get_current_user
+from app.models.user import Proveedor_Servicio
+from app.api.v1.deps import get_current_user, Principal
 
 # --- Import de DB ---
 from app.core.database import get_db 
@@ -52,7 +52,7 @@ class ReporteResponseSchema(BaseModel):
 def crear_reporte(
     payload: ReporteCreateSchema,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Crea un nuevo reporte de un usuario contra un proveedor.
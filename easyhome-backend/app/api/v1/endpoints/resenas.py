@@ -1,22 +1,86 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, insert, update
 from datetime import datetime
 import uuid
 import logging
 from typing import List
 
-from app.core.database import get_db
+from app.api.v1.deps import get_current_admin, Principal
+from app.core.database import get_db, get_async_db, liberar_conexion
 from app.models.reseña_servicio import Reseña_Servicio
 from app.models.imagen_reseña import Imagen_Reseña
 from app.models.user import Usuario, Proveedor_Servicio
 from app.models.servicio_contratado import Servicio_Contratado
+from app.models.property import Publicacion_Servicio
 from app.services.s3_service import s3_service
+from app.services import estadisticas_service, imagenes_service, identidad_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/resenas", tags=["Resenas"])
 
 
+def _registrar_resena(db: Session, datos: dict) -> dict:
+    """
+    Fase de BD de la creación de una reseña (bloqueante: se ejecuta en el
+    threadpool). Guarda la reseña y el agregado del proveedor y libera la conexión.
+    """
+    usuario = identidad_service.usuario_por_correo(db, datos["user_email"])
+    if not usuario:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado.")
+
+    servicio_contratado = db.query(Servicio_Contratado).filter(
+        Servicio_Contratado.id_servicio_contratado == datos["id_servicio_contratado"]
+    ).first()
+    if not servicio_contratado:
+        raise HTTPException(status_code=404, detail="Servicio contratado no encontrado.")
+
+    proveedor = identidad_service.proveedor_de(db, servicio_contratado.id_proveedor)
+    if not proveedor:
+        raise HTTPException(status_code=404, detail="Proveedor no encontrado.")
+
+    nueva_reseña = Reseña_Servicio(
+        id_servicio_contratado=datos["id_servicio_contratado"],
+        id_cliente=usuario.id_usuario,
+        id_proveedor=proveedor.id_proveedor,
+        calificacion_general=datos["calificacion_general"],
+        calificacion_puntualidad=datos["calificacion_puntualidad"],
+        calificacion_calidad_servicio=datos["calificacion_calidad_servicio"],
+        calificacion_calidad_precio=datos["calificacion_calidad_precio"],
+        comentario=datos["comentario"],
+        recomendacion=datos["recomendacion"],
+        fecha_reseña=datetime.utcnow(),
+        estado="activa"
+    )
+
+    db.add(nueva_reseña)
+    # Actualizar el agregado del proveedor en la misma transacción
+    estadisticas_service.aplicar_resena(db, nueva_reseña)
+    db.flush()
+    respuesta = {
+        "message": "Reseña creada exitosamente.",
+        "id_reseña": nueva_reseña.id_reseña,
+        "total_imagenes": 0,
+        "estado": nueva_reseña.estado,
+        "fecha_reseña": nueva_reseña.fecha_reseña
+    }
+    # Devolver la conexión al pool antes de subir las imágenes a S3
+    liberar_conexion(db)
+    return respuesta
+
+
+def _registrar_imagenes_resena(db: Session, filas: list) -> None:
+    """Inserta las imágenes ya subidas de una reseña (en el threadpool)."""
+    try:
+        db.execute(insert(Imagen_Reseña), filas)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def crear_resena_servicio(
     id_servicio_contratado: int = Form(...),
@@ -30,154 +94,188 @@ async def crear_resena_servicio(
     imagenes: List[UploadFile] = File(default=[]),
     db: Session = Depends(get_db)
 ):
+    # La sesión es síncrona: todo acceso a la BD va al threadpool para no
+    # bloquear el event loop
+    datos = {
+        "id_servicio_contratado": id_servicio_contratado,
+        "user_email": user_email,
+        "calificacion_general": calificacion_general,
+        "calificacion_puntualidad": calificacion_puntualidad,
+        "calificacion_calidad_servicio": calificacion_calidad_servicio,
+        "calificacion_calidad_precio": calificacion_calidad_precio,
+        "comentario": comentario,
+        "recomendacion": recomendacion,
+    }
     try:
-        usuario = db.query(Usuario).filter(Usuario.correo_electronico == user_email).first()
-        if not usuario:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado.")
+        respuesta = await run_in_threadpool(_registrar_resena, db, datos)
+    except HTTPException:
+        raise
+    except Exception as e:
+        await run_in_threadpool(db.rollback)
+        logger.error(f"Error al crear reseña: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
 
-        servicio_contratado = db.query(Servicio_Contratado).filter(
-            Servicio_Contratado.id_servicio_contratado == id_servicio_contratado
-        ).first()
-        if not servicio_contratado:
-            raise HTTPException(status_code=404, detail="Servicio contratado no encontrado.")
+    # Procesar imágenes solo si se enviaron (subidas en paralelo, máximo 5)
+    id_reseña = respuesta["id_reseña"]
+    subidas = []
+    for imagen in (imagenes or [])[:5]:
+        if imagen.filename:
+            extension = imagen.filename.split('.')[-1] if '.' in imagen.filename else 'jpg'
+            subidas.append({
+                "file_obj": imagen.file,
+                "object_name": f"resenas/{uuid.uuid4()}.{extension}",
+                "content_type": imagen.content_type,
+            })
+    if not subidas:
+        return respuesta
+
+    # Subidas a S3 sin conexión a la BD
+    resultados = await run_in_threadpool(s3_service.upload_files, subidas)
+    filas = []
+    for resultado in resultados:
+        if not resultado["ok"]:
+            logger.error(f"Error al subir imagen de la reseña {id_reseña}: {resultado['error']}")
+            continue
+        filas.append({
+            "id_reseña": id_reseña,
+            "url_imagen": resultado["object_name"],
+            "fecha_subida": datetime.utcnow(),
+        })
+    if not filas:
+        return respuesta
+
+    # Registrar las imágenes en una transacción corta. La reseña ya está
+    # guardada: si esto falla se borran las imágenes subidas (como una
+    # subida fallida) en lugar de devolver un error que invite a duplicarla.
+    keys = [fila["url_imagen"] for fila in filas]
+    try:
+        await run_in_threadpool(_registrar_imagenes_resena, db, filas)
+    except Exception as e:
+        logger.error(f"Error al registrar las imágenes de la reseña {id_reseña}: {e}")
+        await run_in_threadpool(s3_service.delete_files, keys)
+        return respuesta
 
-        proveedor = db.query(Proveedor_Servicio).filter(
-            Proveedor_Servicio.id_proveedor == servicio_contratado.id_proveedor
-        ).first()
-        if not proveedor:
-            raise HTTPException(status_code=404, detail="Proveedor no encontrado.")
+    imagenes_service.encolar_variantes(keys)
+    respuesta["total_imagenes"] = len(filas)
+    return respuesta
 
-        nueva_reseña = Reseña_Servicio(
-            id_servicio_contratado=id_servicio_contratado,
-            id_cliente=usuario.id_usuario,
-            id_proveedor=proveedor.id_proveedor,
-            calificacion_general=calificacion_general,
-            calificacion_puntualidad=calificacion_puntualidad,
-            calificacion_calidad_servicio=calificacion_calidad_servicio,
-            calificacion_calidad_precio=calificacion_calidad_precio,
-            comentario=comentario,
-            recomendacion=recomendacion,
-            fecha_reseña=datetime.utcnow(),
-            estado="activa"
-        )
 
-        db.add(nueva_reseña)
-        db.commit()
-        db.refresh(nueva_reseña)
-
-        # Procesar imágenes solo si se enviaron
-        imagenes_subidas = 0
-        if imagenes and len(imagenes) > 0:
-            for imagen in imagenes[:5]:  # máximo 5
-                if imagen.filename:
-                    extension = imagen.filename.split('.')[-1] if '.' in imagen.filename else 'jpg'
-                    s3_key = f"resenas/{uuid.uuid4()}.{extension}"
-
-                    s3_service.upload_file(
-                        file_obj=imagen.file,
-                        object_name=s3_key,
-                        content_type=imagen.content_type
-                    )
-
-                    nueva_imagen = Imagen_Reseña(
-                        id_reseña=nueva_reseña.id_reseña,
-                        url_imagen=s3_key,
-                        fecha_subida=datetime.utcnow()
-                    )
-                    db.add(nueva_imagen)
-                    imagenes_subidas += 1
-
-            if imagenes_subidas > 0:
-                db.commit()
-
-        return {
-            "message": "Reseña creada exitosamente.",
-            "id_reseña": nueva_reseña.id_reseña,
-            "total_imagenes": imagenes_subidas,
-            "estado": nueva_reseña.estado,
-            "fecha_reseña": nueva_reseña.fecha_reseña
-        }
+# Estados que puede tomar una reseña (solo las 'activa' cuentan en el agregado)
+ESTADOS_RESEÑA = {"activa", "inactiva"}
+
 
+@router.put("/{id_reseña}/estado", status_code=status.HTTP_200_OK)
+def actualizar_estado_resena(
+    id_reseña: int,
+    estado: str = Form(..., description="Debe ser 'activa' o 'inactiva'"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_admin)
+):
+    """
+    Cambia el estado de una reseña (moderación, solo administradores) y
+    mantiene el agregado de calificaciones del proveedor.
+
+    El cambio es un UPDATE condicionado al estado leído: si otra petición
+    lo cambió antes, no se aplica y el agregado no se ajusta dos veces.
+    """
+    if estado not in ESTADOS_RESEÑA:
+        raise HTTPException(status_code=400, detail="Estado inválido. Use 'activa' o 'inactiva'.")
+
+    estado_anterior = db.scalar(select(Reseña_Servicio.estado).where(Reseña_Servicio.id_reseña == id_reseña))
+    if estado_anterior is None:
+        raise HTTPException(status_code=404, detail="Reseña no encontrada.")
+    if estado_anterior == estado:
+        return {"message": "La reseña ya tiene ese estado.", "id_reseña": id_reseña, "estado": estado}
+
+    try:
+        reseña = db.execute(
+            update(Reseña_Servicio)
+            .where(Reseña_Servicio.id_reseña == id_reseña, Reseña_Servicio.estado == estado_anterior)
+            .values(estado=estado)
+            .returning(Reseña_Servicio)
+        ).scalar_one_or_none()
+        if reseña is None:
+            # Otra petición cambió el estado entre la lectura y el UPDATE
+            db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail="El estado de la reseña cambió mientras se procesaba. Vuelva a intentarlo.",
+            )
+        estadisticas_service.registrar_cambio_estado(db, reseña, estado_anterior)
+        db.commit()
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
-        logger.error(f"Error al crear reseña: {e}")
+        logger.error(f"Error al cambiar estado de reseña {id_reseña}: {e}")
         raise HTTPException(status_code=500, detail=f"Error interno: {e}")
 
+    logger.info(f"Reseña {id_reseña}: {estado_anterior} -> {estado} (administrador {current_user.id_usuario})")
+    return {"message": "Estado de la reseña actualizado.", "id_reseña": id_reseña, "estado": estado}
+
+
+def _datos_resena(resena: Reseña_Servicio) -> dict:
+    return {
+        "id_reseña": resena.id_reseña,
+        "comentario": resena.comentario,
+        "calificacion_general": resena.calificacion_general,
+        "calificacion_puntualidad": resena.calificacion_puntualidad,
+        "calificacion_calidad_servicio": resena.calificacion_calidad_servicio,
+        "calificacion_calidad_precio": resena.calificacion_calidad_precio,
+        "fecha_reseña": resena.fecha_reseña.isoformat() if resena.fecha_reseña else None,
+    }
+
 
 @router.get("/cliente/{user_email}", status_code=status.HTTP_200_OK)
 async def obtener_resenas_cliente(
     user_email: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene todas las reseñas realizadas por un cliente específico.
+
+    Dos consultas en total sin importar cuántas reseñas haya: el cliente y
+    las reseñas unidas a proveedor, usuario del proveedor y publicación.
     """
     try:
         logger.info(f"Solicitando reseñas para cliente: {user_email}")
-        usuario = db.query(Usuario).filter(Usuario.correo_electronico == user_email).first()
-        if not usuario:
+        id_cliente = await db.scalar(select(Usuario.id_usuario).where(Usuario.correo_electronico == user_email))
+        if not id_cliente:
             logger.warning(f"Usuario {user_email} no encontrado")
             raise HTTPException(status_code=404, detail="Usuario no encontrado.")
 
-        resenas = db.query(Reseña_Servicio).filter(
-            Reseña_Servicio.id_cliente == usuario.id_usuario
-        ).all()
+        filas = (await db.execute(
+            select(
+                Reseña_Servicio,
+                Proveedor_Servicio.id_proveedor,
+                Usuario.nombre,
+                Usuario.foto_perfil,
+                Publicacion_Servicio.titulo,
+            )
+            .outerjoin(Proveedor_Servicio, Proveedor_Servicio.id_proveedor == Reseña_Servicio.id_proveedor)
+            .outerjoin(Usuario, Usuario.id_usuario == Proveedor_Servicio.id_proveedor)
+            .outerjoin(
+                Servicio_Contratado,
+                Servicio_Contratado.id_servicio_contratado == Reseña_Servicio.id_servicio_contratado,
+            )
+            .outerjoin(Publicacion_Servicio, Publicacion_Servicio.id_publicacion == Servicio_Contratado.id_publicacion)
+            .where(Reseña_Servicio.id_cliente == id_cliente)
+        )).all()
+
+        # Fotos de los proveedores firmadas en lote
+        urls = s3_service.get_presigned_urls(fila.foto_perfil for fila in filas)
 
         resultado = []
-        for resena in resenas:
-            proveedor = db.query(Proveedor_Servicio).filter(
-                Proveedor_Servicio.id_proveedor == resena.id_proveedor
-            ).first()
-
-            usuario_proveedor = None
-            foto_perfil_url = None
-            nombre_servicio = "Servicio"
-
-            if proveedor:
-                usuario_proveedor = db.query(Usuario).filter(
-                    Usuario.id_usuario == proveedor.id_proveedor
-                ).first()
-
-                if usuario_proveedor and usuario_proveedor.foto_perfil:
-                    try:
-                        foto_perfil_url = s3_service.get_presigned_url(
-                            usuario_proveedor.foto_perfil,
-                            expiration=3600
-                        )
-                    except Exception as e:
-                        logger.warning(f"No se pudo generar URL para foto de perfil: {e}")
-
-                servicio_contratado = db.query(Servicio_Contratado).filter(
-                    Servicio_Contratado.id_servicio_contratado == reseña.id_servicio_contratado
-                ).first()
-
-                if servicio_contratado and getattr(servicio_contratado, "id_publicacion", None):
-                    from app.models.property import Publicacion_Servicio
-                    publicacion = db.query(Publicacion_Servicio).filter(
-                        Publicacion_Servicio.id_publicacion == servicio_contratado.id_publicacion
-                    ).first()
-                    if publicacion:
-                        nombre_servicio = publicacion.titulo
-
+        for resena, id_proveedor, nombre_proveedor, foto_key, titulo in filas:
             resultado.append({
-                "reseña": {
-                    "id_reseña": reseña.id_reseña,
-                    "comentario": reseña.comentario,
-                    "calificacion_general": reseña.calificacion_general,
-                    "calificacion_puntualidad": reseña.calificacion_puntualidad,
-                    "calificacion_calidad_servicio": reseña.calificacion_calidad_servicio,
-                    "calificacion_calidad_precio": reseña.calificacion_calidad_precio,
-                    "fecha_reseña": reseña.fecha_reseña.isoformat() if reseña.fecha_reseña else None,
-                },
+                "reseña": _datos_resena(resena),
                 "cliente": {
                     "email": user_email,
                 },
                 "proveedor": {
-                    "nombre": usuario_proveedor.nombre if usuario_proveedor else "Proveedor",
-                    "servicio": nombre_servicio,
-                    "foto_perfil": foto_perfil_url,
+                    "nombre": nombre_proveedor or "Proveedor",
+                    "servicio": (titulo if id_proveedor else None) or "Servicio",
+                    "foto_perfil": urls.get(foto_key) if foto_key else None,
                 },
             })
 
@@ -193,87 +291,78 @@ async def obtener_resenas_cliente(
 @router.get("/proveedor/{id_proveedor}", status_code=status.HTTP_200_OK)
 async def obtener_resenas_proveedor(
     id_proveedor: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene todas las reseñas recibidas por un proveedor específico.
+
+    Dos consultas en total sin importar cuántas reseñas haya: el proveedor y
+    las reseñas unidas a cliente, publicación y promedio de cada cliente
+    (un solo GROUP BY para todos los autores).
     """
     try:
         logger.info(f"Solicitando reseñas para proveedor ID: {id_proveedor}")
-        # Validar proveedor
-        proveedor = db.query(Proveedor_Servicio).filter(Proveedor_Servicio.id_proveedor == id_proveedor).first()
+        # Validar proveedor (y datos de su usuario)
+        proveedor = (await db.execute(
+            select(Proveedor_Servicio.id_proveedor, Usuario.nombre, Usuario.foto_perfil)
+            .outerjoin(Usuario, Usuario.id_usuario == Proveedor_Servicio.id_proveedor)
+            .where(Proveedor_Servicio.id_proveedor == id_proveedor)
+        )).first()
         if not proveedor:
             logger.warning(f"Proveedor {id_proveedor} no encontrado")
             raise HTTPException(status_code=404, detail="Proveedor no encontrado.")
 
-        usuario_proveedor = db.query(Usuario).filter(Usuario.id_usuario == proveedor.id_proveedor).first()
+        # Calificación promedio de cada cliente (como autor de reseñas), solo
+        # para los clientes que reseñaron a este proveedor
+        autores = select(Reseña_Servicio.id_cliente).where(Reseña_Servicio.id_proveedor == id_proveedor)
+        promedios = (
+            select(
+                Reseña_Servicio.id_cliente,
+                func.avg(Reseña_Servicio.calificacion_general).label("calificacion_promedio"),
+            )
+            .where(Reseña_Servicio.id_cliente.in_(autores))
+            .group_by(Reseña_Servicio.id_cliente)
+            .subquery("promedios")
+        )
 
-        # Obtener reseñas recibidas por el proveedor
-        resenas = db.query(Reseña_Servicio).filter(
-            Reseña_Servicio.id_proveedor == id_proveedor
-        ).order_by(Reseña_Servicio.fecha_reseña.desc()).all()
+        # Reseñas recibidas por el proveedor con todo lo que muestra cada una
+        filas = (await db.execute(
+            select(
+                Reseña_Servicio,
+                Usuario.nombre,
+                Usuario.correo_electronico,
+                Usuario.foto_perfil,
+                promedios.c.calificacion_promedio,
+                Publicacion_Servicio.titulo,
+            )
+            .outerjoin(Usuario, Usuario.id_usuario == Reseña_Servicio.id_cliente)
+            .outerjoin(promedios, promedios.c.id_cliente == Reseña_Servicio.id_cliente)
+            .outerjoin(
+                Servicio_Contratado,
+                Servicio_Contratado.id_servicio_contratado == Reseña_Servicio.id_servicio_contratado,
+            )
+            .outerjoin(Publicacion_Servicio, Publicacion_Servicio.id_publicacion == Servicio_Contratado.id_publicacion)
+            .where(Reseña_Servicio.id_proveedor == id_proveedor)
+            .order_by(Reseña_Servicio.fecha_reseña.desc())
+        )).all()
+
+        # Fotos (proveedor y clientes) firmadas en lote
+        urls = s3_service.get_presigned_urls([proveedor.foto_perfil] + [fila.foto_perfil for fila in filas])
+        foto_perfil_url = urls.get(proveedor.foto_perfil, proveedor.foto_perfil) if proveedor.foto_perfil else None
 
         resultado = []
-        for resena in resenas:
-            # Info del cliente autor de la reseña
-            cliente_usuario = db.query(Usuario).filter(Usuario.id_usuario == resena.id_cliente).first()
-
-            # Foto de perfil del cliente (pre-firmada si existe)
-            foto_cliente_url = None
-            if cliente_usuario and cliente_usuario.foto_perfil:
-                try:
-                    foto_cliente_url = s3_service.get_presigned_url(cliente_usuario.foto_perfil, expiration=3600)
-                except Exception as e:
-                    logger.warning(f"No se pudo generar URL para foto del cliente: {e}")
-                    foto_cliente_url = None
-
-            # Calcular calificación promedio del cliente (como autor de reseñas)
-            calificacion_promedio_cliente = db.query(
-                func.avg(Reseña_Servicio.calificacion_general)
-            ).filter(
-                Reseña_Servicio.id_cliente == resena.id_cliente
-            ).scalar() or 0.0
-
-            # Nombre del servicio (desde Servicio_Contratado -> Publicacion_Servicio)
-            nombre_servicio = "Servicio"
-            servicio_contratado = db.query(Servicio_Contratado).filter(
-                Servicio_Contratado.id_servicio_contratado == resena.id_servicio_contratado
-            ).first()
-            if servicio_contratado and getattr(servicio_contratado, "id_publicacion", None):
-                from app.models.property import Publicacion_Servicio
-                publicacion = db.query(Publicacion_Servicio).filter(
-                    Publicacion_Servicio.id_publicacion == servicio_contratado.id_publicacion
-                ).first()
-                if publicacion:
-                    nombre_servicio = publicacion.titulo
-
-            # Foto de perfil del proveedor (pre-firmada si existe)
-            foto_perfil_url = None
-            if usuario_proveedor and usuario_proveedor.foto_perfil:
-                try:
-                    foto_perfil_url = s3_service.get_presigned_url(usuario_proveedor.foto_perfil, expiration=3600)
-                except Exception:
-                    foto_perfil_url = usuario_proveedor.foto_perfil
-
+        for resena, nombre_cliente, correo_cliente, foto_key, calificacion_promedio_cliente, titulo in filas:
             resultado.append({
-                "reseña": {
-                    "id_reseña": resena.id_reseña,
-                    "comentario": resena.comentario,
-                    "calificacion_general": resena.calificacion_general,
-                    "calificacion_puntualidad": resena.calificacion_puntualidad,
-                    "calificacion_calidad_servicio": resena.calificacion_calidad_servicio,
-                    "calificacion_calidad_precio": resena.calificacion_calidad_precio,
-                    "fecha_reseña": resena.fecha_reseña.isoformat() if resena.fecha_reseña else None,
-                },
+                "reseña": _datos_resena(resena),
                 "cliente": {
-                    "nombre": cliente_usuario.nombre if cliente_usuario else "Cliente",
-                    "email": cliente_usuario.correo_electronico if cliente_usuario else None,
-                    "foto_perfil": foto_cliente_url,
-                    "calificacion_promedio": round(calificacion_promedio_cliente, 1) if calificacion_promedio_cliente else 0.0,
+                    "nombre": nombre_cliente or "Cliente",
+                    "email": correo_cliente,
+                    "foto_perfil": urls.get(foto_key) if foto_key else None,
+                    "calificacion_promedio": round(float(calificacion_promedio_cliente), 1) if calificacion_promedio_cliente else 0.0,
                 },
                 "proveedor": {
-                    "nombre": usuario_proveedor.nombre if usuario_proveedor else "Proveedor",
-                    "servicio": nombre_servicio,
+                    "nombre": proveedor.nombre or "Proveedor",
+                    "servicio": titulo or "Servicio",
                     "foto_perfil": foto_perfil_url,
                 },
             })
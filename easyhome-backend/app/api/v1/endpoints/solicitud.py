@@ -1,17 +1,21 @@
 # app/api/v1/endpoints/solicitud.py
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import joinedload
 from typing import List, Optional
 from datetime import datetime
-from app.core.database import get_db
+from app.core.database import get_db, liberar_conexion
+from app.api.v1.deps import invalidar_principal
 from app.models.user import Proveedor_Servicio, Usuario
 # Asegúrate de que esta importación sea correcta según tu estructura
 # Si 'foto_trabajo.py' está en 'app/models/', esta importación es correcta.
 from app.models.foto_trabajo import Foto_Trabajo_Anterior 
 from app.services.cognito_service import cognito_service  # Importas tu servicio de Cognito
 from app.services.s3_service import s3_service  # Importar servicio S3
+from app.services import catalogo_service, imagenes_service, eliminaciones_service, identidad_service
 import uuid
 import logging # Es buena práctica añadir logging
 
@@ -27,31 +31,14 @@ router = APIRouter(prefix="/solicitudes", tags=["Solicitudes de Proveedor"])
 # Endpoint AJUSTADO (sin 'telefono_contacto')
 # =========================================================
 
-@router.post("/")
-async def crear_solicitud_proveedor(
-    # --- Campos del formulario de Figma (corregido) ---
-    # 'telefono_contacto' se elimina, se usará el del perfil de Usuario
-    curp: str = Form(...),
-    direccion: str = Form(...),
-    años_experiencia: int = Form(..., description="El frontend debe enviar un valor numérico (ej: 1, 3, 5, 10)"),
-    descripcion_servicios: Optional[str] = Form(None),
-    servicios_ofrece: List[str] = Form(..., description="Lista de servicios seleccionados, ej: ['Electricidad', 'Pintura']"),
-    fotos: List[UploadFile] = File(..., description="Evidencia fotográfica"),
-    
-    # --- Datos adicionales del frontend ---
-    nombre_completo: str = Form(...), # Nombre completo del usuario
-    user_email: str = Form(...), # Email del usuario logueado
-    db: Session = Depends(get_db) # Inyectar la sesión de DB
-):
+def _reservar_solicitud(db: Session, user_email: str, datos: dict) -> dict:
     """
-    Crea una solicitud de proveedor (postulación) asociada a un usuario (cliente) existente.
-    Guarda todos los datos del formulario de Figma y sube las fotos de evidencia.
-    El teléfono se hereda del perfil de usuario base.
+    Fase de BD inicial de `crear_solicitud_proveedor` (bloqueante: se ejecuta
+    en el threadpool). Crea la solicitud y devuelve la conexión al pool.
     """
-    
     try:
         # 🔹 1. Buscar usuario por correo
-        usuario = db.query(Usuario).filter(Usuario.correo_electronico == user_email).first()
+        usuario = identidad_service.usuario_por_correo(db, user_email)
         if not usuario:
             logger.warning(f"Intento de solicitud para usuario no existente: {user_email}")
             raise HTTPException(status_code=404, detail="Usuario no encontrado.")
@@ -64,90 +51,164 @@ async def crear_solicitud_proveedor(
 
 
         # 🔹 2. Verificar si ya tiene una solicitud o es proveedor activo
-        if usuario.proveedor_servicio:
+        if identidad_service.proveedor_de(db, usuario.id_usuario):
             logger.warning(f"Usuario {user_email} ya tiene una solicitud o es proveedor.")
             raise HTTPException(status_code=400, detail="Ya existe una solicitud o eres proveedor activo.")
 
         # 🔹 3. Convertir la lista de servicios en un string (ej: "Electricidad, Pintura, Plomería")
-        especializaciones_str = ", ".join(servicios_ofrece)
+        especializaciones_str = ", ".join(datos["servicios_ofrece"])
 
-        # 🔹 4. Crear la solicitud en la tabla Proveedor_Servicio
+        # 🔹 4. FASE BD: crear la solicitud en la tabla Proveedor_Servicio.
+        # La conexión se devuelve al pool antes de subir las fotos a S3.
         solicitud = Proveedor_Servicio(
             id_proveedor=usuario.id_usuario, # Se usa el ID del usuario como FK
-            nombre_completo=nombre_completo,
+            nombre_completo=datos["nombre_completo"],
             # 'telefono_contacto' se omite aquí
-            direccion=direccion,
-            curp=curp,
-            años_experiencia=años_experiencia,
-            experiencia_profesional=descripcion_servicios, # Mapeado a "Descripcion de tus servicios"
+            direccion=datos["direccion"],
+            curp=datos["curp"],
+            años_experiencia=datos["años_experiencia"],
+            experiencia_profesional=datos["descripcion_servicios"], # Mapeado a "Descripcion de tus servicios"
             especializaciones=especializaciones_str, # Mapeado a "Servicios que ofreces"
             estado_solicitud="pendiente", # Estado inicial
             fecha_solicitud=datetime.utcnow()
         )
 
         db.add(solicitud)
-        db.commit()
-        db.refresh(solicitud)
-
-        # 🔹 5. Guardar fotos en S3
-        urls_fotos_guardadas = []
-        for file in fotos:
-            try:
-                # Generar nombre único para el archivo
-                file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-                # Usar work-images/ como está configurado en el bucket
-                s3_key = f"work-images/{uuid.uuid4()}.{file_extension}"
-                
-                # Determinar content type basado en la extensión
-                content_types = {
-                    'jpg': 'image/jpeg',
-                    'jpeg': 'image/jpeg',
-                    'png': 'image/png',
-                    'gif': 'image/gif',
-                    'webp': 'image/webp'
-                }
-                content_type = content_types.get(file_extension.lower(), 'image/jpeg')
-                
-                # Subir archivo a S3 (retorna la S3 key, no URL pública)
-                s3_object_key = s3_service.upload_file(
-                    file_obj=file.file,
-                    object_name=s3_key,
-                    content_type=content_type
-                )
-                
-                # Guardar la S3 key en la base de datos (no URL pública)
-                # La key será usada para generar URLs pre-firmadas cuando se necesite
-                nueva_foto = Foto_Trabajo_Anterior(
-                    id_proveedor=solicitud.id_proveedor,
-                    url_imagen=s3_object_key,  # Guardar S3 key
-                    descripcion="Evidencia de trabajo (postulación)"
-                )
-                db.add(nueva_foto)
-                urls_fotos_guardadas.append(s3_object_key)
-                
-                logger.info(f"Foto subida a S3: {s3_object_key}")
-                
-            except Exception as e:
-                logger.error(f"Error al subir foto {file.filename}: {e}")
-                # Continuar con las demás fotos aunque una falle
-                continue
-        
-        db.commit()
-        logger.info(f"Nueva solicitud creada para {user_email}, ID: {solicitud.id_proveedor}")
-
-        return {
-            "message": "Solicitud enviada correctamente.",
-            "estado": solicitud.estado_solicitud,
+        db.flush()
+        reservada = {
             "id_solicitud": solicitud.id_proveedor,
-            "fotos_subidas": urls_fotos_guardadas,
-            "telefono_registrado": usuario.numero_telefono # Devuelve el teléfono que ya estaba
+            "estado_solicitud": solicitud.estado_solicitud,
+            "telefono_registrado": usuario.numero_telefono,
         }
+        liberar_conexion(db)
+        identidad_service.invalidar_proveedor(usuario.id_usuario)
+        return reservada
+
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback() # Revertir cambios en caso de error
         logger.error(f"Error al crear solicitud para {user_email}: {e}")
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
 
 
+def _registrar_fotos_solicitud(db: Session, id_solicitud: int, keys: list) -> None:
+    """
+    Fase de BD final de `crear_solicitud_proveedor` (en el threadpool): guarda
+    las S3 keys (no URL pública) con un solo INSERT. Si falla, elimina la
+    solicitud para que el usuario pueda reintentar y relanza el error.
+    """
+    try:
+        if keys:
+            db.execute(insert(Foto_Trabajo_Anterior), [
+                {
+                    "id_proveedor": id_solicitud,
+                    "url_imagen": s3_key,  # Guardar S3 key
+                    "descripcion": "Evidencia de trabajo (postulación)",
+                    }
+                for s3_key in keys
+            ])
+            logger.info(f"{len(keys)} fotos subidas a S3 para la solicitud {id_solicitud}")
+        db.commit()
+    except Exception:
+        db.rollback()
+        try:
+            db.query(Proveedor_Servicio).filter(Proveedor_Servicio.id_proveedor == id_solicitud).delete()
+            liberar_conexion(db)
+            # Una copia cacheada de la solicitud eliminada impediría reintentar
+            identidad_service.invalidar_proveedor(id_solicitud)
+        except Exception as error_compensacion:
+            db.rollback()
+            logger.error(f"No se pudo eliminar la solicitud {id_solicitud} tras el error: {error_compensacion}")
+        raise
+
+
+@router.post("/")
+async def crear_solicitud_proveedor(
+    # --- Campos del formulario de Figma (corregido) ---
+    # 'telefono_contacto' se elimina, se usará el del perfil de Usuario
+    curp: str = Form(...),
+    direccion: str = Form(...),
+    años_experiencia: int = Form(..., description="El frontend debe enviar un valor numérico (ej: 1, 3, 5, 10)"),
+    descripcion_servicios: Optional[str] = Form(None),
+    servicios_ofrece: List[str] = Form(..., description="Lista de servicios seleccionados, ej: ['Electricidad', 'Pintura']"),
+    fotos: List[UploadFile] = File(default=[], description="Evidencia fotográfica (o subirla después vía /subidas)"),
+    
+    # --- Datos adicionales del frontend ---
+    nombre_completo: str = Form(...), # Nombre completo del usuario
+    user_email: str = Form(...), # Email del usuario logueado
+    db: Session = Depends(get_db) # Inyectar la sesión de DB
+):
+    """
+    Crea una solicitud de proveedor (postulación) asociada a un usuario (cliente) existente.
+    Guarda todos los datos del formulario de Figma y sube las fotos de evidencia.
+    El teléfono se hereda del perfil de usuario base.
+
+    La conexión a la BD no se retiene durante las subidas a S3; si el registro
+    de las fotos falla se eliminan la solicitud y las fotos subidas.
+    La sesión es síncrona: las fases de BD corren en el threadpool.
+    """
+    datos = {
+        "nombre_completo": nombre_completo,
+        "direccion": direccion,
+        "curp": curp,
+        "años_experiencia": años_experiencia,
+        "descripcion_servicios": descripcion_servicios,
+        "servicios_ofrece": servicios_ofrece,
+    }
+    reservada = await run_in_threadpool(_reservar_solicitud, db, user_email, datos)
+    id_solicitud = reservada["id_solicitud"]
+
+    # 🔹 5. FASE S3 (sin conexión a la BD): guardar fotos en paralelo, fuera del event loop
+    # Determinar content type basado en la extensión
+    content_types = {
+        'jpg': 'image/jpeg',
+        'jpeg': 'image/jpeg',
+        'png': 'image/png',
+        'gif': 'image/gif',
+        'webp': 'image/webp'
+    }
+    subidas = []
+    for file in fotos:
+        # Generar nombre único para el archivo
+        file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
+        subidas.append({
+            "file_obj": file.file,
+            # Usar work-images/ como está configurado en el bucket
+            "object_name": f"work-images/{uuid.uuid4()}.{file_extension}",
+            "content_type": content_types.get(file_extension.lower(), 'image/jpeg'),
+        })
+    resultados = await run_in_threadpool(s3_service.upload_files, subidas)
+
+    # Las fotos que fallan se omiten y se continúa con las demás.
+    urls_fotos_guardadas = []
+    for file, resultado in zip(fotos, resultados):
+        if resultado["ok"]:
+            urls_fotos_guardadas.append(resultado["object_name"])
+        else:
+            logger.error(f"Error al subir foto {file.filename}: {resultado['error']}")
+
+    # 🔹 6. FASE BD: guardar las S3 keys (no URL pública).
+    # La key será usada para generar URLs pre-firmadas cuando se necesite.
+    try:
+        await run_in_threadpool(_registrar_fotos_solicitud, db, id_solicitud, urls_fotos_guardadas)
+    except Exception as e:
+        logger.error(f"Error al registrar las fotos de la solicitud {id_solicitud}: {e}")
+        # Compensación: la solicitud ya se quitó; eliminar las fotos ya subidas
+        await run_in_threadpool(s3_service.delete_files, urls_fotos_guardadas)
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
+
+    imagenes_service.encolar_variantes(urls_fotos_guardadas)
+    logger.info(f"Nueva solicitud creada para {user_email}, ID: {id_solicitud}")
+
+    return {
+        "message": "Solicitud enviada correctamente.",
+        "estado": reservada["estado_solicitud"],
+        "id_solicitud": id_solicitud,
+        "fotos_subidas": urls_fotos_guardadas,
+        "telefono_registrado": reservada["telefono_registrado"] # Devuelve el teléfono que ya estaba
+    }
+
 # =========================================================
 # 2️⃣ MOSTRAR SOLICITUDES (ADMINISTRADOR)
 # RF-07 / CU-08
@@ -172,32 +233,31 @@ def listar_solicitudes_admin(db: Session = Depends(get_db)):
             .all()
 
         resultado = []
+
+        # 2. Generar URLs pre-firmadas de TODAS las fotos en una sola llamada
+        # foto.url_imagen contiene la S3 key (ej: "work-images/uuid.jpg")
+        urls = s3_service.get_presigned_urls(
+            (foto.url_imagen for s in solicitudes for foto in s.foto_trabajo),
+            expiration=3600 # Damos 1 hora de validez
+        )
         
         # Iterar sobre cada solicitud encontrada
         for s in solicitudes:
             
-            # 2. Generar URLs pre-firmadas para las fotos de CADA solicitud
             fotos_con_urls = []
-            if s.foto_trabajo: # Si hay fotos asociadas
-                for foto in s.foto_trabajo:
-                    try:
-                        # foto.url_imagen contiene la S3 key (ej: "work-images/uuid.jpg")
-                        presigned_url = s3_service.get_presigned_url(
-                            object_name=foto.url_imagen,
-                            expiration=3600 # Damos 1 hora de validez
-                        )
-                        fotos_con_urls.append({
-                            "id_foto": foto.id_foto, # Asumiendo que el ID se llama id_foto (como en tu endpoint 4)
-                            "url_temporal": presigned_url,
-                            "descripcion": foto.descripcion
-                        })
-                    except Exception as e:
-                        logger.error(f"Error generando URL para foto {foto.url_imagen}: {e}")
-                        fotos_con_urls.append({
-                            "id_foto": foto.id_foto, # Asumiendo ID
-                            "url_temporal": None, # Indicar que falló
-                            "error": str(e)
-                        })
+            for foto in s.foto_trabajo or []:
+                if foto.url_imagen in urls:
+                    fotos_con_urls.append({
+                        "id_foto": foto.id_foto, # Asumiendo que el ID se llama id_foto (como en tu endpoint 4)
+                        "url_temporal": urls[foto.url_imagen],
+                        "descripcion": foto.descripcion
+                    })
+                else:
+                    fotos_con_urls.append({
+                        "id_foto": foto.id_foto, # Asumiendo ID
+                        "url_temporal": None, # Indicar que falló
+                        "error": "No se pudo generar la URL pre-firmada"
+                    })
 
             # 3. Construir el objeto JSON de respuesta para esta solicitud
             resultado.append({
@@ -256,37 +316,60 @@ def actualizar_estado_solicitud(
     if estado not in ["aprobado", "rechazado"]:
         raise HTTPException(status_code=400, detail="Estado inválido. Use 'aprobado' o 'rechazado'.")
 
-    usuario = db.query(Usuario).filter(Usuario.id_usuario == solicitud.id_proveedor).first()
+    usuario = identidad_service.usuario_por_id(db, solicitud.id_proveedor)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario asociado a la solicitud no encontrado.")
 
     # 🔹 Lógica de APROBACIÓN
     if estado == "aprobado":
-        solicitud.estado_solicitud = estado
-        solicitud.fecha_aprobacion = datetime.utcnow()
-        solicitud.tiempo_activo_desde = datetime.utcnow() # Inicia tiempo como proveedor
-        
+        correo = usuario.correo_electronico
+        cognito_sub = usuario.google_id
+        # Cognito se llama sin retener una conexión del pool
+        liberar_conexion(db)
+
         try:
-            # Actualizamos tipo_usuario local
-            usuario.tipo_usuario = "proveedor"
-            
             # -----------------------------------------------------------------
             # AQUI ESTÁ LA LÓGICA DE CAMBIO DE GRUPO QUE PEDISTE
             # Se llama a tu servicio de cognito para mover al usuario
+            # (es idempotente: si la fase de BD falla, se puede reintentar)
             # -----------------------------------------------------------------
-            cognito_service.add_user_to_group(
-                username=usuario.correo_electronico, 
+            agregado = cognito_service.add_user_to_group(
+                username=correo,
                 group_name="Trabajadores" # El grupo de proveedores
             )
-            
-            logger.info(f"Solicitud {id_proveedor} APROBADA. Usuario {usuario.correo_electronico} movido a 'Trabajadores'.")
-        
+
         except Exception as e:
-            db.rollback()
             logger.error(f"Error en Cognito al aprobar {id_proveedor}: {e}")
             raise HTTPException(status_code=500, detail=f"Error al actualizar grupo en Cognito: {e}")
+
+        # Transacción corta: estado de la solicitud + tipo_usuario local
+        try:
+            ahora = datetime.utcnow()
+            db.query(Proveedor_Servicio).filter(Proveedor_Servicio.id_proveedor == id_proveedor).update({
+                "estado_solicitud": estado,
+                "fecha_aprobacion": ahora,
+                "tiempo_activo_desde": ahora, # Inicia tiempo como proveedor
+            })
+            db.query(Usuario).filter(Usuario.id_usuario == id_proveedor).update({"tipo_usuario": "proveedor"})
+
+            # El estado de aprobación decide si el proveedor aparece como miembro premium
+            catalogo_service.refrescar_tarjetas(db, ids_proveedor=[id_proveedor])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error al aprobar la solicitud {id_proveedor} en la BD: {e}")
+            # Compensación: la solicitud sigue pendiente, así que el usuario
+            # no debe quedar en el grupo de proveedores de Cognito
+            if agregado and not cognito_service.remove_user_from_group(username=correo, group_name="Trabajadores"):
+                logger.error(f"{correo} quedó en 'Trabajadores' con la solicitud {id_proveedor} pendiente; "
+                             f"reintentar la aprobación lo corrige")
+            raise HTTPException(status_code=500, detail=f"Error al aprobar la solicitud: {e}")
+        identidad_service.invalidar_usuario(id_proveedor)
+        identidad_service.invalidar_proveedor(id_proveedor)
+        if cognito_sub:
+            invalidar_principal(cognito_sub)
         
-        db.commit()
+        logger.info(f"Solicitud {id_proveedor} APROBADA. Usuario {correo} movido a 'Trabajadores'.")
         
         return {
             "message": "Solicitud aprobada correctamente.", 
@@ -295,42 +378,39 @@ def actualizar_estado_solicitud(
         }
             
     else: # 🔹 Lógica de RECHAZO - ELIMINAR SOLICITUD
+        correo = usuario.correo_electronico
         try:
-            # 1. Obtener y eliminar fotos de S3 y BD
+            # 1. Obtener las keys de las fotos (y de sus variantes) y eliminar sus registros
             fotos = db.query(Foto_Trabajo_Anterior).filter(
                 Foto_Trabajo_Anterior.id_proveedor == id_proveedor
             ).all()
             
+            # url_imagen contiene la S3 key directamente (ej: work-images/uuid.jpg)
+            keys = [foto.url_imagen for foto in fotos]
+            keys += imagenes_service.descartar_variantes(db, keys)
             for foto in fotos:
-                try:
-                    # url_imagen ahora contiene la S3 key directamente (ej: work-images/uuid.jpg)
-                    s3_key = foto.url_imagen
-                    s3_service.delete_file(s3_key)
-                    logger.info(f"Foto eliminada de S3: {s3_key}")
-                except Exception as e:
-                    logger.warning(f"Error al eliminar foto de S3: {e}")
-                    # Continuar aunque falle la eliminación de S3
-                
-                # Eliminar de BD
                 db.delete(foto)
             
-            # 2. Eliminar la solicitud de la BD
+            # 2. Eliminar la solicitud de la BD y encolar las fotos de S3 en la
+            # misma transacción (el drenador en segundo plano las elimina en lote)
             db.delete(solicitud)
+            eliminaciones_service.encolar_eliminaciones(db, keys)
             db.commit()
-            
-            logger.info(f"Solicitud {id_proveedor} RECHAZADA y ELIMINADA. Usuario {usuario.correo_electronico} puede crear nueva solicitud.")
-            
-            return {
-                "message": "Solicitud rechazada y eliminada correctamente. El usuario puede crear una nueva solicitud.", 
-                "id_proveedor": id_proveedor,
-                "nuevo_estado": "eliminado"
-            }
+            identidad_service.invalidar_proveedor(id_proveedor)
             
         except Exception as e:
             db.rollback()
             logger.error(f"Error al eliminar solicitud {id_proveedor}: {e}")
             raise HTTPException(status_code=500, detail=f"Error al eliminar la solicitud: {e}")
 
+        logger.info(f"Solicitud {id_proveedor} RECHAZADA y ELIMINADA. Usuario {correo} puede crear nueva solicitud.")
+        
+        return {
+            "message": "Solicitud rechazada y eliminada correctamente. El usuario puede crear una nueva solicitud.", 
+            "id_proveedor": id_proveedor,
+            "nuevo_estado": "eliminado"
+        }
+
 
 # =========================================================
 # 4️⃣ OBTENER FOTOS DE UN PROVEEDOR CON URLs PRE-FIRMADAS
@@ -361,27 +441,26 @@ def obtener_fotos_proveedor(
         if not fotos:
             return []
         
-        # Generar URLs pre-firmadas para cada foto
+        # Generar URLs pre-firmadas para todas las fotos en una sola llamada
+        urls = s3_service.get_presigned_urls(
+            (foto.url_imagen for foto in fotos),  # S3 keys
+            expiration=expiration
+        )
+
         fotos_con_urls = []
         for foto in fotos:
-            try:
-                # Generar URL pre-firmada temporal
-                presigned_url = s3_service.get_presigned_url(
-                    object_name=foto.url_imagen,  # S3 key
-                    expiration=expiration
-                )
-                
-                fotos_con_urls.append({
-                    "id_foto": foto.id_foto,
-                    "url_temporal": presigned_url,
-                    "s3_key": foto.url_imagen,
-                    "descripcion": foto.descripcion,
-                    "fecha_subida": foto.fecha_subida,
-                    "expira_en": f"{expiration} segundos"
-                })
-            except Exception as e:
-                logger.error(f"Error generando URL pre-firmada para foto {foto.id_foto}: {e}")
+            if foto.url_imagen not in urls:
+                logger.error(f"Error generando URL pre-firmada para foto {foto.id_foto}")
                 continue
+
+            fotos_con_urls.append({
+                "id_foto": foto.id_foto,
+                "url_temporal": urls[foto.url_imagen],
+                "s3_key": foto.url_imagen,
+                "descripcion": foto.descripcion,
+                "fecha_subida": foto.fecha_subida,
+                "expira_en": f"{expiration} segundos"
+            })
         
         return fotos_con_urls
         
@@ -1,15 +1,22 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, joinedload
-
-from app.core.database import get_db
+from sqlalchemy import select, func, tuple_, literal, and_, union_all, bindparam
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.deps import get_current_user, Principal
+from app.core.database import get_db, get_async_db
+from app.core.pagination import (
+    LIMITE_POR_DEFECTO, LIMITE_MAXIMO, encode_cursor, decode_cursor, parse_datetime, parse_int,
+)
 from app.models.alerta_sistema import Alerta_Sistema
+from app.models.property import Publicacion_Servicio
 from app.models.servicio_contratado import Servicio_Contratado
-from app.models.user import Proveedor_Servicio
+from app.models.user import Usuario, Proveedor_Servicio
 from app.services.s3_service import s3_service
 
 router = APIRouter(
@@ -20,6 +27,15 @@ router = APIRouter(
 # Estados que continuan activos y pueden finalizarse desde el panel.
 ESTADOS_ACTIVOS = {"confirmado", "en_proceso"}
 
+# Todos los estados posibles de un servicio contratado (conteos del dashboard)
+ESTADOS_SERVICIO = ("contactado", "confirmado", "en_proceso", "finalizado", "cancelado")
+
+# Listas paginadas del dashboard del proveedor y los estados que agrupa cada una
+LISTAS_DASHBOARD = {
+    "activos": ESTADOS_ACTIVOS,
+    "finalizados": {"finalizado"},
+}
+
 
 class ClienteServicioSchema(BaseModel):
     id_usuario: int
@@ -55,34 +71,32 @@ class FinalizarServicioResponse(BaseModel):
     "/proveedores/{id_proveedor}/servicios-activos",
     response_model=List[ServicioActivoSchema]
 )
-def listar_servicios_activos(
+async def listar_servicios_activos(
     id_proveedor: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Devuelve el listado de servicios contratados en curso para un proveedor.
     """
-    servicios = (
-        db.query(Servicio_Contratado)
+    servicios = (await db.scalars(
+        select(Servicio_Contratado)
         .options(joinedload(Servicio_Contratado.usuario))
-        .filter(Servicio_Contratado.id_proveedor == id_proveedor)
-        .filter(Servicio_Contratado.estado_servicio.in_(ESTADOS_ACTIVOS))
+        .where(Servicio_Contratado.id_proveedor == id_proveedor)
+        .where(Servicio_Contratado.estado_servicio.in_(ESTADOS_ACTIVOS))
         .order_by(Servicio_Contratado.fecha_contacto.desc())
-        .all()
-    )
+    )).all()
 
     respuesta: List[ServicioActivoSchema] = []
 
+    # Fotos de los clientes firmadas en lote
+    urls = s3_service.get_presigned_urls(
+        getattr(servicio.usuario, "foto_perfil", None) for servicio in servicios
+    )
+
     for servicio in servicios:
         usuario = getattr(servicio, "usuario", None)
         foto_key = getattr(usuario, "foto_perfil", None)
-        foto_url = None
-
-        if usuario and foto_key:
-            try:
-                foto_url = s3_service.get_presigned_url(foto_key)
-            except Exception:
-                foto_url = foto_key
+        foto_url = urls.get(foto_key, foto_key) if usuario and foto_key else None
 
         servicio_payload = {
             "id_servicio_contratado": servicio.id_servicio_contratado,
@@ -178,44 +192,43 @@ def finalizar_servicio(
     "/proveedores/{id_proveedor}/servicios",
     summary="Devuelve servicios activos y finalizados del proveedor"
 )
-def listar_servicios_completos(
+async def listar_servicios_completos(
     id_proveedor: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Devuelve la lista de los servicios activos y finalizados
     """
     # --- Servicios Activos ---
-    servicios_activos = (
-        db.query(Servicio_Contratado)
+    servicios_activos = (await db.scalars(
+        select(Servicio_Contratado)
         .options(joinedload(Servicio_Contratado.usuario))
-        .filter(Servicio_Contratado.id_proveedor == id_proveedor)
-        .filter(Servicio_Contratado.estado_servicio.in_(ESTADOS_ACTIVOS))
+        .where(Servicio_Contratado.id_proveedor == id_proveedor)
+        .where(Servicio_Contratado.estado_servicio.in_(ESTADOS_ACTIVOS))
         .order_by(Servicio_Contratado.fecha_contacto.desc())
-        .all()
-    )
+    )).all()
 
     # --- Servicios Finalizados ---
-    servicios_finalizados = (
-        db.query(Servicio_Contratado)
+    servicios_finalizados = (await db.scalars(
+        select(Servicio_Contratado)
         .options(joinedload(Servicio_Contratado.usuario))
-        .filter(Servicio_Contratado.id_proveedor == id_proveedor)
-        .filter(Servicio_Contratado.estado_servicio == "finalizado")
+        .where(Servicio_Contratado.id_proveedor == id_proveedor)
+        .where(Servicio_Contratado.estado_servicio == "finalizado")
         .order_by(Servicio_Contratado.fecha_finalizacion.desc())
-        .all()
+    )).all()
+
+    # Fotos de los clientes firmadas en lote
+    urls = s3_service.get_presigned_urls(
+        getattr(servicio.usuario, "foto_perfil", None)
+        for servicio in servicios_activos + servicios_finalizados
     )
 
     def map_servicio(servicio):
         usuario = getattr(servicio, "usuario", None)
         foto_key = getattr(usuario, "foto_perfil", None)
 
-        # Generar URL de foto (si existe)
-        foto_url = None
-        if usuario and foto_key:
-            try:
-                foto_url = s3_service.get_presigned_url(foto_key)
-            except Exception:
-                foto_url = foto_key
+        # URL de foto (si existe)
+        foto_url = urls.get(foto_key, foto_key) if usuario and foto_key else None
 
         return {
             "id_servicio_contratado": servicio.id_servicio_contratado,
@@ -239,6 +252,226 @@ def listar_servicios_completos(
     }
 
 
+# -----------------------------------------------------------------
+# --- Dashboard del proveedor ---------------------------------------
+# -----------------------------------------------------------------
+def _fecha_orden(lista: str):
+    """Orden de cada lista: activos por fecha de contacto, finalizados por fecha de finalización."""
+    if lista == "finalizados":
+        return func.coalesce(Servicio_Contratado.fecha_finalizacion, Servicio_Contratado.fecha_contacto)
+    return Servicio_Contratado.fecha_contacto
+
+
+def _consulta_lista(id_proveedor: int, lista: str, valores_cursor: Optional[dict], limite: int):
+    """
+    Página de una lista (keyset sobre fecha de orden, id_servicio_contratado)
+    con los datos del cliente; pide una fila extra para saber si hay más.
+    """
+    fecha = _fecha_orden(lista)
+    claves = (fecha, Servicio_Contratado.id_servicio_contratado)
+
+    consulta = (
+        select(
+            literal(lista).label("lista"),
+            fecha.label("fecha_orden"),
+            Servicio_Contratado.id_servicio_contratado,
+            Servicio_Contratado.fecha_contacto,
+            Servicio_Contratado.fecha_confirmacion_acuerdo,
+            Servicio_Contratado.estado_servicio,
+            Servicio_Contratado.confirmacion_cliente_finalizado,
+            Servicio_Contratado.acuerdo_confirmado,
+            Servicio_Contratado.fecha_finalizacion,
+            Usuario.id_usuario,
+            Usuario.nombre,
+            Usuario.numero_telefono,
+            Usuario.foto_perfil,
+        )
+        .outerjoin(Usuario, Usuario.id_usuario == Servicio_Contratado.id_cliente)
+        .where(Servicio_Contratado.id_proveedor == id_proveedor)
+        # Estados como literales: así Postgres puede usar los índices parciales
+        # idx_servicio_proveedor_activos / _finalizados también con planes genéricos
+        .where(Servicio_Contratado.estado_servicio.in_(bindparam(
+            f"estados_{lista}", sorted(LISTAS_DASHBOARD[lista]), expanding=True, literal_execute=True,
+        )))
+    )
+    if valores_cursor is not None:
+        ultimos = (parse_datetime(valores_cursor.get("f")), parse_int(valores_cursor.get("id")))
+        consulta = consulta.where(tuple_(*claves) < tuple_(*ultimos))
+
+    return consulta.order_by(*[clave.desc() for clave in claves]).limit(limite + 1)
+
+
+def _pagina(filas, limite: int, urls: dict) -> dict:
+    """Servicios de una lista y su next_cursor (null si ya no hay más)."""
+    filas = sorted(filas, key=lambda fila: (fila.fecha_orden, fila.id_servicio_contratado), reverse=True)
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+
+    next_cursor = None
+    if hay_mas and filas:
+        ultima = filas[-1]
+        next_cursor = encode_cursor({"f": ultima.fecha_orden, "id": ultima.id_servicio_contratado})
+
+    servicios = [
+        {
+            "id_servicio_contratado": fila.id_servicio_contratado,
+            "fecha_contacto": fila.fecha_contacto,
+            "fecha_confirmacion_acuerdo": fila.fecha_confirmacion_acuerdo,
+            "estado_servicio": fila.estado_servicio,
+            "confirmacion_cliente_finalizado": fila.confirmacion_cliente_finalizado,
+            "acuerdo_confirmado": fila.acuerdo_confirmado,
+            "fecha_finalizacion": fila.fecha_finalizacion,
+            "usuario": {
+                "id_usuario": fila.id_usuario,
+                "nombre": fila.nombre or "Cliente sin nombre",
+                "numero_telefono": fila.numero_telefono,
+                "foto_perfil": urls.get(fila.foto_perfil, fila.foto_perfil) if fila.foto_perfil else None,
+            },
+        }
+        for fila in filas
+    ]
+    return {"servicios": servicios, "next_cursor": next_cursor}
+
+
+def _verificar_propietario(current_user: Principal, id_proveedor: int) -> None:
+    """Solo el propio proveedor ve su dashboard (clientes, teléfonos e ingresos)."""
+    if current_user.id_usuario != id_proveedor:
+        raise HTTPException(status_code=403, detail="No puedes acceder al dashboard de otro proveedor.")
+
+
+@router.get(
+    "/proveedores/{id_proveedor}/conteos",
+    summary="Servicios activos y finalizados de un proveedor (público)"
+)
+async def contar_servicios_proveedor(
+    id_proveedor: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Solo los totales de cada lista del dashboard, para el perfil público del
+    proveedor. No expone clientes ni ingresos.
+    """
+    agregados = (await db.execute(
+        select(Servicio_Contratado.estado_servicio, func.count().label("total"))
+        .where(
+            Servicio_Contratado.id_proveedor == id_proveedor,
+            Servicio_Contratado.estado_servicio.in_(set().union(*LISTAS_DASHBOARD.values())),
+        )
+        .group_by(Servicio_Contratado.estado_servicio)
+    )).all()
+
+    conteos = {fila.estado_servicio: fila.total for fila in agregados}
+    return {
+        lista: sum(conteos.get(estado, 0) for estado in estados)
+        for lista, estados in LISTAS_DASHBOARD.items()
+    }
+
+
+@router.get(
+    "/proveedores/{id_proveedor}/dashboard",
+    summary="Dashboard del proveedor: conteos, primera página de cada lista y estadísticas"
+)
+async def obtener_dashboard_proveedor(
+    id_proveedor: int,
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Servicios por lista"),
+    dias: int = Query(30, ge=1, le=365, description="Ventana de las estadísticas recientes"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Todo el dashboard en dos consultas, sin importar cuántos servicios tenga
+    el proveedor:
+
+    1. Agregado por estado (con FILTER): conteos y, en los últimos `dias`,
+       contratos confirmados, servicios finalizados e ingresos estimados
+       (suma del rango de precio de la publicación de cada servicio finalizado).
+    2. UNION ALL de la primera página de cada lista (`activos`, `finalizados`).
+
+    Cada lista trae su `next_cursor` para /dashboard/{lista}. Solo para el
+    propio proveedor; el perfil público usa /conteos.
+    """
+    _verificar_propietario(current_user, id_proveedor)
+    desde = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=dias)
+    finalizado_reciente = and_(
+        Servicio_Contratado.estado_servicio == "finalizado",
+        Servicio_Contratado.fecha_finalizacion >= desde,
+    )
+
+    # --- 1. Conteos y estadísticas ---
+    agregados = (await db.execute(
+        select(
+            Servicio_Contratado.estado_servicio,
+            func.count().label("total"),
+            func.count().filter(and_(
+                Servicio_Contratado.acuerdo_confirmado,
+                Servicio_Contratado.fecha_confirmacion_acuerdo >= desde,
+            )).label("contratos"),
+            func.count().filter(finalizado_reciente).label("finalizados"),
+            func.sum(Publicacion_Servicio.rango_precio_min).filter(finalizado_reciente).label("ingresos_min"),
+            func.sum(Publicacion_Servicio.rango_precio_max).filter(finalizado_reciente).label("ingresos_max"),
+        )
+        .outerjoin(Publicacion_Servicio,
+                   Publicacion_Servicio.id_publicacion == Servicio_Contratado.id_publicacion)
+        .where(Servicio_Contratado.id_proveedor == id_proveedor)
+        .group_by(Servicio_Contratado.estado_servicio)
+    )).all()
+
+    conteos = dict.fromkeys(ESTADOS_SERVICIO, 0)
+    estadisticas = {"dias": dias, "contratos": 0, "finalizados": 0,
+                    "ingresos_estimados_min": 0.0, "ingresos_estimados_max": 0.0}
+    for fila in agregados:
+        conteos[fila.estado_servicio] = fila.total
+        estadisticas["contratos"] += fila.contratos
+        estadisticas["finalizados"] += fila.finalizados
+        estadisticas["ingresos_estimados_min"] += float(fila.ingresos_min or 0)
+        estadisticas["ingresos_estimados_max"] += float(fila.ingresos_max or 0)
+
+    # --- 2. Primera página de cada lista ---
+    paginas = union_all(*[
+        select(_consulta_lista(id_proveedor, lista, None, limite).subquery())
+        for lista in LISTAS_DASHBOARD
+    ])
+    filas = (await db.execute(paginas)).all()
+
+    # Fotos de los clientes firmadas en lote
+    urls = s3_service.get_presigned_urls(fila.foto_perfil for fila in filas)
+
+    respuesta = {"conteos": conteos, "estadisticas": estadisticas}
+    for lista, estados in LISTAS_DASHBOARD.items():
+        respuesta[lista] = {
+            "total": sum(conteos.get(estado, 0) for estado in estados),
+            **_pagina([fila for fila in filas if fila.lista == lista], limite, urls),
+        }
+    return respuesta
+
+
+@router.get(
+    "/proveedores/{id_proveedor}/dashboard/{lista}",
+    summary="Siguientes páginas de una lista del dashboard del proveedor"
+)
+async def listar_pagina_dashboard(
+    id_proveedor: int,
+    lista: str,
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto como 'next_cursor'"),
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Servicios por página"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Página de `activos` o `finalizados` a partir del `next_cursor` del dashboard."""
+    _verificar_propietario(current_user, id_proveedor)
+    if lista not in LISTAS_DASHBOARD:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Lista '{lista}' no encontrada. Usa: {', '.join(LISTAS_DASHBOARD)}."
+        )
+
+    filas = (await db.execute(
+        _consulta_lista(id_proveedor, lista, decode_cursor(cursor), limite)
+    )).all()
+    urls = s3_service.get_presigned_urls(fila.foto_perfil for fila in filas)
+    return _pagina(filas, limite, urls)
+
+
 class ProveedorServicioSchema(BaseModel):
     id_proveedor: int
     id_usuario: int
@@ -272,9 +505,9 @@ class ServicioClienteSchema(BaseModel):
     response_model=List[ServicioClienteSchema],
     summary="Devuelve los servicios contratados por un cliente"
 )
-def listar_servicios_cliente(
+async def listar_servicios_cliente(
     id_cliente: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Devuelve la lista de servicios contratados por un cliente,
@@ -283,33 +516,33 @@ def listar_servicios_cliente(
     from app.models.user import Proveedor_Servicio
     from app.models.reseña_servicio import Reseña_Servicio
     
-    servicios = (
-        db.query(Servicio_Contratado)
+    servicios = (await db.scalars(
+        select(Servicio_Contratado)
         .options(
             joinedload(Servicio_Contratado.proveedor_servicio)
             .joinedload(Proveedor_Servicio.usuario)
         )
-        .options(joinedload(Servicio_Contratado.reseña_servicio))
-        .filter(Servicio_Contratado.id_cliente == id_cliente)
-        .filter(Servicio_Contratado.acuerdo_confirmado == True)
+        # Colección: selectinload (un joinedload obligaría a deduplicar filas)
+        .options(selectinload(Servicio_Contratado.reseña_servicio))
+        .where(Servicio_Contratado.id_cliente == id_cliente)
+        .where(Servicio_Contratado.acuerdo_confirmado == True)
         .order_by(Servicio_Contratado.fecha_contacto.desc())
-        .all()
-    )
+    )).all()
 
     respuesta: List[ServicioClienteSchema] = []
 
+    # Fotos de los proveedores firmadas en lote
+    urls = s3_service.get_presigned_urls(
+        getattr(getattr(servicio.proveedor_servicio, "usuario", None), "foto_perfil", None)
+        for servicio in servicios
+    )
+
     for servicio in servicios:
         proveedor_obj = getattr(servicio, "proveedor_servicio", None)
         usuario_proveedor = getattr(proveedor_obj, "usuario", None) if proveedor_obj else None
         
         foto_key = getattr(usuario_proveedor, "foto_perfil", None)
-        foto_url = None
-
-        if usuario_proveedor and foto_key:
-            try:
-                foto_url = s3_service.get_presigned_url(foto_key)
-            except Exception:
-                foto_url = foto_key
+        foto_url = urls.get(foto_key, foto_key) if usuario_proveedor and foto_key else None
 
         # Verificar si tiene reseña (soporta relación uno-a-uno o lista)
         # bool(None) -> False, bool([]) -> False, bool(objeto o lista no vacía) -> True
@@ -368,9 +601,9 @@ class ServicioInfoReseñaSchema(BaseModel):
     response_model=ServicioInfoReseñaSchema,
     summary="Obtiene información del servicio para el formulario de reseña"
 )
-def obtener_info_servicio_resena(
+async def obtener_info_servicio_resena(
     id_servicio_contratado: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Devuelve la información del proveedor y servicio necesaria
@@ -379,15 +612,14 @@ def obtener_info_servicio_resena(
     from app.models.user import Proveedor_Servicio
     from app.models.property import Publicacion_Servicio
     
-    servicio = (
-        db.query(Servicio_Contratado)
+    servicio = await db.scalar(
+        select(Servicio_Contratado)
         .options(
             joinedload(Servicio_Contratado.proveedor_servicio)
             .joinedload(Proveedor_Servicio.usuario)
         )
         .options(joinedload(Servicio_Contratado.publicacion_servicio))
-        .filter(Servicio_Contratado.id_servicio_contratado == id_servicio_contratado)
-        .first()
+        .where(Servicio_Contratado.id_servicio_contratado == id_servicio_contratado)
     )
 
     if not servicio:
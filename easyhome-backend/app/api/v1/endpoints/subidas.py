@@ -0,0 +1,352 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import uuid
+import logging
+
+from app.core.database import get_db, liberar_conexion
+from app.api.v1.deps import get_current_user, Principal
+from app.models.user import Usuario, Proveedor_Servicio
+from app.models.property import Publicacion_Servicio, Imagen_Publicacion
+from app.models.foto_trabajo import Foto_Trabajo_Anterior
+from app.models.reseña_servicio import Reseña_Servicio
+from app.models.imagen_reseña import Imagen_Reseña
+from app.services.s3_service import s3_service
+from app.services import catalogo_service, imagenes_service, eliminaciones_service, identidad_service
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/subidas", tags=["Subidas directas a S3"])
+
+
+# =========================================================
+# ⚙️ CONFIGURACIÓN
+# El cliente sube las imágenes DIRECTO a S3 con una política
+# POST pre-firmada; la API nunca recibe los bytes.
+# =========================================================
+CONTENT_TYPES_PERMITIDOS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+MB = 1024 * 1024
+
+# destino -> prefijo base de la key, máximo de imágenes y tamaño máximo por imagen
+DESTINOS = {
+    "publicacion": {"prefijo": "publicaciones", "max_archivos": 10, "max_bytes": 10 * MB},
+    "solicitud": {"prefijo": "work-images", "max_archivos": 10, "max_bytes": 10 * MB},
+    "resena": {"prefijo": "resenas", "max_archivos": 5, "max_bytes": 10 * MB},
+    "perfil": {"prefijo": "profile-images", "max_archivos": 1, "max_bytes": 5 * MB},
+}
+VIGENCIA_POLITICA = 900  # 15 minutos
+
+
+class ArchivoSolicitado(BaseModel):
+    nombre: str
+    content_type: str
+    tamaño: int = Field(..., gt=0, description="Tamaño en bytes")
+
+
+class PoliticasRequest(BaseModel):
+    destino: str = Field(..., description="publicacion | solicitud | resena | perfil")
+    id_recurso: Optional[int] = Field(None, description="id_publicacion o id_reseña (según el destino)")
+    archivos: List[ArchivoSolicitado]
+
+
+class ConfirmarRequest(BaseModel):
+    destino: str
+    id_recurso: Optional[int] = None
+    keys: List[str]
+
+
+def _prefijo_de(destino: str, id_recurso: Optional[int], usuario: Principal, db: Session) -> str:
+    """
+    Valida que el usuario pueda subir imágenes al recurso y devuelve el
+    prefijo de S3 reservado para él (ej: "publicaciones/15/").
+    """
+    config = DESTINOS.get(destino)
+    if not config:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Destino inválido. Use: {', '.join(DESTINOS)}"
+        )
+
+    if destino == "publicacion":
+        publicacion = db.query(Publicacion_Servicio).filter(Publicacion_Servicio.id_publicacion == id_recurso).first()
+        if not publicacion:
+            raise HTTPException(status_code=404, detail="Publicación no encontrada.")
+        if publicacion.id_proveedor != usuario.id_usuario:
+            raise HTTPException(status_code=403, detail="La publicación no pertenece al usuario.")
+        return f"{config['prefijo']}/{id_recurso}/"
+
+    if destino == "resena":
+        reseña = db.query(Reseña_Servicio).filter(Reseña_Servicio.id_reseña == id_recurso).first()
+        if not reseña:
+            raise HTTPException(status_code=404, detail="Reseña no encontrada.")
+        if reseña.id_cliente != usuario.id_usuario:
+            raise HTTPException(status_code=403, detail="La reseña no pertenece al usuario.")
+        return f"{config['prefijo']}/{id_recurso}/"
+
+    if destino == "solicitud" and not db.query(Proveedor_Servicio.id_proveedor).filter(
+        Proveedor_Servicio.id_proveedor == usuario.id_usuario
+    ).first():
+        raise HTTPException(status_code=404, detail="El usuario no tiene una solicitud de proveedor.")
+
+    # solicitud / perfil: el recurso es el propio usuario
+    return f"{config['prefijo']}/{usuario.id_usuario}/"
+
+
+def _imagenes_actuales(destino: str, id_recurso: Optional[int], usuario: Principal, db: Session) -> set:
+    """S3 keys ya registradas en la BD para el recurso."""
+    if destino == "publicacion":
+        filas = db.query(Imagen_Publicacion.url_imagen).filter(Imagen_Publicacion.id_publicacion == id_recurso)
+    elif destino == "resena":
+        filas = db.query(Imagen_Reseña.url_imagen).filter(Imagen_Reseña.id_reseña == id_recurso)
+    elif destino == "solicitud":
+        filas = db.query(Foto_Trabajo_Anterior.url_imagen).filter(Foto_Trabajo_Anterior.id_proveedor == usuario.id_usuario)
+    else:
+        foto_perfil = db.query(Usuario.foto_perfil).filter(Usuario.id_usuario == usuario.id_usuario).scalar()
+        return {foto_perfil} if foto_perfil else set()
+    return {url for (url,) in filas.all()}
+
+
+def _bloquear_recurso(destino: str, id_recurso: Optional[int], id_usuario: int, db: Session) -> None:
+    """
+    Bloquea (FOR UPDATE) la fila dueña de las imágenes: las confirmaciones
+    concurrentes del mismo recurso se serializan y respetan max_archivos.
+    """
+    if destino == "publicacion":
+        stmt = select(Publicacion_Servicio.id_publicacion).where(Publicacion_Servicio.id_publicacion == id_recurso)
+    elif destino == "resena":
+        stmt = select(Reseña_Servicio.id_reseña).where(Reseña_Servicio.id_reseña == id_recurso)
+    elif destino == "solicitud":
+        stmt = select(Proveedor_Servicio.id_proveedor).where(Proveedor_Servicio.id_proveedor == id_usuario)
+    else:
+        stmt = select(Usuario.id_usuario).where(Usuario.id_usuario == id_usuario)
+    if db.execute(stmt.with_for_update()).first() is None:
+        # Se eliminó mientras se verificaban los objetos en S3
+        raise HTTPException(status_code=404, detail="El recurso ya no existe.")
+
+
+def _insertar_imagenes(db: Session, modelo, columna_recurso, filas: list) -> list:
+    """
+    Inserta las filas en un solo INSERT ... ON CONFLICT DO NOTHING sobre
+    (recurso, url_imagen) y devuelve las keys realmente insertadas.
+    """
+    stmt = (
+        pg_insert(modelo)
+        .values(filas)
+        .on_conflict_do_nothing(index_elements=[columna_recurso, modelo.url_imagen])
+        .returning(modelo.url_imagen)
+    )
+    insertadas = set(db.execute(stmt).scalars().all())
+    return [fila["url_imagen"] for fila in filas if fila["url_imagen"] in insertadas]
+
+
+# =========================================================
+# 1️⃣ EMITIR POLÍTICAS POST PRE-FIRMADAS
+# =========================================================
+@router.post("/politicas", status_code=status.HTTP_200_OK)
+def emitir_politicas(
+    data: PoliticasRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Devuelve una política POST pre-firmada por archivo. El cliente envía
+    cada archivo a `url` como multipart/form-data con los `fields` indicados
+    (el archivo va al final, en el campo `file`) y después llama a
+    `/subidas/confirmar` con las `key` subidas.
+
+    Cada política fija la key (dentro del prefijo del recurso), el
+    Content-Type, el cifrado, el tamaño máximo permitido y la etiqueta de
+    subida pendiente: los objetos que nunca se confirman los expira la
+    regla de ciclo de vida del bucket (scripts/configure_s3_lifecycle.py).
+    """
+    prefijo = _prefijo_de(data.destino, data.id_recurso, current_user, db)
+    config = DESTINOS[data.destino]
+
+    if not data.archivos:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un archivo.")
+
+    existentes = len(_imagenes_actuales(data.destino, data.id_recurso, current_user, db))
+    if existentes + len(data.archivos) > config["max_archivos"] and data.destino != "perfil":
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se permite un máximo de {config['max_archivos']} imágenes (ya hay {existentes})."
+        )
+    if data.destino == "perfil" and len(data.archivos) > 1:
+        raise HTTPException(status_code=400, detail="Solo se permite una foto de perfil.")
+
+    for archivo in data.archivos:
+        if archivo.content_type not in CONTENT_TYPES_PERMITIDOS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tipo de archivo no permitido ({archivo.nombre}). Permitidos: {', '.join(CONTENT_TYPES_PERMITIDOS)}"
+            )
+        if archivo.tamaño > config["max_bytes"]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Archivo muy grande ({archivo.nombre}). Tamaño máximo: {config['max_bytes'] // MB}MB"
+            )
+
+    try:
+        politicas = []
+        for archivo in data.archivos:
+            key = f"{prefijo}{uuid.uuid4()}.{CONTENT_TYPES_PERMITIDOS[archivo.content_type]}"
+            politica = s3_service.generate_presigned_post(
+                object_name=key,
+                content_type=archivo.content_type,
+                max_size=config["max_bytes"],
+                expiration=VIGENCIA_POLITICA,
+                # Etiqueta de subida pendiente: S3 expira el objeto si nunca se confirma
+                pending=True
+            )
+            politicas.append({
+                "nombre": archivo.nombre,
+                "key": key,
+                "url": politica["url"],
+                "fields": politica["fields"],
+            })
+
+        return {"politicas": politicas, "expira_en": VIGENCIA_POLITICA}
+
+    except Exception as e:
+        logger.error(f"Error al emitir políticas de subida ({data.destino}) para usuario {current_user.id_usuario}: {e}")
+        raise HTTPException(status_code=500, detail="Error al generar las políticas de subida.")
+
+
+# =========================================================
+# 2️⃣ CONFIRMAR SUBIDAS Y REGISTRAR EN LA BD
+# =========================================================
+@router.post("/confirmar", status_code=status.HTTP_200_OK)
+def confirmar_subidas(
+    data: ConfirmarRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Verifica (HEAD en S3) que los objetos subidos existen y cumplen tipo y
+    tamaño, y registra las filas correspondientes en un solo INSERT
+    (Imagen_Publicacion / Foto_Trabajo_Anterior / Imagen_Reseña) o actualiza
+    la foto de perfil. Es idempotente: las keys ya registradas se ignoran
+    (ON CONFLICT sobre la restricción única recurso + url_imagen).
+
+    La conexión a la BD no se retiene durante las llamadas a S3. Las keys
+    pierden la etiqueta de subida pendiente solo después del commit (la
+    regla de ciclo de vida del bucket expira las que la conservan); las que
+    S3 no pudo actualizar vuelven en `pendientes` para reintentar. Las
+    inválidas van a la bandeja de eliminaciones de S3.
+    """
+    prefijo = _prefijo_de(data.destino, data.id_recurso, current_user, db)
+    config = DESTINOS[data.destino]
+    id_usuario = current_user.id_usuario
+
+    keys = list(dict.fromkeys(data.keys))
+    if not keys:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos una key.")
+    ajenas = [key for key in keys if not key.startswith(prefijo) or "/" in key[len(prefijo):]]
+    if ajenas:
+        raise HTTPException(status_code=403, detail=f"Keys fuera del prefijo permitido: {', '.join(ajenas)}")
+    if data.destino == "perfil" and len(keys) > 1:
+        raise HTTPException(status_code=400, detail="Solo se permite una foto de perfil.")
+
+    # FASE S3 (sin conexión a la BD): verificar en paralelo que los objetos existen y son válidos
+    liberar_conexion(db)
+    objetos = s3_service.head_objects(keys)
+    faltantes = [key for key in keys if key not in objetos]
+    invalidas = [
+        key for key, info in objetos.items()
+        if info["content_type"] not in CONTENT_TYPES_PERMITIDOS or not 0 < info["size"] <= config["max_bytes"]
+    ]
+    validas = [key for key in keys if key in objetos and key not in invalidas]
+
+    # FASE BD: registrar las válidas
+    try:
+        _bloquear_recurso(data.destino, data.id_recurso, id_usuario, db)
+        existentes = _imagenes_actuales(data.destino, data.id_recurso, current_user, db)
+        nuevas = [key for key in validas if key not in existentes]
+
+        if data.destino == "perfil":
+            nuevas = nuevas[:1]
+        elif len(existentes) + len(nuevas) > config["max_archivos"]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Se permite un máximo de {config['max_archivos']} imágenes (ya hay {len(existentes)})."
+            )
+
+        # Objetos subidos que no cumplen tipo o tamaño: nunca se registrarán
+        eliminaciones_service.encolar_eliminaciones(db, [key for key in invalidas if key not in existentes])
+
+        registradas = []
+        if data.destino == "perfil":
+            if nuevas:
+                usuario = db.query(Usuario).filter(Usuario.id_usuario == id_usuario).first()
+                anterior = usuario.foto_perfil
+                usuario.foto_perfil = nuevas[0]
+                if anterior:
+                    # La foto anterior (y sus variantes) va a la bandeja de eliminaciones de S3
+                    eliminaciones_service.encolar_eliminaciones(
+                        db, [anterior] + imagenes_service.descartar_variantes(db, [anterior])
+                    )
+                catalogo_service.refrescar_tarjetas(db, ids_proveedor=[id_usuario])
+                registradas = nuevas
+
+        elif nuevas:
+            if data.destino == "publicacion":
+                orden_actual = db.query(func.coalesce(func.max(Imagen_Publicacion.orden), 0)).filter(
+                    Imagen_Publicacion.id_publicacion == data.id_recurso
+                ).scalar()
+                registradas = _insertar_imagenes(db, Imagen_Publicacion, Imagen_Publicacion.id_publicacion, [
+                    {"id_publicacion": data.id_recurso, "url_imagen": key, "orden": orden_actual + i + 1}
+                    for i, key in enumerate(nuevas)
+                ])
+                catalogo_service.refrescar_tarjetas(db, ids_publicacion=[data.id_recurso])
+            elif data.destino == "solicitud":
+                registradas = _insertar_imagenes(db, Foto_Trabajo_Anterior, Foto_Trabajo_Anterior.id_proveedor, [
+                    {"id_proveedor": id_usuario, "url_imagen": key, "descripcion": "Evidencia de trabajo (postulación)"}
+                    for key in nuevas
+                ])
+            elif data.destino == "resena":
+                registradas = _insertar_imagenes(db, Imagen_Reseña, Imagen_Reseña.id_reseña, [
+                    {"id_reseña": data.id_recurso, "url_imagen": key}
+                    for key in nuevas
+                ])
+
+        db.commit()
+
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error al confirmar subidas ({data.destino}) para usuario {id_usuario}: {e}")
+        raise HTTPException(status_code=500, detail="Error al registrar las imágenes.")
+
+    if data.destino == "perfil" and registradas:
+        identidad_service.invalidar_usuario(id_usuario)
+
+    # FASE S3 tras el commit: sin la etiqueta de pendiente la regla de ciclo
+    # de vida ya no las expira. Incluye las ya registradas, por si un intento
+    # anterior no pudo quitarla; las que fallen se reintentan confirmando de nuevo.
+    try:
+        pendientes = s3_service.delete_object_tags(validas)
+    except Exception as e:
+        logger.error(f"Error al quitar la etiqueta de pendiente ({data.destino}) para usuario {id_usuario}: {e}")
+        pendientes = list(validas)
+
+    # Miniaturas/variantes WebP en segundo plano
+    imagenes_service.encolar_variantes(registradas)
+
+    logger.info(f"Subidas confirmadas ({data.destino}) para usuario {id_usuario}: {len(registradas)}")
+    return {
+        "registradas": registradas,
+        "ya_registradas": [key for key in validas if key not in registradas],
+        "faltantes": faltantes,
+        "invalidas": invalidas,
+        # Registradas que conservan la etiqueta de pendiente: reintentar la confirmación
+        "pendientes": pendientes,
+    }
@@ -0,0 +1,133 @@
+"""
+Caché en memoria (por proceso) con expiración por entrada y desalojo LRU
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_FALTANTE = object()
+
+
+class TTLCache:
+    """
+    Caché LRU acotada en tamaño, con TTL por entrada y segura entre hilos.
+
+    - Las entradas expiradas se tratan como faltantes (cuentan como miss).
+    - Al superar `maxsize` se desaloja la entrada usada hace más tiempo.
+    - `stats()` expone contadores de hits, misses y desalojos.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize debe ser mayor que 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Devuelve el valor vigente de `key` o `default`."""
+        with self._lock:
+            entrada = self._data.get(key, _FALTANTE)
+            if entrada is _FALTANTE:
+                self.misses += 1
+                return default
+
+            valor, expira = entrada
+            if expira is not None and expira <= self._clock():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Guarda `value`; `ttl` (segundos) reemplaza el TTL por defecto de la caché."""
+        ttl = self.ttl if ttl is None else ttl
+        expira = self._clock() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (value, expira)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Elimina `key` (invalidación explícita) y devuelve su valor."""
+        with self._lock:
+            entrada = self._data.pop(key, _FALTANTE)
+        return default if entrada is _FALTANTE else entrada[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _Vuelo:
+    __slots__ = ("evento", "resultado", "error")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave en una sola ejecución.
+
+    El primer hilo que pide `key` ejecuta `fn`; los que llegan mientras está
+    en curso esperan y reciben el mismo resultado (o la misma excepción).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vuelos: "dict[Hashable, _Vuelo]" = {}
+        self.compartidas = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            vuelo = self._vuelos.get(key)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[key] = _Vuelo()
+            else:
+                self.compartidas += 1
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado
+
+        try:
+            vuelo.resultado = fn()
+            return vuelo.resultado
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._vuelos[key]
+            vuelo.evento.set()
@@ -0,0 +1,161 @@
+"""
+Verificación local de tokens JWT de Cognito (access e ID tokens)
+
+Las firmas se validan contra el JWKS del user pool, que se descarga una vez
+y se mantiene en memoria: se refresca cada COGNITO_JWKS_REFRESH_SECONDS y,
+si llega un `kid` desconocido (rotación de llaves), se vuelve a descargar
+como máximo una vez por minuto. Con COGNITO_JWKS_FILE el JWKS se lee de un
+archivo local (pruebas sin red). Verificar un token no requiere llamadas
+de red ni consultas a la BD.
+"""
+import json
+import logging
+import threading
+import time
+import urllib.request
+from typing import Callable, Optional
+
+import jwt
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ALGORITMOS = ["RS256"]
+# Tolerancia (s) para diferencias de reloj al validar exp/iat
+MARGEN_RELOJ = 30
+# Espera mínima (s) entre descargas forzadas por un `kid` desconocido
+ESPERA_RECARGA = 60
+TIMEOUT_DESCARGA = 5
+
+
+class TokenInvalido(Exception):
+    """El token no es un JWT de Cognito válido para esta aplicación."""
+
+
+class JWKSCache:
+    """
+    Llaves públicas del user pool indexadas por `kid`, seguras entre hilos.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        archivo: Optional[str] = None,
+        refresco: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not url and not archivo:
+            raise ValueError("Se requiere la URL o el archivo del JWKS")
+        self.url = url
+        self.archivo = archivo
+        self.refresco = refresco
+        self._clock = clock
+        self._llaves: dict[str, jwt.PyJWK] = {}
+        self._cargado_en: Optional[float] = None
+        self._lock = threading.Lock()
+        self.descargas = 0
+
+    def _leer(self) -> dict:
+        if self.archivo:
+            with open(self.archivo, encoding="utf-8") as f:
+                return json.load(f)
+        with urllib.request.urlopen(self.url, timeout=TIMEOUT_DESCARGA) as respuesta:
+            return json.load(respuesta)
+
+    def _recargar(self) -> None:
+        """Descarga el JWKS. Si falla se conservan las llaves anteriores."""
+        self._cargado_en = self._clock()
+        try:
+            jwks = jwt.PyJWKSet.from_dict(self._leer())
+        except Exception as e:
+            logger.error(f"No se pudo cargar el JWKS de Cognito ({self.archivo or self.url}): {e}")
+            return
+        self.descargas += 1
+        self._llaves = {llave.key_id: llave for llave in jwks.keys if llave.key_id}
+
+    def obtener(self, kid: str) -> jwt.PyJWK:
+        """Llave pública para `kid`; lanza TokenInvalido si el pool no la publica."""
+        with self._lock:
+            ahora = self._clock()
+            vencido = self._cargado_en is None or ahora - self._cargado_en >= self.refresco
+            desconocido = kid not in self._llaves and (
+                self._cargado_en is None or ahora - self._cargado_en >= ESPERA_RECARGA
+            )
+            if vencido or desconocido:
+                self._recargar()
+            llave = self._llaves.get(kid)
+        if llave is None:
+            raise TokenInvalido("Llave de firma desconocida")
+        return llave
+
+
+def emisor_user_pool() -> str:
+    return f"https://cognito-idp.{settings.AWS_REGION}.amazonaws.com/{settings.COGNITO_USER_POOL_ID}"
+
+
+class VerificadorCognito:
+    """Valida firma, expiración, emisor, uso (access/id) y cliente de los tokens."""
+
+    def __init__(self, jwks: JWKSCache, emisor: str, client_id: str):
+        self.jwks = jwks
+        self.emisor = emisor
+        self.client_id = client_id
+
+    def verificar(self, token: str) -> dict:
+        """Devuelve los claims del token o lanza TokenInvalido."""
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.PyJWTError as e:
+            raise TokenInvalido(f"Token mal formado: {e}")
+        if not kid:
+            raise TokenInvalido("El token no indica su llave de firma")
+
+        llave = self.jwks.obtener(kid)
+        try:
+            claims = jwt.decode(
+                token,
+                llave.key,
+                algorithms=ALGORITMOS,
+                issuer=self.emisor,
+                leeway=MARGEN_RELOJ,
+                # Cognito solo incluye `aud` en los ID tokens: se valida abajo
+                options={"require": ["exp", "iat", "iss", "sub", "token_use"], "verify_aud": False},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenInvalido(str(e))
+
+        uso = claims["token_use"]
+        if uso == "id":
+            cliente = claims.get("aud")
+        elif uso == "access":
+            cliente = claims.get("client_id")
+        else:
+            raise TokenInvalido(f"token_use no admitido: {uso}")
+        if cliente != self.client_id:
+            raise TokenInvalido("El token fue emitido para otro cliente")
+        return claims
+
+
+_verificador: Optional[VerificadorCognito] = None
+_verificador_lock = threading.Lock()
+
+
+def obtener_verificador() -> VerificadorCognito:
+    """Verificador configurado desde settings (inicialización perezosa)."""
+    global _verificador
+    with _verificador_lock:
+        if _verificador is None:
+            if not settings.COGNITO_USER_POOL_ID:
+                raise TokenInvalido("COGNITO_USER_POOL_ID no está configurado")
+            if not settings.COGNITO_APP_CLIENT_ID:
+                # Sin cliente se aceptarían tokens de cualquier app del user pool
+                raise TokenInvalido("COGNITO_APP_CLIENT_ID no está configurado")
+            emisor = emisor_user_pool()
+            jwks = JWKSCache(
+                url=f"{emisor}/.well-known/jwks.json",
+                archivo=settings.COGNITO_JWKS_FILE,
+                refresco=settings.COGNITO_JWKS_REFRESH_SECONDS,
+            )
+            _verificador = VerificadorCognito(jwks, emisor, settings.COGNITO_APP_CLIENT_ID)
+        return _verificador
@@ -66,10 +66,39 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str | None = None
     COGNITO_USER_POOL_ID: str | None = None
     COGNITO_DEFAULT_GROUP: str = "Clientes"
+    COGNITO_APP_CLIENT_ID: str | None = None  # Cliente (aud/client_id) aceptado en los tokens
+    COGNITO_JWKS_FILE: str | None = None  # JWKS local (pruebas sin red); por defecto se descarga del user pool
+    COGNITO_JWKS_REFRESH_SECONDS: int = 3600  # Cada cuánto se vuelve a descargar el JWKS
+    COGNITO_CACHE_SIZE: int = 10000  # Usuarios de Cognito (atributos/grupos) en caché por proceso
+    COGNITO_CACHE_TTL: int = 300  # Segundos que se reutilizan atributos y grupos de Cognito
+    COGNITO_NEGATIVE_CACHE_TTL: int = 30  # Segundos que se recuerda un usuario inexistente en Cognito
+    AUTH_PRINCIPAL_CACHE_SIZE: int = 10000  # Usuarios autenticados en caché por proceso
+    AUTH_PRINCIPAL_CACHE_TTL: int = 300  # Segundos que se reutiliza el usuario resuelto de un token
+    IDENTITY_CACHE_SIZE: int = 10000  # Usuarios/proveedores en la caché de identidad por proceso
+    IDENTITY_CACHE_TTL: int = 60  # Segundos que una copia de Usuario/Proveedor_Servicio es válida
+    ULTIMA_SESION_FLUSH_INTERVAL: float = 5  # Segundos entre escrituras agrupadas de ultima_sesion
+    ULTIMA_SESION_FLUSH_MAX: int = 500  # Usuarios pendientes que fuerzan una escritura anticipada
+    ALERTAS_PUSH_ENABLED: bool = True  # Canal SSE/WebSocket de alertas alimentado por LISTEN/NOTIFY
+    ALERTAS_PUSH_HEARTBEAT: float = 15  # Segundos entre heartbeats (y verificaciones del LISTEN)
+    ALERTAS_PUSH_QUEUE_SIZE: int = 100  # Eventos pendientes por conexión antes de pedir un resync
+    ALERTAS_PARTICIONES_ADELANTE: int = 3  # Meses futuros con partición de alerta_sistema ya creada
+    ALERTAS_RETENCION_MESES: int = 12  # Meses completos de alertas que se conservan (además del actual)
+    ALERTAS_PARTICIONES_ENABLED: bool = True  # Crear en segundo plano las particiones de los próximos meses
+    ALERTAS_PARTICIONES_INTERVAL: float = 21600  # Segundos entre revisiones de las particiones de alerta_sistema
     
     # AWS S3 Configuration
     S3_BUCKET_NAME: str
     S3_REGION: str
+    S3_PRESIGNED_CACHE_SIZE: int = 20000  # URLs pre-firmadas en caché por proceso
+    S3_PRESIGNED_MIN_REMAINING: int = 600  # Vigencia mínima (s) de una URL servida desde caché
+    S3_UPLOAD_CONCURRENCY: int = 10  # Subidas simultáneas a S3 por lote de archivos
+    IMAGE_VARIANT_WORKERS: int = 2  # Hilos que generan miniaturas/variantes WebP en segundo plano
+    S3_DELETE_DRAIN_ENABLED: bool = True  # Drenar la bandeja de eliminaciones de S3 en segundo plano
+    S3_DELETE_DRAIN_INTERVAL: float = 10  # Segundos entre pasadas cuando la bandeja está vacía
+    
+    # Diagnóstico
+    LOOP_MONITOR_ENABLED: bool = False  # Detector de bloqueos del event loop (activar en staging)
+    LOOP_MONITOR_THRESHOLD_MS: float = 100  # Retención mínima del loop (ms) que se reporta como bloqueo
     
     class Config:
         env_file = ENV_FILE
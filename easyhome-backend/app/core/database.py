@@ -72,6 +72,19 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def liberar_conexion(db: Session) -> None:
+    """
+    Commit the current transaction and return the connection to the pool
+    
+    Call it before slow I/O outside the database (S3 uploads/deletes,
+    Cognito) so the request does not hold a pooled connection meanwhile.
+    The session stays usable (it checks out a new connection on the next
+    query), but loaded objects become detached: copy the values you need first.
+    """
+    db.commit()
+    db.close()
+
+
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency function to get database session for asynchronous operations
@@ -118,6 +131,10 @@ def init_db():
         Reporte_Usuario,
         Token_Recuperacion_Password,
         Reporte_Mensual_Premium,
+        Estadistica_Proveedor,
+        Tarjeta_Catalogo,
+        Imagen_Variante,
+        Eliminacion_S3_Pendiente,
     )
     
     Base.metadata.create_all(bind=engine)
@@ -151,6 +168,10 @@ async def init_async_db():
         Reporte_Usuario,
         Token_Recuperacion_Password,
         Reporte_Mensual_Premium,
+        Estadistica_Proveedor,
+        Tarjeta_Catalogo,
+        Imagen_Variante,
+        Eliminacion_S3_Pendiente,
     )
     
     async_engine = get_async_engine()
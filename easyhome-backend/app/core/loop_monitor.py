@@ -0,0 +1,196 @@
+"""
+Detector de bloqueos del event loop (opt-in con LOOP_MONITOR_ENABLED)
+
+Un latido que corre en el loop se despierta cada `intervalo` y mide cuánto
+tarde lo hizo (lag). Un hilo vigilante comprueba que el latido avance: si
+el loop lleva más de `umbral` sin atenderlo, algo síncrono lo está
+reteniendo (una consulta con la sesión síncrona, boto3, CPU...) y el
+vigilante captura en ese momento la pila del hilo del loop y la ruta de la
+petición que se está ejecutando. Cuando el loop se libera el latido
+registra el bloqueo con su duración.
+
+Las rutas se conocen gracias a MonitorEventLoopMiddleware, que asocia cada
+tarea del loop con la petición que atiende. Los contadores por ruta y los
+últimos bloqueos (con su pila) se consultan con `stats()`.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bloqueos recientes que se conservan con su pila
+ULTIMOS_BLOQUEOS = 20
+# Bloqueos fuera de una petición (tareas de fondo, callbacks sueltos)
+SIN_RUTA = "(fuera de una petición)"
+
+
+class MonitorEventLoop:
+    """
+    Mide el lag del event loop y reporta los callbacks que lo retienen
+    más de `umbral` segundos, con la pila y la ruta responsables.
+    """
+
+    def __init__(self, umbral: float = 0.1, intervalo: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if umbral <= 0:
+            raise ValueError("umbral debe ser mayor que 0")
+        self.umbral = umbral
+        # Sondear varias veces por umbral para capturar la pila mientras dura el bloqueo
+        self.intervalo = intervalo or min(umbral / 4, 0.05)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo_loop: Optional[int] = None
+        self._latido = 0.0
+        self._captura: Optional[dict] = None
+        self._peticiones: "weakref.WeakKeyDictionary[asyncio.Task, dict]" = weakref.WeakKeyDictionary()
+        self._tarea: Optional[asyncio.Task] = None
+        self._detener = threading.Event()
+        self._vigilante: Optional[threading.Thread] = None
+        self._rutas: dict[str, dict] = {}
+        self._ultimos: deque = deque(maxlen=ULTIMOS_BLOQUEOS)
+        self.latidos = 0
+        self.lag_ultimo = 0.0
+        self.lag_maximo = 0.0
+        self.bloqueos = 0
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea is not None and not self._tarea.done()
+
+    def iniciar(self) -> asyncio.Task:
+        """Arranca el latido en el loop actual y el hilo vigilante. Devuelve la tarea del latido."""
+        if self.activo:
+            return self._tarea
+        self._loop = asyncio.get_running_loop()
+        self._hilo_loop = threading.get_ident()
+        self._latido = self._clock()
+        self._detener.clear()
+        self._vigilante = threading.Thread(target=self._vigilar, name="monitor-event-loop", daemon=True)
+        self._vigilante.start()
+        self._tarea = asyncio.create_task(self._latir(), name="monitor-event-loop")
+        self._tarea.add_done_callback(lambda _: self._detener.set())
+        logger.info(f"Monitor del event loop iniciado (umbral {self.umbral * 1000:.0f} ms)")
+        return self._tarea
+
+    async def detener(self) -> None:
+        """Detiene el latido y el vigilante."""
+        self._detener.set()
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+        if self._vigilante is not None:
+            self._vigilante.join(timeout=1)
+
+    def registrar_peticion(self, scope: dict) -> None:
+        """Asocia la tarea actual con la petición (scope ASGI) que atiende."""
+        tarea = asyncio.current_task()
+        if tarea is not None:
+            self._peticiones[tarea] = scope
+
+    def olvidar_peticion(self) -> None:
+        tarea = asyncio.current_task()
+        if tarea is not None:
+            self._peticiones.pop(tarea, None)
+
+    def _ruta_de(self, tarea: Optional[asyncio.Task]) -> str:
+        scope = self._peticiones.get(tarea) if tarea is not None else None
+        if scope is None:
+            return SIN_RUTA if tarea is None else f"{SIN_RUTA} {tarea.get_name()}"
+        # Plantilla de la ruta (ej: /api/v1/proveedores/{id_proveedor}/resenas) para agrupar
+        ruta = scope.get("route")
+        path = getattr(ruta, "path", None) or scope.get("path", "?")
+        return f"{scope.get('method', '')} {path}".strip()
+
+    async def _latir(self) -> None:
+        while True:
+            inicio = self._clock()
+            await asyncio.sleep(self.intervalo)
+            ahora = self._clock()
+            lag = max(0.0, ahora - inicio - self.intervalo)
+            with self._lock:
+                self._latido = ahora
+                captura, self._captura = self._captura, None
+                self.latidos += 1
+                self.lag_ultimo = lag
+                self.lag_maximo = max(self.lag_maximo, lag)
+            if lag >= self.umbral:
+                self._registrar_bloqueo(lag, captura)
+
+    def _vigilar(self) -> None:
+        while not self._detener.wait(self.intervalo):
+            with self._lock:
+                if self._captura is not None or self._clock() - self._latido < self.umbral:
+                    continue
+                self._captura = self._capturar()
+
+    def _capturar(self) -> dict:
+        """Pila del hilo del loop y ruta de la tarea que lo está reteniendo."""
+        frame = sys._current_frames().get(self._hilo_loop)
+        pila = "".join(traceback.format_stack(frame)) if frame is not None else None
+        try:
+            tarea = asyncio.current_task(self._loop)
+        except RuntimeError:
+            tarea = None
+        return {"ruta": self._ruta_de(tarea), "pila": pila}
+
+    def _registrar_bloqueo(self, duracion: float, captura: Optional[dict]) -> None:
+        # Sin captura el bloqueo fue más corto que un sondeo del vigilante
+        ruta = captura["ruta"] if captura else SIN_RUTA
+        pila = captura["pila"] if captura else None
+        duracion_ms = duracion * 1000
+        with self._lock:
+            self.bloqueos += 1
+            datos = self._rutas.setdefault(ruta, {"bloqueos": 0, "total_ms": 0.0, "max_ms": 0.0})
+            datos["bloqueos"] += 1
+            datos["total_ms"] += duracion_ms
+            datos["max_ms"] = max(datos["max_ms"], duracion_ms)
+            self._ultimos.append({
+                "ruta": ruta,
+                "duracion_ms": round(duracion_ms, 1),
+                "fecha": time.time(),
+                "pila": pila,
+            })
+        logger.warning(f"Event loop bloqueado {duracion_ms:.0f} ms en {ruta}" + (f"\n{pila}" if pila else ""))
+
+    def stats(self) -> dict:
+        """Lag del loop, bloqueos por ruta (de más a menos) y los últimos bloqueos con su pila."""
+        with self._lock:
+            rutas = {
+                ruta: {**datos, "total_ms": round(datos["total_ms"], 1), "max_ms": round(datos["max_ms"], 1)}
+                for ruta, datos in sorted(self._rutas.items(), key=lambda item: -item[1]["bloqueos"])
+            }
+            return {
+                "activo": self.activo,
+                "umbral_ms": self.umbral * 1000,
+                "latidos": self.latidos,
+                "lag_ultimo_ms": round(self.lag_ultimo * 1000, 1),
+                "lag_maximo_ms": round(self.lag_maximo * 1000, 1),
+                "bloqueos": self.bloqueos,
+                "rutas": rutas,
+                "ultimos": list(self._ultimos),
+            }
+
+
+class MonitorEventLoopMiddleware:
+    """Middleware ASGI que informa al monitor qué petición atiende cada tarea."""
+
+    def __init__(self, app, monitor: MonitorEventLoop):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.monitor.registrar_peticion(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.olvidar_peticion()
@@ -0,0 +1,84 @@
+"""
+Utilidades de paginación por cursor (keyset pagination)
+
+El cursor es un JSON codificado en base64 url-safe con los valores de
+ordenamiento de la última fila entregada. Para el cliente es opaco:
+solo debe reenviarlo tal cual para pedir la siguiente página.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import HTTPException, status
+
+# Tamaño de página por defecto y máximo permitido
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+
+
+def _serializar(valor: Any) -> Any:
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def encode_cursor(valores: dict) -> str:
+    """Codifica los valores de ordenamiento de la última fila en un cursor opaco."""
+    payload = json.dumps({k: _serializar(v) for k, v in valores.items()}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[dict]:
+    """
+    Decodifica un cursor generado por `encode_cursor`.
+
+    Raises:
+        HTTPException 400: si el cursor no es válido
+    """
+    if not cursor:
+        return None
+
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido.")
+
+    if not isinstance(valores, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido.")
+    return valores
+
+
+def parse_datetime(valor: Any) -> datetime:
+    """Convierte un valor de cursor a datetime o responde 400."""
+    try:
+        return datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido.")
+
+
+def parse_int(valor: Any) -> int:
+    """Convierte un valor de cursor a int o responde 400."""
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido.")
+    return valor
+
+
+def parse_decimal(valor: Any) -> Decimal:
+    """Convierte un valor de cursor a Decimal o responde 400."""
+    try:
+        return Decimal(valor)
+    except (TypeError, ValueError, ArithmeticError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido.")
+
+
+def parse_float(valor: Any) -> float:
+    """Convierte un valor de cursor a float o responde 400."""
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido.")
+    return float(valor)
@@ -0,0 +1,217 @@
+"""
+Recepción de imágenes en streaming con memoria acotada
+
+El cuerpo multipart se procesa chunk por chunk a medida que llega:
+el tamaño máximo y los magic bytes se validan de forma incremental y
+el archivo se acumula en un SpooledTemporaryFile (memoria hasta un
+umbral, disco a partir de ahí) que se entrega tal cual a S3. Las
+escrituras a disco (incluido el volcado del buffer al superar el umbral)
+van al threadpool para no bloquear el event loop.
+"""
+import tempfile
+from typing import List, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from python_multipart.exceptions import FormParserError
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+    from multipart.exceptions import FormParserError
+
+# A partir de este tamaño el archivo temporal pasa de memoria a disco
+UMBRAL_DISCO = 1024 * 1024
+# Bytes de cabecera necesarios para reconocer el formato
+LONGITUD_CABECERA = 12
+# Holgura para los encabezados multipart al comparar Content-Length
+MARGEN_MULTIPART = 16 * 1024
+
+EXTENSIONES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+
+def detectar_tipo_imagen(cabecera: bytes) -> Optional[str]:
+    """Devuelve el content-type según los magic bytes, o None si no es una imagen permitida."""
+    if cabecera.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if cabecera.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if cabecera[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class ImagenEntrante:
+    """
+    Acumula una imagen chunk por chunk validando tamaño y formato.
+
+    - `escribir()` responde 413 en cuanto se supera `max_bytes` (sin
+      esperar al resto del cuerpo) y 400 si la cabecera no es de imagen.
+    - Mientras el archivo cabe en `umbral_disco` se escribe en memoria; a
+      partir de ahí los chunks se acumulan y `volcar()` los escribe a disco
+      en el threadpool.
+    - `archivo` es un SpooledTemporaryFile listo para `upload_fileobj`.
+    """
+
+    def __init__(self, max_bytes: int, umbral_disco: int = UMBRAL_DISCO):
+        self.max_bytes = max_bytes
+        self.umbral_disco = umbral_disco
+        self.archivo = tempfile.SpooledTemporaryFile(max_size=umbral_disco)
+        self.tamaño = 0
+        self.content_type: Optional[str] = None
+        self.filename: Optional[str] = None
+        self._cabecera = b""
+        # Chunks que van a disco, pendientes de `volcar()`
+        self._pendientes: List[bytes] = []
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONES[self.content_type]
+
+    def escribir(self, chunk: bytes) -> None:
+        self.tamaño += len(chunk)
+        if self.tamaño > self.max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Archivo muy grande. Tamaño máximo: {self.max_bytes // (1024*1024)}MB"
+            )
+
+        if self.content_type is None:
+            self._cabecera += chunk[:LONGITUD_CABECERA - len(self._cabecera)]
+            if len(self._cabecera) >= LONGITUD_CABECERA:
+                self._validar_cabecera()
+
+        if self.tamaño <= self.umbral_disco:
+            # Sigue en memoria: escribir aquí no toca el disco
+            self.archivo.write(chunk)
+        else:
+            self._pendientes.append(chunk)
+
+    async def volcar(self) -> None:
+        """Escribe en el threadpool los chunks que ya no caben en memoria."""
+        if self._pendientes:
+            datos = b"".join(self._pendientes)
+            self._pendientes = []
+            await run_in_threadpool(self.archivo.write, datos)
+
+    async def terminar(self) -> None:
+        """Valida el archivo completo, vuelca lo pendiente y lo rebobina para leerlo."""
+        if self.tamaño == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El archivo está vacío")
+        if self.content_type is None:
+            self._validar_cabecera()
+        await self.volcar()
+        self.archivo.seek(0)
+
+    def cerrar(self) -> None:
+        self.archivo.close()
+
+    def _validar_cabecera(self) -> None:
+        self.content_type = detectar_tipo_imagen(self._cabecera)
+        if self.content_type is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"El archivo debe ser una imagen. Permitidos: {', '.join(EXTENSIONES.values())}"
+            )
+
+
+async def recibir_imagen(
+    request: Request,
+    max_bytes: int,
+    campo: str = "file",
+    umbral_disco: int = UMBRAL_DISCO,
+) -> ImagenEntrante:
+    """
+    Lee del cuerpo multipart/form-data (en streaming) el archivo del campo
+    `campo` y lo devuelve validado y rebobinado. El llamador debe invocar
+    `cerrar()` al terminar.
+
+    Raises:
+        HTTPException 400: cuerpo inválido, campo ausente, vacío o no es imagen
+        HTTPException 413: supera `max_bytes`
+    """
+    tipo, parametros = parse_options_header(request.headers.get("content-type", ""))
+    if tipo != b"multipart/form-data" or b"boundary" not in parametros:
+        raise HTTPException(status_code=400, detail="Se esperaba un cuerpo multipart/form-data.")
+
+    # Rechazo inmediato si el cliente ya declara un cuerpo demasiado grande
+    longitud = request.headers.get("content-length")
+    if longitud and longitud.isdigit() and int(longitud) > max_bytes + MARGEN_MULTIPART:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Archivo muy grande. Tamaño máximo: {max_bytes // (1024*1024)}MB"
+        )
+
+    imagen = ImagenEntrante(max_bytes, umbral_disco)
+    estado = {"campo": b"", "valor": b"", "disposicion": b"", "en_archivo": False, "encontrado": False}
+
+    def on_part_begin():
+        estado["disposicion"] = b""
+
+    def on_header_field(data, start, end):
+        estado["campo"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        estado["valor"] += data[start:end]
+
+    def on_header_end():
+        if estado["campo"].lower() == b"content-disposition":
+            estado["disposicion"] = estado["valor"]
+        estado["campo"] = b""
+        estado["valor"] = b""
+
+    def on_headers_finished():
+        _, opciones = parse_options_header(estado["disposicion"])
+        es_campo = opciones.get(b"name", b"").decode("latin-1") == campo
+        estado["en_archivo"] = es_campo and not estado["encontrado"]
+        if estado["en_archivo"]:
+            estado["encontrado"] = True
+            imagen.filename = opciones.get(b"filename", b"").decode("utf-8", "replace") or None
+
+    def on_part_data(data, start, end):
+        if estado["en_archivo"]:
+            imagen.escribir(data[start:end])
+
+    def on_part_end():
+        estado["en_archivo"] = False
+
+    parser = MultipartParser(parametros[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            # Lo que superó el umbral va a disco fuera del event loop; se
+            # vuelca por chunk recibido, así la memoria sigue acotada
+            await imagen.volcar()
+        parser.finalize()
+
+        if not estado["encontrado"]:
+            raise HTTPException(status_code=400, detail=f"Falta el archivo en el campo '{campo}'.")
+        await imagen.terminar()
+        return imagen
+
+    except HTTPException:
+        imagen.cerrar()
+        raise
+    except FormParserError:
+        imagen.cerrar()
+        raise HTTPException(status_code=400, detail="Cuerpo multipart inválido.")
+    except Exception:
+        imagen.cerrar()
+        raise
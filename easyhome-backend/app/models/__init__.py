@@ -16,6 +16,10 @@ from .publicidad_activa import Publicidad_Activa
 from .reporte_usuario import Reporte_Usuario
 from .token_recuperacion_password import Token_Recuperacion_Password
 from .reporte_mensual_premium import Reporte_Mensual_Premium
+from .estadistica_proveedor import Estadistica_Proveedor
+from .tarjeta_catalogo import Tarjeta_Catalogo
+from .imagen_variante import Imagen_Variante
+from .eliminacion_s3_pendiente import Eliminacion_S3_Pendiente
 
 __all__ = [
     "Base", "BaseModel",
@@ -34,5 +38,9 @@ __all__ = [
     "Publicidad_Activa",
     "Reporte_Usuario",
     "Token_Recuperacion_Password",
-    "Reporte_Mensual_Premium"
+    "Reporte_Mensual_Premium",
+    "Estadistica_Proveedor",
+    "Tarjeta_Catalogo",
+    "Imagen_Variante",
+    "Eliminacion_S3_Pendiente"
 ]
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, Boolean
+import json
+from datetime import date
+
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, Boolean, Identity, Index, event, select, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -10,19 +13,69 @@ from .base import Base
 # a un servicio contratado específico.
 # ────────────────────────────────────────────────
 
+# Canal de LISTEN/NOTIFY por el que se avisa de cada alerta nueva
+CANAL_ALERTAS = "alertas"
+
 
 class Alerta_Sistema(Base):
     __tablename__ = "alerta_sistema"
 
-    id_alerta = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    # Particionada por mes de fecha_envio: la PK de la tabla debe incluirla,
+    # pero id_alerta (autogenerado) sigue identificando la fila para el ORM
+    id_alerta = Column(Integer, Identity(), primary_key=True, index=True)
     id_usuario = Column(Integer, ForeignKey("usuario.id_usuario", ondelete="CASCADE"), nullable=False)
     id_servicio_contratado = Column(Integer,ForeignKey("servicio_contratado.id_servicio_contratado", ondelete="SET NULL"),nullable=True)
     tipo_alerta = Column(String(30), nullable=False)
     mensaje = Column(Text, nullable=False)
     leida = Column(Boolean, nullable=False, default=False)
-    fecha_envio = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    fecha_envio = Column(TIMESTAMP, primary_key=True, nullable=False, server_default=func.now())
     fecha_lectura = Column(TIMESTAMP, nullable=True)
 
     # Relaciones
     usuario = relationship("Usuario", back_populates="alerta_sistema")
     servicio_contratado = relationship("Servicio_Contratado", back_populates="alerta_sistema")
+
+    __mapper_args__ = {"primary_key": [id_alerta]}
+
+    __table_args__ = (
+        # Feed por cursor: WHERE id_usuario = ? ORDER BY fecha_envio DESC, id_alerta DESC
+        # (índice de la tabla padre: Postgres lo crea en cada partición)
+        Index("idx_alerta_usuario_fecha_id", id_usuario, fecha_envio.desc(), id_alerta.desc()),
+        # Contador del badge: solo las alertas no leídas (visibles en el feed)
+        Index(
+            "idx_alerta_usuario_no_leidas",
+            "id_usuario",
+            postgresql_where=text("NOT leida AND id_servicio_contratado IS NOT NULL"),
+        ),
+        {"postgresql_partition_by": "RANGE (fecha_envio)"},
+    )
+
+
+@event.listens_for(Alerta_Sistema, "after_insert")
+def _notificar_alerta(mapper, connection, target):
+    """
+    Emite pg_notify por cada alerta insertada con el ORM, en la misma
+    transacción: Postgres solo la entrega si el INSERT se confirma. El payload
+    lleva solo identificadores (NOTIFY admite hasta 8000 bytes); el mensaje
+    se lee del feed.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    payload = json.dumps({
+        "id_alerta": target.id_alerta,
+        "id_usuario": target.id_usuario,
+        "id_servicio_contratado": target.id_servicio_contratado,
+        "tipo_alerta": target.tipo_alerta,
+    })
+    connection.execute(select(func.pg_notify(CANAL_ALERTAS, payload)))
+
+
+@event.listens_for(Alerta_Sistema.__table__, "after_create")
+def _crear_particiones_iniciales(target, connection, **kw):
+    """create_all deja la tabla padre sin particiones: se crean la del mes actual, las siguientes y la DEFAULT."""
+    if connection.dialect.name != "postgresql":
+        return
+    from app.core.config import settings
+    from app.services.particiones_alertas_service import crear_particiones
+
+    crear_particiones(connection, date.today(), settings.ALERTAS_PARTICIONES_ADELANTE)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, TIMESTAMP
+from sqlalchemy.sql import func
+from .base import Base
+
+# ────────────────────────────────────────────────
+# Entidad: Eliminacion_S3_Pendiente
+# Referencia: SRS 3.4.2 (imágenes almacenadas en S3)
+# Descripción: Bandeja de salida (outbox) de objetos de S3 por eliminar. Los
+# endpoints agregan las keys en la misma transacción en que borran las filas
+# que las referencian; un proceso en segundo plano las elimina en lotes con
+# DeleteObjects y reintenta con espera exponencial las que fallan.
+# ────────────────────────────────────────────────
+
+class Eliminacion_S3_Pendiente(Base):
+    __tablename__ = "eliminacion_s3_pendiente"
+
+    id_eliminacion = Column(BigInteger, primary_key=True, autoincrement=True)
+    s3_key = Column(String(500), nullable=False)
+    intentos = Column(Integer, nullable=False, server_default="0")
+    ultimo_error = Column(Text, nullable=True)
+    fecha_creacion = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    # Momento a partir del cual se puede (re)intentar; también sirve de arriendo
+    # mientras un proceso la tiene tomada
+    proximo_intento = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), index=True)
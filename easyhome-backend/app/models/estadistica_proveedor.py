@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, DECIMAL, TIMESTAMP, ForeignKey
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from .base import Base
+
+# ────────────────────────────────────────────────
+# Entidad: Estadistica_Proveedor
+# Referencia: SRS 3.4.2.10 (RF-17 al RF-20)
+# Descripción: Agregado precalculado de las reseñas activas de cada proveedor
+# (total, sumas y promedios por rubro). Se mantiene de forma incremental al
+# crear reseñas o cambiar su estado, y se reconstruye con
+# scripts/rebuild_estadisticas_proveedor.py.
+# ────────────────────────────────────────────────
+
+class Estadistica_Proveedor(Base):
+    __tablename__ = "estadistica_proveedor"
+
+    id_proveedor = Column(Integer, ForeignKey("proveedor_servicio.id_proveedor", ondelete="CASCADE"), primary_key=True)
+    total_reseñas = Column(Integer, nullable=False, server_default="0")
+
+    # Sumas por rubro (permiten actualizar los promedios sin releer las reseñas)
+    suma_general = Column(Integer, nullable=False, server_default="0")
+    suma_puntualidad = Column(Integer, nullable=False, server_default="0")
+    suma_calidad_servicio = Column(Integer, nullable=False, server_default="0")
+    suma_calidad_precio = Column(Integer, nullable=False, server_default="0")
+
+    # Promedios por rubro (NULL mientras el proveedor no tenga reseñas activas)
+    calificacion_promedio = Column(DECIMAL(3, 2), nullable=True, index=True)
+    promedio_puntualidad = Column(DECIMAL(3, 2), nullable=True)
+    promedio_calidad_servicio = Column(DECIMAL(3, 2), nullable=True)
+    promedio_calidad_precio = Column(DECIMAL(3, 2), nullable=True)
+
+    fecha_actualizacion = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relaciones
+    proveedor_servicio = relationship("Proveedor_Servicio", back_populates="estadistica_proveedor")
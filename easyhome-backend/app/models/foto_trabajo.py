@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .base import Base
@@ -21,3 +21,8 @@ class Foto_Trabajo_Anterior(Base):
 
     # Relaciones
     proveedor_servicio = relationship("Proveedor_Servicio", back_populates="foto_trabajo")
+
+    __table_args__ = (
+        # Confirmar una subida dos veces no duplica la foto (ON CONFLICT DO NOTHING)
+        UniqueConstraint("id_proveedor", "url_imagen", name="uq_foto_trabajo_url"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -18,3 +18,8 @@ class Imagen_Reseña(Base):
 
     # Relaciones
     reseña_servicio = relationship("Reseña_Servicio", back_populates="imagen_reseña")
+
+    __table_args__ = (
+        # Confirmar una subida dos veces no duplica la imagen (ON CONFLICT DO NOTHING)
+        UniqueConstraint("id_reseña", "url_imagen", name="uq_imagen_reseña_url"),
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, TIMESTAMP
+from sqlalchemy.sql import func
+from .base import Base
+
+# ────────────────────────────────────────────────
+# Entidad: Imagen_Variante
+# Referencia: SRS 3.4.2 (imágenes almacenadas en S3)
+# Descripción: Registra las imágenes originales (por S3 key) cuyas variantes
+# WebP (miniatura y mediana) ya fueron generadas. Mientras una key no esté
+# aquí, los listados sirven el original. Las variantes viven junto al original
+# en keys deterministas (ver app/services/imagenes_service.key_variante).
+# ────────────────────────────────────────────────
+
+class Imagen_Variante(Base):
+    __tablename__ = "imagen_variante"
+
+    s3_key = Column(String(500), primary_key=True)
+    fecha_generacion = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
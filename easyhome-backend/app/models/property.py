@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DECIMAL, TIMESTAMP, Table, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DECIMAL, TIMESTAMP, Table, Index, UniqueConstraint, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from .base import Base
 from fastapi import Request
@@ -64,6 +65,10 @@ class Publicacion_Servicio(Base):
     estado = Column(String(20), nullable=False, default="activo", index=True)
     vistas = Column(Integer, nullable=False, default=0)
 
+    # Documento de búsqueda (config 'spanish'): título, categoría, especializaciones
+    # del proveedor y descripción. Lo mantienen los triggers de DDL_BUSQUEDA.
+    documento_busqueda = deferred(Column(TSVECTOR, nullable=True))
+
     # Relaciones
     proveedor_servicio = relationship("Proveedor_Servicio", back_populates="publicacion_servicio")
     categoria_servicio = relationship("Categoria_Servicio", back_populates="publicacion_servicio")
@@ -77,6 +82,95 @@ class Publicacion_Servicio(Base):
         back_populates="publicacion_servicio"
     )
 
+    __table_args__ = (
+        # Paginación keyset del catálogo: WHERE estado = 'activo' ORDER BY fecha, id DESC
+        Index("idx_publicacion_estado_fecha_id", "estado", "fecha_publicacion", "id_publicacion"),
+        # Búsqueda de texto completo: documento_busqueda @@ websearch_to_tsquery(...)
+        Index("idx_publicacion_documento_busqueda", "documento_busqueda", postgresql_using="gin"),
+    )
+
+
+# ────────────────────────────────────────────────
+# Búsqueda de texto completo de publicaciones
+# Descripción: Funciones y triggers que mantienen publicacion_servicio.documento_busqueda.
+# Pesos: A = título, B = categoría, C = especializaciones del proveedor, D = descripción.
+# Se recalcula al insertar/editar la publicación y cuando cambia el nombre de su
+# categoría o las especializaciones de su proveedor.
+# Para bases existentes: scripts/add_busqueda_publicaciones.py
+# ────────────────────────────────────────────────
+
+DDL_BUSQUEDA = [
+    """
+    CREATE OR REPLACE FUNCTION publicacion_documento_busqueda(
+        p_titulo text, p_descripcion text, p_id_categoria integer, p_id_proveedor integer
+    ) RETURNS tsvector LANGUAGE sql STABLE AS $$
+        SELECT setweight(to_tsvector('spanish', coalesce(p_titulo, '')), 'A')
+            || setweight(to_tsvector('spanish', coalesce(
+                   (SELECT nombre_categoria FROM categoria_servicio WHERE id_categoria = p_id_categoria), '')), 'B')
+            || setweight(to_tsvector('spanish', coalesce(
+                   (SELECT especializaciones FROM proveedor_servicio WHERE id_proveedor = p_id_proveedor), '')), 'C')
+            || setweight(to_tsvector('spanish', coalesce(p_descripcion, '')), 'D')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION publicacion_busqueda_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.documento_busqueda := publicacion_documento_busqueda(
+            NEW.titulo, NEW.descripcion, NEW.id_categoria, NEW.id_proveedor);
+        RETURN NEW;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_publicacion_busqueda ON publicacion_servicio",
+    """
+    CREATE TRIGGER trg_publicacion_busqueda
+    BEFORE INSERT OR UPDATE OF titulo, descripcion, id_categoria, id_proveedor ON publicacion_servicio
+    FOR EACH ROW EXECUTE FUNCTION publicacion_busqueda_trigger()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION categoria_busqueda_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE publicacion_servicio
+        SET documento_busqueda = publicacion_documento_busqueda(titulo, descripcion, id_categoria, id_proveedor)
+        WHERE id_categoria = NEW.id_categoria;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_categoria_busqueda ON categoria_servicio",
+    """
+    CREATE TRIGGER trg_categoria_busqueda
+    AFTER UPDATE OF nombre_categoria ON categoria_servicio
+    FOR EACH ROW WHEN (OLD.nombre_categoria IS DISTINCT FROM NEW.nombre_categoria)
+    EXECUTE FUNCTION categoria_busqueda_trigger()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION proveedor_busqueda_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE publicacion_servicio
+        SET documento_busqueda = publicacion_documento_busqueda(titulo, descripcion, id_categoria, id_proveedor)
+        WHERE id_proveedor = NEW.id_proveedor;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_proveedor_busqueda ON proveedor_servicio",
+    """
+    CREATE TRIGGER trg_proveedor_busqueda
+    AFTER UPDATE OF especializaciones ON proveedor_servicio
+    FOR EACH ROW WHEN (OLD.especializaciones IS DISTINCT FROM NEW.especializaciones)
+    EXECUTE FUNCTION proveedor_busqueda_trigger()
+    """,
+]
+
+# Instalar funciones y triggers al crear la tabla (init_db / create_all)
+for _sentencia in DDL_BUSQUEDA:
+    event.listen(
+        Publicacion_Servicio.__table__,
+        "after_create",
+        DDL(_sentencia).execute_if(dialect="postgresql"),
+    )
+
 # ────────────────────────────────────────────────
 # Entidad: Imagen_Publicacion
 # Referencia: SRS 3.4.2.6 (RF-09, RF-11)
@@ -95,6 +189,12 @@ class Imagen_Publicacion(Base):
 
     # Relaciones
     publicacion_servicio = relationship("Publicacion_Servicio", back_populates="imagen_publicacion")
+
+    __table_args__ = (
+        # Confirmar una subida dos veces no duplica la imagen (ON CONFLICT DO NOTHING)
+        UniqueConstraint("id_publicacion", "url_imagen", name="uq_imagen_publicacion_url"),
+    )
+
     # 🔥 MÉTODO NUEVO
     def get_url_completa(self, request: Request):
         base_url = str(request.base_url).rstrip("/")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, ForeignKey, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -41,4 +41,17 @@ class Servicio_Contratado(Base):
         Index("idx_servicio_cliente", "id_cliente"),
         Index("idx_servicio_proveedor", "id_proveedor"),
         Index("idx_servicio_estado", "estado_servicio"),
+        # Listas del dashboard del proveedor (keyset, ver status_servicio)
+        Index(
+            "idx_servicio_proveedor_activos",
+            id_proveedor, fecha_contacto.desc(), id_servicio_contratado.desc(),
+            postgresql_where=text("estado_servicio IN ('confirmado', 'en_proceso')"),
+        ),
+        Index(
+            "idx_servicio_proveedor_finalizados",
+            id_proveedor,
+            func.coalesce(fecha_finalizacion, fecha_contacto).desc(),
+            id_servicio_contratado.desc(),
+            postgresql_where=text("estado_servicio = 'finalizado'"),
+        ),
     )
@@ -0,0 +1,61 @@
+from sqlalchemy import Column, Integer, String, Text, Boolean, DECIMAL, TIMESTAMP, ForeignKey, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from .base import Base
+
+# ────────────────────────────────────────────────
+# Entidad: Tarjeta_Catalogo
+# Referencia: SRS 3.4.2.5 (RF-09 al RF-12, RF-15)
+# Descripción: Proyección desnormalizada de cada publicación con todo lo que
+# necesita una tarjeta del catálogo (datos de la publicación, categoría,
+# proveedor, portada, galería y calificación). El catálogo y la barra de
+# miembros premium leen solo de esta tabla. La mantiene
+# app/services/catalogo_service.py y se reconstruye con
+# scripts/rebuild_tarjetas_catalogo.py.
+# ────────────────────────────────────────────────
+
+class Tarjeta_Catalogo(Base):
+    __tablename__ = "tarjeta_catalogo"
+
+    id_publicacion = Column(Integer, ForeignKey("publicacion_servicio.id_publicacion", ondelete="CASCADE"), primary_key=True)
+    id_proveedor = Column(Integer, nullable=False, index=True)
+    id_categoria = Column(Integer, nullable=False, index=True)
+
+    # Publicación
+    titulo = Column(String(200), nullable=False)
+    descripcion = Column(Text, nullable=False)
+    rango_precio_min = Column(DECIMAL(10, 2), nullable=False)
+    rango_precio_max = Column(DECIMAL(10, 2), nullable=False)
+    fecha_publicacion = Column(TIMESTAMP, nullable=False)
+    estado = Column(String(20), nullable=False)
+    categoria = Column(String(100), nullable=True)
+
+    # Imágenes (S3 keys): portada y galería [{"id_imagen", "url_imagen"}] ordenada
+    imagen_portada_key = Column(String(500), nullable=True)
+    imagenes = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+
+    # Proveedor
+    nombre_proveedor = Column(String(200), nullable=False)
+    correo_proveedor = Column(String(150), nullable=True)
+    telefono_proveedor = Column(String(20), nullable=True)
+    foto_perfil_key = Column(String(500), nullable=True)
+    calificacion_promedio = Column(DECIMAL(3, 2), nullable=True)
+    es_suscriptor = Column(Boolean, nullable=False, server_default="false")
+    proveedor_activo = Column(Boolean, nullable=False, server_default="false")  # aprobado y con cuenta activa
+
+    fecha_actualizacion = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Catálogo por fecha: WHERE estado = 'activo' ORDER BY fecha_publicacion DESC, id_publicacion DESC
+        Index("idx_tarjeta_estado_fecha_id", "estado", "fecha_publicacion", "id_publicacion"),
+        # Catálogo "mejor_calificados" (sin calificación al final)
+        Index(
+            "idx_tarjeta_estado_calificacion",
+            "estado", text("coalesce(calificacion_promedio, -1)"), "fecha_publicacion", "id_publicacion",
+        ),
+        # Barra de miembros premium
+        Index(
+            "idx_tarjeta_premium", "calificacion_promedio",
+            postgresql_where=text("es_suscriptor AND proveedor_activo"),
+        ),
+    )
@@ -82,3 +82,4 @@ class Proveedor_Servicio(Base):
     reporte_usuario = relationship("Reporte_Usuario", back_populates="proveedor_reportado", cascade="all, delete")
     reporte_mensual_premium = relationship("Reporte_Mensual_Premium", back_populates="proveedor_servicio", cascade="all, delete")
     plan_suscripcion = relationship("Plan_Suscripcion", back_populates="proveedor_servicio")
+    estadistica_proveedor = relationship("Estadistica_Proveedor", back_populates="proveedor_servicio", uselist=False, cascade="all, delete")
@@ -0,0 +1,167 @@
+"""
+Canal push de Alerta_Sistema (SSE / WebSocket)
+
+Cada worker abre UNA sola conexión asyncpg con LISTEN al canal de alertas
+(el INSERT de Alerta_Sistema emite pg_notify en su transacción, ver
+app/models/alerta_sistema.py) y reparte cada notificación entre las
+conexiones abiertas del usuario destinatario. Una conexión SSE inactiva es
+solo una corrutina esperando en una asyncio.Queue: no ocupa hilos ni
+conexiones del pool, así que un worker sostiene miles.
+
+El canal no guarda historial. Cuando algo pudo perderse (reconexión del
+LISTEN, cola de un cliente desbordada) se envía un evento `resync` y el
+cliente vuelve a pedir la primera página del feed paginado; lo mismo hace
+al reconectarse él mismo.
+"""
+import asyncio
+import json
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import asyncpg
+
+from app.core.config import settings
+from app.models.alerta_sistema import CANAL_ALERTAS
+
+logger = logging.getLogger(__name__)
+
+# Evento para que el cliente vuelva a leer el feed paginado
+RESYNC = {"evento": "resync", "datos": {}}
+# Espera entre reintentos del LISTEN: 1 s, 2 s, 4 s, ... hasta 30 s
+ESPERA_MAXIMA_SEGUNDOS = 30
+
+
+class CanalAlertas:
+    """Reparte las notificaciones de alertas entre los suscriptores de cada usuario."""
+
+    def __init__(self, tamano_cola: int):
+        if tamano_cola <= 0:
+            raise ValueError("tamano_cola debe ser mayor que 0")
+        self.tamano_cola = tamano_cola
+        self._suscriptores: dict[int, set[asyncio.Queue]] = {}
+        self.escuchando = False
+        self.recibidas = 0
+        self.entregadas = 0
+        self.desbordes = 0
+        self.reconexiones = 0
+
+    @contextmanager
+    def suscripcion(self, id_usuario: int) -> Iterator[asyncio.Queue]:
+        """Cola de eventos del usuario mientras dure el bloque `with`."""
+        cola: asyncio.Queue = asyncio.Queue(maxsize=self.tamano_cola)
+        self._suscriptores.setdefault(id_usuario, set()).add(cola)
+        try:
+            yield cola
+        finally:
+            colas = self._suscriptores.get(id_usuario)
+            if colas is not None:
+                colas.discard(cola)
+                if not colas:
+                    del self._suscriptores[id_usuario]
+
+    def _entregar(self, cola: asyncio.Queue, evento: dict) -> None:
+        try:
+            cola.put_nowait(evento)
+            self.entregadas += 1
+        except asyncio.QueueFull:
+            # Cliente lento: se descarta lo acumulado y se le pide releer el feed
+            self.desbordes += 1
+            while not cola.empty():
+                cola.get_nowait()
+            cola.put_nowait(RESYNC)
+
+    def publicar(self, datos: dict) -> int:
+        """Entrega una alerta a las conexiones de su usuario. Devuelve a cuántas."""
+        colas = self._suscriptores.get(datos.get("id_usuario"), ())
+        for cola in list(colas):
+            self._entregar(cola, {"evento": "alerta", "datos": datos})
+        return len(colas)
+
+    def resincronizar(self) -> None:
+        """Pide a todos los suscriptores releer el feed (posibles avisos perdidos)."""
+        for colas in list(self._suscriptores.values()):
+            for cola in list(colas):
+                self._entregar(cola, RESYNC)
+
+    def _al_notificar(self, connection, pid, channel, payload: str) -> None:
+        """Callback de asyncpg (corre en el event loop)."""
+        self.recibidas += 1
+        try:
+            datos = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Notificación de alerta inválida: {payload!r}")
+            return
+        self.publicar(datos)
+
+    async def ejecutar(self, dsn: str, intervalo_verificacion: float) -> None:
+        """
+        Tarea de fondo: mantiene el LISTEN y lo reabre si la conexión se
+        pierde. Cada `intervalo_verificacion` segundos comprueba la conexión
+        (una conexión TCP muerta e inactiva no siempre se detecta sola).
+        """
+        espera = 1
+        while True:
+            try:
+                conexion = await asyncpg.connect(dsn)
+            except Exception as e:
+                logger.error(f"No se pudo abrir el LISTEN de alertas (reintento en {espera} s): {e}")
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, ESPERA_MAXIMA_SEGUNDOS)
+                continue
+
+            perdida = asyncio.Event()
+            conexion.add_termination_listener(lambda _conexion: perdida.set())
+            try:
+                await conexion.add_listener(CANAL_ALERTAS, self._al_notificar)
+                self.escuchando = True
+                espera = 1
+                logger.info("LISTEN de alertas activo")
+                # Lo notificado mientras no se escuchaba no llegará nunca
+                if self.reconexiones:
+                    self.resincronizar()
+                self.reconexiones += 1
+
+                while not perdida.is_set():
+                    try:
+                        await asyncio.wait_for(perdida.wait(), timeout=intervalo_verificacion)
+                    except asyncio.TimeoutError:
+                        await conexion.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Se perdió el LISTEN de alertas: {e}")
+            finally:
+                self.escuchando = False
+                if not conexion.is_closed():
+                    try:
+                        await asyncio.shield(conexion.close(timeout=5))
+                    except Exception:
+                        conexion.terminate()
+
+    def stats(self) -> dict:
+        return {
+            "escuchando": self.escuchando,
+            "usuarios": len(self._suscriptores),
+            "conexiones": sum(len(colas) for colas in self._suscriptores.values()),
+            "recibidas": self.recibidas,
+            "entregadas": self.entregadas,
+            "desbordes": self.desbordes,
+            "reconexiones": max(self.reconexiones - 1, 0),
+        }
+
+
+_canal = CanalAlertas(tamano_cola=settings.ALERTAS_PUSH_QUEUE_SIZE)
+
+
+def suscripcion(id_usuario: int):
+    return _canal.suscripcion(id_usuario)
+
+
+async def ejecutar_escucha(dsn: Optional[str] = None) -> None:
+    # asyncpg acepta el DSN postgresql:// de la conexión síncrona
+    await _canal.ejecutar(dsn or settings.database_url, settings.ALERTAS_PUSH_HEARTBEAT)
+
+
+def stats() -> dict:
+    return _canal.stats()
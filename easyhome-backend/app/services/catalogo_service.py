@@ -0,0 +1,148 @@
+"""
+Mantenimiento de la tabla desnormalizada del catálogo (Tarjeta_Catalogo)
+"""
+from typing import Iterable, Optional
+from sqlalchemy import select, update, func, and_, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by
+from sqlalchemy.orm import Session
+import logging
+
+from app.models.tarjeta_catalogo import Tarjeta_Catalogo
+from app.models.property import Publicacion_Servicio, Categoria_Servicio, Imagen_Publicacion
+from app.models.user import Usuario, Proveedor_Servicio
+
+logger = logging.getLogger(__name__)
+
+
+def _consulta_tarjetas():
+    """SELECT que arma una fila de Tarjeta_Catalogo por publicación."""
+    galeria = (
+        select(
+            func.coalesce(
+                func.jsonb_agg(
+                    aggregate_order_by(
+                        func.jsonb_build_object(
+                            "id_imagen", Imagen_Publicacion.id_imagen,
+                            "url_imagen", Imagen_Publicacion.url_imagen,
+                        ),
+                        Imagen_Publicacion.orden, Imagen_Publicacion.id_imagen,
+                    )
+                ),
+                literal_column("'[]'::jsonb"),
+            )
+        )
+        .where(Imagen_Publicacion.id_publicacion == Publicacion_Servicio.id_publicacion)
+        .scalar_subquery()
+    )
+    portada = (
+        select(Imagen_Publicacion.url_imagen)
+        .where(Imagen_Publicacion.id_publicacion == Publicacion_Servicio.id_publicacion)
+        .order_by(Imagen_Publicacion.orden, Imagen_Publicacion.id_imagen)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    columnas = {
+        "id_publicacion": Publicacion_Servicio.id_publicacion,
+        "id_proveedor": Publicacion_Servicio.id_proveedor,
+        "id_categoria": Publicacion_Servicio.id_categoria,
+        "titulo": Publicacion_Servicio.titulo,
+        "descripcion": Publicacion_Servicio.descripcion,
+        "rango_precio_min": Publicacion_Servicio.rango_precio_min,
+        "rango_precio_max": Publicacion_Servicio.rango_precio_max,
+        "fecha_publicacion": Publicacion_Servicio.fecha_publicacion,
+        "estado": Publicacion_Servicio.estado,
+        "categoria": Categoria_Servicio.nombre_categoria,
+        "imagen_portada_key": portada,
+        "imagenes": galeria,
+        "nombre_proveedor": func.coalesce(
+            func.nullif(Proveedor_Servicio.nombre_completo, ""),
+            func.nullif(Usuario.nombre, ""),
+            "Sin nombre",
+        ),
+        "correo_proveedor": Usuario.correo_electronico,
+        "telefono_proveedor": Usuario.numero_telefono,
+        # Foto del proveedor con respaldo en la foto de su usuario
+        "foto_perfil_key": func.coalesce(
+            func.nullif(Proveedor_Servicio.foto_perfil, ""),
+            func.nullif(Usuario.foto_perfil, ""),
+        ),
+        "calificacion_promedio": Proveedor_Servicio.calificacion_promedio,
+        "es_suscriptor": Proveedor_Servicio.id_plan_suscripcion.isnot(None),
+        "proveedor_activo": and_(
+            Proveedor_Servicio.estado_solicitud == "aprobado",
+            func.coalesce(Usuario.estado_cuenta == "activo", False),
+        ),
+    }
+
+    consulta = (
+        select(*[c.label(nombre) for nombre, c in columnas.items()])
+        .select_from(Publicacion_Servicio)
+        .join(Proveedor_Servicio, Proveedor_Servicio.id_proveedor == Publicacion_Servicio.id_proveedor)
+        .outerjoin(Usuario, Usuario.id_usuario == Proveedor_Servicio.id_proveedor)
+        .outerjoin(Categoria_Servicio, Categoria_Servicio.id_categoria == Publicacion_Servicio.id_categoria)
+    )
+    return consulta, list(columnas)
+
+
+def refrescar_tarjetas(
+    db: Session,
+    ids_publicacion: Optional[Iterable[int]] = None,
+    ids_proveedor: Optional[Iterable[int]] = None,
+    id_categoria: Optional[int] = None,
+) -> int:
+    """
+    Recalcula en una sola pasada (INSERT ... SELECT ... ON CONFLICT DO UPDATE)
+    las tarjetas de las publicaciones indicadas, de las publicaciones de los
+    proveedores indicados o de una categoría. Sin filtros reconstruye todo
+    el catálogo. Devuelve el número de tarjetas escritas. No hace commit.
+
+    Las tarjetas de publicaciones eliminadas se borran solas (ON DELETE CASCADE).
+    """
+    consulta, nombres = _consulta_tarjetas()
+
+    if ids_publicacion is not None:
+        ids_publicacion = list(ids_publicacion)
+        if not ids_publicacion:
+            return 0
+        consulta = consulta.where(Publicacion_Servicio.id_publicacion.in_(ids_publicacion))
+    if ids_proveedor is not None:
+        ids_proveedor = list(ids_proveedor)
+        if not ids_proveedor:
+            return 0
+        consulta = consulta.where(Publicacion_Servicio.id_proveedor.in_(ids_proveedor))
+    if id_categoria is not None:
+        consulta = consulta.where(Publicacion_Servicio.id_categoria == id_categoria)
+
+    # Enviar a la BD los cambios pendientes de la sesión antes de leerlos
+    db.flush()
+
+    tabla = Tarjeta_Catalogo.__table__
+    stmt = pg_insert(tabla).from_select(nombres, consulta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tabla.c.id_publicacion],
+        set_={
+            **{nombre: stmt.excluded[nombre] for nombre in nombres[1:]},
+            "fecha_actualizacion": func.now(),
+        },
+    )
+    escritas = db.execute(stmt).rowcount
+
+    logger.info(f"Tarjetas del catálogo refrescadas: {escritas}")
+    return escritas
+
+
+def actualizar_calificacion(db: Session, id_proveedor: Optional[int] = None) -> None:
+    """
+    Copia Proveedor_Servicio.calificacion_promedio a las tarjetas
+    (de un proveedor o de todos). No hace commit.
+    """
+    stmt = (
+        update(Tarjeta_Catalogo)
+        .where(Tarjeta_Catalogo.id_proveedor == Proveedor_Servicio.id_proveedor)
+        .where(Tarjeta_Catalogo.calificacion_promedio.is_distinct_from(Proveedor_Servicio.calificacion_promedio))
+        .values(calificacion_promedio=Proveedor_Servicio.calificacion_promedio)
+    )
+    if id_proveedor is not None:
+        stmt = stmt.where(Tarjeta_Catalogo.id_proveedor == id_proveedor)
+    db.execute(stmt)
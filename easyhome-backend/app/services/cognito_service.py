@@ -1,13 +1,34 @@
 """
 Servicio para interactuar con AWS Cognito
+
+Los atributos (búsqueda por correo) y los grupos de cada usuario se guardan
+en una caché con TTL, incluidos los usuarios inexistentes (con un TTL más
+corto). Las búsquedas concurrentes del mismo usuario se agrupan en una sola
+llamada a AWS. Los errores de AWS (p. ej. throttling) nunca se cachean.
 """
 import boto3
 from botocore.exceptions import ClientError
+from app.core.cache import TTLCache, SingleFlight
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Grupo de Cognito -> tipo_usuario local, en orden de prioridad
+TIPOS_POR_GRUPO = (
+    ("Admin", "administrador"),
+    ("Trabajadores", "proveedor"),
+    ("Clientes", "cliente"),
+)
+
+
+def tipo_usuario_de_grupos(grupos, actual: str | None = None) -> str | None:
+    """Tipo de usuario local según los grupos de Cognito (`actual` si ninguno aplica)."""
+    for grupo, tipo in TIPOS_POR_GRUPO:
+        if grupo in grupos:
+            return tipo
+    return actual
+
 
 class CognitoService:
     """Servicio para gestionar usuarios y grupos en AWS Cognito"""
@@ -16,6 +37,9 @@ class CognitoService:
         """Inicializa el cliente de Cognito"""
         self.client = None
         self.user_pool_id = settings.COGNITO_USER_POOL_ID
+        self._atributos = TTLCache(maxsize=settings.COGNITO_CACHE_SIZE, ttl=settings.COGNITO_CACHE_TTL)  # correo -> atributos
+        self._grupos = TTLCache(maxsize=settings.COGNITO_CACHE_SIZE, ttl=settings.COGNITO_CACHE_TTL)  # username -> grupos
+        self._vuelos = SingleFlight()
         
         # Solo inicializar si tenemos las credenciales configuradas
         if settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY:
@@ -48,6 +72,7 @@ class CognitoService:
                 GroupName=group_name
             )
             logger.info(f"Usuario {username} agregado al grupo {group_name}")
+            self._grupos.pop(username, None)
             return True
             
         except ClientError as e:
@@ -65,7 +90,37 @@ class CognitoService:
         except Exception as e:
             logger.error(f"Error inesperado al agregar usuario al grupo: {e}")
             return False
-    
+
+    def remove_user_from_group(self, username: str, group_name: str) -> bool:
+        """
+        Quita a un usuario de un grupo en Cognito (idempotente: quitarlo de un
+        grupo al que no pertenece no es un error)
+
+        Args:
+            username: El username del usuario (puede ser email o sub)
+            group_name: Nombre del grupo
+
+        Returns:
+            True si se quitó exitosamente, False en caso contrario
+        """
+        if not self.client or not self.user_pool_id:
+            logger.warning("Cliente de Cognito no configurado. Verifica las credenciales de AWS.")
+            return False
+
+        try:
+            self.client.admin_remove_user_from_group(
+                UserPoolId=self.user_pool_id,
+                Username=username,
+                GroupName=group_name
+            )
+            logger.info(f"Usuario {username} quitado del grupo {group_name}")
+            self._grupos.pop(username, None)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error al quitar usuario {username} del grupo {group_name}: {e}")
+            return False
+
     def get_user_groups(self, username: str) -> list[str]:
         """
         Obtiene los grupos a los que pertenece un usuario
@@ -80,6 +135,12 @@ class CognitoService:
             logger.warning("Cliente de Cognito no configurado")
             return []
         
+        groups = self._grupos.get(username)
+        if groups is None:
+            groups = self._vuelos.do(("grupos", username), lambda: self._consultar_grupos(username))
+        return list(groups)
+
+    def _consultar_grupos(self, username: str) -> list[str]:
         try:
             response = self.client.admin_list_groups_for_user(
                 UserPoolId=self.user_pool_id,
@@ -88,9 +149,12 @@ class CognitoService:
             
             groups = [group['GroupName'] for group in response.get('Groups', [])]
             logger.info(f"Usuario {username} pertenece a los grupos: {groups}")
+            self._grupos.set(username, groups)
             return groups
             
         except ClientError as e:
+            if e.response['Error']['Code'] == 'UserNotFoundException':
+                self._grupos.set(username, [], ttl=settings.COGNITO_NEGATIVE_CACHE_TTL)
             logger.error(f"Error al obtener grupos del usuario: {e}")
             return []
         except Exception as e:
@@ -130,6 +194,12 @@ class CognitoService:
             logger.warning("Cliente de Cognito no configurado")
             return {}
 
+        attributes = self._atributos.get(email)
+        if attributes is None:
+            attributes = self._vuelos.do(("correo", email), lambda: self._buscar_por_correo(email))
+        return dict(attributes)
+
+    def _buscar_por_correo(self, email: str) -> dict:
         try:
             # Busca al usuario por correo (case-insensitive)
             response = self.client.list_users(
@@ -144,13 +214,17 @@ class CognitoService:
             users = response.get("Users", [])
             if not users:
                 logger.warning(f"No se encontró usuario con el correo {email}")
+                self._atributos.set(email, {}, ttl=settings.COGNITO_NEGATIVE_CACHE_TTL)
                 return {}
 
             username = users[0]["Username"]
             logger.info(f"Usuario encontrado: {username} para {email}")
 
             # Obtén atributos reales con admin_get_user
-            return self.get_user_attributes(username)
+            attributes = self.get_user_attributes(username)
+            if attributes:
+                self._atributos.set(email, attributes)
+            return attributes
 
         except ClientError as e:
             logger.error(f"Error al buscar usuario por correo {email}: {e}")
@@ -184,6 +258,19 @@ class CognitoService:
         logger.info(f"Usuario {username} ya tiene grupos: {current_groups}")
         return True
 
+    def invalidar_usuario(self, email: str) -> None:
+        """Olvida atributos y grupos cacheados de un usuario (tras modificarlo en Cognito)."""
+        self._atributos.pop(email, None)
+        self._grupos.pop(email, None)
+
+    def stats(self) -> dict:
+        """Contadores de las cachés de Cognito (para diagnóstico)."""
+        return {
+            "atributos": self._atributos.stats(),
+            "grupos": self._grupos.stats(),
+            "llamadas_compartidas": self._vuelos.compartidas,
+        }
+
 
 # Instancia global del servicio
 cognito_service = CognitoService()
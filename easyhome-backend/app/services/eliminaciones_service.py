@@ -0,0 +1,138 @@
+"""
+Bandeja de salida (outbox) de eliminaciones en S3
+
+Los endpoints no borran objetos de S3 dentro del request: agregan las keys a
+Eliminacion_S3_Pendiente en la misma transacción en que borran las filas
+que las referencian. Un drenador en segundo plano las elimina en lotes de
+hasta 1000 (DeleteObjects) y reprograma con espera exponencial las que
+fallan, así que ningún objeto queda huérfano en silencio.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Iterable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import BigInteger, Text, column, select, update, delete, func, insert, literal_column
+from sqlalchemy import values as sa_values
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.eliminacion_s3_pendiente import Eliminacion_S3_Pendiente
+from app.services.s3_service import s3_service, DELETE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Tiempo que un drenador tiene tomada una tanda antes de que otro la reintente
+ARRIENDO = timedelta(minutes=5)
+# Espera entre reintentos: 30 s, 1 min, 2 min, ... hasta 1 h
+ESPERA_BASE_SEGUNDOS = 30
+ESPERA_MAXIMA_SEGUNDOS = 3600
+
+
+def encolar_eliminaciones(db: Session, keys: Iterable[str]) -> int:
+    """
+    Agrega keys de S3 a la bandeja de eliminaciones. No hace commit: se
+    confirma junto con el borrado de las filas del llamador.
+    """
+    keys = [key for key in dict.fromkeys(keys) if key]
+    if keys:
+        db.execute(insert(Eliminacion_S3_Pendiente), [{"s3_key": key} for key in keys])
+    return len(keys)
+
+
+def drenar_pendientes(lote: int = DELETE_BATCH_SIZE) -> int:
+    """
+    Procesa una tanda de eliminaciones vencidas. Devuelve cuántas se tomaron.
+
+    1. Toma la tanda (FOR UPDATE SKIP LOCKED) moviendo su próximo intento al
+       final del arriendo y confirma: varios procesos pueden drenar a la vez
+       y la conexión no se retiene durante la llamada a S3.
+    2. Elimina los objetos con DeleteObjects.
+    3. Borra las filas eliminadas y reprograma las fallidas con espera
+       exponencial (un DELETE y un UPDATE por tanda).
+    """
+    tabla = Eliminacion_S3_Pendiente
+    db = SessionLocal()
+    try:
+        vencidas = (
+            select(tabla.id_eliminacion)
+            .where(tabla.proximo_intento <= func.now())
+            .order_by(tabla.id_eliminacion)
+            .limit(lote)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        tomadas = db.execute(
+            update(tabla)
+            .where(tabla.id_eliminacion.in_(vencidas))
+            .values(proximo_intento=func.now() + ARRIENDO)
+            .returning(tabla.id_eliminacion, tabla.s3_key)
+        ).all()
+        db.commit()
+        if not tomadas:
+            return 0
+
+        errores = s3_service.delete_objects(key for _, key in tomadas)
+
+        eliminadas = [id_eliminacion for id_eliminacion, key in tomadas if key not in errores]
+        if eliminadas:
+            db.execute(delete(tabla).where(tabla.id_eliminacion.in_(eliminadas)))
+
+        fallidas = [(id_eliminacion, errores[key][:1000]) for id_eliminacion, key in tomadas if key in errores]
+        if fallidas:
+            # Una sola sentencia para toda la tanda: UPDATE ... FROM (VALUES (id, error), ...)
+            valores = sa_values(
+                column("id_eliminacion", BigInteger), column("ultimo_error", Text), name="fallidas"
+            ).data(fallidas)
+            espera = func.least(
+                ESPERA_BASE_SEGUNDOS * func.power(2, tabla.intentos),
+                ESPERA_MAXIMA_SEGUNDOS,
+            )
+            db.execute(
+                update(tabla)
+                .where(tabla.id_eliminacion == valores.c.id_eliminacion)
+                .values(
+                    intentos=tabla.intentos + 1,
+                    ultimo_error=valores.c.ultimo_error,
+                    proximo_intento=func.now() + espera * literal_column("interval '1 second'"),
+                )
+            )
+        db.commit()
+
+        if errores:
+            logger.warning(f"Eliminaciones en S3 con error (se reintentarán): {len(errores)}")
+        return len(tomadas)
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def contar_pendientes(db: Session) -> dict:
+    """Totales de la bandeja (para diagnóstico)."""
+    tabla = Eliminacion_S3_Pendiente
+    total, con_error = db.execute(
+        select(func.count(), func.count().filter(tabla.intentos > 0))
+    ).one()
+    return {"pendientes": total, "con_error": con_error}
+
+
+async def ejecutar_drenador(intervalo: float = None) -> None:
+    """
+    Tarea de fondo: drena la bandeja continuamente. Sigue de inmediato
+    mientras encuentre tandas completas y espera `intervalo` cuando se vacía.
+    """
+    intervalo = intervalo or settings.S3_DELETE_DRAIN_INTERVAL
+    logger.info("Drenador de eliminaciones de S3 iniciado")
+    while True:
+        try:
+            tomadas = await run_in_threadpool(drenar_pendientes)
+        except Exception as e:
+            logger.error(f"Error al drenar eliminaciones de S3: {e}")
+            tomadas = 0
+        if tomadas < DELETE_BATCH_SIZE:
+            await asyncio.sleep(intervalo)
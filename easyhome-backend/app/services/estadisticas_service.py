@@ -0,0 +1,150 @@
+"""
+Mantenimiento del agregado de calificaciones por proveedor (Estadistica_Proveedor)
+"""
+from sqlalchemy import select, update, func, cast, and_, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+import logging
+
+from app.models.estadistica_proveedor import Estadistica_Proveedor
+from app.models.reseña_servicio import Reseña_Servicio
+from app.models.user import Proveedor_Servicio
+from app.services import catalogo_service
+
+logger = logging.getLogger(__name__)
+
+# Solo las reseñas en este estado cuentan para el agregado
+ESTADO_ACTIVA = "activa"
+
+# (columna de suma, columna de promedio, atributo de la reseña)
+RUBROS = (
+    ("suma_general", "calificacion_promedio", "calificacion_general"),
+    ("suma_puntualidad", "promedio_puntualidad", "calificacion_puntualidad"),
+    ("suma_calidad_servicio", "promedio_calidad_servicio", "calificacion_calidad_servicio"),
+    ("suma_calidad_precio", "promedio_calidad_precio", "calificacion_calidad_precio"),
+)
+
+
+def _promedio(suma, total):
+    """Promedio redondeado a 2 decimales; NULL si no hay reseñas."""
+    return func.round(cast(suma, Numeric) / func.nullif(total, 0), 2)
+
+
+def _sincronizar_proveedor(db: Session, id_proveedor: int, calificacion) -> None:
+    """Copia el promedio general a Proveedor_Servicio y a sus tarjetas del catálogo."""
+    db.execute(
+        update(Proveedor_Servicio)
+        .where(Proveedor_Servicio.id_proveedor == id_proveedor)
+        .values(calificacion_promedio=calificacion)
+    )
+    catalogo_service.actualizar_calificacion(db, id_proveedor)
+
+
+def aplicar_resena(db: Session, resena: Reseña_Servicio, signo: int = 1) -> None:
+    """
+    Suma (signo=1) o resta (signo=-1) una reseña al agregado de su proveedor
+    con un único UPSERT. No hace commit: corre en la transacción del llamador.
+    """
+    tabla = Estadistica_Proveedor.__table__
+    nuevo_total = tabla.c.total_reseñas + signo
+
+    valores_insert = {
+        "id_proveedor": resena.id_proveedor,
+        "total_reseñas": max(signo, 0),
+    }
+    valores_update = {
+        "total_reseñas": nuevo_total,
+        "fecha_actualizacion": func.now(),
+    }
+
+    for columna_suma, columna_promedio, atributo in RUBROS:
+        valor = getattr(resena, atributo) or 0
+        valores_insert[columna_suma] = valor if signo > 0 else 0
+        valores_insert[columna_promedio] = valor if signo > 0 else None
+
+        nueva_suma = tabla.c[columna_suma] + signo * valor
+        valores_update[columna_suma] = nueva_suma
+        valores_update[columna_promedio] = _promedio(nueva_suma, nuevo_total)
+
+    stmt = (
+        pg_insert(tabla)
+        .values(**valores_insert)
+        .on_conflict_do_update(index_elements=[tabla.c.id_proveedor], set_=valores_update)
+        .returning(tabla.c.calificacion_promedio)
+    )
+    calificacion = db.execute(stmt).scalar()
+
+    _sincronizar_proveedor(db, resena.id_proveedor, calificacion)
+
+
+def registrar_cambio_estado(db: Session, resena: Reseña_Servicio, estado_anterior: str) -> None:
+    """
+    Ajusta el agregado cuando una reseña entra o sale del estado 'activa'.
+    Debe llamarse después de asignar el nuevo estado a la reseña.
+    """
+    estaba_activa = estado_anterior == ESTADO_ACTIVA
+    esta_activa = resena.estado == ESTADO_ACTIVA
+
+    if estaba_activa and not esta_activa:
+        aplicar_resena(db, resena, signo=-1)
+    elif esta_activa and not estaba_activa:
+        aplicar_resena(db, resena, signo=1)
+
+
+def recalcular_estadisticas(db: Session, id_proveedor: int | None = None) -> int:
+    """
+    Reconstruye el agregado en una sola pasada (INSERT ... SELECT ... GROUP BY)
+    para todos los proveedores o solo para `id_proveedor`.
+    Devuelve el número de proveedores procesados. No hace commit.
+    """
+    tabla = Estadistica_Proveedor.__table__
+
+    columnas = [
+        Proveedor_Servicio.id_proveedor,
+        func.count(Reseña_Servicio.id_reseña),
+    ]
+    nombres = ["id_proveedor", "total_reseñas"]
+    for columna_suma, columna_promedio, atributo in RUBROS:
+        campo = getattr(Reseña_Servicio, atributo)
+        columnas += [func.coalesce(func.sum(campo), 0), func.round(func.avg(campo), 2)]
+        nombres += [columna_suma, columna_promedio]
+
+    consulta = (
+        select(*columnas)
+        .select_from(Proveedor_Servicio)
+        .outerjoin(
+            Reseña_Servicio,
+            and_(
+                Reseña_Servicio.id_proveedor == Proveedor_Servicio.id_proveedor,
+                Reseña_Servicio.estado == ESTADO_ACTIVA,
+            ),
+        )
+        .group_by(Proveedor_Servicio.id_proveedor)
+    )
+    if id_proveedor is not None:
+        consulta = consulta.where(Proveedor_Servicio.id_proveedor == id_proveedor)
+
+    stmt = pg_insert(tabla).from_select(nombres, consulta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tabla.c.id_proveedor],
+        set_={
+            **{nombre: stmt.excluded[nombre] for nombre in nombres[1:]},
+            "fecha_actualizacion": func.now(),
+        },
+    )
+    procesados = db.execute(stmt).rowcount
+
+    # Sincronizar Proveedor_Servicio.calificacion_promedio en la misma pasada
+    sincronizar = (
+        update(Proveedor_Servicio)
+        .where(Proveedor_Servicio.id_proveedor == tabla.c.id_proveedor)
+        .where(Proveedor_Servicio.calificacion_promedio.is_distinct_from(tabla.c.calificacion_promedio))
+        .values(calificacion_promedio=tabla.c.calificacion_promedio)
+    )
+    if id_proveedor is not None:
+        sincronizar = sincronizar.where(Proveedor_Servicio.id_proveedor == id_proveedor)
+    db.execute(sincronizar)
+    catalogo_service.actualizar_calificacion(db, id_proveedor)
+
+    logger.info(f"Estadísticas recalculadas para {procesados} proveedores")
+    return procesados
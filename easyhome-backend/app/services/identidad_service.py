@@ -0,0 +1,147 @@
+"""
+Caché de identidad: Usuario y Proveedor_Servicio por id y por correo
+
+Casi todos los endpoints de escritura empiezan resolviendo al usuario por
+correo (y a su registro de proveedor). Estas funciones devuelven copias
+inmutables de esas filas desde una caché LRU acotada con TTL, de modo que
+las búsquedas repetidas no llegan a la BD.
+
+Las copias no están ligadas a la sesión: para modificar una fila hay que
+cargarla. Donde se modifican esas filas (login, aprobación/rechazo de
+solicitudes, fotos de perfil) se llama a `invalidar_usuario` /
+`invalidar_proveedor`; entre procesos el TTL acota lo que puede quedar
+desactualizado.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import Usuario, Proveedor_Servicio
+
+
+@dataclass(frozen=True)
+class UsuarioSnapshot:
+    id_usuario: int
+    nombre: str
+    correo_electronico: str
+    numero_telefono: Optional[str]
+    fecha_nacimiento: Optional[date]
+    tipo_usuario: str
+    estado_cuenta: str
+    google_id: Optional[str]
+    foto_perfil: Optional[str]
+    fecha_registro: Optional[datetime]
+    ultima_sesion: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class ProveedorSnapshot:
+    id_proveedor: int
+    nombre_completo: str
+    estado_solicitud: str
+
+
+# Marca de "el usuario no tiene registro de proveedor" (también se cachea)
+_SIN_PROVEEDOR = object()
+
+_usuarios = TTLCache(maxsize=settings.IDENTITY_CACHE_SIZE, ttl=settings.IDENTITY_CACHE_TTL)  # id -> UsuarioSnapshot
+_ids_por_correo = TTLCache(maxsize=settings.IDENTITY_CACHE_SIZE, ttl=settings.IDENTITY_CACHE_TTL)  # correo -> id
+_proveedores = TTLCache(maxsize=settings.IDENTITY_CACHE_SIZE, ttl=settings.IDENTITY_CACHE_TTL)  # id -> ProveedorSnapshot
+
+
+def _copiar_usuario(usuario: Usuario) -> UsuarioSnapshot:
+    return UsuarioSnapshot(
+        id_usuario=usuario.id_usuario,
+        nombre=usuario.nombre,
+        correo_electronico=usuario.correo_electronico,
+        numero_telefono=usuario.numero_telefono,
+        fecha_nacimiento=usuario.fecha_nacimiento,
+        tipo_usuario=usuario.tipo_usuario,
+        estado_cuenta=usuario.estado_cuenta,
+        google_id=usuario.google_id,
+        foto_perfil=usuario.foto_perfil,
+        fecha_registro=usuario.fecha_registro,
+        ultima_sesion=usuario.ultima_sesion,
+    )
+
+
+def _guardar_usuario(usuario: Optional[Usuario]) -> Optional[UsuarioSnapshot]:
+    # Los usuarios inexistentes no se cachean: el login puede crearlos en cualquier momento
+    if usuario is None:
+        return None
+    copia = _copiar_usuario(usuario)
+    _usuarios.set(copia.id_usuario, copia)
+    _ids_por_correo.set(copia.correo_electronico, copia.id_usuario)
+    return copia
+
+
+def usuario_por_id(db: Session, id_usuario: int) -> Optional[UsuarioSnapshot]:
+    """Copia del Usuario con ese id (o None)."""
+    copia = _usuarios.get(id_usuario)
+    if copia is not None:
+        return copia
+    return _guardar_usuario(db.query(Usuario).filter(Usuario.id_usuario == id_usuario).first())
+
+
+def usuario_por_correo(db: Session, correo: str) -> Optional[UsuarioSnapshot]:
+    """Copia del Usuario con ese correo (o None)."""
+    id_usuario = _ids_por_correo.get(correo)
+    if id_usuario is not None:
+        copia = _usuarios.get(id_usuario)
+        if copia is not None and copia.correo_electronico == correo:
+            return copia
+    return _guardar_usuario(db.query(Usuario).filter(Usuario.correo_electronico == correo).first())
+
+
+def proveedor_de(db: Session, id_usuario: int) -> Optional[ProveedorSnapshot]:
+    """Copia del registro de Proveedor_Servicio del usuario (o None si no tiene)."""
+    copia = _proveedores.get(id_usuario)
+    if copia is _SIN_PROVEEDOR:
+        return None
+    if copia is not None:
+        return copia
+
+    fila = db.query(
+        Proveedor_Servicio.id_proveedor,
+        Proveedor_Servicio.nombre_completo,
+        Proveedor_Servicio.estado_solicitud,
+    ).filter(Proveedor_Servicio.id_proveedor == id_usuario).first()
+    copia = ProveedorSnapshot(**fila._asdict()) if fila else None
+    _proveedores.set(id_usuario, copia if copia is not None else _SIN_PROVEEDOR)
+    return copia
+
+
+def invalidar_usuario(id_usuario: Optional[int] = None, correo: Optional[str] = None) -> None:
+    """Olvida la copia de un usuario (llamar después del commit que lo modifica)."""
+    if id_usuario is None and correo is not None:
+        id_usuario = _ids_por_correo.get(correo)
+    if correo is not None:
+        _ids_por_correo.pop(correo, None)
+    if id_usuario is not None:
+        copia = _usuarios.pop(id_usuario, None)
+        if copia is not None:
+            _ids_por_correo.pop(copia.correo_electronico, None)
+
+
+def invalidar_proveedor(id_proveedor: int) -> None:
+    """Olvida el registro de proveedor de un usuario (creado, aprobado o eliminado)."""
+    _proveedores.pop(id_proveedor, None)
+
+
+def limpiar() -> None:
+    _usuarios.clear()
+    _ids_por_correo.clear()
+    _proveedores.clear()
+
+
+def stats() -> dict:
+    """Contadores de hits/misses de las cachés (para diagnóstico)."""
+    return {
+        "usuarios": _usuarios.stats(),
+        "correos": _ids_por_correo.stats(),
+        "proveedores": _proveedores.stats(),
+    }
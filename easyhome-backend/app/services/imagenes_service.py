@@ -0,0 +1,222 @@
+"""
+Variantes de imágenes (miniatura y mediana en WebP)
+
+Después de subir una imagen a S3 se encola su procesamiento en un pool de
+hilos, fuera del request: se descarga el original, se aplica la orientación
+EXIF, se descartan los metadatos (EXIF/GPS) y se recomprime en WebP de
+tamaño fijo en keys hermanas deterministas:
+
+    publicaciones/15/abc.jpg -> publicaciones/15/abc__thumb.webp
+                             -> publicaciones/15/abc__medium.webp
+
+Cuando todas las variantes están en S3 la key original se registra en
+Imagen_Variante; mientras tanto los listados sirven el original. Si el
+original se eliminó o reemplazó mientras se procesaba, no se registra y
+las variantes recién subidas van a la bandeja de eliminaciones de S3.
+
+Pillow es opcional: si no está instalado no se generan variantes y se
+sirven siempre los originales.
+"""
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from sqlalchemy import select, delete, func, exists, literal, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.eliminacion_s3_pendiente import Eliminacion_S3_Pendiente
+from app.models.foto_trabajo import Foto_Trabajo_Anterior
+from app.models.imagen_reseña import Imagen_Reseña
+from app.models.imagen_variante import Imagen_Variante
+from app.models.property import Imagen_Publicacion
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import eliminaciones_service
+from app.services.s3_service import s3_service
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow no instalado: se sirven los originales
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# variante -> lado mayor máximo en píxeles (nunca se amplía)
+VARIANTES = {
+    "thumb": 320,
+    "medium": 1024,
+}
+CALIDAD_WEBP = 80
+
+# Columnas que guardan keys de S3 de imágenes con variantes
+COLUMNAS_IMAGEN = (
+    Imagen_Publicacion.url_imagen,
+    Foto_Trabajo_Anterior.url_imagen,
+    Imagen_Reseña.url_imagen,
+    Usuario.foto_perfil,
+    Proveedor_Servicio.foto_perfil,
+)
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def key_variante(key: str, variante: str) -> str:
+    """Key de S3 de una variante (ej: "a/b.jpg" -> "a/b__thumb.webp")."""
+    base, _ = posixpath.splitext(key)
+    return f"{base}__{variante}.webp"
+
+
+def generar_variantes(contenido: bytes) -> dict[str, bytes]:
+    """
+    Genera las variantes WebP de una imagen: orientación EXIF aplicada,
+    sin metadatos y recomprimidas. Devuelve {variante: bytes}.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow no está instalado")
+
+    with Image.open(io.BytesIO(contenido)) as original:
+        imagen = ImageOps.exif_transpose(original)
+        transparente = imagen.mode in ("RGBA", "LA") or (
+            imagen.mode == "P" and "transparency" in imagen.info
+        )
+        imagen = imagen.convert("RGBA" if transparente else "RGB")
+
+        variantes = {}
+        for nombre, lado in VARIANTES.items():
+            copia = imagen.copy()
+            copia.thumbnail((lado, lado), Image.LANCZOS)
+            buffer = io.BytesIO()
+            copia.save(buffer, format="WEBP", quality=CALIDAD_WEBP, method=4, exif=b"")
+            variantes[nombre] = buffer.getvalue()
+        return variantes
+
+
+def _registrar_variantes(db: Session, key: str) -> bool:
+    """
+    Registra en Imagen_Variante un original cuyas variantes ya están en S3,
+    solo si alguna fila todavía lo usa y no está en la bandeja de
+    eliminaciones (un solo INSERT ... SELECT). Si no, encola las variantes
+    subidas para eliminarlas. Devuelve si quedó registrado. No hace commit.
+    """
+    vigente = (
+        select(literal(key))
+        .where(or_(*[exists().where(columna == key) for columna in COLUMNAS_IMAGEN]))
+        .where(~exists().where(Eliminacion_S3_Pendiente.s3_key == key))
+    )
+    stmt = pg_insert(Imagen_Variante).from_select([Imagen_Variante.s3_key], vigente)
+    registrada = db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Imagen_Variante.s3_key],
+            set_={"fecha_generacion": func.now()},
+        ).returning(Imagen_Variante.s3_key)
+    ).scalar()
+    if registrada is None:
+        # El original se eliminó o reemplazó durante el procesamiento:
+        # descartar_variantes ya corrió y no verá estas variantes
+        eliminaciones_service.encolar_eliminaciones(db, [key_variante(key, nombre) for nombre in VARIANTES])
+    return registrada is not None
+
+
+def procesar_imagen(key: str) -> bool:
+    """
+    Descarga el original, sube sus variantes y lo marca en Imagen_Variante.
+    Se ejecuta en el pool; los errores se registran y el original se sigue sirviendo.
+    """
+    try:
+        variantes = generar_variantes(s3_service.download_file(key))
+        for nombre, datos in variantes.items():
+            s3_service.upload_file(io.BytesIO(datos), key_variante(key, nombre), content_type="image/webp")
+    except Exception as e:
+        logger.error(f"No se pudieron generar las variantes de {key}: {e}")
+        return False
+
+    db = SessionLocal()
+    try:
+        registrada = _registrar_variantes(db, key)
+        db.commit()
+        if registrada:
+            logger.info(f"Variantes generadas para {key}")
+        else:
+            logger.info(f"{key} se eliminó durante el procesamiento: variantes descartadas")
+        return registrada
+    except Exception as e:
+        db.rollback()
+        logger.error(f"No se pudo registrar las variantes de {key}: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def _obtener_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                thread_name_prefix="variantes"
+            )
+        return _pool
+
+
+def encolar_variantes(keys: Iterable[str]) -> int:
+    """
+    Encola (sin esperar) la generación de variantes de las keys subidas.
+    Llamar después del commit que registra las imágenes. Devuelve cuántas se encolaron.
+    """
+    keys = [key for key in dict.fromkeys(keys) if key]
+    if not keys:
+        return 0
+    if Image is None:
+        logger.debug("Pillow no está instalado: no se generan variantes de imágenes")
+        return 0
+
+    pool = _obtener_pool()
+    for key in keys:
+        pool.submit(procesar_imagen, key)
+    return len(keys)
+
+
+def _consulta_listas(keys: Iterable[str]):
+    keys = [key for key in dict.fromkeys(keys) if key]
+    if not keys:
+        return None
+    return select(Imagen_Variante.s3_key).where(Imagen_Variante.s3_key.in_(keys))
+
+
+def variantes_listas(db: Session, keys: Iterable[str]) -> set:
+    """Subconjunto de `keys` cuyas variantes ya están generadas (una sola consulta)."""
+    consulta = _consulta_listas(keys)
+    return set(db.scalars(consulta)) if consulta is not None else set()
+
+
+async def variantes_listas_async(db: AsyncSession, keys: Iterable[str]) -> set:
+    """Igual que `variantes_listas`, con AsyncSession."""
+    consulta = _consulta_listas(keys)
+    return set(await db.scalars(consulta)) if consulta is not None else set()
+
+
+def clave_vista(key: Optional[str], variante: str, listas: set) -> Optional[str]:
+    """Key a servir para una vista: la variante si está lista, si no el original."""
+    if key and key in listas:
+        return key_variante(key, variante)
+    return key
+
+
+def descartar_variantes(db: Session, keys: Iterable[str]) -> list[str]:
+    """
+    Olvida las variantes de originales que se van a borrar o reemplazar y
+    devuelve sus keys de S3 para eliminarlas junto con el original. No hace commit.
+    """
+    keys = [key for key in dict.fromkeys(keys) if key]
+    if not keys:
+        return []
+    db.execute(delete(Imagen_Variante).where(Imagen_Variante.s3_key.in_(keys)))
+    return [key_variante(key, variante) for key in keys for variante in VARIANTES]
@@ -0,0 +1,275 @@
+"""
+Particiones mensuales de alerta_sistema y su retención
+
+alerta_sistema está particionada por rango de fecha_envio, una partición por
+mes (alerta_sistema_p2026_01, ...). Cada partición hereda los índices de la
+tabla padre, entre ellos (id_usuario, fecha_envio DESC, id_alerta DESC) del
+feed: las consultas de un usuario recorren índices pequeños y las acotadas
+por fecha descartan los meses que no cubren.
+
+La partición DEFAULT (alerta_sistema_default) recibe las alertas de meses
+sin partición, así que un INSERT nunca falla aunque el mantenimiento se
+atrase. La API crea por adelantado las particiones de los próximos
+ALERTAS_PARTICIONES_ADELANTE meses (ejecutar_mantenimiento) y, si la DEFAULT
+ya tiene filas de un mes, las mueve a su partición al crearla.
+La retención separa las particiones más antiguas que ALERTAS_RETENCION_MESES
+y las elimina o las mueve al esquema `archivo`. Postgres no permite
+DETACH ... CONCURRENTLY si hay partición DEFAULT: se usa el DETACH normal,
+que solo cambia el catálogo, con lock_timeout para no encolar escrituras.
+Requiere PostgreSQL 14+.
+"""
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TABLA = "alerta_sistema"
+# Esquema al que se mueven las particiones archivadas
+ESQUEMA_ARCHIVO = "archivo"
+# Espera máxima por el bloqueo del DETACH sin CONCURRENTLY (reintenta en la siguiente pasada)
+LOCK_TIMEOUT_DETACH = "5s"
+
+_LIMITES = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+@dataclass
+class Particion:
+    nombre: str
+    desde: date
+    hasta: date
+    # DETACH CONCURRENTLY interrumpido: falta el FINALIZE
+    pendiente: bool = False
+
+
+def inicio_de_mes(fecha: date) -> date:
+    return date(fecha.year, fecha.month, 1)
+
+
+def sumar_meses(mes: date, meses: int) -> date:
+    """Primer día del mes que está `meses` meses después (o antes) de `mes`."""
+    total = mes.year * 12 + mes.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nombre_particion(mes: date, tabla: str = TABLA) -> str:
+    return f"{tabla}_p{mes:%Y_%m}"
+
+
+def nombre_default(tabla: str = TABLA) -> str:
+    return f"{tabla}_default"
+
+
+def ddl_particion(mes: date, tabla: str = TABLA, padre: Optional[str] = None) -> str:
+    """
+    CREATE de la partición del mes de `mes` (rango [día 1, día 1 del
+    siguiente)). `padre` permite colgarla de otra tabla con el nombre
+    definitivo (la migración la crea bajo alerta_sistema_nueva).
+    """
+    desde = inicio_de_mes(mes)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {nombre_particion(desde, tabla)} "
+        f"PARTITION OF {padre or tabla} "
+        f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{sumar_meses(desde, 1).isoformat()}')"
+    )
+
+
+def ddl_default(tabla: str = TABLA, padre: Optional[str] = None) -> str:
+    """CREATE de la partición DEFAULT (alertas de meses sin partición)."""
+    return f"CREATE TABLE IF NOT EXISTS {nombre_default(tabla)} PARTITION OF {padre or tabla} DEFAULT"
+
+
+def es_particionada(conexion: Connection, tabla: str = TABLA) -> bool:
+    return conexion.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:tabla)"),
+        {"tabla": tabla},
+    ).scalar() or False
+
+
+def listar_particiones(conexion: Connection, tabla: str = TABLA) -> List[Particion]:
+    """Particiones de rango de la tabla, de la más antigua a la más reciente."""
+    filas = conexion.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), i.inhdetachpending "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:tabla)"
+        ),
+        {"tabla": tabla},
+    ).all()
+
+    particiones = []
+    for nombre, limites, pendiente in filas:
+        rango = _LIMITES.search(limites or "")
+        if not rango:
+            continue
+        desde, hasta = (date.fromisoformat(valor[:10]) for valor in rango.groups())
+        particiones.append(Particion(nombre, desde, hasta, bool(pendiente)))
+    return sorted(particiones, key=lambda particion: particion.desde)
+
+
+def particion_default(conexion: Connection, tabla: str = TABLA) -> Optional[str]:
+    """Nombre de la partición DEFAULT de la tabla (None si no tiene)."""
+    return conexion.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:tabla) AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'"
+        ),
+        {"tabla": tabla},
+    ).scalar()
+
+
+def _crear_particion(conexion: Connection, mes: date, tabla: str, padre: Optional[str], default: Optional[str]):
+    """
+    Crea la partición del mes. Postgres rechaza el CREATE si la DEFAULT ya
+    tiene filas de ese rango: se sacan antes a una tabla temporal y se
+    reinsertan por la tabla padre, todo en la transacción del llamador.
+    """
+    desde, hasta = mes.isoformat(), sumar_meses(mes, 1).isoformat()
+    rango = f"fecha_envio >= '{desde}' AND fecha_envio < '{hasta}'"
+    con_filas = default is not None and conexion.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {rango})")
+    ).scalar()
+    if not con_filas:
+        conexion.execute(text(ddl_particion(mes, tabla, padre)))
+        return
+
+    temporal = f"{nombre_particion(mes, tabla)}_movidas"
+    conexion.execute(text(f"LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE"))
+    conexion.execute(text(f"CREATE TEMP TABLE {temporal} ON COMMIT DROP AS SELECT * FROM {default} WHERE {rango}"))
+    conexion.execute(text(f"DELETE FROM {default} WHERE {rango}"))
+    conexion.execute(text(ddl_particion(mes, tabla, padre)))
+    movidas = conexion.execute(text(f"INSERT INTO {padre or tabla} SELECT * FROM {temporal}")).rowcount
+    logger.info(f"{movidas} alertas movidas de {default} a {nombre_particion(mes, tabla)}")
+
+
+def crear_particiones(
+    conexion: Connection,
+    desde: date,
+    meses_adelante: int,
+    tabla: str = TABLA,
+    hoy: Optional[date] = None,
+    padre: Optional[str] = None,
+) -> List[str]:
+    """
+    Crea las particiones que falten desde el mes de `desde` hasta
+    `meses_adelante` meses después del actual, y la DEFAULT si no existe.
+    Devuelve las creadas. No hace commit.
+    """
+    cubiertos = {particion.desde for particion in listar_particiones(conexion, padre or tabla)}
+    default = particion_default(conexion, padre or tabla)
+    ultimo = sumar_meses(inicio_de_mes(hoy or date.today()), meses_adelante)
+
+    creadas = []
+    mes = inicio_de_mes(desde)
+    while mes <= ultimo:
+        if mes not in cubiertos:
+            _crear_particion(conexion, mes, tabla, padre, default)
+            creadas.append(nombre_particion(mes, tabla))
+        mes = sumar_meses(mes, 1)
+
+    if default is None:
+        conexion.execute(text(ddl_default(tabla, padre)))
+        creadas.append(nombre_default(tabla))
+    return creadas
+
+
+def asegurar_particiones(engine: Engine, meses_adelante: int, hoy: Optional[date] = None) -> List[str]:
+    """
+    Crea en una transacción las particiones que falten, desde el final de la
+    última existente (o el mes actual). Un advisory lock evita que dos
+    procesos de la API las creen a la vez. No hace nada si la tabla aún no
+    está particionada.
+    """
+    with engine.begin() as conexion:
+        if not es_particionada(conexion):
+            return []
+        conexion.execute(text("SELECT pg_advisory_xact_lock(hashtext(:llave))"), {"llave": f"{TABLA}_particiones"})
+        existentes = listar_particiones(conexion)
+        inicio = existentes[-1].hasta if existentes else (hoy or date.today())
+        return crear_particiones(conexion, inicio, meses_adelante, hoy=hoy)
+
+
+async def ejecutar_mantenimiento(intervalo: float = None) -> None:
+    """
+    Tarea de fondo: revisa al iniciar y cada `intervalo` segundos que existan
+    las particiones de los próximos meses. La retención (que borra datos) se
+    queda en scripts/mantener_particiones_alertas.py.
+    """
+    from app.core.database import engine
+
+    intervalo = intervalo or settings.ALERTAS_PARTICIONES_INTERVAL
+    logger.info("Mantenimiento de particiones de alertas iniciado")
+    while True:
+        try:
+            creadas = await run_in_threadpool(asegurar_particiones, engine, settings.ALERTAS_PARTICIONES_ADELANTE)
+            if creadas:
+                logger.info(f"Particiones de alertas creadas: {', '.join(creadas)}")
+        except Exception as e:
+            logger.error(f"Error al crear particiones de alertas: {e}")
+        await asyncio.sleep(intervalo)
+
+
+def vencidas(particiones: List[Particion], meses_retencion: int, hoy: Optional[date] = None) -> List[Particion]:
+    """
+    Particiones que quedan completas fuera de la retención: se conservan el
+    mes en curso y los `meses_retencion` meses anteriores.
+    """
+    if meses_retencion < 1:
+        raise ValueError("meses_retencion debe ser al menos 1")
+    limite = sumar_meses(inicio_de_mes(hoy or date.today()), -meses_retencion)
+    return [particion for particion in particiones if particion.hasta <= limite]
+
+
+def aplicar_retencion(
+    engine: Engine,
+    meses_retencion: int,
+    archivar: bool,
+    tabla: str = TABLA,
+    hoy: Optional[date] = None,
+    simular: bool = False,
+) -> List[str]:
+    """
+    Separa las particiones vencidas y las elimina o, con `archivar`, las
+    mueve al esquema `archivo` para exportarlas antes de borrarlas. Sin
+    partición DEFAULT usa DETACH ... CONCURRENTLY (sin bloquear lecturas ni
+    escrituras); con ella, el DETACH normal con lock_timeout. Devuelve sus nombres.
+    """
+    # DETACH CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexion:
+        particiones = vencidas(listar_particiones(conexion, tabla), meses_retencion, hoy)
+        if simular:
+            return [particion.nombre for particion in particiones]
+
+        if archivar and particiones:
+            conexion.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ESQUEMA_ARCHIVO}"))
+
+        concurrente = particion_default(conexion, tabla) is None
+        if particiones and not concurrente:
+            conexion.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT_DETACH}'"))
+
+        try:
+            for particion in particiones:
+                modo = "FINALIZE" if particion.pendiente else ("CONCURRENTLY" if concurrente else "")
+                conexion.execute(text(f"ALTER TABLE {tabla} DETACH PARTITION {particion.nombre} {modo}".rstrip()))
+                if archivar:
+                    conexion.execute(text(f"ALTER TABLE {particion.nombre} SET SCHEMA {ESQUEMA_ARCHIVO}"))
+                else:
+                    conexion.execute(text(f"DROP TABLE {particion.nombre}"))
+                logger.info(
+                    f"Partición {particion.nombre} ({particion.desde} a {particion.hasta}) "
+                    f"{'archivada' if archivar else 'eliminada'}"
+                )
+        finally:
+            # La conexión vuelve al pool sin el lock_timeout
+            if particiones and not concurrente:
+                conexion.execute(text("RESET lock_timeout"))
+        return [particion.nombre for particion in particiones]
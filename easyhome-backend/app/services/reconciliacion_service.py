@@ -0,0 +1,394 @@
+"""
+Reconciliación masiva de los usuarios de Cognito con la tabla usuario
+
+Recorre `list_users` página por página y, por cada página:
+1. Agrega al grupo por defecto a los usuarios sin grupo (en paralelo, con
+   concurrencia acotada).
+2. Deja un solo usuario por correo (sin distinguir mayúsculas), compara
+   nombre, teléfono y tipo_usuario con la BD en una sola consulta y escribe
+   solo las diferencias con un INSERT ... ON CONFLICT DO UPDATE por lote
+   (los usuarios que nunca iniciaron sesión se crean; las filas sin
+   google_id se vinculan a su usuario de Cognito si el correo está
+   verificado). Quien queda como proveedor recibe su Proveedor_Servicio
+   auto-aprobado en la misma transacción, igual que en el login.
+3. Hace commit y guarda un checkpoint con el token de la página siguiente,
+   de modo que una corrida interrumpida se reanuda donde quedó.
+
+La página siguiente se descarga mientras se procesa la actual. `client` es
+cualquier objeto con la interfaz de boto3 `cognito-idp` que se usa aquí
+(list_users, list_users_in_group, admin_add_user_to_group), así que el job
+puede probarse contra un Cognito local.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.api.v1.deps import invalidar_principal
+from app.core.config import settings
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import catalogo_service, identidad_service
+from app.services.cognito_service import TIPOS_POR_GRUPO, tipo_usuario_de_grupos
+
+logger = logging.getLogger(__name__)
+
+# Máximo de usuarios por página que admite list_users / list_users_in_group
+TAM_PAGINA = 60
+
+
+@dataclass(frozen=True)
+class UsuarioCognito:
+    username: str
+    correo: str
+    sub: Optional[str]
+    nombre: Optional[str]
+    telefono: Optional[str]
+    email_verificado: bool = False
+
+
+@dataclass
+class Progreso:
+    """Estado de la corrida; es también el contenido del checkpoint."""
+    pagination_token: Optional[str] = None
+    paginas: int = 0
+    procesados: int = 0
+    creados: int = 0
+    actualizados: int = 0
+    grupos_corregidos: int = 0
+    errores_grupo: int = 0
+    duplicados: int = 0
+    segundos: float = 0.0
+    terminado: bool = False
+
+    @property
+    def por_segundo(self) -> float:
+        return self.procesados / self.segundos if self.segundos else 0.0
+
+
+def cargar_checkpoint(ruta: str) -> Progreso:
+    """Progreso guardado en `ruta` (uno vacío si no existe)."""
+    if not os.path.exists(ruta):
+        return Progreso()
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+    conocidos = {campo.name for campo in fields(Progreso)}
+    return Progreso(**{k: v for k, v in datos.items() if k in conocidos})
+
+
+def guardar_checkpoint(ruta: str, progreso: Progreso) -> None:
+    """Escribe el checkpoint de forma atómica (archivo temporal + rename)."""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(asdict(progreso), f)
+    os.replace(temporal, ruta)
+
+
+def usuario_de(raw: dict) -> Optional[UsuarioCognito]:
+    """Convierte un usuario de list_users; None si está deshabilitado o no tiene correo."""
+    atributos = {attr["Name"]: attr["Value"] for attr in raw.get("Attributes", [])}
+    correo = atributos.get("email")
+    if not correo or not raw.get("Enabled", True):
+        return None
+    return UsuarioCognito(
+        username=raw["Username"],
+        correo=correo,
+        sub=atributos.get("sub"),
+        nombre=(atributos.get("name") or "").strip() or None,
+        telefono=atributos.get("phone_number"),
+        email_verificado=atributos.get("email_verified") == "true",
+    )
+
+
+def deduplicar(usuarios: list[UsuarioCognito]) -> tuple[list[UsuarioCognito], list[UsuarioCognito]]:
+    """
+    Deja un usuario por correo (sin distinguir mayúsculas): el correo no es un
+    alias único en todos los pools (ej. un usuario federado y uno nativo) y el
+    upsert por lote no puede escribir la misma fila dos veces. Se conserva el
+    de menor username, sin importar el orden de list_users. Devuelve (únicos, descartados).
+    """
+    elegidos: dict = {}
+    for usuario in sorted(usuarios, key=lambda u: u.username):
+        elegidos.setdefault(usuario.correo.lower(), usuario)
+    unicos = [u for u in usuarios if elegidos[u.correo.lower()] is u]
+    descartados = [u for u in usuarios if elegidos[u.correo.lower()] is not u]
+    return unicos, descartados
+
+
+def diferencias(usuarios: list[UsuarioCognito], grupos: dict, filas: dict) -> tuple[list[dict], list[dict]]:
+    """
+    Compara una página de Cognito (ya deduplicada) con sus filas en la BD
+    (`filas`: correo en minúsculas -> fila).
+    Devuelve (nuevos, modificados) como valores listos para el upsert; a los
+    modificados solo se les sobrescribe lo que Cognito trae, igual que en el login.
+    """
+    nuevos, modificados = [], []
+    for usuario in usuarios:
+        tipo = tipo_usuario_de_grupos(grupos.get(usuario.username, ()))
+        fila = filas.get(usuario.correo.lower())
+        if fila is None:
+            nuevos.append({
+                "correo_electronico": usuario.correo,
+                "nombre": usuario.nombre or usuario.correo.split("@")[0],
+                "numero_telefono": usuario.telefono,
+                "tipo_usuario": tipo or "cliente",
+                "google_id": usuario.sub,
+            })
+            continue
+
+        deseado = {
+            # El de la BD: el ON CONFLICT (correo) distingue mayúsculas
+            "correo_electronico": fila.correo_electronico,
+            "nombre": usuario.nombre or fila.nombre,
+            "numero_telefono": usuario.telefono or fila.numero_telefono,
+            "tipo_usuario": tipo or fila.tipo_usuario,
+            # Las filas sin usuario de Cognito se vinculan solo con un correo verificado
+            "google_id": fila.google_id or (usuario.sub if usuario.email_verificado else None),
+        }
+        if (deseado["nombre"], deseado["numero_telefono"], deseado["tipo_usuario"], deseado["google_id"]) != (
+            fila.nombre, fila.numero_telefono, fila.tipo_usuario, fila.google_id
+        ):
+            modificados.append(deseado)
+    return nuevos, modificados
+
+
+def aplicar_diferencias(db: Session, nuevos: list[dict], modificados: list[dict]) -> list[int]:
+    """
+    Escribe nuevos y modificados con un único INSERT ... ON CONFLICT (correo)
+    DO UPDATE y crea el Proveedor_Servicio auto-aprobado de los que quedan
+    como proveedor (si no lo tienen). Devuelve los ids escritos. No hace commit.
+    """
+    if not nuevos and not modificados:
+        return []
+
+    ahora = datetime.now()
+    tabla = Usuario.__table__
+    valores = [
+        {
+            **fila,
+            "contraseña": "",  # No se necesita contraseña (usa Cognito)
+            "estado_cuenta": "activo",
+            "metodo_autenticacion": "cognito",
+            "fecha_registro": ahora,
+        }
+        for fila in nuevos + modificados
+    ]
+    stmt = pg_insert(tabla).values(valores)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tabla.c.correo_electronico],
+        set_={
+            "nombre": stmt.excluded.nombre,
+            "numero_telefono": stmt.excluded.numero_telefono,
+            "tipo_usuario": stmt.excluded.tipo_usuario,
+            "google_id": func.coalesce(tabla.c.google_id, stmt.excluded.google_id),
+        },
+    ).returning(tabla.c.id_usuario, tabla.c.nombre, tabla.c.tipo_usuario)
+    escritos = db.execute(stmt).all()
+
+    proveedores = [fila for fila in escritos if fila.tipo_usuario == "proveedor"]
+    if proveedores:
+        db.execute(
+            pg_insert(Proveedor_Servicio.__table__)
+            .values([
+                {
+                    "id_proveedor": fila.id_usuario,
+                    "nombre_completo": fila.nombre,
+                    "estado_solicitud": "aprobado",
+                    "fecha_solicitud": ahora,
+                }
+                for fila in proveedores
+            ])
+            .on_conflict_do_nothing(index_elements=["id_proveedor"])
+        )
+    return [fila.id_usuario for fila in escritos]
+
+
+class ReconciliadorCognito:
+    """Job de reconciliación Cognito -> BD (ver docstring del módulo)."""
+
+    def __init__(
+        self,
+        client,
+        user_pool_id: str,
+        session_factory: Callable[[], Session],
+        checkpoint: Optional[str] = None,
+        concurrencia: int = 4,
+        aplicar: bool = True,
+        grupo_por_defecto: str = settings.COGNITO_DEFAULT_GROUP,
+    ):
+        if concurrencia < 1:
+            raise ValueError("concurrencia debe ser al menos 1")
+        self.client = client
+        self.user_pool_id = user_pool_id
+        self.session_factory = session_factory
+        self.checkpoint = checkpoint
+        self.concurrencia = concurrencia
+        self.aplicar = aplicar
+        self.grupo_por_defecto = grupo_por_defecto
+
+    def _pagina(self, token: Optional[str]) -> tuple[list, Optional[str]]:
+        kwargs = {"UserPoolId": self.user_pool_id, "Limit": TAM_PAGINA}
+        if token:
+            kwargs["PaginationToken"] = token
+        respuesta = self.client.list_users(**kwargs)
+        return respuesta.get("Users", []), respuesta.get("PaginationToken")
+
+    def _miembros(self, grupo: str) -> list[str]:
+        miembros, token = [], None
+        while True:
+            kwargs = {"UserPoolId": self.user_pool_id, "GroupName": grupo, "Limit": TAM_PAGINA}
+            if token:
+                kwargs["NextToken"] = token
+            respuesta = self.client.list_users_in_group(**kwargs)
+            miembros += [usuario["Username"] for usuario in respuesta.get("Users", [])]
+            token = respuesta.get("NextToken")
+            if not token:
+                return miembros
+
+    def _grupos_por_usuario(self, pool: ThreadPoolExecutor) -> dict:
+        """username -> grupos, con una pasada paginada por grupo (no una llamada por usuario)."""
+        grupos: dict = {}
+        nombres = [grupo for grupo, _ in TIPOS_POR_GRUPO]
+        for grupo, miembros in zip(nombres, pool.map(self._miembros, nombres)):
+            for username in miembros:
+                grupos.setdefault(username, set()).add(grupo)
+        return grupos
+
+    def _agregar_a_grupo(self, username: str) -> bool:
+        try:
+            self.client.admin_add_user_to_group(
+                UserPoolId=self.user_pool_id,
+                Username=username,
+                GroupName=self.grupo_por_defecto,
+            )
+            return True
+        except Exception as e:
+            logger.error(f"No se pudo agregar {username} al grupo {self.grupo_por_defecto}: {e}")
+            return False
+
+    def _procesar_pagina(self, raw: list, grupos: dict, progreso: Progreso, pool: ThreadPoolExecutor) -> None:
+        usuarios = [u for u in map(usuario_de, raw) if u is not None]
+
+        # 1. Usuarios sin grupo -> grupo por defecto, en paralelo
+        sin_grupo = [u.username for u in usuarios if not grupos.get(u.username)]
+        if sin_grupo and self.aplicar:
+            for username, agregado in zip(sin_grupo, pool.map(self._agregar_a_grupo, sin_grupo)):
+                if agregado:
+                    grupos[username] = {self.grupo_por_defecto}
+                    progreso.grupos_corregidos += 1
+                else:
+                    progreso.errores_grupo += 1
+        elif sin_grupo:
+            for username in sin_grupo:
+                grupos[username] = {self.grupo_por_defecto}
+            progreso.grupos_corregidos += len(sin_grupo)
+
+        # 2. Un usuario por correo; diferencias con la BD (una lectura y una escritura por página)
+        usuarios, duplicados = deduplicar(usuarios)
+        if duplicados:
+            logger.warning(
+                f"{len(duplicados)} usuarios con correo repetido omitidos: "
+                + ", ".join(f"{u.username} ({u.correo})" for u in duplicados)
+            )
+        db = self.session_factory()
+        try:
+            filas = {
+                fila.correo_electronico.lower(): fila
+                for fila in db.execute(
+                    select(
+                        Usuario.id_usuario,
+                        Usuario.correo_electronico,
+                        Usuario.nombre,
+                        Usuario.numero_telefono,
+                        Usuario.tipo_usuario,
+                        Usuario.google_id,
+                    ).where(func.lower(Usuario.correo_electronico).in_([u.correo.lower() for u in usuarios]))
+                )
+            }
+            nuevos, modificados = diferencias(usuarios, grupos, filas)
+
+            if self.aplicar:
+                escritos = aplicar_diferencias(db, nuevos, modificados)
+                # Nombre y teléfono aparecen en las tarjetas del catálogo
+                contacto = [
+                    filas[m["correo_electronico"].lower()].id_usuario
+                    for m in modificados
+                    if (m["nombre"], m["numero_telefono"]) != (
+                        filas[m["correo_electronico"].lower()].nombre,
+                        filas[m["correo_electronico"].lower()].numero_telefono,
+                    )
+                ]
+                if contacto:
+                    catalogo_service.refrescar_tarjetas(db, ids_proveedor=contacto)
+                db.commit()
+                for id_usuario in escritos:
+                    identidad_service.invalidar_usuario(id_usuario)
+                    identidad_service.invalidar_proveedor(id_usuario)
+                # El Principal cacheado guarda el tipo de usuario
+                subs = {u.correo.lower(): u.sub for u in usuarios}
+                for m in modificados:
+                    correo = m["correo_electronico"].lower()
+                    if subs[correo] and m["tipo_usuario"] != filas[correo].tipo_usuario:
+                        invalidar_principal(subs[correo])
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        progreso.procesados += len(raw)
+        progreso.creados += len(nuevos)
+        progreso.actualizados += len(modificados)
+        progreso.duplicados += len(duplicados)
+
+    def ejecutar(self, max_paginas: Optional[int] = None, reiniciar: bool = False) -> Progreso:
+        """
+        Corre (o reanuda desde el checkpoint) la reconciliación. Con
+        `max_paginas` se detiene tras ese número de páginas en esta corrida.
+        """
+        progreso = Progreso()
+        if self.checkpoint and not reiniciar:
+            progreso = cargar_checkpoint(self.checkpoint)
+            if progreso.terminado:
+                progreso = Progreso()
+            elif progreso.paginas:
+                logger.info(f"Reanudando desde la página {progreso.paginas + 1} ({progreso.procesados} usuarios)")
+
+        inicio = time.perf_counter() - progreso.segundos
+        paginas_corrida = 0
+        # `pool` acota las llamadas simultáneas a Cognito; `lector` descarga páginas por adelantado
+        with ThreadPoolExecutor(max_workers=self.concurrencia) as pool, ThreadPoolExecutor(max_workers=1) as lector:
+            grupos = self._grupos_por_usuario(pool)
+            pendiente = lector.submit(self._pagina, progreso.pagination_token)
+            while pendiente is not None:
+                raw, siguiente = pendiente.result()
+                # La página siguiente se descarga mientras se procesa esta
+                pendiente = lector.submit(self._pagina, siguiente) if siguiente else None
+
+                self._procesar_pagina(raw, grupos, progreso, pool)
+
+                paginas_corrida += 1
+                progreso.paginas += 1
+                progreso.pagination_token = siguiente
+                progreso.terminado = siguiente is None
+                progreso.segundos = time.perf_counter() - inicio
+                if self.checkpoint and self.aplicar:
+                    guardar_checkpoint(self.checkpoint, progreso)
+                logger.info(
+                    f"Página {progreso.paginas}: {progreso.procesados} usuarios "
+                    f"({progreso.por_segundo:.1f}/s), {progreso.creados} creados, "
+                    f"{progreso.actualizados} actualizados, {progreso.grupos_corregidos} grupos corregidos, "
+                    f"{progreso.duplicados} duplicados omitidos"
+                )
+
+                if max_paginas is not None and paginas_corrida >= max_paginas:
+                    break
+
+        return progreso
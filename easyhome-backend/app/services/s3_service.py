@@ -2,13 +2,30 @@
 S3 Service for handling file uploads to AWS S3
 """
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from typing import BinaryIO
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, Optional
 import logging
+import time
 from app.core.config import settings
+from app.core.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Maximum keys per DeleteObjects request (S3 limit)
+DELETE_BATCH_SIZE = 1000
+
+# Tag carried by objects uploaded with a presigned POST until the upload is
+# confirmed; a bucket lifecycle rule expires the objects that still carry it
+# (see scripts/configure_s3_lifecycle.py)
+PENDING_UPLOAD_TAG = {"Key": "upload-status", "Value": "pending"}
+PENDING_UPLOAD_TAGGING = (
+    "<Tagging><TagSet><Tag>"
+    f"<Key>{PENDING_UPLOAD_TAG['Key']}</Key><Value>{PENDING_UPLOAD_TAG['Value']}</Value>"
+    "</Tag></TagSet></Tagging>"
+)
+
 
 class S3Service:
     """Service for interacting with AWS S3"""
@@ -20,9 +37,13 @@ class S3Service:
                 's3',
                 region_name=settings.S3_REGION,
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                # Enough pooled connections for concurrent batch uploads
+                config=Config(max_pool_connections=max(10, settings.S3_UPLOAD_CONCURRENCY))
             )
             self.bucket_name = settings.S3_BUCKET_NAME
+            # Cache of presigned URLs keyed by (object_name, expiration)
+            self.presigned_cache = TTLCache(maxsize=settings.S3_PRESIGNED_CACHE_SIZE, clock=time.time)
             logger.info(f"S3 Service initialized for bucket: {self.bucket_name}")
         except Exception as e:
             logger.error(f"Error initializing S3 client: {e}")
@@ -71,6 +92,199 @@ class S3Service:
             logger.error(f"Unexpected error during S3 upload: {e}")
             raise
     
+    def download_file(self, object_name: str) -> bytes:
+        """
+        Download an object from S3 into memory
+        
+        Args:
+            object_name: S3 object name (key/path in bucket)
+            
+        Returns:
+            bytes: object contents
+            
+        Raises:
+            Exception: If the download fails
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_name)
+            return response['Body'].read()
+        except ClientError as e:
+            logger.error(f"Error downloading file from S3: {e}")
+            raise Exception(f"Failed to download file from S3: {str(e)}")
+
+    def upload_files(
+        self,
+        files: Iterable[dict],
+        max_workers: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Upload several files to S3 concurrently (bounded thread pool)
+        
+        Args:
+            files: dicts with the upload_file arguments
+                (file_obj, object_name, content_type)
+            max_workers: parallel uploads (default: S3_UPLOAD_CONCURRENCY)
+            
+        Returns:
+            list: one result per file, in input order:
+            {"object_name": str, "ok": bool, "error": str | None}.
+            A failed file does not abort the rest of the batch.
+        """
+        files = list(files)
+        if not files:
+            return []
+
+        def upload(item: dict) -> dict:
+            try:
+                self.upload_file(**item)
+                return {"object_name": item["object_name"], "ok": True, "error": None}
+            except Exception as e:
+                return {"object_name": item["object_name"], "ok": False, "error": str(e)}
+
+        return self._map_concurrently(upload, files, max_workers)
+
+    def _map_concurrently(self, fn, items: list, max_workers: Optional[int] = None) -> list:
+        """Run fn over items on a bounded thread pool, preserving order"""
+        workers = min(len(items), max_workers or settings.S3_UPLOAD_CONCURRENCY)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-batch") as pool:
+            return list(pool.map(fn, items))
+
+    def generate_presigned_post(
+        self,
+        object_name: str,
+        content_type: str,
+        max_size: int,
+        expiration: int = 900,
+        pending: bool = False
+    ) -> dict:
+        """
+        Generate a presigned POST policy so a client can upload one object
+        directly to S3 (the file never goes through the API)
+        
+        The policy pins the key, the Content-Type, server-side encryption
+        and a 1..max_size byte content-length-range.
+        
+        Args:
+            object_name: S3 key the client must upload to
+            content_type: MIME type the client must send
+            max_size: maximum object size in bytes
+            expiration: policy lifetime in seconds (default: 15 minutes)
+            pending: also pin PENDING_UPLOAD_TAG, so the object expires
+                unless its tags are cleared when the upload is confirmed
+            
+        Returns:
+            dict: {"url": str, "fields": dict} to send as multipart/form-data
+        """
+        fields = {
+            'Content-Type': content_type,
+            'x-amz-server-side-encryption': 'AES256'
+        }
+        conditions = [
+            {'Content-Type': content_type},
+            {'x-amz-server-side-encryption': 'AES256'},
+            ['content-length-range', 1, max_size]
+        ]
+        if pending:
+            fields['tagging'] = PENDING_UPLOAD_TAGGING
+            conditions.append({'tagging': PENDING_UPLOAD_TAGGING})
+        try:
+            return self.s3_client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=object_name,
+                Fields=fields,
+                Conditions=conditions,
+                ExpiresIn=expiration
+            )
+        except ClientError as e:
+            logger.error(f"Error generating presigned POST: {e}")
+            raise Exception(f"Failed to generate presigned POST: {str(e)}")
+
+    def head_objects(
+        self,
+        object_names: Iterable[str],
+        max_workers: Optional[int] = None
+    ) -> dict[str, dict]:
+        """
+        Check concurrently which objects exist in the bucket
+        
+        Args:
+            object_names: S3 object names
+            max_workers: parallel requests (default: S3_UPLOAD_CONCURRENCY)
+            
+        Returns:
+            dict: {object_name: {"size": int, "content_type": str}} for the
+            objects that exist. Missing objects (and lookup errors) are omitted.
+        """
+        object_names = list(dict.fromkeys(object_names))
+        if not object_names:
+            return {}
+
+        def head(object_name: str):
+            try:
+                response = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_name)
+                return object_name, {
+                    "size": response.get('ContentLength', 0),
+                    "content_type": response.get('ContentType')
+                }
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                    logger.error(f"Error checking S3 object {object_name}: {e}")
+                return object_name, None
+
+        return {
+            object_name: info
+            for object_name, info in self._map_concurrently(head, object_names, max_workers)
+            if info is not None
+        }
+
+    def delete_object_tags(
+        self,
+        object_names: Iterable[str],
+        max_workers: Optional[int] = None
+    ) -> list[str]:
+        """
+        Remove the tags of several objects concurrently (used to clear
+        PENDING_UPLOAD_TAG once an upload is confirmed)
+        
+        Args:
+            object_names: S3 object names
+            max_workers: parallel requests (default: S3_UPLOAD_CONCURRENCY)
+            
+        Returns:
+            list: object names whose tags could not be removed
+        """
+        object_names = list(dict.fromkeys(object_names))
+        if not object_names:
+            return []
+
+        def untag(object_name: str):
+            try:
+                self.s3_client.delete_object_tagging(Bucket=self.bucket_name, Key=object_name)
+                return None
+            except ClientError as e:
+                logger.error(f"Error removing tags from S3 object {object_name}: {e}")
+                return object_name
+
+        return [name for name in self._map_concurrently(untag, object_names, max_workers) if name]
+
+    def _sign_url(self, object_name: str, expiration: int) -> str:
+        """
+        Sign a GET URL and cache it while it still has at least
+        S3_PRESIGNED_MIN_REMAINING seconds of validity left.
+        """
+        url = self.s3_client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket_name,
+                'Key': object_name
+            },
+            ExpiresIn=expiration
+        )
+        # Never hand out a cached URL that is about to expire
+        min_remaining = min(settings.S3_PRESIGNED_MIN_REMAINING, expiration // 2)
+        self.presigned_cache.set((object_name, expiration), url, ttl=expiration - min_remaining)
+        return url
+
     def get_presigned_url(
         self,
         object_name: str,
@@ -86,19 +300,50 @@ class S3Service:
         Returns:
             str: Presigned URL for accessing the file
         """
-        try:
-            url = self.s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': self.bucket_name,
-                    'Key': object_name
-                },
-                ExpiresIn=expiration
-            )
+        url = self.presigned_cache.get((object_name, expiration))
+        if url is not None:
             return url
+
+        try:
+            return self._sign_url(object_name, expiration)
         except ClientError as e:
             logger.error(f"Error generating presigned URL: {e}")
             raise Exception(f"Failed to generate presigned URL: {str(e)}")
+
+    def get_presigned_urls(
+        self,
+        object_names: Iterable[str],
+        expiration: int = 3600
+    ) -> dict[str, str]:
+        """
+        Generate presigned URLs for many objects in one call
+        
+        Keys are de-duplicated and served from the in-process cache when a
+        URL with enough remaining lifetime exists; only misses are signed.
+        
+        Args:
+            object_names: S3 object names (empty values are ignored)
+            expiration: URL expiration time in seconds (default: 1 hour)
+            
+        Returns:
+            dict: {object_name: presigned_url}. Keys that failed to sign
+            are omitted, so callers should use .get() with a fallback.
+        """
+        urls = {}
+        for object_name in dict.fromkeys(k for k in object_names if k):
+            url = self.presigned_cache.get((object_name, expiration))
+            if url is None:
+                try:
+                    url = self._sign_url(object_name, expiration)
+                except Exception as e:
+                    logger.error(f"Error generating presigned URL for {object_name}: {e}")
+                    continue
+            urls[object_name] = url
+        return urls
+
+    def cache_stats(self) -> dict:
+        """Hit/miss/eviction counters of the presigned URL cache"""
+        return self.presigned_cache.stats()
     
     def get_object_url(self, object_name: str) -> str:
         """
@@ -113,6 +358,53 @@ class S3Service:
         """
         return object_name
     
+    def delete_objects(self, object_names: Iterable[str]) -> dict[str, str]:
+        """
+        Delete objects with DeleteObjects, up to DELETE_BATCH_SIZE keys per request
+        
+        Missing keys count as deleted (S3 reports them as such).
+        
+        Args:
+            object_names: S3 object names (empty values are ignored)
+            
+        Returns:
+            dict: {object_name: error} for the objects that could not be
+            deleted; empty when every object was deleted
+        """
+        object_names = [name for name in dict.fromkeys(object_names) if name]
+        errors = {}
+
+        for start in range(0, len(object_names), DELETE_BATCH_SIZE):
+            batch = object_names[start:start + DELETE_BATCH_SIZE]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': name} for name in batch], 'Quiet': True}
+                )
+            except Exception as e:
+                logger.error(f"Error deleting {len(batch)} files from S3: {e}")
+                errors.update({name: str(e) for name in batch})
+                continue
+
+            for error in response.get('Errors', []):
+                errors[error['Key']] = f"{error.get('Code')}: {error.get('Message')}"
+
+        if object_names:
+            logger.info(f"Files deleted from S3: {len(object_names) - len(errors)}/{len(object_names)}")
+        return errors
+
+    def delete_files(self, object_names: Iterable[str]) -> list[str]:
+        """
+        Delete several objects right away (batched DeleteObjects)
+        
+        Args:
+            object_names: S3 object names (empty values are ignored)
+            
+        Returns:
+            list: object names that could not be deleted
+        """
+        return list(self.delete_objects(object_names))
+
     def delete_file(self, object_name: str) -> bool:
         """
         Delete a file from S3 bucket
@@ -0,0 +1,162 @@
+"""
+Write-behind de Usuario.ultima_sesion
+
+El login solo registra en memoria el momento en que se vio a cada usuario.
+Una tarea de fondo escribe lo acumulado con un único UPDATE ... FROM (VALUES
+...) cada ULTIMA_SESION_FLUSH_INTERVAL segundos, o antes si se juntan
+ULTIMA_SESION_FLUSH_MAX usuarios, y una última vez al apagar la API. Varios
+logins del mismo usuario entre escrituras se reducen a una sola fila.
+
+Si la escritura falla, los timestamps vuelven al buffer y se reintentan en
+la siguiente pasada (sin pisar otros más recientes).
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import DateTime, Integer, column, or_, update, values
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.user import Usuario
+
+logger = logging.getLogger(__name__)
+
+
+class BufferUltimaSesion:
+    """Timestamps de última sesión pendientes de escribir, seguros entre hilos."""
+
+    def __init__(
+        self,
+        max_pendientes: int,
+        session_factory: Callable[[], Session] = SessionLocal,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        if max_pendientes <= 0:
+            raise ValueError("max_pendientes debe ser mayor que 0")
+        self.max_pendientes = max_pendientes
+        self.session_factory = session_factory
+        self._clock = clock
+        self._pendientes: dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        # Se asignan cuando corre la tarea de fondo (para despertarla desde otros hilos)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lleno: Optional[asyncio.Event] = None
+        self.escrituras = 0
+        self.escritos = 0
+
+    def registrar(self, id_usuario: int, momento: Optional[datetime] = None) -> None:
+        """Anota que el usuario inició sesión en `momento` (ahora por defecto)."""
+        momento = momento or self._clock()
+        with self._lock:
+            anterior = self._pendientes.get(id_usuario)
+            if anterior is None or anterior < momento:
+                self._pendientes[id_usuario] = momento
+            lleno = len(self._pendientes) >= self.max_pendientes
+
+        if not lleno:
+            return
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._lleno.set)
+        else:
+            # Sin tarea de fondo (scripts, pruebas): se escribe aquí mismo
+            self.vaciar()
+
+    def vaciar(self) -> int:
+        """Escribe todo lo pendiente en un solo UPDATE. Devuelve cuántos usuarios envió."""
+        with self._lock:
+            tomados, self._pendientes = self._pendientes, {}
+        if not tomados:
+            return 0
+
+        tabla = Usuario.__table__
+        filas = values(
+            column("id_usuario", Integer),
+            column("ultima_sesion", DateTime(timezone=True)),
+            name="pendientes",
+        ).data(list(tomados.items()))
+        stmt = (
+            update(tabla)
+            .where(tabla.c.id_usuario == filas.c.id_usuario)
+            # Nunca retroceder un timestamp ya escrito
+            .where(or_(tabla.c.ultima_sesion.is_(None), tabla.c.ultima_sesion < filas.c.ultima_sesion))
+            .values(ultima_sesion=filas.c.ultima_sesion)
+        )
+
+        db = self.session_factory()
+        try:
+            db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._devolver(tomados)
+            raise
+        finally:
+            db.close()
+
+        self.escrituras += 1
+        self.escritos += len(tomados)
+        return len(tomados)
+
+    def _devolver(self, tomados: dict) -> None:
+        with self._lock:
+            for id_usuario, momento in tomados.items():
+                actual = self._pendientes.get(id_usuario)
+                if actual is None or actual < momento:
+                    self._pendientes[id_usuario] = momento
+
+    async def ejecutar(self, intervalo: float) -> None:
+        """
+        Tarea de fondo: escribe cada `intervalo` segundos o en cuanto el
+        buffer se llena. Al cancelarla se hace una última escritura.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._lleno = asyncio.Event()
+        logger.info("Write-behind de ultima_sesion iniciado")
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._lleno.wait(), timeout=intervalo)
+                except asyncio.TimeoutError:
+                    pass
+                self._lleno.clear()
+                try:
+                    await run_in_threadpool(self.vaciar)
+                except Exception as e:
+                    logger.error(f"Error al escribir ultima_sesion (se reintentará): {e}")
+        finally:
+            self._loop = None
+            self._lleno = None
+            try:
+                enviados = await run_in_threadpool(self.vaciar)
+                logger.info(f"Write-behind de ultima_sesion detenido ({enviados} pendientes escritos)")
+            except Exception as e:
+                logger.error(f"No se pudieron escribir los últimos ultima_sesion: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            pendientes = len(self._pendientes)
+        return {"pendientes": pendientes, "escrituras": self.escrituras, "escritos": self.escritos}
+
+
+_buffer = BufferUltimaSesion(max_pendientes=settings.ULTIMA_SESION_FLUSH_MAX)
+
+
+def registrar(id_usuario: int, momento: Optional[datetime] = None) -> None:
+    _buffer.registrar(id_usuario, momento)
+
+
+def vaciar() -> int:
+    return _buffer.vaciar()
+
+
+async def ejecutar_vaciado(intervalo: float = None) -> None:
+    await _buffer.ejecutar(intervalo or settings.ULTIMA_SESION_FLUSH_INTERVAL)
+
+
+def stats() -> dict:
+    return _buffer.stats()
@@ -1,5 +1,14 @@
-from fastapi import FastAPI, Request
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from app.api.v1.deps import get_current_admin
+from app.core.config import settings
+from app.core.loop_monitor import MonitorEventLoop, MonitorEventLoopMiddleware
+from app.services import (
+    alertas_push_service, eliminaciones_service, particiones_alertas_service, ultima_sesion_service,
+)
 from app.api.v1.endpoints import (
     example,
     auth,
@@ -12,13 +21,42 @@ from app.api.v1.endpoints import (
     status_servicio,
     alerta_finalizacion,
     reportes,
+    subidas,
 )
 
+
+# Detector de bloqueos del event loop (solo si LOOP_MONITOR_ENABLED)
+monitor_event_loop = MonitorEventLoop(umbral=settings.LOOP_MONITOR_THRESHOLD_MS / 1000)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks on startup and cancel them on shutdown"""
+    # El write-behind de ultima_sesion escribe lo pendiente al cancelarse
+    tareas = [asyncio.create_task(ultima_sesion_service.ejecutar_vaciado())]
+    if settings.LOOP_MONITOR_ENABLED:
+        tareas.append(monitor_event_loop.iniciar())
+    if settings.S3_DELETE_DRAIN_ENABLED:
+        tareas.append(asyncio.create_task(eliminaciones_service.ejecutar_drenador()))
+    if settings.ALERTAS_PUSH_ENABLED:
+        tareas.append(asyncio.create_task(alertas_push_service.ejecutar_escucha()))
+    if settings.ALERTAS_PARTICIONES_ENABLED:
+        tareas.append(asyncio.create_task(particiones_alertas_service.ejecutar_mantenimiento()))
+
+    yield
+
+    for tarea in tareas:
+        tarea.cancel()
+    await asyncio.gather(*tareas, return_exceptions=True)
+    await monitor_event_loop.detener()
+
+
 app = FastAPI(
     title="EasyHome Backend API",
     description="API for managing EasyHome smart home devices and services.",
     version="1.0.0",
-    redirect_slashes=False
+    redirect_slashes=False,
+    lifespan=lifespan
 )
 
 # CORS
@@ -30,6 +68,8 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+if settings.LOOP_MONITOR_ENABLED:
+    app.add_middleware(MonitorEventLoopMiddleware, monitor=monitor_event_loop)
 
 # Routers CON /api prefix (para API Gateway stage "api")
 app.include_router(example.router, prefix="/api/api/v1")
@@ -39,6 +79,7 @@ app.include_router(publicacion.router, prefix="/api/api/v1", tags=["Publicacione
 app.include_router(solicitud.router, prefix="/api/api/v1")
 app.include_router(perfil_proveedor.router, prefix="/api/api/v1")
 app.include_router(perfil_usuario.router, prefix="/api/api/v1")
+app.include_router(subidas.router, prefix="/api/api/v1")
 
 # Routers SIN prefix (para localhost/testing)
 app.include_router(example.router, prefix="/api/v1")
@@ -48,6 +89,7 @@ app.include_router(publicacion.router, prefix="/api/v1", tags=["Publicaciones"])
 app.include_router(solicitud.router, prefix="/api/v1")
 app.include_router(perfil_proveedor.router, prefix="/api/v1")
 app.include_router(perfil_usuario.router, prefix="/api/v1")
+app.include_router(subidas.router, prefix="/api/v1")
 app.include_router(resenas.router, prefix="/api/v1")
 app.include_router(status_servicio.router, prefix="/api/v1")
 app.include_router(alerta_finalizacion.router, prefix="/api/v1")
@@ -58,3 +100,19 @@ app.include_router(alerta_finalizacion.router, prefix="/api/v1")
 @app.get("/")
 def root():
     return {"message": "Welcome to the EasyHome Backend API!"}
+
+
+@app.get("/api/v1/diagnostico/event-loop", dependencies=[Depends(get_current_admin)])
+def diagnostico_event_loop():
+    """Lag del event loop y bloqueos por ruta (requiere LOOP_MONITOR_ENABLED y un administrador)"""
+    if not settings.LOOP_MONITOR_ENABLED:
+        raise HTTPException(status_code=404, detail="Monitor del event loop desactivado")
+    return monitor_event_loop.stats()
+
+
+@app.get("/api/v1/diagnostico/alertas-push", dependencies=[Depends(get_current_admin)])
+def diagnostico_alertas_push():
+    """Estado del LISTEN de alertas y conexiones SSE/WebSocket de este worker (requiere un administrador)"""
+    if not settings.ALERTAS_PUSH_ENABLED:
+        raise HTTPException(status_code=404, detail="Canal push de alertas desactivado")
+    return alertas_push_service.stats()
@@ -0,0 +1,77 @@
+"""
+Script para habilitar la búsqueda de texto completo en una base existente.
+
+1. Agrega la columna publicacion_servicio.documento_busqueda (tsvector).
+2. Instala las funciones y triggers que la mantienen (DDL_BUSQUEDA).
+3. Rellena la columna por lotes de id (transacciones cortas, sin bloquear la tabla).
+4. Crea el índice GIN con CREATE INDEX CONCURRENTLY.
+
+Es idempotente: puede volver a ejecutarse sin efectos secundarios.
+
+Uso:
+    python scripts/add_busqueda_publicaciones.py
+    python scripts/add_busqueda_publicaciones.py --lote 2000
+"""
+import sys
+import os
+import argparse
+import time
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app.core.database import engine
+from app.models.property import DDL_BUSQUEDA
+
+RELLENAR_LOTE = text("""
+    UPDATE publicacion_servicio
+    SET documento_busqueda = publicacion_documento_busqueda(titulo, descripcion, id_categoria, id_proveedor)
+    WHERE id_publicacion > :desde AND id_publicacion <= :hasta
+""")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Habilita la búsqueda de texto completo en publicaciones")
+    parser.add_argument("--lote", type=int, default=5000, help="Publicaciones por transacción al rellenar")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BÚSQUEDA DE TEXTO COMPLETO EN PUBLICACIONES")
+    print("=" * 60)
+
+    inicio = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE publicacion_servicio ADD COLUMN IF NOT EXISTS documento_busqueda tsvector"))
+            for sentencia in DDL_BUSQUEDA:
+                conn.exec_driver_sql(sentencia)
+        print("✅ Columna, funciones y triggers instalados")
+
+        with engine.connect() as conn:
+            maximo = conn.execute(text("SELECT coalesce(max(id_publicacion), 0) FROM publicacion_servicio")).scalar()
+
+        desde = 0
+        while desde < maximo:
+            with engine.begin() as conn:
+                conn.execute(RELLENAR_LOTE, {"desde": desde, "hasta": desde + args.lote})
+            desde += args.lote
+            print(f"   ... {min(desde, maximo)}/{maximo}")
+        print("✅ documento_busqueda rellenado")
+
+        # CONCURRENTLY no puede ejecutarse dentro de una transacción
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_publicacion_documento_busqueda "
+                "ON publicacion_servicio USING gin (documento_busqueda)"
+            ))
+        print("✅ Índice GIN idx_publicacion_documento_busqueda creado")
+    except Exception as e:
+        print(f"❌ Error al habilitar la búsqueda: {e}")
+        sys.exit(1)
+
+    print(f"✅ Listo en {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+-- Script para agregar los índices de las listas del dashboard del proveedor
+-- (GET /status-servicio/proveedores/{id}/dashboard). Ejecutar en tu base de datos PostgreSQL.
+-- CONCURRENTLY evita bloquear escrituras mientras se construye el índice
+-- (no puede ejecutarse dentro de una transacción).
+
+-- Activos: WHERE id_proveedor = ? AND estado IN (...) ORDER BY fecha_contacto DESC, id DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_servicio_proveedor_activos
+    ON servicio_contratado (id_proveedor, fecha_contacto DESC, id_servicio_contratado DESC)
+    WHERE estado_servicio IN ('confirmado', 'en_proceso');
+
+-- Finalizados: ORDER BY coalesce(fecha_finalizacion, fecha_contacto) DESC, id DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_servicio_proveedor_finalizados
+    ON servicio_contratado (id_proveedor, (coalesce(fecha_finalizacion, fecha_contacto)) DESC, id_servicio_contratado DESC)
+    WHERE estado_servicio = 'finalizado';
+
+-- Verificar que los índices se crearon correctamente
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'servicio_contratado' AND indexname LIKE 'idx_servicio_proveedor_%';
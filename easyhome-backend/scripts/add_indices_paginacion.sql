@@ -0,0 +1,13 @@
+-- Script para agregar los índices usados por la paginación por cursor (keyset)
+-- del catálogo de publicaciones. Ejecutar en tu base de datos PostgreSQL.
+-- CONCURRENTLY evita bloquear escrituras mientras se construye el índice
+-- (no puede ejecutarse dentro de una transacción).
+
+-- Catálogo ordenado por fecha: WHERE estado = 'activo' ORDER BY fecha_publicacion DESC, id_publicacion DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_publicacion_estado_fecha_id
+    ON publicacion_servicio (estado, fecha_publicacion, id_publicacion);
+
+-- Verificar que el índice se creó correctamente
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'publicacion_servicio' AND indexname = 'idx_publicacion_estado_fecha_id';
@@ -0,0 +1,44 @@
+-- Script para agregar las restricciones únicas (recurso, url_imagen) de las tablas
+-- de imágenes que usa POST /subidas/confirmar (INSERT ... ON CONFLICT DO NOTHING).
+-- Ejecutar en tu base de datos PostgreSQL.
+-- Primero elimina los duplicados (conserva la fila más antigua de cada key); el
+-- índice se construye CONCURRENTLY para no bloquear escrituras (no puede ejecutarse
+-- dentro de una transacción) y después se adjunta como restricción.
+
+-- 1. Eliminar duplicados
+DELETE FROM imagen_publicacion a
+    USING imagen_publicacion b
+    WHERE a.id_publicacion = b.id_publicacion AND a.url_imagen = b.url_imagen AND a.id_imagen > b.id_imagen;
+
+DELETE FROM foto_trabajo_anterior a
+    USING foto_trabajo_anterior b
+    WHERE a.id_proveedor = b.id_proveedor AND a.url_imagen = b.url_imagen AND a.id_foto > b.id_foto;
+
+DELETE FROM "imagen_reseña" a
+    USING "imagen_reseña" b
+    WHERE a."id_reseña" = b."id_reseña" AND a.url_imagen = b.url_imagen AND a."id_imagen_reseña" > b."id_imagen_reseña";
+
+-- 2. Índices únicos
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_imagen_publicacion_url
+    ON imagen_publicacion (id_publicacion, url_imagen);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_foto_trabajo_url
+    ON foto_trabajo_anterior (id_proveedor, url_imagen);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "uq_imagen_reseña_url"
+    ON "imagen_reseña" ("id_reseña", url_imagen);
+
+-- 3. Adjuntar los índices como restricciones
+ALTER TABLE imagen_publicacion
+    ADD CONSTRAINT uq_imagen_publicacion_url UNIQUE USING INDEX uq_imagen_publicacion_url;
+
+ALTER TABLE foto_trabajo_anterior
+    ADD CONSTRAINT uq_foto_trabajo_url UNIQUE USING INDEX uq_foto_trabajo_url;
+
+ALTER TABLE "imagen_reseña"
+    ADD CONSTRAINT "uq_imagen_reseña_url" UNIQUE USING INDEX "uq_imagen_reseña_url";
+
+-- Verificar que las restricciones se crearon correctamente
+SELECT conrelid::regclass AS tabla, conname
+FROM pg_constraint
+WHERE conname IN ('uq_imagen_publicacion_url', 'uq_foto_trabajo_url', 'uq_imagen_reseña_url');
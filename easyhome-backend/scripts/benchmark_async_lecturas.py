@@ -0,0 +1,179 @@
+"""
+Benchmark de throughput: lecturas con la sesión síncrona vs AsyncSession.
+
+Levanta una app FastAPI mínima con la misma consulta (una página del
+catálogo, Tarjeta_Catalogo) servida de tres formas:
+
+- sync:            def + get_db (FastAPI la ejecuta en el threadpool)
+- async_bloqueante: async def + get_db (camino anterior: bloquea el event loop)
+- async:           async def + get_async_db (asyncpg, lo que usan ahora los routers de lectura)
+
+y la golpea con C clientes concurrentes (200 por defecto) durante R
+peticiones cada uno. Reporta peticiones/s y latencias p50/p95.
+Requiere la base de datos configurada en .env (con datos en el catálogo
+para que la consulta sea representativa).
+
+Resultados de referencia (1 vCPU, Postgres 16.2 local, 5000 tarjetas,
+10 peticiones por cliente, ASGITransport, pools de 10 + 20 conexiones):
+
+    clientes  modo               req/s   p50 (ms)  p95 (ms)  errores
+    25        sync               201.2     131.0     164.4        0
+    25        async_bloqueante   160.7     138.2     216.3        0
+    25        async              210.7      76.8     213.2        0
+    50        sync               205.8     248.1     292.6        0
+    50        async              316.7     134.4     318.1        0
+    200       sync               271.9     714.9     836.3        0
+    200       sync               307.9     607.2     793.5        0
+    200       async              303.9     513.0    1443.4        0
+    200       async              316.4     545.6    1355.2        0
+    200       async_bloqueante   sin terminar en 300 s (1 petición/cliente)
+
+Con 200 clientes sync y async terminan sin errores: el techo es la CPU
+(~300 req/s con 1 vCPU), no el pool. Cada consulta devuelve su conexión en
+milisegundos, así que las esperas del pool nunca llegan a pool_timeout
+(30 s); la latencia crece con la cola (200 clientes / ~300 req/s ≈ 650 ms).
+async tiene mejor p50 y peor p95 que sync con la misma carga.
+
+async_bloqueante se congela en cuanto hay más clientes que conexiones del
+pool (pool_size + max_overflow = 30): el checkout que espera bloquea el
+event loop, el loop no puede ejecutar el cierre de las sesiones que
+liberarían conexiones, y cada espera solo termina al vencer pool_timeout.
+
+Con --url y varios workers, cada proceso abre hasta 60 conexiones (30 del
+pool síncrono + 30 del asíncrono): con el max_connections = 100 por defecto
+de Postgres, dos workers ya pueden agotar el servidor.
+
+Uso:
+    python scripts/benchmark_async_lecturas.py
+    python scripts/benchmark_async_lecturas.py --clientes 200 --peticiones 20 --modos sync async
+
+    # Contra un servidor real (varios workers), en otra terminal:
+    #   uvicorn scripts.benchmark_async_lecturas:app --workers 4
+    python scripts/benchmark_async_lecturas.py --url http://127.0.0.1:8000
+"""
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db, get_async_db
+from app.models.tarjeta_catalogo import Tarjeta_Catalogo
+
+LIMITE = 12
+MODOS = ("sync", "async_bloqueante", "async")
+
+
+def _consulta():
+    return (
+        select(Tarjeta_Catalogo)
+        .where(Tarjeta_Catalogo.estado == "activo")
+        .order_by(Tarjeta_Catalogo.fecha_publicacion.desc(), Tarjeta_Catalogo.id_publicacion.desc())
+        .limit(LIMITE)
+    )
+
+
+def _serializar(tarjetas) -> list:
+    return [{"id": tarjeta.id_publicacion, "titulo": tarjeta.titulo} for tarjeta in tarjetas]
+
+
+app = FastAPI()
+
+
+@app.get("/sync")
+def pagina_sync(db: Session = Depends(get_db)):
+    return _serializar(db.scalars(_consulta()).all())
+
+
+@app.get("/async_bloqueante")
+async def pagina_async_bloqueante(db: Session = Depends(get_db)):
+    return _serializar(db.scalars(_consulta()).all())
+
+
+@app.get("/async")
+async def pagina_async(db: AsyncSession = Depends(get_async_db)):
+    return _serializar((await db.scalars(_consulta())).all())
+
+
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+async def medir(cliente: httpx.AsyncClient, modo: str, clientes: int, peticiones: int) -> dict:
+    latencias = []
+    errores = 0
+
+    async def usuario():
+        nonlocal errores
+        for _ in range(peticiones):
+            inicio = time.perf_counter()
+            try:
+                respuesta = await cliente.get(f"/{modo}")
+                respuesta.raise_for_status()
+            except Exception:
+                errores += 1
+                continue
+            latencias.append(time.perf_counter() - inicio)
+
+    # Calentamiento: abre las conexiones de los pools
+    await asyncio.gather(*(cliente.get(f"/{modo}") for _ in range(20)), return_exceptions=True)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(clientes)))
+    total = time.perf_counter() - inicio
+    return {
+        "rps": len(latencias) / total if total else 0.0,
+        "p50": _percentil(latencias, 0.50) * 1000 if latencias else 0.0,
+        "p95": _percentil(latencias, 0.95) * 1000 if latencias else 0.0,
+        "errores": errores,
+    }
+
+
+async def ejecutar(args) -> None:
+    if args.url:
+        transporte = None
+        base = args.url.rstrip("/")
+    else:
+        transporte = httpx.ASGITransport(app=app)
+        base = "http://benchmark"
+
+    limites = httpx.Limits(max_connections=args.clientes, max_keepalive_connections=args.clientes)
+    async with httpx.AsyncClient(transport=transporte, base_url=base, limits=limites, timeout=60) as cliente:
+        print(f"{'modo':<18}{'req/s':>10}{'p50 (ms)':>12}{'p95 (ms)':>12}{'errores':>10}")
+        for modo in args.modos:
+            r = await medir(cliente, modo, args.clientes, args.peticiones)
+            print(f"{modo:<18}{r['rps']:>10.1f}{r['p50']:>12.1f}{r['p95']:>12.1f}{r['errores']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de lecturas: sesión síncrona vs AsyncSession")
+    parser.add_argument("--clientes", type=int, default=200, help="Clientes concurrentes")
+    parser.add_argument("--peticiones", type=int, default=20, help="Peticiones por cliente")
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS))
+    parser.add_argument("--url", help="URL de un servidor que sirve esta app (si no, se usa ASGITransport)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DE LECTURAS: SYNC vs ASYNC")
+    print(f"{args.clientes} clientes x {args.peticiones} peticiones, página de {LIMITE} tarjetas")
+    print("=" * 60)
+
+    try:
+        asyncio.run(ejecutar(args))
+    except Exception as e:
+        print(f"❌ Error durante el benchmark: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
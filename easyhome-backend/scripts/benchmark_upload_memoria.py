@@ -0,0 +1,147 @@
+"""
+Benchmark de memoria: subida de foto de perfil con buffer completo vs streaming.
+
+Simula N subidas concurrentes de un archivo de T MB que llegan en chunks
+de 64 KB y mide el pico de RSS del proceso (ru_maxrss). Cada combinación
+se ejecuta en un subproceso aparte para que los picos no se mezclen.
+
+- buffer:    camino anterior (request.form() + await file.read() + BytesIO)
+- streaming: app.core.uploads.recibir_imagen (validación por chunk + SpooledTemporaryFile)
+
+En ambos casos el "envío a S3" lee el archivo en bloques de 8 MB, como
+upload_fileobj. No requiere AWS ni base de datos.
+
+Uso:
+    python scripts/benchmark_upload_memoria.py
+    python scripts/benchmark_upload_memoria.py --mb 5 --concurrencia 1 10 50
+"""
+import sys
+import os
+import argparse
+import asyncio
+import io
+import resource
+import subprocess
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from starlette.requests import Request
+
+from app.core.uploads import recibir_imagen
+
+BOUNDARY = "----benchmark"
+CHUNK = 64 * 1024
+BLOQUE_S3 = 8 * 1024 * 1024
+
+
+def _rss_mb() -> float:
+    # Linux reporta KB; macOS reporta bytes
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 if sys.platform != "darwin" else maxrss / (1024 * 1024)
+
+
+def _crear_request(tamaño: int) -> Request:
+    """Request multipart cuyo cuerpo se genera chunk a chunk (sin tenerlo completo en memoria)."""
+    inicio = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="foto.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + b"\xff\xd8\xff\xe0"
+    fin = f"\r\n--{BOUNDARY}--\r\n".encode()
+    pendientes = {"inicio": inicio, "restante": tamaño - 4, "fin": fin}
+
+    async def receive():
+        await asyncio.sleep(0)  # ceder el loop: las subidas se intercalan
+        if pendientes["inicio"]:
+            cuerpo, pendientes["inicio"] = pendientes["inicio"], b""
+        elif pendientes["restante"] > 0:
+            n = min(CHUNK, pendientes["restante"])
+            pendientes["restante"] -= n
+            cuerpo = b"\x00" * n
+        else:
+            cuerpo, pendientes["fin"] = pendientes["fin"], b""
+        mas = bool(pendientes["restante"] > 0 or pendientes["fin"])
+        return {"type": "http.request", "body": cuerpo, "more_body": mas}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    return Request({"type": "http", "method": "PUT", "headers": headers}, receive)
+
+
+def _enviar_a_s3(archivo) -> int:
+    """Simula upload_fileobj leyendo en bloques."""
+    total = 0
+    while True:
+        bloque = archivo.read(BLOQUE_S3)
+        if not bloque:
+            return total
+        total += len(bloque)
+
+
+async def _subida_buffer(tamaño: int, max_bytes: int) -> int:
+    form = await _crear_request(tamaño).form()
+    file = form["file"]
+    contenido = await file.read()
+    await file.close()
+    if len(contenido) > max_bytes:
+        raise ValueError("demasiado grande")
+    with io.BytesIO(contenido) as file_obj:
+        return _enviar_a_s3(file_obj)
+
+
+async def _subida_streaming(tamaño: int, max_bytes: int) -> int:
+    imagen = await recibir_imagen(_crear_request(tamaño), max_bytes=max_bytes)
+    try:
+        return _enviar_a_s3(imagen.archivo)
+    finally:
+        imagen.cerrar()
+
+
+def _ejecutar(modo: str, concurrencia: int, mb: float) -> None:
+    tamaño = int(mb * 1024 * 1024)
+    subida = _subida_buffer if modo == "buffer" else _subida_streaming
+    base = _rss_mb()
+
+    async def correr():
+        return await asyncio.gather(*[subida(tamaño, tamaño + 1) for _ in range(concurrencia)])
+
+    enviados = asyncio.run(correr())
+    assert all(n == tamaño for n in enviados)
+    print(f"{_rss_mb() - base:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria de subidas")
+    parser.add_argument("--mb", type=float, default=5, help="Tamaño de cada archivo en MB")
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--_modo", help=argparse.SUPPRESS)
+    parser.add_argument("--_n", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._modo:
+        _ejecutar(args._modo, args._n, args.mb)
+        return
+
+    print("=" * 60)
+    print(f"BENCHMARK DE MEMORIA: SUBIDAS DE {args.mb} MB")
+    print("=" * 60)
+    print(f"{'concurrencia':>12} | {'buffer (MB RSS)':>16} | {'streaming (MB RSS)':>18}")
+    print("-" * 60)
+
+    for n in args.concurrencia:
+        fila = []
+        for modo in ("buffer", "streaming"):
+            salida = subprocess.run(
+                [sys.executable, __file__, "--mb", str(args.mb), "--_modo", modo, "--_n", str(n)],
+                capture_output=True, text=True, check=True
+            )
+            fila.append(float(salida.stdout.strip().splitlines()[-1]))
+        print(f"{n:>12} | {fila[0]:>16.1f} | {fila[1]:>18.1f}")
+
+    print("-" * 60)
+    print("Pico de RSS adicional sobre el proceso base. El modo streaming mantiene")
+    print("en memoria como máximo el umbral de spool (1 MB) por subida en curso.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Script para configurar CORS en el bucket S3 y permitir que el navegador
+suba imágenes directo a S3 con las políticas POST de /subidas/politicas.
+Uso: python scripts/configure_s3_cors.py [origen ...]
+"""
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from app.core.config import settings
+import boto3
+
+
+def configure_bucket_cors(origenes):
+    print("=" * 60)
+    print("🔧 CONFIGURACIÓN CORS DEL BUCKET S3 (SUBIDAS DIRECTAS)")
+    print("=" * 60)
+
+    bucket_name = settings.S3_BUCKET_NAME
+    print(f"\n📦 Bucket: {bucket_name}")
+    print(f"🌍 Orígenes permitidos: {', '.join(origenes)}")
+
+    s3_client = boto3.client(
+        's3',
+        region_name=settings.S3_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+    )
+
+    cors = {
+        "CORSRules": [
+            {
+                "AllowedOrigins": origenes,
+                "AllowedMethods": ["GET", "POST"],
+                "AllowedHeaders": ["*"],
+                "ExposeHeaders": ["ETag", "Location"],
+                "MaxAgeSeconds": 3000,
+            }
+        ]
+    }
+
+    try:
+        s3_client.put_bucket_cors(Bucket=bucket_name, CORSConfiguration=cors)
+        print("\n✅ CORS configurado correctamente")
+    except Exception as e:
+        print(f"\n❌ Error al configurar CORS: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    configure_bucket_cors(sys.argv[1:] or ["*"])
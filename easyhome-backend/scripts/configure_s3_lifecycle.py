@@ -0,0 +1,82 @@
+"""
+Script para configurar la regla de ciclo de vida que expira las subidas
+directas a S3 que nunca se confirmaron.
+
+Las políticas POST de /subidas/politicas etiquetan cada objeto como subida
+pendiente y /subidas/confirmar quita la etiqueta al registrarlo, así que la
+regla solo alcanza objetos sin referencia en la BD. Las demás reglas del
+bucket se conservan.
+
+Requiere que las credenciales de la API tengan s3:PutObjectTagging y
+s3:DeleteObjectTagging sobre el bucket.
+
+Uso: python scripts/configure_s3_lifecycle.py [--dias 1]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from botocore.exceptions import ClientError
+
+from app.core.config import settings
+from app.services.s3_service import PENDING_UPLOAD_TAG
+import boto3
+
+ID_REGLA = "expirar-subidas-sin-confirmar"
+
+
+def configure_bucket_lifecycle(dias: int):
+    print("=" * 60)
+    print("🔧 CICLO DE VIDA DEL BUCKET S3 (SUBIDAS SIN CONFIRMAR)")
+    print("=" * 60)
+
+    bucket_name = settings.S3_BUCKET_NAME
+    print(f"\n📦 Bucket: {bucket_name}")
+    print(f"🏷️  Etiqueta: {PENDING_UPLOAD_TAG['Key']}={PENDING_UPLOAD_TAG['Value']} (expira a los {dias} días)")
+
+    s3_client = boto3.client(
+        's3',
+        region_name=settings.S3_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+    )
+
+    # put_bucket_lifecycle_configuration reemplaza todas las reglas: se
+    # conservan las existentes y solo se sustituye la nuestra
+    try:
+        reglas = s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)["Rules"]
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchLifecycleConfiguration":
+            print(f"\n❌ Error al leer el ciclo de vida: {e}")
+            sys.exit(1)
+        reglas = []
+
+    reglas = [regla for regla in reglas if regla.get("ID") != ID_REGLA]
+    reglas.append({
+        "ID": ID_REGLA,
+        "Filter": {"Tag": PENDING_UPLOAD_TAG},
+        "Status": "Enabled",
+        "Expiration": {"Days": dias},
+    })
+
+    try:
+        s3_client.put_bucket_lifecycle_configuration(
+            Bucket=bucket_name,
+            LifecycleConfiguration={"Rules": reglas},
+        )
+        print(f"\n✅ Regla '{ID_REGLA}' aplicada ({len(reglas)} reglas en total)")
+    except Exception as e:
+        print(f"\n❌ Error al configurar el ciclo de vida: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # S3 expira por días completos: 1 es el mínimo
+    parser.add_argument("--dias", type=int, default=1, help="Días antes de expirar una subida sin confirmar")
+    args = parser.parse_args()
+    configure_bucket_lifecycle(max(args.dias, 1))
@@ -0,0 +1,68 @@
+"""
+Script para drenar a mano la bandeja de eliminaciones de S3
+(eliminacion_s3_pendiente), por ejemplo desde un cron o cuando la API
+corre con S3_DELETE_DRAIN_ENABLED=false.
+
+Crea la tabla si no existe, elimina en lotes (DeleteObjects, hasta 1000
+keys por llamada) todas las keys vencidas y muestra lo que queda pendiente.
+
+Uso:
+    python scripts/drenar_eliminaciones_s3.py
+    python scripts/drenar_eliminaciones_s3.py --solo-contar
+"""
+import sys
+import os
+import argparse
+import time
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.database import engine, SessionLocal
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.models.eliminacion_s3_pendiente import Eliminacion_S3_Pendiente
+from app.services import eliminaciones_service
+from app.services.s3_service import DELETE_BATCH_SIZE
+
+
+def mostrar_pendientes():
+    db = SessionLocal()
+    try:
+        totales = eliminaciones_service.contar_pendientes(db)
+    finally:
+        db.close()
+    print(f"📦 Pendientes: {totales['pendientes']} (con error previo: {totales['con_error']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drena la bandeja de eliminaciones de S3")
+    parser.add_argument("--solo-contar", action="store_true", help="Solo mostrar cuántas hay pendientes")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BANDEJA DE ELIMINACIONES DE S3")
+    print("=" * 60)
+
+    Eliminacion_S3_Pendiente.__table__.create(bind=engine, checkfirst=True)
+    mostrar_pendientes()
+    if args.solo_contar:
+        return
+
+    inicio = time.perf_counter()
+    total = 0
+    try:
+        while True:
+            tomadas = eliminaciones_service.drenar_pendientes()
+            total += tomadas
+            if tomadas < DELETE_BATCH_SIZE:
+                break
+    except Exception as e:
+        print(f"❌ Error al drenar la bandeja: {e}")
+        sys.exit(1)
+
+    print(f"✅ {total} eliminaciones procesadas en {time.perf_counter() - inicio:.2f}s")
+    mostrar_pendientes()
+
+
+if __name__ == "__main__":
+    main()
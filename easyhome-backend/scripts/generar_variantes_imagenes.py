@@ -0,0 +1,89 @@
+"""
+Script para generar las variantes WebP (miniatura y mediana) de las
+imágenes que ya estaban en S3 antes del pipeline de variantes.
+
+Recorre las keys de imagen_publicacion, foto_trabajo_anterior,
+imagen_reseña y las fotos de perfil que todavía no están en
+imagen_variante y las procesa en paralelo. Requiere Pillow.
+
+Uso:
+    python scripts/generar_variantes_imagenes.py
+    python scripts/generar_variantes_imagenes.py --limite 500 --hilos 8
+"""
+import sys
+import os
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select, union
+
+from app.core.database import engine, SessionLocal
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.models.imagen_variante import Imagen_Variante
+from app.models.property import Imagen_Publicacion
+from app.models.foto_trabajo import Foto_Trabajo_Anterior
+from app.models.imagen_reseña import Imagen_Reseña
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import imagenes_service
+
+
+def keys_pendientes(db, limite=None) -> list:
+    """Keys de imágenes sin variantes registradas."""
+    todas = union(
+        select(Imagen_Publicacion.url_imagen.label("key")),
+        select(Foto_Trabajo_Anterior.url_imagen),
+        select(Imagen_Reseña.url_imagen),
+        select(Usuario.foto_perfil).where(Usuario.foto_perfil.isnot(None)),
+        select(Proveedor_Servicio.foto_perfil).where(Proveedor_Servicio.foto_perfil.isnot(None)),
+    ).subquery()
+
+    consulta = (
+        select(todas.c.key)
+        .where(todas.c.key != "")
+        .where(todas.c.key.notin_(select(Imagen_Variante.s3_key)))
+        .order_by(todas.c.key)
+    )
+    if limite:
+        consulta = consulta.limit(limite)
+    return list(db.scalars(consulta))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera variantes WebP de imágenes existentes")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de imágenes a procesar")
+    parser.add_argument("--hilos", type=int, default=4, help="Imágenes procesadas en paralelo")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("GENERACIÓN DE VARIANTES DE IMÁGENES")
+    print("=" * 60)
+
+    if imagenes_service.Image is None:
+        print("❌ Pillow no está instalado (pip install Pillow)")
+        sys.exit(1)
+
+    Imagen_Variante.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        keys = keys_pendientes(db, args.limite)
+    finally:
+        db.close()
+
+    print(f"🖼️  Imágenes pendientes: {len(keys)}")
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+        resultados = list(pool.map(imagenes_service.procesar_imagen, keys))
+
+    ok = sum(resultados)
+    print(f"✅ {ok} imágenes procesadas en {time.perf_counter() - inicio:.2f}s")
+    if ok < len(keys):
+        print(f"❌ {len(keys) - ok} con error (ver el log)")
+
+
+if __name__ == "__main__":
+    main()
@@ -65,6 +65,10 @@ def main():
             Reporte_Usuario,
             Token_Recuperacion_Password,
             Reporte_Mensual_Premium,
+            Estadistica_Proveedor,
+            Tarjeta_Catalogo,
+            Imagen_Variante,
+            Eliminacion_S3_Pendiente,
         )
         
         # Crear todas las tablas
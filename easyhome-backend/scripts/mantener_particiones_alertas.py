@@ -0,0 +1,77 @@
+"""
+Job de mantenimiento de las particiones mensuales de alerta_sistema
+(ejecutar a diario desde un cron; es idempotente).
+
+1. Crea las particiones que falten hasta ALERTAS_PARTICIONES_ADELANTE meses
+   después del actual (sin partición, las alertas de ese mes caen en la
+   DEFAULT) y la DEFAULT si no existe. La API ya lo hace en segundo plano
+   con ALERTAS_PARTICIONES_ENABLED; aquí se repite por si está desactivado.
+2. Aplica la retención: separa con DETACH las particiones más antiguas que
+   ALERTAS_RETENCION_MESES y las elimina, o con --archivar las mueve al
+   esquema `archivo` (para exportarlas con pg_dump y borrarlas). Con
+   partición DEFAULT el DETACH no puede ser CONCURRENTLY: toma un bloqueo
+   breve (lock_timeout) y se reintenta en la siguiente ejecución si no lo obtiene.
+
+Requiere que la tabla ya esté particionada (scripts/migrar_alertas_particionadas.py).
+
+Uso:
+    python scripts/mantener_particiones_alertas.py
+    python scripts/mantener_particiones_alertas.py --simular
+    python scripts/mantener_particiones_alertas.py --archivar --retencion-meses 24
+"""
+import sys
+import os
+import argparse
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services import particiones_alertas_service as particiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crea y retira particiones de alerta_sistema")
+    parser.add_argument("--meses-adelante", type=int, default=settings.ALERTAS_PARTICIONES_ADELANTE,
+                        help="Meses futuros con partición creada")
+    parser.add_argument("--retencion-meses", type=int, default=settings.ALERTAS_RETENCION_MESES,
+                        help="Meses completos que se conservan además del actual")
+    parser.add_argument("--archivar", action="store_true",
+                        help=f"Mover las particiones vencidas al esquema '{particiones.ESQUEMA_ARCHIVO}' en vez de eliminarlas")
+    parser.add_argument("--simular", action="store_true", help="Solo mostrar qué se haría")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("PARTICIONES DE ALERTA_SISTEMA")
+    print("=" * 60)
+
+    with engine.connect() as conexion:
+        if not particiones.es_particionada(conexion):
+            print("❌ alerta_sistema no está particionada: ejecuta scripts/migrar_alertas_particionadas.py")
+            sys.exit(1)
+
+        existentes = particiones.listar_particiones(conexion)
+        print(f"📦 {len(existentes)} particiones: "
+              f"{existentes[0].nombre if existentes else '-'} … {existentes[-1].nombre if existentes else '-'}")
+
+    if args.simular:
+        print("🔎 Simulación: no se crean particiones")
+    else:
+        creadas = particiones.asegurar_particiones(engine, args.meses_adelante)
+        print(f"✅ Particiones creadas: {', '.join(creadas) or 'ninguna (ya existían)'}")
+
+    try:
+        retiradas = particiones.aplicar_retencion(
+            engine, args.retencion_meses, archivar=args.archivar, simular=args.simular,
+        )
+    except Exception as e:
+        print(f"❌ Error al aplicar la retención: {e}")
+        sys.exit(1)
+
+    accion = "se retirarían" if args.simular else ("archivadas" if args.archivar else "eliminadas")
+    print(f"🗑️  Particiones {accion}: {', '.join(retiradas) or 'ninguna'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Migración en línea de alerta_sistema a una tabla particionada por mes
+
+La API puede seguir funcionando mientras corre:
+
+1. preparar: crea alerta_sistema_nueva (mismas columnas y defaults, incluida
+   la secuencia de id_alerta) PARTITION BY RANGE (fecha_envio), con sus
+   particiones mensuales, la DEFAULT e índices (los mismos del modelo), y un trigger en alerta_sistema que replica
+   en la nueva tabla cada INSERT/UPDATE/DELETE a partir de ese momento (con
+   ON CONFLICT DO UPDATE: la versión del trigger siempre gana a la copia).
+2. copiar: copia las filas existentes por rangos de id_alerta, un lote por
+   transacción (ON CONFLICT DO NOTHING: se puede repetir o reanudar con
+   --desde-id sin duplicar ni pisar lo que replicó el trigger).
+3. verificar que ambas tablas tengan exactamente las mismas filas, columna
+   por columna (sin bloquear la tabla). Si difieren, reparar las diferencias
+   y volver a verificar.
+4. intercambiar: en una transacción corta (lock_timeout de 5 s) renombra
+   alerta_sistema -> alerta_sistema_anterior y alerta_sistema_nueva ->
+   alerta_sistema, con sus índices, y quita el trigger.
+
+alerta_sistema_anterior se conserva para verificar; se elimina a mano.
+Después, programa scripts/mantener_particiones_alertas.py a diario.
+
+Uso:
+    python scripts/migrar_alertas_particionadas.py
+    python scripts/migrar_alertas_particionadas.py --lote 5000 --pausa 0.2
+    python scripts/migrar_alertas_particionadas.py --desde-id 1200000
+    python scripts/migrar_alertas_particionadas.py --sin-intercambiar
+"""
+import sys
+import os
+import argparse
+import time
+from datetime import date
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services import particiones_alertas_service as particiones
+
+TABLA = particiones.TABLA
+NUEVA = f"{TABLA}_nueva"
+ANTERIOR = f"{TABLA}_anterior"
+TRIGGER = f"{TABLA}_replicar"
+LLAVE = ("id_alerta", "fecha_envio")
+
+# Índices de la tabla (los mismos del modelo Alerta_Sistema)
+INDICES = {
+    "idx_alerta_usuario_fecha_id": "(id_usuario, fecha_envio DESC, id_alerta DESC)",
+    "idx_alerta_usuario_no_leidas": "(id_usuario) WHERE NOT leida AND id_servicio_contratado IS NOT NULL",
+    f"ix_{TABLA}_id_alerta": "(id_alerta)",
+}
+
+
+def columnas(conexion) -> list[str]:
+    """Columnas de alerta_sistema en su orden físico (el de NEW.* y SELECT *)."""
+    return list(conexion.execute(
+        text(
+            "SELECT attname FROM pg_attribute "
+            "WHERE attrelid = CAST(:tabla AS regclass) AND attnum > 0 AND NOT attisdropped "
+            "ORDER BY attnum"
+        ),
+        {"tabla": TABLA},
+    ).scalars())
+
+
+def asignaciones(nombres: list[str]) -> str:
+    """SET de un ON CONFLICT DO UPDATE que sobrescribe todas las columnas no llave."""
+    return ", ".join(f"{c} = EXCLUDED.{c}" for c in nombres if c not in LLAVE)
+
+
+def preparar(meses_adelante: int):
+    with engine.begin() as conexion:
+        if particiones.es_particionada(conexion, TABLA):
+            print("✅ alerta_sistema ya está particionada: no hay nada que migrar")
+            sys.exit(0)
+
+        conexion.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {NUEVA} "
+            f"(LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (fecha_envio)"
+        ))
+        conexion.execute(text(
+            f"DO $$ BEGIN "
+            f"ALTER TABLE {NUEVA} ADD CONSTRAINT {NUEVA}_pkey PRIMARY KEY (id_alerta, fecha_envio); "
+            f"ALTER TABLE {NUEVA} ADD CONSTRAINT {TABLA}_id_usuario_fkey FOREIGN KEY (id_usuario) "
+            f"REFERENCES usuario (id_usuario) ON DELETE CASCADE; "
+            f"ALTER TABLE {NUEVA} ADD CONSTRAINT {TABLA}_id_servicio_contratado_fkey "
+            f"FOREIGN KEY (id_servicio_contratado) "
+            f"REFERENCES servicio_contratado (id_servicio_contratado) ON DELETE SET NULL; "
+            f"EXCEPTION WHEN duplicate_table OR duplicate_object THEN NULL; END $$"
+        ))
+
+        # Particiones desde el mes de la alerta más antigua
+        primera = conexion.execute(text(f"SELECT min(fecha_envio) FROM {TABLA}")).scalar()
+        creadas = particiones.crear_particiones(
+            conexion, primera.date() if primera else date.today(), meses_adelante, padre=NUEVA,
+        )
+        print(f"📦 {len(creadas)} particiones creadas")
+
+        # Índices en la tabla padre: Postgres los crea en cada partición
+        for nombre, definicion in INDICES.items():
+            conexion.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre}_nueva ON {NUEVA} {definicion}"))
+
+        # Desde aquí, todo cambio en alerta_sistema se replica en la nueva tabla.
+        # DO UPDATE: si un lote de la copia insertó una versión vieja de la fila
+        # (aún sin commit cuando el trigger borró), el trigger la sobrescribe.
+        set_ = asignaciones(columnas(conexion))
+        conexion.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {TRIGGER}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {NUEVA} WHERE id_alerta = OLD.id_alerta AND fecha_envio = OLD.fecha_envio;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {NUEVA} VALUES (NEW.*)
+                    ON CONFLICT (id_alerta, fecha_envio) DO UPDATE SET {set_};
+                END IF;
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql
+        """))
+        conexion.execute(text(f"DROP TRIGGER IF EXISTS {TRIGGER} ON {TABLA}"))
+        conexion.execute(text(
+            f"CREATE TRIGGER {TRIGGER} AFTER INSERT OR UPDATE OR DELETE ON {TABLA} "
+            f"FOR EACH ROW EXECUTE FUNCTION {TRIGGER}()"
+        ))
+    print("✅ Tabla particionada y trigger de réplica listos")
+
+
+def copiar(lote: int, pausa: float, desde_id: int):
+    with engine.connect() as conexion:
+        # Lo insertado después del trigger ya se replica: basta llegar al máximo actual
+        ultimo = conexion.execute(text(f"SELECT coalesce(max(id_alerta), 0) FROM {TABLA}")).scalar()
+
+    inicio = time.perf_counter()
+    copiadas = 0
+    actual = desde_id
+    while actual < ultimo:
+        hasta = min(actual + lote, ultimo)
+        with engine.begin() as conexion:
+            copiadas += conexion.execute(
+                text(
+                    f"INSERT INTO {NUEVA} SELECT * FROM {TABLA} "
+                    f"WHERE id_alerta > :desde AND id_alerta <= :hasta "
+                    f"ON CONFLICT (id_alerta, fecha_envio) DO NOTHING"
+                ),
+                {"desde": actual, "hasta": hasta},
+            ).rowcount
+        actual = hasta
+        print(f"   … hasta id_alerta {actual} de {ultimo} ({copiadas} copiadas)")
+        if pausa:
+            time.sleep(pausa)
+
+    print(f"✅ {copiadas} alertas copiadas en {time.perf_counter() - inicio:.1f}s")
+
+
+# Alertas sin una fila idéntica (todas las columnas) en la tabla nueva: faltantes
+# o con otro contenido. ROW(x.*) se expande columna a columna; IS NOT DISTINCT
+# FROM iguala los NULL.
+DIFERENTES = (
+    f"SELECT a.id_alerta, a.fecha_envio FROM {TABLA} a WHERE NOT EXISTS ("
+    f"SELECT 1 FROM {NUEVA} n WHERE n.id_alerta = a.id_alerta AND n.fecha_envio = a.fecha_envio "
+    f"AND ROW(n.*) IS NOT DISTINCT FROM ROW(a.*))"
+)
+# Filas de la tabla nueva que ya no existen en la original (p. ej. una que la
+# copia insertó después de que el trigger replicara su DELETE)
+SOBRANTES = (
+    f"SELECT n.id_alerta, n.fecha_envio FROM {NUEVA} n WHERE NOT EXISTS ("
+    f"SELECT 1 FROM {TABLA} a WHERE a.id_alerta = n.id_alerta AND a.fecha_envio = n.fecha_envio)"
+)
+
+
+def diferencias() -> tuple[int, int]:
+    """(faltantes o distintas, sobrantes) en la tabla nueva, sin bloquear."""
+    with engine.connect() as conexion:
+        diferentes = conexion.execute(text(f"SELECT count(*) FROM ({DIFERENTES}) d")).scalar()
+        sobrantes = conexion.execute(text(f"SELECT count(*) FROM ({SOBRANTES}) s")).scalar()
+    return diferentes, sobrantes
+
+
+def reparar():
+    """Iguala la tabla nueva con la original en las filas que difieren."""
+    with engine.begin() as conexion:
+        set_ = asignaciones(columnas(conexion))
+        sobrantes = conexion.execute(text(
+            f"DELETE FROM {NUEVA} WHERE (id_alerta, fecha_envio) IN ({SOBRANTES})"
+        )).rowcount
+        corregidas = conexion.execute(text(
+            f"INSERT INTO {NUEVA} SELECT * FROM {TABLA} WHERE (id_alerta, fecha_envio) IN ({DIFERENTES}) "
+            f"ON CONFLICT (id_alerta, fecha_envio) DO UPDATE SET {set_}"
+        )).rowcount
+    print(f"🔧 {corregidas} alertas recopiadas, {sobrantes} sobrantes eliminadas")
+
+
+def verificar(reintentar: bool = True):
+    # Sin bloquear la tabla: lo que llegue después lo replica el trigger
+    diferentes, sobrantes = diferencias()
+    if diferentes or sobrantes:
+        if not reintentar:
+            raise RuntimeError(
+                f"{diferentes} alertas faltantes o distintas y {sobrantes} sobrantes en {NUEVA}"
+            )
+        print(f"⚠️  {diferentes} alertas faltantes o distintas y {sobrantes} sobrantes: reparando")
+        reparar()
+        return verificar(reintentar=False)
+    print("✅ La tabla particionada tiene exactamente las mismas alertas")
+
+
+def intercambiar():
+    # Solo renombra: el bloqueo exclusivo dura milisegundos
+    with engine.begin() as conexion:
+        conexion.execute(text("SET LOCAL lock_timeout = '5s'"))
+        conexion.execute(text(f"LOCK TABLE {TABLA} IN ACCESS EXCLUSIVE MODE"))
+
+        conexion.execute(text(f"DROP TRIGGER {TRIGGER} ON {TABLA}"))
+        conexion.execute(text(f"DROP FUNCTION {TRIGGER}()"))
+
+        conexion.execute(text(f"ALTER TABLE {TABLA} RENAME TO {ANTERIOR}"))
+        conexion.execute(text(f"ALTER INDEX {TABLA}_pkey RENAME TO {ANTERIOR}_pkey"))
+        for nombre in INDICES:
+            conexion.execute(text(f"ALTER INDEX IF EXISTS {nombre} RENAME TO {nombre}_anterior"))
+
+        conexion.execute(text(f"ALTER TABLE {NUEVA} RENAME TO {TABLA}"))
+        conexion.execute(text(f"ALTER INDEX {NUEVA}_pkey RENAME TO {TABLA}_pkey"))
+        for nombre in INDICES:
+            conexion.execute(text(f"ALTER INDEX {nombre}_nueva RENAME TO {nombre}"))
+
+        # La secuencia de id_alerta pasa a pertenecer a la tabla particionada
+        secuencia = conexion.execute(
+            text("SELECT pg_get_serial_sequence(:tabla, 'id_alerta')"), {"tabla": ANTERIOR},
+        ).scalar()
+        if secuencia:
+            conexion.execute(text(f"ALTER SEQUENCE {secuencia} OWNED BY {TABLA}.id_alerta"))
+    print(f"✅ Intercambio hecho; la tabla original quedó como {ANTERIOR}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra alerta_sistema a particiones mensuales")
+    parser.add_argument("--lote", type=int, default=10000, help="Alertas copiadas por transacción")
+    parser.add_argument("--pausa", type=float, default=0.1, help="Segundos de espera entre lotes")
+    parser.add_argument("--desde-id", type=int, default=0, help="Reanudar la copia después de este id_alerta")
+    parser.add_argument("--sin-intercambiar", action="store_true", help="Preparar y copiar, sin renombrar las tablas")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("MIGRACIÓN DE ALERTA_SISTEMA A PARTICIONES MENSUALES")
+    print("=" * 60)
+
+    try:
+        preparar(settings.ALERTAS_PARTICIONES_ADELANTE)
+        copiar(args.lote, args.pausa, args.desde_id)
+        verificar()
+        if not args.sin_intercambiar:
+            intercambiar()
+    except Exception as e:
+        print(f"❌ Error en la migración: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Script para reconstruir el agregado de calificaciones de proveedores
+(tabla estadistica_proveedor) a partir de las reseñas activas.
+
+Crea la tabla si no existe y la recalcula en una sola pasada
+(INSERT ... SELECT ... GROUP BY ... ON CONFLICT DO UPDATE).
+
+Uso:
+    python scripts/rebuild_estadisticas_proveedor.py
+    python scripts/rebuild_estadisticas_proveedor.py --proveedor 12
+"""
+import sys
+import os
+import argparse
+import time
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.database import engine, SessionLocal
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.models.estadistica_proveedor import Estadistica_Proveedor
+from app.services.estadisticas_service import recalcular_estadisticas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye estadistica_proveedor")
+    parser.add_argument("--proveedor", type=int, default=None, help="Recalcular solo este id_proveedor")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("RECONSTRUCCIÓN DE ESTADÍSTICAS DE PROVEEDORES")
+    print("=" * 60)
+
+    Estadistica_Proveedor.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    try:
+        procesados = recalcular_estadisticas(db, id_proveedor=args.proveedor)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al reconstruir estadísticas: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"✅ {procesados} proveedores recalculados en {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
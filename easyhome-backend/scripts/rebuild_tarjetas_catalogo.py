@@ -0,0 +1,55 @@
+"""
+Script para reconstruir la tabla desnormalizada del catálogo
+(tarjeta_catalogo) a partir de publicaciones, proveedores, usuarios,
+categorías e imágenes.
+
+Crea la tabla si no existe y la recalcula en una sola pasada
+(INSERT ... SELECT ... ON CONFLICT DO UPDATE).
+
+Uso:
+    python scripts/rebuild_tarjetas_catalogo.py
+    python scripts/rebuild_tarjetas_catalogo.py --proveedor 12
+"""
+import sys
+import os
+import argparse
+import time
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.database import engine, SessionLocal
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.models.tarjeta_catalogo import Tarjeta_Catalogo
+from app.services.catalogo_service import refrescar_tarjetas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye tarjeta_catalogo")
+    parser.add_argument("--proveedor", type=int, default=None, help="Recalcular solo las tarjetas de este id_proveedor")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("RECONSTRUCCIÓN DEL CATÁLOGO DE PUBLICACIONES")
+    print("=" * 60)
+
+    Tarjeta_Catalogo.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    try:
+        ids_proveedor = [args.proveedor] if args.proveedor is not None else None
+        escritas = refrescar_tarjetas(db, ids_proveedor=ids_proveedor)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al reconstruir el catálogo: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"✅ {escritas} tarjetas recalculadas en {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Script para reconciliar los usuarios de Cognito con la tabla usuario
+
+Recorre el User Pool por páginas, agrega al grupo por defecto a quien no
+tenga grupo y sincroniza nombre, teléfono y tipo_usuario en la BD con
+upserts por lote. Guarda un checkpoint después de cada página: si se
+interrumpe, la siguiente corrida continúa donde quedó. Reemplaza a
+migrate_users_to_default_group.py, que corregía los grupos uno por uno.
+
+Uso:
+    python scripts/reconciliar_usuarios_cognito.py
+    python scripts/reconciliar_usuarios_cognito.py --simular
+    python scripts/reconciliar_usuarios_cognito.py --concurrencia 8 --max-paginas 10
+    python scripts/reconciliar_usuarios_cognito.py --reiniciar
+"""
+import sys
+import os
+import argparse
+import logging
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.services.cognito_service import cognito_service
+from app.services.reconciliacion_service import ReconciliadorCognito
+
+logging.basicConfig(level=logging.INFO)
+
+CHECKPOINT = os.path.join(os.path.dirname(__file__), ".reconciliacion_cognito.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcilia usuarios de Cognito con la BD")
+    parser.add_argument("--checkpoint", default=CHECKPOINT, help="Archivo de checkpoint para reanudar")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Llamadas simultáneas a Cognito")
+    parser.add_argument("--max-paginas", type=int, default=None, help="Detenerse tras N páginas")
+    parser.add_argument("--simular", action="store_true", help="Solo contar diferencias, sin escribir")
+    parser.add_argument("--reiniciar", action="store_true", help="Ignorar el checkpoint y empezar de cero")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("RECONCILIACIÓN COGNITO -> BD")
+    print("=" * 60)
+
+    if not cognito_service.client or not settings.COGNITO_USER_POOL_ID:
+        print("❌ Cognito no está configurado (COGNITO_USER_POOL_ID / credenciales de AWS)")
+        sys.exit(1)
+
+    reconciliador = ReconciliadorCognito(
+        client=cognito_service.client,
+        user_pool_id=settings.COGNITO_USER_POOL_ID,
+        session_factory=SessionLocal,
+        checkpoint=args.checkpoint,
+        concurrencia=args.concurrencia,
+        aplicar=not args.simular,
+    )
+    try:
+        progreso = reconciliador.ejecutar(max_paginas=args.max_paginas, reiniciar=args.reiniciar)
+    except Exception as e:
+        print(f"❌ Error durante la reconciliación: {e}")
+        print(f"   Vuelve a ejecutar el script para reanudar desde {args.checkpoint}")
+        sys.exit(1)
+
+    print("")
+    print(f"{'🔎 Simulación' if args.simular else '✅ Reconciliación'} "
+          f"{'completa' if progreso.terminado else 'parcial (se reanudará desde el checkpoint)'}")
+    print(f"Páginas: {progreso.paginas}")
+    print(f"Usuarios procesados: {progreso.procesados} ({progreso.por_segundo:.1f} usuarios/s)")
+    print(f"Creados en la BD: {progreso.creados}")
+    print(f"Actualizados en la BD: {progreso.actualizados}")
+    print(f"Agregados a '{settings.COGNITO_DEFAULT_GROUP}': {progreso.grupos_corregidos}")
+    if progreso.duplicados:
+        print(f"⚠️  Omitidos por correo repetido en Cognito: {progreso.duplicados}")
+    if progreso.errores_grupo:
+        print(f"❌ Errores al asignar grupo: {progreso.errores_grupo}")
+
+
+if __name__ == "__main__":
+    main()
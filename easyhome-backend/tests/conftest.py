@@ -0,0 +1,97 @@
+import os
+
+import pytest
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+
+# Las pruebas crean las tablas en SQLite
+@compiles(TSVECTOR, "sqlite")
+def _tsvector_sqlite(tipo, compilador, **kw):
+    return "TEXT"
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_sqlite(tipo, compilador, **kw):
+    # INTEGER PRIMARY KEY es el único autoincremental en SQLite
+    return "INTEGER"
+
+
+@pytest.fixture
+def crear_bd(tmp_path):
+    """
+    Fábrica de BD SQLite de prueba: crea las tablas de `modelos` y devuelve
+    una Session sobre ella. `sesion.sentencias` acumula el SQL ejecutado
+    (para contar consultas). Con archivo=True la BD vive en un archivo y
+    admite varias conexiones a la vez.
+    """
+    sesiones = []
+
+    def crear(*modelos, archivo=False):
+        engine = create_engine(f"sqlite:///{tmp_path / 'bd.sqlite'}" if archivo else "sqlite://")
+        for modelo in modelos:
+            modelo.__table__.create(engine)
+        sentencias = []
+        event.listen(engine, "before_cursor_execute", lambda *args: sentencias.append(args[2]))
+
+        sesion = Session(engine)
+        sesion.sentencias = sentencias
+        sesiones.append(sesion)
+        return sesion
+
+    yield crear
+    for sesion in sesiones:
+        sesion.close()
+        sesion.get_bind().dispose()
+
+
+@pytest.fixture
+def urls_firmadas(monkeypatch):
+    """URLs prefirmadas falsas (https://s3/<key>); devuelve los lotes que se firmaron."""
+    from app.services.s3_service import s3_service
+
+    lotes = []
+
+    def firmar(keys):
+        keys = [key for key in keys if key]
+        lotes.append(keys)
+        return {key: f"https://s3/{key}" for key in keys}
+
+    monkeypatch.setattr(s3_service, "get_presigned_urls", firmar)
+    return lotes
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    """
+    Postgres para las pruebas que ejecutan SQL exclusivo de Postgres:
+    TEST_DATABASE_URL o, si está instalado, un servidor local de pgserver.
+    Sin ninguno de los dos esas pruebas se omiten.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if url:
+        return url
+    pgserver = pytest.importorskip("pgserver", reason="Requiere TEST_DATABASE_URL o pgserver")
+    servidor = pgserver.get_server(str(tmp_path_factory.mktemp("postgres")), cleanup_mode="stop")
+    return servidor.get_uri()
+
+
+class SesionAsync:
+    """Expone una Session síncrona con la interfaz de AsyncSession que usan los endpoints."""
+
+    def __init__(self, sesion):
+        self.sesion = sesion
+
+    async def execute(self, stmt):
+        return self.sesion.execute(stmt)
+
+    async def scalar(self, stmt):
+        return self.sesion.scalar(stmt)
+
+    async def scalars(self, stmt):
+        return self.sesion.scalars(stmt)
+
+    async def get(self, modelo, ident):
+        return self.sesion.get(modelo, ident)
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.deps import Principal
+from app.api.v1.endpoints import alerta_finalizacion
+from app.models.alerta_sistema import Alerta_Sistema
+from app.models.estadistica_proveedor import Estadistica_Proveedor
+from app.models.servicio_contratado import Servicio_Contratado
+from app.models.user import Usuario, Proveedor_Servicio
+from conftest import SesionAsync
+
+T0 = datetime(2026, 1, 1, 9, 0, 0)
+CLIENTE = Principal(id_usuario=1, correo_electronico="c@example.com", tipo_usuario="cliente", sub="sub-cliente")
+OTRO = Principal(id_usuario=2, correo_electronico="o@example.com", tipo_usuario="cliente", sub="sub-otro")
+
+
+@pytest.fixture
+def bd(crear_bd, urls_firmadas):
+    sesion = crear_bd(Usuario, Proveedor_Servicio, Estadistica_Proveedor, Servicio_Contratado, Alerta_Sistema)
+    sesion.add_all([
+        Usuario(id_usuario=1, nombre="Cliente", correo_electronico="c@example.com", contraseña=""),
+        Usuario(id_usuario=2, nombre="Otro", correo_electronico="o@example.com", contraseña=""),
+        Usuario(id_usuario=3, nombre="Pro", correo_electronico="p@example.com", contraseña="",
+                foto_perfil="perfiles/3.jpg"),
+        Proveedor_Servicio(id_proveedor=3, nombre_completo="Pro Servicios", curp="CURP00000000000003",
+                           años_experiencia=2),
+        Estadistica_Proveedor(id_proveedor=3, total_reseñas=4, calificacion_promedio=4.5),
+        Servicio_Contratado(id_servicio_contratado=1, id_cliente=1, id_proveedor=3, estado_servicio="finalizado"),
+    ])
+    for i in range(25):
+        sesion.add(Alerta_Sistema(
+            id_alerta=i + 1, id_usuario=1, id_servicio_contratado=1, tipo_alerta="finalizacion",
+            mensaje=f"Alerta {i + 1}", leida=i < 20,
+            # Pares con la misma fecha: el id desempata
+            fecha_envio=T0 + timedelta(minutes=i // 2),
+        ))
+    sesion.add_all([
+        Alerta_Sistema(id_alerta=100, id_usuario=1, tipo_alerta="sistema", mensaje="Sin servicio",
+                       leida=False, fecha_envio=T0),
+        Alerta_Sistema(id_alerta=101, id_usuario=2, id_servicio_contratado=1, tipo_alerta="finalizacion",
+                       mensaje="De otro usuario", leida=False, fecha_envio=T0),
+    ])
+    sesion.commit()
+    return sesion
+
+
+def _pagina(sesion, cursor=None, limite=10):
+    sesion.sentencias.clear()
+    respuesta = asyncio.run(alerta_finalizacion.obtener_alertas(
+        1, cursor=cursor, limite=limite, current_user=CLIENTE, db=SesionAsync(sesion)))
+    return respuesta, len(sesion.sentencias)
+
+
+def test_feed_paginado_por_cursor(bd):
+    ids, cursor, consultas = [], None, set()
+    while True:
+        pagina, n = _pagina(bd, cursor)
+        ids += [alerta["id_alerta"] for alerta in pagina["alertas"]]
+        consultas.add(n)
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+
+    assert ids == list(range(25, 0, -1))
+    # Misma cantidad de consultas por página, sin importar cuántas alertas haya
+    assert len(consultas) == 1
+
+    primera = _pagina(bd, limite=1)[0]["alertas"][0]
+    assert primera["proveedor"] == {
+        "idProveedor": 3,
+        "nombreCompleto": "Pro Servicios",
+        "fotoPerfil": "https://s3/perfiles/3.jpg",
+        "calificacionPromedio": 4.5,
+        "totalResenas": 4,
+    }
+
+
+def test_cursor_invalido(bd):
+    with pytest.raises(HTTPException) as error:
+        _pagina(bd, cursor="no-es-un-cursor")
+    assert error.value.status_code == 400
+
+
+def test_contador_de_no_leidas(bd):
+    bd.sentencias.clear()
+    respuesta = asyncio.run(alerta_finalizacion.contar_alertas_no_leidas(1, current_user=CLIENTE, db=SesionAsync(bd)))
+
+    assert respuesta == {"no_leidas": 5}
+    (sql,) = bd.sentencias
+    assert sql.startswith("SELECT count(*)") and "JOIN" not in sql
+
+
+def test_solo_el_propio_usuario_lee_sus_alertas(bd):
+    bd.sentencias.clear()
+    lecturas = [
+        alerta_finalizacion.obtener_alertas(1, cursor=None, limite=10, current_user=OTRO, db=SesionAsync(bd)),
+        alerta_finalizacion.contar_alertas_no_leidas(1, current_user=OTRO, db=SesionAsync(bd)),
+    ]
+    for lectura in lecturas:
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(lectura)
+        assert error.value.status_code == 403
+    assert bd.sentencias == []
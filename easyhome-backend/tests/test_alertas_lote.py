@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.deps import Principal
+from app.api.v1.endpoints import alerta_finalizacion
+from app.models.alerta_sistema import Alerta_Sistema
+from app.models.user import Usuario
+
+AHORA = datetime.now(timezone.utc).replace(tzinfo=None)
+ANA = Principal(id_usuario=1, correo_electronico="a@example.com", tipo_usuario="cliente", sub="sub-ana")
+BETO = Principal(id_usuario=2, correo_electronico="b@example.com", tipo_usuario="cliente", sub="sub-beto")
+
+
+@pytest.fixture
+def bd(crear_bd):
+    sesion = crear_bd(Usuario, Alerta_Sistema)
+    sesion.add_all([
+        Usuario(id_usuario=1, nombre="Ana", correo_electronico="a@example.com", contraseña=""),
+        Usuario(id_usuario=2, nombre="Beto", correo_electronico="b@example.com", contraseña=""),
+    ])
+    # Alertas 1..50 del usuario 1, una por hora hacia atrás; la 50 ya leída
+    for i in range(1, 51):
+        sesion.add(Alerta_Sistema(id_alerta=i, id_usuario=1, tipo_alerta="sistema", mensaje=f"Alerta {i}",
+                                  leida=i == 50, fecha_envio=AHORA - timedelta(hours=i)))
+    sesion.add(Alerta_Sistema(id_alerta=99, id_usuario=2, tipo_alerta="sistema", mensaje="De otro",
+                              leida=False, fecha_envio=AHORA))
+    sesion.commit()
+    return sesion
+
+
+def _leidas(sesion, id_usuario=1):
+    sesion.expire_all()
+    # Las marcadas por los endpoints deben tener fecha_lectura (la 50 venía leída)
+    return {
+        alerta.id_alerta
+        for alerta in sesion.query(Alerta_Sistema).filter_by(id_usuario=id_usuario, leida=True)
+        if alerta.fecha_lectura is not None or alerta.id_alerta == 50
+    }
+
+
+def test_marcar_todas_hasta_un_momento_es_una_sentencia(bd):
+    bd.sentencias.clear()
+    payload = alerta_finalizacion.MarcarTodasLeidasRequest(hasta=AHORA - timedelta(hours=10, minutes=30))
+    respuesta = alerta_finalizacion.marcar_todas_leidas(1, payload, current_user=ANA, db=bd)
+
+    (sql,) = bd.sentencias
+    assert sql.startswith("UPDATE alerta_sistema") and "RETURNING" in sql
+    # Solo las enviadas hasta ese momento y aún no leídas
+    assert respuesta == {"marcadas": 39, "ids": list(range(11, 50))}
+    assert _leidas(bd) == set(range(11, 51))
+
+    respuesta = alerta_finalizacion.marcar_todas_leidas(1, None, current_user=ANA, db=bd)
+    assert respuesta["ids"] == list(range(1, 11))
+    assert _leidas(bd, id_usuario=2) == set()
+
+
+def test_marcar_lista_de_ids(bd):
+    bd.sentencias.clear()
+    payload = alerta_finalizacion.MarcarLeidasRequest(ids=[3, 4, 4, 50, 99])
+    respuesta = alerta_finalizacion.marcar_leidas(1, payload, current_user=ANA, db=bd)
+
+    assert len(bd.sentencias) == 1
+    # 50 ya estaba leída y 99 es de otro usuario
+    assert respuesta == {"marcadas": 2, "ids": [3, 4]}
+    assert _leidas(bd) == {3, 4, 50}
+
+    with pytest.raises(ValidationError):
+        alerta_finalizacion.MarcarLeidasRequest(ids=list(range(alerta_finalizacion.MAX_IDS_POR_LOTE + 1)))
+
+
+def test_marcar_una_alerta(bd):
+    bd.sentencias.clear()
+    assert alerta_finalizacion.marcar_alerta_leida(7, current_user=ANA, db=bd) == {"message": "Alerta marcada como leída"}
+    assert len(bd.sentencias) == 1
+    assert _leidas(bd) == {7, 50}
+
+    # Inexistente o de otro usuario
+    for id_alerta, usuario in ((12345, ANA), (8, BETO)):
+        with pytest.raises(HTTPException) as error:
+            alerta_finalizacion.marcar_alerta_leida(id_alerta, current_user=usuario, db=bd)
+        assert error.value.status_code == 404
+    assert _leidas(bd) == {7, 50}
+
+
+def test_eliminar_leidas_antiguas(bd):
+    bd.add(Alerta_Sistema(id_alerta=200, id_usuario=1, tipo_alerta="sistema", mensaje="Vieja sin leer",
+                          leida=False, fecha_envio=AHORA - timedelta(days=90)))
+    bd.add(Alerta_Sistema(id_alerta=201, id_usuario=1, tipo_alerta="sistema", mensaje="Vieja leída",
+                          leida=True, fecha_envio=AHORA - timedelta(days=90)))
+    bd.add(Alerta_Sistema(id_alerta=202, id_usuario=2, tipo_alerta="sistema", mensaje="Vieja de otro",
+                          leida=True, fecha_envio=AHORA - timedelta(days=90)))
+    bd.commit()
+    bd.sentencias.clear()
+
+    assert alerta_finalizacion.eliminar_alertas_leidas(1, dias=30, current_user=ANA, db=bd) == {"eliminadas": 1}
+    (sql,) = bd.sentencias
+    assert sql.startswith("DELETE FROM alerta_sistema")
+    assert bd.get(Alerta_Sistema, 201) is None
+    assert bd.get(Alerta_Sistema, 200) is not None and bd.get(Alerta_Sistema, 202) is not None
+
+
+def test_solo_el_propio_usuario_opera_sus_alertas(bd):
+    payload = alerta_finalizacion.MarcarLeidasRequest(ids=[3])
+    operaciones = [
+        lambda: alerta_finalizacion.marcar_todas_leidas(1, None, current_user=BETO, db=bd),
+        lambda: alerta_finalizacion.marcar_leidas(1, payload, current_user=BETO, db=bd),
+        lambda: alerta_finalizacion.eliminar_alertas_leidas(1, dias=1, current_user=BETO, db=bd),
+    ]
+    bd.sentencias.clear()
+    for operacion in operaciones:
+        with pytest.raises(HTTPException) as error:
+            operacion()
+        assert error.value.status_code == 403
+
+    assert bd.sentencias == []
+    assert _leidas(bd) == {50}
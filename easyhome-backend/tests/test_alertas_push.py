@@ -0,0 +1,158 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.deps import Principal
+from app.api.v1.endpoints import alerta_finalizacion
+from app.models.alerta_sistema import Alerta_Sistema, CANAL_ALERTAS, _notificar_alerta
+from app.models.user import Usuario
+from app.services import alertas_push_service
+from app.services.alertas_push_service import CanalAlertas, RESYNC
+
+
+def _notificacion(**datos):
+    return json.dumps({"id_alerta": 1, "id_usuario": 1, "tipo_alerta": "servicio_finalizado", **datos})
+
+
+def test_reparte_solo_a_las_conexiones_del_usuario():
+    async def escenario():
+        canal = CanalAlertas(tamano_cola=10)
+        with canal.suscripcion(1) as pestana_a, canal.suscripcion(1) as pestana_b, canal.suscripcion(2) as otro:
+            canal._al_notificar(None, 0, CANAL_ALERTAS, _notificacion(id_alerta=7))
+            canal._al_notificar(None, 0, CANAL_ALERTAS, "no-es-json")
+            assert canal.stats()["conexiones"] == 3
+            return pestana_a.get_nowait(), pestana_b.get_nowait(), otro.empty(), canal
+
+    evento_a, evento_b, otro_vacio, canal = asyncio.run(escenario())
+    assert evento_a == evento_b == {
+        "evento": "alerta",
+        "datos": {"id_alerta": 7, "id_usuario": 1, "tipo_alerta": "servicio_finalizado"},
+    }
+    assert otro_vacio
+    # Al salir del bloque no quedan suscriptores
+    assert canal.stats()["usuarios"] == canal.stats()["conexiones"] == 0
+    assert canal.stats()["recibidas"] == 2
+
+
+def test_cliente_lento_recibe_resync():
+    async def escenario():
+        canal = CanalAlertas(tamano_cola=2)
+        with canal.suscripcion(1) as cola:
+            for i in range(5):
+                canal.publicar({"id_alerta": i, "id_usuario": 1})
+            eventos = [cola.get_nowait() for _ in range(cola.qsize())]
+        return eventos, canal.desbordes
+
+    eventos, desbordes = asyncio.run(escenario())
+    assert RESYNC in eventos and len(eventos) <= 2
+    assert desbordes >= 1
+
+
+def test_stream_sse(monkeypatch):
+    canal = CanalAlertas(tamano_cola=10)
+    monkeypatch.setattr(alertas_push_service, "_canal", canal)
+
+    async def escenario():
+        stream = alerta_finalizacion._stream_sse(1, heartbeat=0.01)
+        trozos = [await stream.__anext__(), await stream.__anext__()]
+        canal.publicar({"id_alerta": 9, "id_usuario": 1})
+        trozos.append(await stream.__anext__())
+        canal.resincronizar()
+        trozos.append(await stream.__anext__())
+        await stream.aclose()
+        return trozos
+
+    trozos = asyncio.run(escenario())
+    assert trozos[0] == f"retry: {alerta_finalizacion.SSE_RETRY_MS}\n\n"
+    assert trozos[1] == ": ping\n\n"
+    assert trozos[2] == 'event: alerta\nid: 9\ndata: {"id_alerta": 9, "id_usuario": 1}\n\n'
+    assert trozos[3] == "event: resync\ndata: {}\n\n"
+    # Cerrar el stream libera la suscripción
+    assert canal.stats()["conexiones"] == 0
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    """Token -> usuario autenticado (sin Cognito)."""
+    principales = {"token-ana": Principal(id_usuario=1, correo_electronico="ana@example.com",
+                                          tipo_usuario="cliente", sub="sub-ana")}
+
+    def principal_de_token(token):
+        if token not in principales:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return principales[token]
+
+    monkeypatch.setattr(alerta_finalizacion, "principal_de_token", principal_de_token)
+    monkeypatch.setattr(alertas_push_service, "_canal", CanalAlertas(tamano_cola=10))
+
+
+@pytest.mark.parametrize("id_usuario, token, status", [
+    (1, None, 401),
+    (1, "token-caducado", 401),
+    (2, "token-ana", 403),  # El canal de otro usuario
+])
+def test_stream_sse_exige_el_token_del_propio_usuario(tokens, id_usuario, token, status):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(alerta_finalizacion.stream_alertas(id_usuario, token=token))
+    assert error.value.status_code == status
+
+
+def test_stream_sse_autenticado(tokens):
+    respuesta = asyncio.run(alerta_finalizacion.stream_alertas(1, token="token-ana"))
+    assert respuesta.media_type == "text/event-stream"
+
+
+def test_websocket_autenticado(tokens):
+    app = FastAPI()
+    app.include_router(alerta_finalizacion.router)
+    cliente = TestClient(app)
+
+    for url in ("/alertas/usuario/1/ws", "/alertas/usuario/2/ws?token=token-ana"):
+        with pytest.raises(WebSocketDisconnect) as error:
+            with cliente.websocket_connect(url):
+                pass
+        assert error.value.code == 1008
+
+    with cliente.websocket_connect("/alertas/usuario/1/ws?token=token-ana") as ws:
+        alertas_push_service._canal.publicar({"id_alerta": 3, "id_usuario": 1})
+        assert ws.receive_json() == {"evento": "alerta", "datos": {"id_alerta": 3, "id_usuario": 1}}
+
+
+class ConexionPostgres:
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self):
+        self.sentencias = []
+
+    def execute(self, stmt):
+        self.sentencias.append(stmt.compile())
+
+
+def test_insertar_alerta_emite_pg_notify():
+    conexion = ConexionPostgres()
+    alerta = Alerta_Sistema(id_alerta=5, id_usuario=3, id_servicio_contratado=8,
+                            tipo_alerta="servicio_finalizado", mensaje="Listo")
+
+    _notificar_alerta(None, conexion, alerta)
+
+    (sql,) = conexion.sentencias
+    assert "pg_notify" in str(sql)
+    canal, payload = sql.params.values()
+    assert canal == CANAL_ALERTAS
+    assert json.loads(payload) == {
+        "id_alerta": 5, "id_usuario": 3, "id_servicio_contratado": 8, "tipo_alerta": "servicio_finalizado",
+    }
+
+
+def test_fuera_de_postgres_no_se_notifica(crear_bd):
+    sesion = crear_bd(Usuario, Alerta_Sistema)
+    sesion.add(Usuario(id_usuario=1, nombre="Ana", correo_electronico="a@example.com", contraseña=""))
+    sesion.add(Alerta_Sistema(id_alerta=1, id_usuario=1, tipo_alerta="sistema", mensaje="Hola"))
+    sesion.commit()
+
+    assert not any("pg_notify" in sql for sql in sesion.sentencias)
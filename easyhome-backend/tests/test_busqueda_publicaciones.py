@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.api.v1.endpoints import publicacion
+from app.core.pagination import encode_cursor
+from app.models.tarjeta_catalogo import Tarjeta_Catalogo
+
+
+def _tarjeta(id_publicacion, titulo):
+    return Tarjeta_Catalogo(
+        id_publicacion=id_publicacion, id_proveedor=7, id_categoria=1, titulo=titulo,
+        descripcion=f"Descripción de {titulo}", rango_precio_min=100, rango_precio_max=200,
+        fecha_publicacion=datetime(2026, 1, id_publicacion), estado="activo", categoria="Plomería",
+        imagen_portada_key=None, imagenes=[], nombre_proveedor="Pro", foto_perfil_key=None,
+        calificacion_promedio=None,
+    )
+
+
+class SesionBusqueda:
+    """AsyncSession falsa: devuelve `filas` a la búsqueda y registra su SQL (PostgreSQL)."""
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.consultas = []
+
+    async def execute(self, stmt):
+        self.consultas.append(stmt.compile(dialect=postgresql.dialect()))
+        return SimpleNamespace(all=lambda: self.filas)
+
+    async def scalars(self, stmt):
+        # Variantes de imágenes listas: ninguna
+        return []
+
+
+@pytest.fixture(autouse=True)
+def sin_s3(monkeypatch):
+    monkeypatch.setattr(publicacion.s3_service, "get_presigned_urls", lambda keys: {})
+
+
+def _buscar(sesion, cursor=None, limite=2, q="fuga de agua"):
+    return asyncio.run(publicacion.buscar_publicaciones(
+        q=q, db=sesion, categorias=None, cursor=cursor, limite=limite,
+    ))
+
+
+def test_consulta_usa_el_documento_y_el_keyset_de_relevancia():
+    sesion = SesionBusqueda([])
+    _buscar(sesion, cursor=encode_cursor({"o": "relevancia", "r": 0.25, "id": 9}))
+
+    (consulta,) = sesion.consultas
+    sql = " ".join(str(consulta).split())
+    assert "publicacion_servicio.documento_busqueda @@ websearch_to_tsquery('spanish'::regconfig, " in sql
+    assert ("(ts_rank(publicacion_servicio.documento_busqueda, websearch_to_tsquery('spanish'::regconfig, "
+            in sql)
+    assert ", publicacion_servicio.id_publicacion) < (" in sql
+    assert "ORDER BY ts_rank(" in sql and "publicacion_servicio.id_publicacion DESC" in sql
+    assert "ts_headline('spanish'::regconfig, tarjeta_catalogo.titulo" in sql
+    assert {0.25, 9, "fuga de agua"} <= set(consulta.params.values())
+
+
+@pytest.mark.parametrize("cursor", [
+    encode_cursor({"o": "fecha", "f": "2025-11-03T10:30:15", "id": 7}),
+    encode_cursor({"r": 0.5, "id": 7}),
+])
+def test_cursor_de_otro_listado_responde_400(cursor):
+    sesion = SesionBusqueda([])
+    with pytest.raises(HTTPException) as error:
+        _buscar(sesion, cursor=cursor)
+
+    assert error.value.status_code == 400
+    assert sesion.consultas == []
+
+
+def _fila(tarjeta, relevancia, fragmento_titulo=None, fragmento_descripcion=None, id_publicacion=None):
+    """Fila de la página de ids unida (LEFT JOIN) a su tarjeta; tarjeta=None si aún no existe."""
+    return (id_publicacion or tarjeta.id_publicacion, relevancia, tarjeta, fragmento_titulo, fragmento_descripcion)
+
+
+def test_fragmentos_van_en_su_tarjeta():
+    sesion = SesionBusqueda([
+        _fila(_tarjeta(3, "Plomero"), 0.61, "<mark>Plomero</mark>", "Arreglo <mark>fugas</mark>"),
+        _fila(_tarjeta(1, "Electricista"), 0.2, "Electricista", "Revisión de <mark>agua</mark>"),
+        _fila(_tarjeta(2, "Jardinero"), 0.1, "Jardinero", "Riego"),
+    ])
+    respuesta = _buscar(sesion, limite=2)
+
+    assert [
+        (t["id_publicacion"], t["relevancia"], t["fragmento_titulo"], t["fragmento_descripcion"])
+        for t in respuesta["publicaciones"]
+    ] == [
+        (3, 0.61, "<mark>Plomero</mark>", "Arreglo <mark>fugas</mark>"),
+        (1, 0.2, "Electricista", "Revisión de <mark>agua</mark>"),
+    ]
+    # La fila extra solo indica que hay otra página; el cursor apunta a la última devuelta
+    siguiente = SesionBusqueda([])
+    _buscar(siguiente, cursor=respuesta["next_cursor"])
+    assert {0.2, 1} <= set(siguiente.consultas[0].params.values())
+
+
+def test_publicacion_sin_tarjeta_no_corta_la_paginacion():
+    # La publicación 5 coincide pero su tarjeta aún no existe (LEFT JOIN -> None)
+    sesion = SesionBusqueda([
+        _fila(_tarjeta(3, "Plomero"), 0.61),
+        _fila(None, 0.4, id_publicacion=5),
+        _fila(_tarjeta(1, "Electricista"), 0.2),
+    ])
+    respuesta = _buscar(sesion, limite=2)
+
+    assert [t["id_publicacion"] for t in respuesta["publicaciones"]] == [3]
+    # Hay una tercera coincidencia: la siguiente página sigue después de la 5
+    assert respuesta["next_cursor"]
+    siguiente = SesionBusqueda([])
+    _buscar(siguiente, cursor=respuesta["next_cursor"])
+    assert {0.4, 5} <= set(siguiente.consultas[0].params.values())
+
+    sql = " ".join(str(sesion.consultas[0]).split())
+    assert "LEFT OUTER JOIN tarjeta_catalogo ON tarjeta_catalogo.id_publicacion = anon_1.id" in sql
@@ -0,0 +1,99 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app.services.cognito_service import CognitoService
+
+
+class CognitoFalso:
+    """Cliente cognito-idp mínimo que cuenta las llamadas."""
+
+    def __init__(self, usuarios, demora=0.0):
+        self.usuarios = usuarios  # correo -> (atributos, grupos)
+        self.demora = demora
+        self.llamadas = []
+        self._lock = threading.Lock()
+        self.throttling = False
+
+    def _registrar(self, operacion):
+        with self._lock:
+            self.llamadas.append(operacion)
+        time.sleep(self.demora)
+        if self.throttling:
+            raise ClientError({"Error": {"Code": "TooManyRequestsException"}}, operacion)
+
+    def list_users(self, UserPoolId, Filter, Limit):
+        self._registrar("list_users")
+        correo = Filter.split('"')[1]
+        return {"Users": [{"Username": correo}] if correo in self.usuarios else []}
+
+    def admin_get_user(self, UserPoolId, Username):
+        self._registrar("admin_get_user")
+        atributos = self.usuarios[Username][0]
+        return {"UserAttributes": [{"Name": k, "Value": v} for k, v in atributos.items()]}
+
+    def admin_list_groups_for_user(self, UserPoolId, Username):
+        self._registrar("admin_list_groups_for_user")
+        if Username not in self.usuarios:
+            raise ClientError({"Error": {"Code": "UserNotFoundException"}}, "admin_list_groups_for_user")
+        return {"Groups": [{"GroupName": g} for g in self.usuarios[Username][1]]}
+
+    def admin_add_user_to_group(self, UserPoolId, Username, GroupName):
+        self._registrar("admin_add_user_to_group")
+        self.usuarios[Username][1].append(GroupName)
+
+
+@pytest.fixture
+def servicio():
+    servicio = CognitoService()
+    servicio.user_pool_id = "us-east-1_prueba"
+    servicio.client = CognitoFalso({
+        "ana@example.com": ({"sub": "sub-ana", "name": "Ana"}, ["Clientes"]),
+    })
+    return servicio
+
+
+def test_atributos_y_grupos_se_cachean(servicio):
+    for _ in range(3):
+        assert servicio.get_user_by_email("ana@example.com")["name"] == "Ana"
+        assert servicio.get_user_groups("ana@example.com") == ["Clientes"]
+    assert servicio.client.llamadas == ["list_users", "admin_get_user", "admin_list_groups_for_user"]
+
+    # Modificar lo devuelto no altera la caché
+    servicio.get_user_by_email("ana@example.com")["name"] = "Otra"
+    assert servicio.get_user_by_email("ana@example.com")["name"] == "Ana"
+
+
+def test_usuario_inexistente_se_cachea(servicio):
+    for _ in range(3):
+        assert servicio.get_user_by_email("nadie@example.com") == {}
+        assert servicio.get_user_groups("nadie@example.com") == []
+    assert servicio.client.llamadas == ["list_users", "admin_list_groups_for_user"]
+
+
+def test_errores_de_aws_no_se_cachean(servicio):
+    servicio.client.throttling = True
+    assert servicio.get_user_by_email("ana@example.com") == {}
+    servicio.client.throttling = False
+    assert servicio.get_user_by_email("ana@example.com")["sub"] == "sub-ana"
+    assert servicio.client.llamadas.count("list_users") == 2
+
+
+def test_agregar_a_grupo_invalida_los_grupos(servicio):
+    assert servicio.get_user_groups("ana@example.com") == ["Clientes"]
+    assert servicio.add_user_to_group("ana@example.com", "Trabajadores")
+    assert servicio.get_user_groups("ana@example.com") == ["Clientes", "Trabajadores"]
+    assert servicio.client.llamadas.count("admin_list_groups_for_user") == 2
+
+
+def test_busquedas_concurrentes_se_agrupan(servicio):
+    servicio.client.demora = 0.2
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        resultados = list(pool.map(lambda _: servicio.get_user_by_email("ana@example.com"), range(10)))
+
+    assert all(r["sub"] == "sub-ana" for r in resultados)
+    assert servicio.client.llamadas == ["list_users", "admin_get_user"]
+    assert servicio.stats()["llamadas_compartidas"] == 9
@@ -0,0 +1,203 @@
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app.api.v1 import deps
+from app.core.cognito_jwt import JWKSCache, TokenInvalido, VerificadorCognito
+from app.models.user import Usuario
+
+EMISOR = "https://cognito-idp.us-east-1.amazonaws.com/us-east-1_prueba"
+CLIENTE = "cliente-web"
+
+
+def _llave(kid):
+    privada = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    publica = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(privada.public_key()))
+    publica.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return privada, publica
+
+
+@pytest.fixture(scope="module")
+def llaves():
+    return dict(a=_llave("kid-a"), b=_llave("kid-b"))
+
+
+@pytest.fixture
+def verificador(llaves, tmp_path):
+    archivo = tmp_path / "jwks.json"
+    archivo.write_text(json.dumps({"keys": [llaves["a"][1]]}))
+    return VerificadorCognito(JWKSCache(archivo=str(archivo)), EMISOR, CLIENTE)
+
+
+def _token(llaves, kid="a", **claims):
+    ahora = int(time.time())
+    datos = {
+        "sub": "sub-123",
+        "iss": EMISOR,
+        "iat": ahora,
+        "exp": ahora + 3600,
+        "token_use": "access",
+        "client_id": CLIENTE,
+        "username": "ana@example.com",
+        "cognito:groups": ["Clientes"],
+    }
+    datos.update(claims)
+    return jwt.encode(datos, llaves[kid][0], algorithm="RS256", headers={"kid": f"kid-{kid}"})
+
+
+def test_access_e_id_token_validos(verificador, llaves):
+    claims = verificador.verificar(_token(llaves))
+    assert claims["sub"] == "sub-123"
+    assert claims["cognito:groups"] == ["Clientes"]
+
+    id_token = _token(llaves, token_use="id", aud=CLIENTE, email="ana@example.com", client_id=None)
+    assert verificador.verificar(id_token)["email"] == "ana@example.com"
+
+
+@pytest.mark.parametrize("claims", [
+    {"exp": int(time.time()) - 3600},
+    {"iss": "https://cognito-idp.us-east-1.amazonaws.com/otro_pool"},
+    {"client_id": "otro-cliente"},
+    {"token_use": "refresh"},
+])
+def test_tokens_rechazados(verificador, llaves, claims):
+    with pytest.raises(TokenInvalido):
+        verificador.verificar(_token(llaves, **claims))
+
+
+def test_sin_cliente_configurado_rechaza_todo(monkeypatch):
+    from app.core import cognito_jwt
+    from app.core.config import settings
+
+    monkeypatch.setattr(cognito_jwt, "_verificador", None)
+    monkeypatch.setattr(settings, "COGNITO_USER_POOL_ID", "us-east-1_prueba")
+    monkeypatch.setattr(settings, "COGNITO_APP_CLIENT_ID", None)
+
+    with pytest.raises(TokenInvalido, match="COGNITO_APP_CLIENT_ID"):
+        cognito_jwt.obtener_verificador()
+    assert cognito_jwt._verificador is None
+
+
+def test_firma_con_llave_desconocida(verificador, llaves):
+    with pytest.raises(TokenInvalido):
+        verificador.verificar(_token(llaves, kid="b"))
+
+
+def test_jwks_se_descarga_una_vez_y_se_recarga_por_rotacion(llaves, tmp_path):
+    archivo = tmp_path / "jwks.json"
+    archivo.write_text(json.dumps({"keys": [llaves["a"][1]]}))
+    reloj = [0.0]
+    jwks = JWKSCache(archivo=str(archivo), refresco=3600, clock=lambda: reloj[0])
+    verificador = VerificadorCognito(jwks, EMISOR, CLIENTE)
+
+    for _ in range(5):
+        verificador.verificar(_token(llaves))
+    assert jwks.descargas == 1
+
+    # El pool rota a la llave "b": se recarga al ver el kid nuevo (con espera mínima)
+    archivo.write_text(json.dumps({"keys": [llaves["a"][1], llaves["b"][1]]}))
+    with pytest.raises(TokenInvalido):
+        verificador.verificar(_token(llaves, kid="b"))
+    reloj[0] = 61
+    assert verificador.verificar(_token(llaves, kid="b"))["sub"] == "sub-123"
+    assert jwks.descargas == 2
+
+
+def _request(token=None):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_get_current_user_cachea_el_principal(verificador, llaves, monkeypatch):
+    consultas = []
+
+    def cargar(claims):
+        consultas.append(claims["sub"])
+        return deps.Principal(id_usuario=7, correo_electronico="ana@example.com", tipo_usuario="cliente",
+                              sub=claims["sub"], grupos=tuple(claims["cognito:groups"]))
+
+    monkeypatch.setattr(deps, "obtener_verificador", lambda: verificador)
+    monkeypatch.setattr(deps, "_cargar_principal", cargar)
+    deps.invalidar_principal("sub-123")
+
+    for _ in range(3):
+        principal = deps.get_current_user(_request(_token(llaves)))
+    assert principal.id_usuario == 7 and principal.grupos == ("Clientes",)
+    assert consultas == ["sub-123"]
+
+    deps.invalidar_principal("sub-123")
+    deps.get_current_user(_request(_token(llaves)))
+    assert consultas == ["sub-123", "sub-123"]
+
+
+def test_get_current_user_sin_token_o_invalido(verificador, llaves, monkeypatch):
+    monkeypatch.setattr(deps, "obtener_verificador", lambda: verificador)
+
+    with pytest.raises(HTTPException) as error:
+        deps.get_current_user(_request())
+    assert error.value.status_code == 401
+
+    with pytest.raises(HTTPException) as error:
+        deps.get_current_user(_request(_token(llaves, client_id="otro-cliente")))
+    assert error.value.status_code == 401
+
+
+@pytest.fixture
+def usuarios(verificador, monkeypatch):
+    engine = create_engine("sqlite://")
+    Usuario.__table__.create(engine)
+    fabrica = sessionmaker(bind=engine)
+    with fabrica() as db:
+        db.add(Usuario(id_usuario=7, nombre="Ana", correo_electronico="ana@example.com", contraseña=""))
+        db.commit()
+    monkeypatch.setattr(deps, "SessionLocal", fabrica)
+    monkeypatch.setattr(deps, "obtener_verificador", lambda: verificador)
+    deps.invalidar_principal("sub-123")
+    yield fabrica
+    deps.invalidar_principal("sub-123")
+
+
+@pytest.mark.parametrize("claims", [
+    # Access token: el username no prueba que el correo sea suyo
+    {},
+    # ID token con el correo de otra persona sin verificar
+    {"token_use": "id", "aud": CLIENTE, "client_id": None, "email": "ana@example.com", "email_verified": False},
+    {"token_use": "id", "aud": CLIENTE, "client_id": None, "email": "ana@example.com"},
+])
+def test_correo_sin_verificar_no_resuelve_al_usuario(usuarios, llaves, claims):
+    with pytest.raises(HTTPException) as error:
+        deps.get_current_user(_request(_token(llaves, **claims)))
+    assert error.value.status_code == 401
+
+
+def test_correo_verificado_vincula_el_sub(usuarios, llaves):
+    id_token = _token(llaves, token_use="id", aud=CLIENTE, client_id=None,
+                      email="ana@example.com", email_verified=True)
+    assert deps.get_current_user(_request(id_token)).id_usuario == 7
+    with usuarios() as db:
+        assert db.scalar(select(Usuario.google_id).where(Usuario.id_usuario == 7)) == "sub-123"
+
+    # Ya vinculado, el access token (sin correo) resuelve por sub
+    deps.invalidar_principal("sub-123")
+    assert deps.get_current_user(_request(_token(llaves))).id_usuario == 7
+
+
+def test_get_current_admin_exige_rol_de_administrador():
+    cliente = deps.Principal(id_usuario=1, correo_electronico="a@example.com", tipo_usuario="cliente", sub="s1")
+    with pytest.raises(HTTPException) as error:
+        deps.get_current_admin(cliente)
+    assert error.value.status_code == 403
+
+    por_grupo = deps.Principal(id_usuario=2, correo_electronico="b@example.com", tipo_usuario="cliente",
+                               sub="s2", grupos=("Admin",))
+    assert deps.get_current_admin(por_grupo) is por_grupo
+    administrador = deps.Principal(id_usuario=3, correo_electronico="c@example.com",
+                                   tipo_usuario="administrador", sub="s3")
+    assert deps.get_current_admin(administrador) is administrador
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.deps import Principal
+from app.api.v1.endpoints import status_servicio
+from app.models.property import Publicacion_Servicio
+from app.models.servicio_contratado import Servicio_Contratado
+from app.models.user import Usuario, Proveedor_Servicio
+from conftest import SesionAsync
+
+AHORA = datetime.now(timezone.utc).replace(tzinfo=None)
+PRO = Principal(id_usuario=1, correo_electronico="pro@example.com", tipo_usuario="proveedor", sub="s1")
+CLIENTE = Principal(id_usuario=2, correo_electronico="c@example.com", tipo_usuario="cliente", sub="s2")
+
+
+@pytest.fixture
+def bd(crear_bd, urls_firmadas):
+    sesion = crear_bd(Usuario, Proveedor_Servicio, Publicacion_Servicio, Servicio_Contratado)
+    sesion.add_all([
+        Usuario(id_usuario=1, nombre="Pro", correo_electronico="pro@example.com", contraseña=""),
+        Proveedor_Servicio(id_proveedor=1, nombre_completo="Pro", curp="CURP00000000000001", años_experiencia=5),
+        Publicacion_Servicio(id_publicacion=1, id_proveedor=1, id_categoria=1, titulo="Plomería",
+                             descripcion="-", rango_precio_min=Decimal("100"), rango_precio_max=Decimal("300")),
+        Usuario(id_usuario=2, nombre="Cliente", correo_electronico="c@example.com", contraseña="",
+                foto_perfil="perfiles/2.jpg"),
+    ])
+    for i in range(1, 8):
+        sesion.add(Servicio_Contratado(
+            id_servicio_contratado=i, id_cliente=2, id_proveedor=1, id_publicacion=1,
+            estado_servicio="en_proceso" if i % 2 else "confirmado", acuerdo_confirmado=True,
+            fecha_contacto=AHORA - timedelta(days=i), fecha_confirmacion_acuerdo=AHORA - timedelta(days=i),
+        ))
+    # Finalizados: 20 con fecha de finalización (uno por día hacia atrás) y uno antiguo sin ella
+    for i in range(100, 120):
+        sesion.add(Servicio_Contratado(
+            id_servicio_contratado=i, id_cliente=2, id_proveedor=1, id_publicacion=1,
+            estado_servicio="finalizado", acuerdo_confirmado=True,
+            fecha_contacto=AHORA - timedelta(days=200), fecha_confirmacion_acuerdo=AHORA - timedelta(days=200),
+            fecha_finalizacion=AHORA - timedelta(days=i - 99, hours=1),
+        ))
+    sesion.add_all([
+        Servicio_Contratado(id_servicio_contratado=200, id_cliente=2, id_proveedor=1,
+                            estado_servicio="finalizado", fecha_contacto=AHORA - timedelta(days=400)),
+        Servicio_Contratado(id_servicio_contratado=300, id_cliente=2, id_proveedor=1,
+                            estado_servicio="contactado", fecha_contacto=AHORA),
+    ])
+    sesion.commit()
+    sesion.firmadas = urls_firmadas
+    return sesion
+
+
+def test_dashboard_en_dos_consultas(bd):
+    bd.sentencias.clear()
+    dashboard = asyncio.run(status_servicio.obtener_dashboard_proveedor(
+        1, limite=5, dias=10, current_user=PRO, db=SesionAsync(bd)))
+
+    assert len(bd.sentencias) == 2
+    assert "GROUP BY" in bd.sentencias[0] and "UNION ALL" in bd.sentencias[1]
+    # Todas las fotos se firman en una sola llamada
+    assert len(bd.firmadas) == 1
+
+    assert dashboard["conteos"] == {
+        "contactado": 1, "confirmado": 3, "en_proceso": 4, "finalizado": 21, "cancelado": 0,
+    }
+    assert dashboard["estadisticas"] == {
+        # Finalizados hace 1..9 días (el del día 10 quedó una hora fuera de la ventana)
+        "dias": 10, "contratos": 7, "finalizados": 9,
+        "ingresos_estimados_min": 900.0, "ingresos_estimados_max": 2700.0,
+    }
+
+    activos = dashboard["activos"]
+    assert activos["total"] == 7
+    assert [s["id_servicio_contratado"] for s in activos["servicios"]] == [1, 2, 3, 4, 5]
+    assert activos["servicios"][0]["usuario"]["foto_perfil"] == "https://s3/perfiles/2.jpg"
+    assert activos["next_cursor"]
+
+    finalizados = dashboard["finalizados"]
+    assert finalizados["total"] == 21
+    assert [s["id_servicio_contratado"] for s in finalizados["servicios"]] == [100, 101, 102, 103, 104]
+
+
+def test_paginas_siguientes_por_cursor(bd):
+    dashboard = asyncio.run(status_servicio.obtener_dashboard_proveedor(
+        1, limite=5, dias=30, current_user=PRO, db=SesionAsync(bd)))
+
+    ids = [s["id_servicio_contratado"] for s in dashboard["finalizados"]["servicios"]]
+    cursor = dashboard["finalizados"]["next_cursor"]
+    while cursor:
+        bd.sentencias.clear()
+        pagina = asyncio.run(status_servicio.listar_pagina_dashboard(
+            1, "finalizados", cursor=cursor, limite=5, current_user=PRO, db=SesionAsync(bd)))
+        assert len(bd.sentencias) == 1
+        ids += [s["id_servicio_contratado"] for s in pagina["servicios"]]
+        cursor = pagina["next_cursor"]
+
+    # El finalizado sin fecha_finalizacion se ordena por su fecha de contacto
+    assert ids == list(range(100, 120)) + [200]
+
+
+def test_lista_desconocida(bd):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(status_servicio.listar_pagina_dashboard(
+            1, "cancelados", cursor=None, limite=5, current_user=PRO, db=SesionAsync(bd)))
+    assert error.value.status_code == 404
+
+
+def test_dashboard_solo_para_el_propio_proveedor(bd):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(status_servicio.obtener_dashboard_proveedor(
+            1, limite=5, dias=30, current_user=CLIENTE, db=SesionAsync(bd)))
+    assert error.value.status_code == 403
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(status_servicio.listar_pagina_dashboard(
+            1, "finalizados", cursor=None, limite=5, current_user=CLIENTE, db=SesionAsync(bd)))
+    assert error.value.status_code == 403
+
+
+def test_conteos_publicos(bd):
+    bd.sentencias.clear()
+    conteos = asyncio.run(status_servicio.contar_servicios_proveedor(1, db=SesionAsync(bd)))
+
+    assert conteos == {"activos": 7, "finalizados": 21}
+    assert len(bd.sentencias) == 1
@@ -0,0 +1,20 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import liberar_conexion
+
+
+def test_liberar_conexion_devuelve_la_conexion_al_pool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    db = sessionmaker(bind=engine, autoflush=False)()
+    db.execute(text("CREATE TABLE foto (key TEXT)"))
+    db.execute(text("INSERT INTO foto VALUES ('a.jpg')"))
+    assert engine.pool.checkedout() == 1
+
+    liberar_conexion(db)
+    assert engine.pool.checkedout() == 0
+
+    # Lo confirmado persiste y la sesión sigue siendo utilizable
+    assert db.execute(text("SELECT key FROM foto")).scalar() == "a.jpg"
+    db.close()
+    engine.dispose()
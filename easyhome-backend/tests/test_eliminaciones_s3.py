@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models.eliminacion_s3_pendiente import Eliminacion_S3_Pendiente
+from app.services import eliminaciones_service
+
+
+class SesionFalsa:
+    """Devuelve la tanda tomada al primer UPDATE y registra el SQL (PostgreSQL) ejecutado."""
+
+    def __init__(self, tomadas):
+        self.tomadas = tomadas
+        self.pasos = []
+
+    def execute(self, stmt):
+        compilada = stmt.compile(dialect=postgresql.dialect())
+        self.pasos.append((str(compilada), compilada.params))
+        if len(self.pasos) == 1:
+            return SimpleNamespace(all=lambda: self.tomadas)
+        return SimpleNamespace()
+
+    def commit(self):
+        self.pasos.append(("COMMIT", None))
+
+    def rollback(self):
+        self.pasos.append(("ROLLBACK", None))
+
+    def close(self):
+        pass
+
+
+def _drenar(monkeypatch, tomadas, errores):
+    sesion = SesionFalsa(tomadas)
+    llamadas = []
+
+    def delete_objects(keys):
+        keys = list(keys)
+        # La tanda ya está confirmada: S3 no se llama con la conexión tomada
+        assert sesion.pasos[-1][0] == "COMMIT"
+        llamadas.append(keys)
+        return {key: errores[key] for key in keys if key in errores}
+
+    monkeypatch.setattr(eliminaciones_service, "SessionLocal", lambda: sesion)
+    monkeypatch.setattr(eliminaciones_service.s3_service, "delete_objects", delete_objects)
+    return eliminaciones_service.drenar_pendientes(), sesion, llamadas
+
+
+def test_toma_la_tanda_con_skip_locked(monkeypatch):
+    tomadas, sesion, llamadas = _drenar(monkeypatch, [(1, "a.jpg"), (2, "b.jpg")], {})
+
+    assert tomadas == 2 and llamadas == [["a.jpg", "b.jpg"]]
+    sql, params = sesion.pasos[0]
+    assert sql.startswith("UPDATE eliminacion_s3_pendiente SET proximo_intento=(now() + ")
+    assert "FOR UPDATE SKIP LOCKED" in sql and "RETURNING" in sql
+    assert params["param_1"] == eliminaciones_service.DELETE_BATCH_SIZE
+
+
+def test_borra_las_eliminadas_y_reprograma_las_fallidas_en_una_sentencia(monkeypatch):
+    tomadas = [(i, f"k/{i}.jpg") for i in range(1, 6)]
+    errores = {"k/2.jpg": "AccessDenied", "k/4.jpg": "x" * 2000}
+    total, sesion, _ = _drenar(monkeypatch, tomadas, errores)
+
+    assert total == 5
+    (borrado, params_borrado), (reprogramacion, params_reprogramacion) = [
+        paso for paso in sesion.pasos[2:] if paso[0] != "COMMIT"
+    ]
+    assert borrado.startswith("DELETE FROM eliminacion_s3_pendiente")
+    assert params_borrado["id_eliminacion_1"] == [1, 3, 5]
+
+    assert reprogramacion.startswith("UPDATE eliminacion_s3_pendiente SET intentos=")
+    assert "FROM (VALUES" in reprogramacion
+    assert "least(" in reprogramacion and "power(" in reprogramacion
+    assert "ultimo_error=fallidas.ultimo_error" in reprogramacion
+    assert [params_reprogramacion[f"param_{i}"] for i in range(1, 5)] == [2, "AccessDenied", 4, "x" * 1000]
+    assert sesion.pasos[-1] == ("COMMIT", None)
+
+
+def test_sin_vencidas_no_llama_a_s3(monkeypatch):
+    tomadas, sesion, llamadas = _drenar(monkeypatch, [], {})
+
+    assert tomadas == 0 and llamadas == []
+    assert len(sesion.pasos) == 2
+
+
+def test_error_de_la_bd_hace_rollback(monkeypatch):
+    sesion = SesionFalsa([(1, "a.jpg")])
+    monkeypatch.setattr(eliminaciones_service, "SessionLocal", lambda: sesion)
+
+    def delete_objects(keys):
+        raise RuntimeError("sin red")
+
+    monkeypatch.setattr(eliminaciones_service.s3_service, "delete_objects", delete_objects)
+
+    with pytest.raises(RuntimeError):
+        eliminaciones_service.drenar_pendientes()
+    assert sesion.pasos[-1] == ("ROLLBACK", None)
+
+
+def test_encolar_no_duplica_ni_hace_commit(crear_bd):
+    sesion = crear_bd(Eliminacion_S3_Pendiente)
+    assert eliminaciones_service.encolar_eliminaciones(sesion, []) == 0
+    assert eliminaciones_service.encolar_eliminaciones(sesion, [None, ""]) == 0
+    assert sesion.sentencias == []
+
+    assert eliminaciones_service.encolar_eliminaciones(sesion, ["a.jpg", "b.jpg", "a.jpg", None]) == 2
+    assert sesion.in_transaction()
+    sesion.rollback()
+    # Sin commit propio: se descarta junto con la transacción del llamador
+    assert sesion.scalars(select(Eliminacion_S3_Pendiente.s3_key)).all() == []
+
+    eliminaciones_service.encolar_eliminaciones(sesion, ["a.jpg", "b.jpg"])
+    sesion.commit()
+    assert sorted(sesion.scalars(select(Eliminacion_S3_Pendiente.s3_key)).all()) == ["a.jpg", "b.jpg"]
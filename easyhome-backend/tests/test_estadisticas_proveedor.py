@@ -0,0 +1,127 @@
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.deps import Principal
+from app.api.v1.endpoints import resenas
+from app.models.estadistica_proveedor import Estadistica_Proveedor
+from app.models.reseña_servicio import Reseña_Servicio
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import estadisticas_service
+
+ADMIN = Principal(id_usuario=99, correo_electronico="admin@example.com", tipo_usuario="administrador", sub="s")
+
+
+@pytest.fixture
+def engine(crear_bd, monkeypatch):
+    # Archivo (no memoria) para poder abrir dos sesiones concurrentes
+    sesion = crear_bd(Usuario, Proveedor_Servicio, Reseña_Servicio, Estadistica_Proveedor, archivo=True)
+    # Las tarjetas del catálogo tienen sus propias pruebas
+    monkeypatch.setattr(estadisticas_service.catalogo_service, "actualizar_calificacion", lambda db, id_proveedor=None: None)
+
+    sesion.add_all([
+        Usuario(id_usuario=1, nombre="Pro", correo_electronico="pro@example.com", contraseña=""),
+        Proveedor_Servicio(id_proveedor=1, nombre_completo="Pro", curp="CURP00000000000001", años_experiencia=5),
+    ])
+    sesion.commit()
+    return sesion.get_bind()
+
+
+def _resena(id_reseña, general, puntualidad=5, estado="activa"):
+    return Reseña_Servicio(
+        id_reseña=id_reseña, id_servicio_contratado=id_reseña, id_cliente=1, id_proveedor=1,
+        calificacion_general=general, calificacion_puntualidad=puntualidad,
+        calificacion_calidad_servicio=general, calificacion_calidad_precio=general,
+        recomendacion="Sí", estado=estado,
+    )
+
+
+def _crear(engine, *reseñas):
+    with Session(engine) as sesion:
+        for reseña in reseñas:
+            sesion.add(reseña)
+            estadisticas_service.aplicar_resena(sesion, reseña)
+        sesion.commit()
+
+
+def _agregado(engine):
+    with Session(engine) as sesion:
+        estadistica = sesion.get(Estadistica_Proveedor, 1)
+        promedio = sesion.get(Proveedor_Servicio, 1).calificacion_promedio
+        return (estadistica.total_reseñas, estadistica.suma_general, estadistica.calificacion_promedio,
+                estadistica.promedio_puntualidad, promedio)
+
+
+def _cambiar_estado(engine, id_reseña, estado):
+    with Session(engine) as sesion:
+        return resenas.actualizar_estado_resena(id_reseña, estado=estado, db=sesion, current_user=ADMIN)
+
+
+def test_crear_desactivar_y_reactivar(engine):
+    _crear(engine, _resena(1, 5), _resena(2, 2, puntualidad=3))
+    assert _agregado(engine) == (2, 7, Decimal("3.50"), Decimal("4.00"), Decimal("3.50"))
+
+    _cambiar_estado(engine, 2, "inactiva")
+    assert _agregado(engine) == (1, 5, Decimal("5.00"), Decimal("5.00"), Decimal("5.00"))
+    # Repetir el mismo estado no vuelve a restar
+    assert _cambiar_estado(engine, 2, "inactiva")["message"] == "La reseña ya tiene ese estado."
+    assert _agregado(engine)[0] == 1
+
+    _cambiar_estado(engine, 2, "activa")
+    assert _agregado(engine) == (2, 7, Decimal("3.50"), Decimal("4.00"), Decimal("3.50"))
+
+    _cambiar_estado(engine, 1, "inactiva")
+    _cambiar_estado(engine, 2, "inactiva")
+    assert _agregado(engine) == (0, 0, None, None, None)
+
+
+def test_cambios_concurrentes_ajustan_el_agregado_una_vez(engine):
+    _crear(engine, _resena(1, 5), _resena(2, 2))
+    respuestas = []
+    disparada = []
+
+    def otra_peticion(conn, cursor, sql, parametros, contexto, executemany):
+        # La otra petición leyó el mismo estado y confirma justo antes de este UPDATE
+        if sql.startswith("UPDATE") and "reseña_servicio" in sql and not disparada:
+            disparada.append(True)
+            respuestas.append(_cambiar_estado(engine, 2, "inactiva"))
+
+    event.listen(engine, "before_cursor_execute", otra_peticion)
+    with pytest.raises(HTTPException) as error:
+        _cambiar_estado(engine, 2, "inactiva")
+    event.remove(engine, "before_cursor_execute", otra_peticion)
+
+    assert error.value.status_code == 409
+    assert respuestas[0]["message"] == "Estado de la reseña actualizado."
+    assert _agregado(engine) == (1, 5, Decimal("5.00"), Decimal("5.00"), Decimal("5.00"))
+
+
+def test_estado_invalido_o_resena_inexistente(engine):
+    with pytest.raises(HTTPException) as error:
+        _cambiar_estado(engine, 1, "borrada")
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        _cambiar_estado(engine, 404, "inactiva")
+    assert error.value.status_code == 404
+
+
+def test_recalcular_reconstruye_desde_las_resenas_activas(engine):
+    with Session(engine) as sesion:
+        # Reseñas insertadas sin pasar por el agregado (datos previos a la tabla)
+        sesion.add_all([_resena(1, 4), _resena(2, 3), _resena(3, 1, estado="inactiva")])
+        sesion.commit()
+        assert estadisticas_service.recalcular_estadisticas(sesion) == 1
+        sesion.commit()
+    assert _agregado(engine) == (2, 7, Decimal("3.50"), Decimal("5.00"), Decimal("3.50"))
+
+    # Un agregado desviado se corrige al recalcular solo ese proveedor
+    with Session(engine) as sesion:
+        sesion.get(Estadistica_Proveedor, 1).total_reseñas = 40
+        sesion.commit()
+        estadisticas_service.recalcular_estadisticas(sesion, id_proveedor=1)
+        sesion.commit()
+    assert _agregado(engine)[0] == 2
@@ -0,0 +1,57 @@
+import pytest
+
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import identidad_service
+
+
+@pytest.fixture
+def db(crear_bd):
+    sesion = crear_bd(Usuario, Proveedor_Servicio)
+    sesion.add_all([
+        Usuario(id_usuario=1, nombre="Ana", correo_electronico="ana@example.com", contraseña="x"),
+        Usuario(id_usuario=2, nombre="Luis", correo_electronico="luis@example.com", contraseña="x"),
+        Proveedor_Servicio(id_proveedor=1, nombre_completo="Ana Pérez", curp="CURP000000000000A1",
+                           años_experiencia=3, estado_solicitud="pendiente"),
+    ])
+    sesion.commit()
+    identidad_service.limpiar()
+    yield sesion
+    identidad_service.limpiar()
+
+
+def test_usuario_se_consulta_una_vez(db):
+    db.sentencias.clear()
+    for _ in range(3):
+        usuario = identidad_service.usuario_por_correo(db, "ana@example.com")
+    assert usuario.id_usuario == 1 and usuario.nombre == "Ana"
+    assert identidad_service.usuario_por_id(db, 1) is usuario
+    assert len(db.sentencias) == 1
+
+    # Los usuarios inexistentes no se cachean
+    assert identidad_service.usuario_por_correo(db, "nadie@example.com") is None
+    assert identidad_service.usuario_por_correo(db, "nadie@example.com") is None
+    assert len(db.sentencias) == 3
+
+
+def test_proveedor_y_ausencia_de_proveedor_se_cachean(db):
+    db.sentencias.clear()
+    for _ in range(3):
+        assert identidad_service.proveedor_de(db, 1).estado_solicitud == "pendiente"
+        assert identidad_service.proveedor_de(db, 2) is None
+    assert len(db.sentencias) == 2
+
+
+def test_invalidacion_tras_modificar_filas(db):
+    identidad_service.usuario_por_correo(db, "ana@example.com")
+    identidad_service.proveedor_de(db, 1)
+
+    db.get(Usuario, 1).foto_perfil = "perfiles/1/foto.jpg"
+    db.get(Proveedor_Servicio, 1).estado_solicitud = "aprobado"
+    db.commit()
+    # Sin invalidar se sigue sirviendo la copia
+    assert identidad_service.usuario_por_id(db, 1).foto_perfil is None
+
+    identidad_service.invalidar_usuario(correo="ana@example.com")
+    identidad_service.invalidar_proveedor(1)
+    assert identidad_service.usuario_por_id(db, 1).foto_perfil == "perfiles/1/foto.jpg"
+    assert identidad_service.proveedor_de(db, 1).estado_solicitud == "aprobado"
@@ -0,0 +1,135 @@
+import io
+
+import pytest
+
+from app.services import imagenes_service
+from app.services.imagenes_service import clave_vista, key_variante
+
+
+def test_key_variante_es_hermana_y_determinista():
+    assert key_variante("publicaciones/15/abc.jpg", "thumb") == "publicaciones/15/abc__thumb.webp"
+    assert key_variante("publicaciones/15/abc.jpg", "medium") == "publicaciones/15/abc__medium.webp"
+    assert key_variante("profile-images/3_foto", "thumb") == "profile-images/3_foto__thumb.webp"
+
+
+def test_clave_vista_usa_el_original_mientras_no_hay_variantes():
+    listas = {"a/lista.jpg"}
+
+    assert clave_vista("a/lista.jpg", "medium", listas) == "a/lista__medium.webp"
+    assert clave_vista("a/pendiente.jpg", "medium", listas) == "a/pendiente.jpg"
+    assert clave_vista(None, "thumb", listas) is None
+
+
+def test_sin_pillow_no_se_encola_nada(monkeypatch):
+    monkeypatch.setattr(imagenes_service, "Image", None)
+    assert imagenes_service.encolar_variantes(["a/b.jpg"]) == 0
+
+
+def test_variantes_redimensionadas_en_webp_sin_exif():
+    Image = pytest.importorskip("PIL.Image")
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientación: rotada 90°
+    exif[0x010F] = "Camara"
+    original = io.BytesIO()
+    Image.new("RGB", (3000, 2000), "red").save(original, format="JPEG", exif=exif)
+
+    variantes = imagenes_service.generar_variantes(original.getvalue())
+
+    assert set(variantes) == set(imagenes_service.VARIANTES)
+    for nombre, datos in variantes.items():
+        with Image.open(io.BytesIO(datos)) as variante:
+            assert variante.format == "WEBP"
+            # Orientación aplicada (vertical) y lado mayor acotado
+            ancho, alto = variante.size
+            assert alto == imagenes_service.VARIANTES[nombre] and ancho < alto
+            assert not variante.getexif()
+        assert len(datos) < len(original.getvalue())
+
+
+def test_imagen_pequeña_no_se_amplia():
+    Image = pytest.importorskip("PIL.Image")
+
+    original = io.BytesIO()
+    Image.new("RGBA", (100, 50), (0, 0, 255, 128)).save(original, format="PNG")
+
+    variantes = imagenes_service.generar_variantes(original.getvalue())
+
+    with Image.open(io.BytesIO(variantes["medium"])) as variante:
+        assert variante.size == (100, 50)
+        assert variante.mode == "RGBA"
+
+
+@pytest.fixture
+def bd(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    import app.models  # noqa: F401  (registra todos los modelos)
+    from app.models.eliminacion_s3_pendiente import Eliminacion_S3_Pendiente
+    from app.models.foto_trabajo import Foto_Trabajo_Anterior
+    from app.models.imagen_reseña import Imagen_Reseña
+    from app.models.imagen_variante import Imagen_Variante
+    from app.models.property import Publicacion_Servicio, Imagen_Publicacion
+    from app.models.user import Usuario, Proveedor_Servicio
+
+    engine = create_engine("sqlite://")
+    for modelo in (Usuario, Proveedor_Servicio, Publicacion_Servicio, Imagen_Publicacion, Foto_Trabajo_Anterior,
+                   Imagen_Reseña, Imagen_Variante, Eliminacion_S3_Pendiente):
+        modelo.__table__.create(engine)
+    Sesion = sessionmaker(engine)
+
+    subidas = []
+    monkeypatch.setattr(imagenes_service, "SessionLocal", Sesion)
+    monkeypatch.setattr(imagenes_service.s3_service, "download_file", lambda key: b"original")
+    monkeypatch.setattr(imagenes_service, "generar_variantes",
+                        lambda contenido: {nombre: b"webp" for nombre in imagenes_service.VARIANTES})
+    monkeypatch.setattr(imagenes_service.s3_service, "upload_file",
+                        lambda archivo, key, content_type=None: subidas.append(key) or key)
+
+    with Sesion() as sesion:
+        sesion.add_all([
+            Usuario(id_usuario=1, nombre="Ana", correo_electronico="a@example.com", contraseña="",
+                    foto_perfil="profile-images/1_a.jpg"),
+            Imagen_Publicacion(id_imagen=1, id_publicacion=5, url_imagen="publicaciones/5/b.jpg", orden=1),
+            # b.jpg se reemplazó: su eliminación está pendiente
+            Eliminacion_S3_Pendiente(s3_key="publicaciones/5/b.jpg"),
+        ])
+        sesion.commit()
+
+    def estado():
+        with Sesion() as sesion:
+            from sqlalchemy import select
+            return (set(sesion.scalars(select(Imagen_Variante.s3_key))),
+                    set(sesion.scalars(select(Eliminacion_S3_Pendiente.s3_key))))
+
+    return subidas, estado
+
+
+def test_registra_las_variantes_de_un_original_vigente(bd):
+    subidas, estado = bd
+
+    assert imagenes_service.procesar_imagen("profile-images/1_a.jpg")
+    # Reprocesar es idempotente
+    assert imagenes_service.procesar_imagen("profile-images/1_a.jpg")
+
+    registradas, pendientes = estado()
+    assert registradas == {"profile-images/1_a.jpg"}
+    assert pendientes == {"publicaciones/5/b.jpg"}
+    assert "profile-images/1_a__thumb.webp" in subidas
+
+
+@pytest.mark.parametrize("key", [
+    "publicaciones/5/b.jpg",      # eliminación pendiente
+    "resenas/9/borrada.jpg",      # ninguna fila la referencia
+])
+def test_original_eliminado_durante_el_proceso_descarta_las_variantes(bd, key):
+    subidas, estado = bd
+
+    assert not imagenes_service.procesar_imagen(key)
+
+    registradas, pendientes = estado()
+    assert registradas == set()
+    variantes = {key_variante(key, nombre) for nombre in imagenes_service.VARIANTES}
+    assert set(subidas) == variantes
+    assert variantes <= pendientes
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from fastapi.routing import APIRoute
+
+from app.api.v1.endpoints import (
+    alerta_finalizacion, perfil_proveedor, publicacion, resenas, status_servicio,
+)
+from app.core.database import get_db, get_async_db
+
+
+def _dependencias(ruta: APIRoute) -> set:
+    return {dependencia.call for dependencia in ruta.dependant.dependencies}
+
+
+def _rutas(*routers, metodo: str):
+    return [
+        ruta
+        for router in routers
+        for ruta in router.routes
+        if isinstance(ruta, APIRoute) and metodo in ruta.methods
+    ]
+
+
+# GET que no consultan la base de datos (solo el canal push)
+SIN_BASE_DE_DATOS = {"stream_alertas"}
+
+
+@pytest.mark.parametrize(
+    "ruta",
+    _rutas(
+        publicacion.router, perfil_proveedor.router, resenas.router,
+        alerta_finalizacion.router, status_servicio.router, metodo="GET",
+    ),
+    ids=lambda ruta: ruta.name,
+)
+def test_lecturas_usan_la_sesion_async(ruta):
+    assert asyncio.iscoroutinefunction(ruta.endpoint)
+    assert get_db not in _dependencias(ruta)
+    if ruta.name in SIN_BASE_DE_DATOS:
+        assert get_async_db not in _dependencias(ruta)
+    else:
+        assert get_async_db in _dependencias(ruta)
+
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.loop_monitor import MonitorEventLoop, MonitorEventLoopMiddleware, SIN_RUTA
+
+
+class _Ruta:
+    path = "/api/v1/proveedores/{id_proveedor}/resenas"
+
+
+def consulta_bloqueante():
+    time.sleep(0.25)
+
+
+async def _app_bloqueante(scope, receive, send):
+    scope["route"] = _Ruta()
+    consulta_bloqueante()
+
+
+async def _app_que_cede(scope, receive, send):
+    await asyncio.sleep(0.25)
+
+
+def _ejecutar(app):
+    monitor = MonitorEventLoop(umbral=0.1)
+    middleware = MonitorEventLoopMiddleware(app, monitor)
+
+    async def principal():
+        monitor.iniciar()
+        await asyncio.sleep(0.05)
+        await middleware({"type": "http", "method": "GET", "path": "/api/v1/proveedores/7/resenas"}, None, None)
+        await asyncio.sleep(0.1)
+        await monitor.detener()
+
+    asyncio.run(principal())
+    return monitor.stats()
+
+
+def test_reporta_el_bloqueo_con_la_ruta_y_la_pila():
+    stats = _ejecutar(_app_bloqueante)
+
+    assert stats["bloqueos"] == 1
+    ruta = "GET /api/v1/proveedores/{id_proveedor}/resenas"
+    assert stats["rutas"][ruta]["bloqueos"] == 1
+    assert stats["rutas"][ruta]["max_ms"] >= 200
+    bloqueo = stats["ultimos"][0]
+    assert bloqueo["ruta"] == ruta
+    assert "consulta_bloqueante" in bloqueo["pila"]
+    assert stats["lag_maximo_ms"] >= 200
+
+
+def test_las_esperas_asincronas_no_cuentan_como_bloqueo():
+    stats = _ejecutar(_app_que_cede)
+
+    assert stats["bloqueos"] == 0
+    assert stats["rutas"] == {}
+    assert stats["latidos"] > 0
+
+
+def test_bloqueo_fuera_de_una_peticion():
+    monitor = MonitorEventLoop(umbral=0.1)
+
+    async def principal():
+        monitor.iniciar()
+        await asyncio.sleep(0.05)
+        time.sleep(0.25)
+        await asyncio.sleep(0.1)
+        await monitor.detener()
+
+    asyncio.run(principal())
+
+    (ruta,) = monitor.stats()["rutas"]
+    assert ruta.startswith(SIN_RUTA)
+
+
+def test_umbral_invalido():
+    with pytest.raises(ValueError):
+        MonitorEventLoop(umbral=0)
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from app.core.pagination import encode_cursor, decode_cursor, parse_datetime, parse_int, parse_decimal, parse_float
+
+
+def test_cursor_round_trip():
+    fecha = datetime(2025, 11, 3, 10, 30, 15, 123456)
+    cursor = encode_cursor({"o": "calificacion", "f": fecha, "id": 42, "c": Decimal("4.50")})
+    valores = decode_cursor(cursor)
+    assert parse_datetime(valores["f"]) == fecha
+    assert parse_int(valores["id"]) == 42
+    assert parse_decimal(valores["c"]) == Decimal("4.50")
+    assert valores["o"] == "calificacion"
+
+
+def test_cursor_vacio_es_primera_pagina():
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+def test_cursor_invalido():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("esto-no-es-un-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_cursor_con_tipos_invalidos():
+    valores = decode_cursor(encode_cursor({"f": "ayer", "id": "7"}))
+    with pytest.raises(HTTPException):
+        parse_datetime(valores["f"])
+    with pytest.raises(HTTPException):
+        parse_int(valores["id"])
+
+
+def test_cursor_de_relevancia():
+    valores = decode_cursor(encode_cursor({"o": "relevancia", "r": 0.0607927, "id": 9}))
+    assert parse_float(valores["r"]) == 0.0607927
+    with pytest.raises(HTTPException):
+        parse_float("0.5")
+
+
+class _SinConsultas:
+    """Sesión que falla si el endpoint llega a consultar la BD."""
+
+    async def scalars(self, stmt):
+        raise AssertionError("No debe consultarse la BD con un cursor inválido")
+
+
+@pytest.mark.parametrize("cursor, ordenar_por", [
+    ("esto-no-es-un-cursor", None),
+    # Cursor bien codificado pero con valores que no son fecha/entero
+    (encode_cursor({"o": "fecha", "f": "ayer", "id": "7"}), None),
+    (encode_cursor({"o": "calificacion", "f": "2025-11-03T10:30:15", "id": 7, "c": "mucho"}), "mejor_calificados"),
+    # Cursor de otro ordenamiento
+    (encode_cursor({"o": "fecha", "f": "2025-11-03T10:30:15", "id": 7}), "mejor_calificados"),
+])
+def test_listar_publicaciones_con_cursor_invalido_responde_400(cursor, ordenar_por):
+    from app.api.v1.endpoints.publicacion import listar_publicaciones
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(listar_publicaciones(
+            db=_SinConsultas(), categorias=None, suscriptores=False,
+            ordenar_por=ordenar_por, cursor=cursor, limite=20,
+        ))
+    assert exc.value.status_code == 400
@@ -0,0 +1,172 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.models.alerta_sistema import Alerta_Sistema
+from app.services import particiones_alertas_service as particiones
+from app.services.particiones_alertas_service import Particion
+
+HOY = date(2026, 10, 18)
+
+
+class ConexionFalsa:
+    """Responde al catálogo de particiones y registra el DDL ejecutado."""
+
+    def __init__(self, limites, default=None, meses_en_default=()):
+        # (nombre, pg_get_expr(relpartbound), inhdetachpending)
+        self.limites = limites
+        self.default = default
+        # Meses (YYYY-MM-01) con alertas guardadas en la partición DEFAULT
+        self.meses_en_default = set(meses_en_default)
+        self.sentencias = []
+
+    def execute(self, stmt, parametros=None):
+        sql = str(stmt)
+        if "pg_inherits" in sql and "'DEFAULT'" in sql:
+            return SimpleNamespace(scalar=lambda: self.default)
+        if "pg_inherits" in sql:
+            return SimpleNamespace(all=lambda: self.limites)
+        if sql.startswith("SELECT EXISTS"):
+            return SimpleNamespace(scalar=lambda: any(f">= '{mes}'" in sql for mes in self.meses_en_default))
+        self.sentencias.append(sql)
+        return SimpleNamespace(rowcount=1)
+
+    def execution_options(self, **kw):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _limites(mes):
+    siguiente = particiones.sumar_meses(mes, 1)
+    return (particiones.nombre_particion(mes),
+            f"FOR VALUES FROM ('{mes} 00:00:00') TO ('{siguiente} 00:00:00')", False)
+
+
+def test_meses_y_nombres():
+    assert particiones.sumar_meses(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert particiones.sumar_meses(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert particiones.nombre_particion(date(2026, 3, 1)) == "alerta_sistema_p2026_03"
+    assert particiones.ddl_particion(date(2026, 12, 15), padre="alerta_sistema_nueva") == (
+        "CREATE TABLE IF NOT EXISTS alerta_sistema_p2026_12 PARTITION OF alerta_sistema_nueva "
+        "FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')"
+    )
+
+
+def test_crea_solo_las_particiones_que_faltan():
+    conexion = ConexionFalsa([_limites(date(2026, 9, 1)), _limites(date(2026, 10, 1)),
+                              ("alerta_sistema_default", "DEFAULT", False)], default="alerta_sistema_default")
+
+    creadas = particiones.crear_particiones(conexion, date(2026, 9, 1), meses_adelante=2, hoy=HOY)
+
+    assert creadas == ["alerta_sistema_p2026_11", "alerta_sistema_p2026_12"]
+    assert len(conexion.sentencias) == 2
+
+
+def test_crea_la_particion_default_si_falta():
+    conexion = ConexionFalsa([_limites(date(2026, 10, 1))])
+
+    creadas = particiones.crear_particiones(conexion, date(2026, 10, 1), meses_adelante=0, hoy=HOY)
+
+    assert creadas == ["alerta_sistema_default"]
+    assert conexion.sentencias == [
+        "CREATE TABLE IF NOT EXISTS alerta_sistema_default PARTITION OF alerta_sistema DEFAULT",
+    ]
+
+
+def test_mueve_las_alertas_de_la_default_a_su_particion():
+    # La API estuvo caída: las alertas de noviembre cayeron en la DEFAULT
+    conexion = ConexionFalsa([_limites(date(2026, 10, 1))], default="alerta_sistema_default",
+                             meses_en_default={"2026-11-01"})
+
+    creadas = particiones.crear_particiones(conexion, date(2026, 11, 1), meses_adelante=2, hoy=HOY)
+
+    assert creadas == ["alerta_sistema_p2026_11", "alerta_sistema_p2026_12"]
+    rango = "fecha_envio >= '2026-11-01' AND fecha_envio < '2026-12-01'"
+    assert conexion.sentencias == [
+        "LOCK TABLE alerta_sistema_default IN ACCESS EXCLUSIVE MODE",
+        "CREATE TEMP TABLE alerta_sistema_p2026_11_movidas ON COMMIT DROP AS "
+        f"SELECT * FROM alerta_sistema_default WHERE {rango}",
+        f"DELETE FROM alerta_sistema_default WHERE {rango}",
+        particiones.ddl_particion(date(2026, 11, 1)),
+        "INSERT INTO alerta_sistema SELECT * FROM alerta_sistema_p2026_11_movidas",
+        # Diciembre no tenía alertas en la DEFAULT: solo se crea
+        particiones.ddl_particion(date(2026, 12, 1)),
+    ]
+
+
+def test_vencidas_conserva_el_mes_actual_y_la_retencion():
+    todas = [Particion(particiones.nombre_particion(mes), mes, particiones.sumar_meses(mes, 1))
+             for mes in (date(2025, 8, 1), date(2025, 9, 1), date(2025, 10, 1), date(2026, 10, 1))]
+
+    assert [p.nombre for p in particiones.vencidas(todas, 12, hoy=HOY)] == [
+        "alerta_sistema_p2025_08", "alerta_sistema_p2025_09",
+    ]
+    with pytest.raises(ValueError):
+        particiones.vencidas(todas, 0, hoy=HOY)
+
+
+def test_retencion_con_default_usa_detach_con_lock_timeout():
+    conexion = ConexionFalsa([_limites(date(2025, 1, 1)), _limites(date(2026, 10, 1))],
+                             default="alerta_sistema_default")
+    engine = SimpleNamespace(connect=lambda: conexion)
+
+    assert particiones.aplicar_retencion(engine, 12, archivar=False, hoy=HOY) == ["alerta_sistema_p2025_01"]
+    assert conexion.sentencias == [
+        "SET lock_timeout = '5s'",
+        "ALTER TABLE alerta_sistema DETACH PARTITION alerta_sistema_p2025_01",
+        "DROP TABLE alerta_sistema_p2025_01",
+        "RESET lock_timeout",
+    ]
+
+
+@pytest.mark.parametrize("archivar", [False, True])
+def test_retencion_separa_sin_bloquear(archivar):
+    viejo = _limites(date(2025, 1, 1))
+    pendiente = (*_limites(date(2025, 2, 1))[:2], True)
+    conexion = ConexionFalsa([viejo, pendiente, _limites(date(2026, 10, 1))])
+    engine = SimpleNamespace(connect=lambda: conexion)
+
+    retiradas = particiones.aplicar_retencion(engine, 12, archivar=archivar, hoy=HOY)
+
+    assert retiradas == ["alerta_sistema_p2025_01", "alerta_sistema_p2025_02"]
+    sentencias = conexion.sentencias
+    assert "DETACH PARTITION alerta_sistema_p2025_01 CONCURRENTLY" in " ".join(sentencias)
+    # Un DETACH CONCURRENTLY interrumpido se termina con FINALIZE
+    assert "DETACH PARTITION alerta_sistema_p2025_02 FINALIZE" in " ".join(sentencias)
+    if archivar:
+        assert "ALTER TABLE alerta_sistema_p2025_01 SET SCHEMA archivo" in sentencias
+        assert not any(sql.startswith("DROP") for sql in sentencias)
+    else:
+        assert "DROP TABLE alerta_sistema_p2025_01" in sentencias
+
+
+def test_simular_no_ejecuta_ddl():
+    conexion = ConexionFalsa([_limites(date(2025, 1, 1))])
+    engine = SimpleNamespace(connect=lambda: conexion)
+
+    assert particiones.aplicar_retencion(engine, 12, archivar=False, hoy=HOY, simular=True) == [
+        "alerta_sistema_p2025_01",
+    ]
+    assert conexion.sentencias == []
+
+
+def test_tabla_particionada_por_fecha_envio():
+    tabla = Alerta_Sistema.__table__
+    ddl = str(CreateTable(tabla).compile(dialect=postgresql.dialect()))
+    assert "PARTITION BY RANGE (fecha_envio)" in ddl
+    assert "PRIMARY KEY (id_alerta, fecha_envio)" in ddl
+
+    indices = {indice.name: str(CreateIndex(indice).compile(dialect=postgresql.dialect()))
+               for indice in tabla.indexes}
+    assert "(id_usuario, fecha_envio DESC, id_alerta DESC)" in indices["idx_alerta_usuario_fecha_id"]
+    # El ORM sigue identificando la alerta solo por id_alerta
+    assert [columna.name for columna in Alerta_Sistema.__mapper__.primary_key] == ["id_alerta"]
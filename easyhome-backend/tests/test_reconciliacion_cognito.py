@@ -0,0 +1,246 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import reconciliacion_service
+from app.services.reconciliacion_service import ReconciliadorCognito, cargar_checkpoint
+
+
+class CognitoLocal:
+    """User Pool en memoria con la paginación de list_users / list_users_in_group."""
+
+    def __init__(self, usuarios, tam_pagina=2, demora=0.0):
+        self.usuarios = usuarios  # username -> {"attrs": {...}, "grupos": [...]}
+        self.tam_pagina = tam_pagina
+        self.demora = demora
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.fallar_en_pagina = None
+        self._lock = threading.Lock()
+
+    def _paginar(self, elementos, token):
+        inicio = int(token or 0)
+        fin = inicio + self.tam_pagina
+        return elementos[inicio:fin], (str(fin) if fin < len(elementos) else None)
+
+    def list_users(self, UserPoolId, Limit, PaginationToken=None):
+        if self.fallar_en_pagina is not None and int(PaginationToken or 0) // self.tam_pagina == self.fallar_en_pagina:
+            raise RuntimeError("throttling")
+        usernames, token = self._paginar(sorted(self.usuarios), PaginationToken)
+        respuesta = {"Users": [
+            {"Username": u, "Enabled": True,
+             "Attributes": [{"Name": k, "Value": v} for k, v in self.usuarios[u]["attrs"].items()]}
+            for u in usernames
+        ]}
+        if token:
+            respuesta["PaginationToken"] = token
+        return respuesta
+
+    def list_users_in_group(self, UserPoolId, GroupName, Limit, NextToken=None):
+        miembros = sorted(u for u, datos in self.usuarios.items() if GroupName in datos["grupos"])
+        usernames, token = self._paginar(miembros, NextToken)
+        respuesta = {"Users": [{"Username": u} for u in usernames]}
+        if token:
+            respuesta["NextToken"] = token
+        return respuesta
+
+    def admin_add_user_to_group(self, UserPoolId, Username, GroupName):
+        with self._lock:
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        time.sleep(self.demora)
+        with self._lock:
+            self.en_curso -= 1
+            self.usuarios[Username]["grupos"].append(GroupName)
+
+
+def _usuario(correo, nombre, grupos, telefono=None):
+    attrs = {"email": correo, "sub": f"sub-{correo}", "name": nombre}
+    if telefono:
+        attrs["phone_number"] = telefono
+    return {"attrs": attrs, "grupos": list(grupos)}
+
+
+@pytest.fixture
+def sesiones(monkeypatch):
+    engine = create_engine("sqlite://")
+    Usuario.__table__.create(engine)
+    # El registro auto-aprobado (como en el login) no trae CURP ni experiencia
+    for columna in ("curp", "años_experiencia"):
+        monkeypatch.setattr(Proveedor_Servicio.__table__.c[columna], "nullable", True)
+    Proveedor_Servicio.__table__.create(engine)
+    fabrica = sessionmaker(bind=engine)
+    with fabrica() as db:
+        db.add_all([
+            Usuario(nombre="Ana Vieja", correo_electronico="ana@example.com", contraseña="", tipo_usuario="cliente"),
+            Usuario(nombre="Beto", correo_electronico="beto@example.com", contraseña="", tipo_usuario="cliente",
+                    numero_telefono="+520000000000"),
+        ])
+        db.commit()
+    refrescos = []
+    monkeypatch.setattr(reconciliacion_service.catalogo_service, "refrescar_tarjetas",
+                        lambda db, ids_proveedor: refrescos.append(ids_proveedor))
+    principales = []
+    monkeypatch.setattr(reconciliacion_service, "invalidar_principal", principales.append)
+    fabrica.refrescos = refrescos
+    fabrica.principales = principales
+    return fabrica
+
+
+def _pool():
+    return CognitoLocal({
+        "ana": _usuario("ana@example.com", "Ana Pérez", ["Trabajadores"]),
+        "beto": _usuario("beto@example.com", "Beto", ["Clientes"]),
+        "caro": _usuario("caro@example.com", "Caro", []),
+        "dani": _usuario("dani@example.com", "Dani", [], telefono="+521111111111"),
+        "eva": _usuario("eva@example.com", "Eva", ["Admin", "Clientes"]),
+    })
+
+
+def _tabla(fabrica):
+    with fabrica() as db:
+        return {
+            u.correo_electronico: (u.nombre, u.numero_telefono, u.tipo_usuario)
+            for u in db.scalars(select(Usuario))
+        }
+
+
+def test_reconcilia_usuarios_y_grupos(sesiones, tmp_path):
+    cognito = _pool()
+    progreso = ReconciliadorCognito(cognito, "pool", sesiones, checkpoint=str(tmp_path / "cp.json")).ejecutar()
+
+    assert progreso.terminado and progreso.paginas == 3 and progreso.procesados == 5
+    assert (progreso.creados, progreso.actualizados, progreso.grupos_corregidos) == (3, 1, 2)
+    assert _tabla(sesiones) == {
+        "ana@example.com": ("Ana Pérez", None, "proveedor"),
+        "beto@example.com": ("Beto", "+520000000000", "cliente"),
+        "caro@example.com": ("Caro", None, "cliente"),
+        "dani@example.com": ("Dani", "+521111111111", "cliente"),
+        "eva@example.com": ("Eva", None, "administrador"),
+    }
+    assert cognito.usuarios["caro"]["grupos"] == ["Clientes"]
+    # Solo Ana cambió de nombre: solo sus tarjetas se refrescan
+    assert len(sesiones.refrescos) == 1
+    # Ana pasó a proveedor: registro auto-aprobado y su Principal cacheado se descarta
+    with sesiones() as db:
+        proveedores = {
+            (p.usuario.correo_electronico, p.nombre_completo, p.estado_solicitud)
+            for p in db.scalars(select(Proveedor_Servicio))
+        }
+    assert proveedores == {("ana@example.com", "Ana Pérez", "aprobado")}
+    assert sesiones.principales == ["sub-ana@example.com"]
+
+    # Una segunda corrida no encuentra diferencias
+    progreso = ReconciliadorCognito(cognito, "pool", sesiones, checkpoint=str(tmp_path / "cp.json")).ejecutar()
+    assert (progreso.creados, progreso.actualizados, progreso.grupos_corregidos) == (0, 0, 0)
+    assert sesiones.principales == ["sub-ana@example.com"]
+
+
+def test_proveedor_nuevo_se_crea_aprobado_y_se_respeta_el_existente(sesiones):
+    with sesiones() as db:
+        beto = db.scalar(select(Usuario).where(Usuario.correo_electronico == "beto@example.com"))
+        db.add(Proveedor_Servicio(id_proveedor=beto.id_usuario, nombre_completo="Beto",
+                                  estado_solicitud="pendiente"))
+        db.commit()
+    cognito = CognitoLocal({
+        "beto": _usuario("beto@example.com", "Beto", ["Trabajadores"]),
+        "fer": _usuario("fer@example.com", "Fer", ["Trabajadores"]),
+    })
+
+    ReconciliadorCognito(cognito, "pool", sesiones).ejecutar()
+
+    with sesiones() as db:
+        estados = {
+            p.usuario.correo_electronico: p.estado_solicitud
+            for p in db.scalars(select(Proveedor_Servicio))
+        }
+    assert estados == {"beto@example.com": "pendiente", "fer@example.com": "aprobado"}
+    assert _tabla(sesiones)["fer@example.com"][2] == "proveedor"
+
+
+def test_correos_repetidos_en_una_pagina(sesiones):
+    cognito = CognitoLocal({
+        # Federado y nativo con el mismo correo; la BD lo tiene en minúsculas
+        "ana": _usuario("ANA@example.com", "Ana Nativa", ["Clientes"]),
+        "google_ana": _usuario("ana@example.com", "Ana Google", ["Clientes"]),
+        "caro": _usuario("caro@example.com", "Caro", ["Clientes"]),
+        "google_caro": _usuario("Caro@Example.com", "Caro Google", ["Clientes"]),
+    }, tam_pagina=10)
+
+    progreso = ReconciliadorCognito(cognito, "pool", sesiones).ejecutar()
+
+    assert progreso.terminado and progreso.duplicados == 2
+    assert (progreso.creados, progreso.actualizados) == (1, 1)
+    tabla = _tabla(sesiones)
+    # Gana el menor username; Ana se actualiza en su fila existente
+    assert tabla["ana@example.com"] == ("Ana Nativa", None, "cliente")
+    assert tabla["caro@example.com"] == ("Caro", None, "cliente")
+    assert len(tabla) == 3
+
+
+def test_vincula_filas_sin_google_id_solo_con_correo_verificado(sesiones):
+    cognito = CognitoLocal({
+        "ana": _usuario("ana@example.com", "Ana Vieja", ["Clientes"]),
+        "beto": _usuario("beto@example.com", "Beto", ["Clientes"]),
+    })
+    cognito.usuarios["ana"]["attrs"]["email_verified"] = "true"
+    cognito.usuarios["beto"]["attrs"]["email_verified"] = "false"
+
+    progreso = ReconciliadorCognito(cognito, "pool", sesiones).ejecutar()
+
+    assert progreso.actualizados == 1
+    with sesiones() as db:
+        vinculos = dict(db.execute(select(Usuario.correo_electronico, Usuario.google_id)).all())
+    assert vinculos == {"ana@example.com": "sub-ana@example.com", "beto@example.com": None}
+
+
+def test_deduplicar_no_depende_del_orden():
+    usuarios = [
+        reconciliacion_service.UsuarioCognito("google_1", "Luz@example.com", "s1", "Luz", None),
+        reconciliacion_service.UsuarioCognito("luz", "luz@example.com", "s2", "Luz", None),
+    ]
+    for orden in (usuarios, usuarios[::-1]):
+        unicos, descartados = reconciliacion_service.deduplicar(orden)
+        assert [u.username for u in unicos] == ["google_1"]
+        assert [u.username for u in descartados] == ["luz"]
+
+
+def test_simulacion_no_escribe(sesiones):
+    cognito = _pool()
+    progreso = ReconciliadorCognito(cognito, "pool", sesiones, aplicar=False).ejecutar()
+
+    assert (progreso.creados, progreso.actualizados, progreso.grupos_corregidos) == (3, 1, 2)
+    assert len(_tabla(sesiones)) == 2
+    assert cognito.usuarios["caro"]["grupos"] == []
+
+
+def test_reanuda_desde_el_checkpoint(sesiones, tmp_path):
+    cognito = _pool()
+    checkpoint = str(tmp_path / "cp.json")
+    cognito.fallar_en_pagina = 1
+
+    with pytest.raises(RuntimeError):
+        ReconciliadorCognito(cognito, "pool", sesiones, checkpoint=checkpoint).ejecutar()
+    guardado = cargar_checkpoint(checkpoint)
+    assert (guardado.paginas, guardado.procesados, guardado.pagination_token) == (1, 2, "2")
+
+    cognito.fallar_en_pagina = None
+    progreso = ReconciliadorCognito(cognito, "pool", sesiones, checkpoint=checkpoint).ejecutar()
+    assert progreso.terminado and progreso.paginas == 3 and progreso.procesados == 5
+    assert len(_tabla(sesiones)) == 5
+
+
+def test_concurrencia_acotada_en_cognito(sesiones):
+    cognito = CognitoLocal(
+        {f"u{i:02d}": _usuario(f"u{i:02d}@example.com", f"U{i}", []) for i in range(12)},
+        tam_pagina=12,
+        demora=0.05,
+    )
+    progreso = ReconciliadorCognito(cognito, "pool", sesiones, concurrencia=3).ejecutar()
+
+    assert progreso.grupos_corregidos == 12
+    assert 1 < cognito.max_en_curso <= 3
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.endpoints import resenas
+from app.models.property import Publicacion_Servicio
+from app.models.reseña_servicio import Reseña_Servicio
+from app.models.servicio_contratado import Servicio_Contratado
+from app.models.user import Usuario, Proveedor_Servicio
+from conftest import SesionAsync
+
+
+@pytest.fixture
+def bd(crear_bd, urls_firmadas):
+    sesion = crear_bd(Usuario, Proveedor_Servicio, Publicacion_Servicio, Servicio_Contratado, Reseña_Servicio)
+    sesion.add_all([
+        Usuario(id_usuario=1, nombre="Pro", correo_electronico="pro@example.com", contraseña="",
+                foto_perfil="perfiles/1.jpg"),
+        Proveedor_Servicio(id_proveedor=1, nombre_completo="Pro", curp="CURP00000000000001", años_experiencia=5),
+        Publicacion_Servicio(id_publicacion=1, id_proveedor=1, id_categoria=1, titulo="Plomería",
+                             descripcion="-", rango_precio_min=Decimal("1"), rango_precio_max=Decimal("2")),
+    ])
+    sesion.commit()
+    return sesion
+
+
+def _agregar_resenas(sesion, desde, cantidad):
+    for i in range(desde, desde + cantidad):
+        id_cliente = 100 + i
+        sesion.add_all([
+            Usuario(id_usuario=id_cliente, nombre=f"Cliente {i}", correo_electronico=f"c{i}@example.com",
+                    contraseña="", foto_perfil=f"perfiles/{id_cliente}.jpg"),
+            Servicio_Contratado(id_servicio_contratado=i, id_cliente=id_cliente, id_proveedor=1, id_publicacion=1,
+                                estado_servicio="finalizado"),
+            Reseña_Servicio(id_servicio_contratado=i, id_cliente=id_cliente, id_proveedor=1,
+                            calificacion_general=4 + i % 2, calificacion_puntualidad=5,
+                            calificacion_calidad_servicio=5, calificacion_calidad_precio=5,
+                            recomendacion="si", fecha_reseña=datetime(2026, 1, 1) + timedelta(days=i)),
+        ])
+    sesion.commit()
+
+
+def _contar(sesion, endpoint, *args):
+    sesion.sentencias.clear()
+    respuesta = asyncio.run(endpoint(*args, db=SesionAsync(sesion)))
+    return respuesta, len(sesion.sentencias)
+
+
+def test_resenas_del_proveedor_con_consultas_constantes(bd):
+    _agregar_resenas(bd, 1, 2)
+    respuesta, con_dos = _contar(bd, resenas.obtener_resenas_proveedor, 1)
+    assert len(respuesta) == 2
+
+    _agregar_resenas(bd, 3, 10)
+    respuesta, con_doce = _contar(bd, resenas.obtener_resenas_proveedor, 1)
+    assert len(respuesta) == 12
+    assert con_dos == con_doce == 2
+
+    primera = respuesta[0]
+    assert primera["reseña"]["id_reseña"] == 12  # la más reciente
+    assert primera["cliente"] == {
+        "nombre": "Cliente 12",
+        "email": "c12@example.com",
+        "foto_perfil": "https://s3/perfiles/112.jpg",
+        "calificacion_promedio": 4.0,
+    }
+    assert primera["proveedor"] == {
+        "nombre": "Pro", "servicio": "Plomería", "foto_perfil": "https://s3/perfiles/1.jpg",
+    }
+
+
+def test_resenas_del_cliente_con_consultas_constantes(bd):
+    _agregar_resenas(bd, 1, 1)
+    respuesta, con_una = _contar(bd, resenas.obtener_resenas_cliente, "c1@example.com")
+    assert respuesta[0]["proveedor"] == {
+        "nombre": "Pro", "servicio": "Plomería", "foto_perfil": "https://s3/perfiles/1.jpg",
+    }
+
+    # Otro proveedor reseñado por el mismo cliente
+    bd.add_all([
+        Usuario(id_usuario=2, nombre="Pro 2", correo_electronico="pro2@example.com", contraseña=""),
+        Proveedor_Servicio(id_proveedor=2, nombre_completo="Pro 2", curp="CURP00000000000002", años_experiencia=1),
+        Servicio_Contratado(id_servicio_contratado=50, id_cliente=101, id_proveedor=2, estado_servicio="finalizado"),
+        Reseña_Servicio(id_servicio_contratado=50, id_cliente=101, id_proveedor=2, calificacion_general=3,
+                        calificacion_puntualidad=3, calificacion_calidad_servicio=3, calificacion_calidad_precio=3,
+                        recomendacion="no"),
+    ])
+    bd.commit()
+    respuesta, con_dos = _contar(bd, resenas.obtener_resenas_cliente, "c1@example.com")
+    assert len(respuesta) == 2
+    assert con_una == con_dos == 2
+    assert {r["proveedor"]["servicio"] for r in respuesta} == {"Plomería", "Servicio"}
@@ -0,0 +1,61 @@
+from app.core.cache import TTLCache
+from app.services.s3_service import S3Service
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.llamadas = 0
+
+    def generate_presigned_url(self, operacion, Params, ExpiresIn):
+        self.llamadas += 1
+        return f"https://firmada/{Params['Key']}?exp={ExpiresIn}&n={self.llamadas}"
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def crear_servicio(reloj, maxsize=100):
+    servicio = S3Service()
+    servicio.s3_client = FakeS3Client()
+    servicio.presigned_cache = TTLCache(maxsize=maxsize, clock=reloj)
+    return servicio
+
+
+def test_urls_en_lote_deduplica_y_usa_cache():
+    servicio = crear_servicio(Reloj())
+
+    urls = servicio.get_presigned_urls(["a.jpg", "b.jpg", "a.jpg", None, ""])
+    assert set(urls) == {"a.jpg", "b.jpg"}
+    assert servicio.s3_client.llamadas == 2
+
+    # Segunda página con las mismas fotos: no se vuelve a firmar
+    assert servicio.get_presigned_urls(["a.jpg", "b.jpg"]) == urls
+    assert servicio.get_presigned_url("a.jpg") == urls["a.jpg"]
+    assert servicio.s3_client.llamadas == 2
+    assert servicio.cache_stats()["hits"] == 3
+
+
+def test_url_cacheada_no_se_entrega_cerca_de_expirar():
+    reloj = Reloj()
+    servicio = crear_servicio(reloj)
+
+    primera = servicio.get_presigned_url("a.jpg", expiration=3600)
+    reloj.ahora += 3600 - 600  # le quedan 10 minutos de vida
+    segunda = servicio.get_presigned_url("a.jpg", expiration=3600)
+
+    assert primera != segunda
+    assert servicio.s3_client.llamadas == 2
+
+
+def test_cache_acotada_desaloja_lru():
+    servicio = crear_servicio(Reloj(), maxsize=2)
+
+    servicio.get_presigned_urls(["a.jpg", "b.jpg", "c.jpg"])
+    stats = servicio.cache_stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
@@ -0,0 +1,161 @@
+import io
+import threading
+import time
+from app.services.s3_service import S3Service
+
+
+class FakeS3Client:
+    def __init__(self, demora=0.2, fallar=()):
+        self.demora = demora
+        self.fallar = set(fallar)
+        self.subidos = []
+        self.lock = threading.Lock()
+
+    def upload_fileobj(self, file_obj, bucket, key, ExtraArgs=None):
+        time.sleep(self.demora)
+        if key in self.fallar:
+            raise RuntimeError("S3 no disponible")
+        with self.lock:
+            self.subidos.append(key)
+
+
+def crear_servicio(**kwargs):
+    servicio = S3Service()
+    servicio.s3_client = FakeS3Client(**kwargs)
+    return servicio
+
+
+def archivos(n):
+    return [
+        {"file_obj": io.BytesIO(b"x"), "object_name": f"publicaciones/1/{i}.jpg", "content_type": "image/jpeg"}
+        for i in range(n)
+    ]
+
+
+def test_lote_se_sube_en_paralelo():
+    servicio = crear_servicio(demora=0.2)
+
+    inicio = time.perf_counter()
+    resultados = servicio.upload_files(archivos(10), max_workers=10)
+    duracion = time.perf_counter() - inicio
+
+    assert all(r["ok"] for r in resultados)
+    assert len(servicio.s3_client.subidos) == 10
+    # ~ el tiempo de una subida, no de diez (2 s en serie)
+    assert duracion < 1.0
+
+
+def test_resultados_por_archivo_en_orden():
+    servicio = crear_servicio(demora=0, fallar={"publicaciones/1/1.jpg"})
+
+    resultados = servicio.upload_files(archivos(3))
+
+    assert [r["object_name"] for r in resultados] == [f"publicaciones/1/{i}.jpg" for i in range(3)]
+    assert [r["ok"] for r in resultados] == [True, False, True]
+    assert "S3 no disponible" in resultados[1]["error"]
+    assert servicio.upload_files([]) == []
+
+
+def test_politica_post_fija_key_tipo_y_tamano(monkeypatch):
+    import base64
+    import json
+    from app.core.config import settings
+    from app.services.s3_service import PENDING_UPLOAD_TAGGING
+
+    # Firma local, no llama a AWS: basta con credenciales ficticias
+    monkeypatch.setattr(settings, "AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setattr(settings, "AWS_SECRET_ACCESS_KEY", "testing")
+    servicio = S3Service()
+
+    politica = servicio.generate_presigned_post("publicaciones/7/foto.jpg", "image/jpeg", max_size=1024)
+
+    assert politica["fields"]["key"] == "publicaciones/7/foto.jpg"
+    assert politica["fields"]["Content-Type"] == "image/jpeg"
+    condiciones = json.loads(base64.b64decode(politica["fields"]["policy"]))["conditions"]
+    assert ["content-length-range", 1, 1024] in condiciones
+    assert {"Content-Type": "image/jpeg"} in condiciones
+    assert {"key": "publicaciones/7/foto.jpg"} in condiciones
+    assert "tagging" not in politica["fields"]
+
+    # Subida pendiente: la etiqueta queda fijada en la política
+    politica = servicio.generate_presigned_post("publicaciones/7/otra.jpg", "image/jpeg", max_size=1024, pending=True)
+    assert politica["fields"]["tagging"] == PENDING_UPLOAD_TAGGING
+    condiciones = json.loads(base64.b64decode(politica["fields"]["policy"]))["conditions"]
+    assert {"tagging": PENDING_UPLOAD_TAGGING} in condiciones
+
+
+def test_delete_object_tags_devuelve_las_fallidas():
+    from botocore.exceptions import ClientError
+
+    class FakeTagging:
+        def __init__(self):
+            self.limpiados = []
+
+        def delete_object_tagging(self, Bucket, Key):
+            if Key == "b.jpg":
+                raise ClientError({"Error": {"Code": "SlowDown"}}, "DeleteObjectTagging")
+            self.limpiados.append(Key)
+
+    servicio = S3Service()
+    servicio.s3_client = FakeTagging()
+
+    assert servicio.delete_object_tags(["a.jpg", "b.jpg", "a.jpg"]) == ["b.jpg"]
+    assert servicio.s3_client.limpiados == ["a.jpg"]
+    assert servicio.delete_object_tags([]) == []
+
+
+def test_head_objects_omite_faltantes():
+    from botocore.exceptions import ClientError
+
+    class FakeHead:
+        def head_object(self, Bucket, Key):
+            if Key == "falta.jpg":
+                raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+            return {"ContentLength": 10, "ContentType": "image/png"}
+
+    servicio = S3Service()
+    servicio.s3_client = FakeHead()
+
+    assert servicio.head_objects(["a.png", "falta.jpg", "a.png"]) == {
+        "a.png": {"size": 10, "content_type": "image/png"}
+    }
+
+
+def test_delete_files_devuelve_las_fallidas():
+    class FakeDelete:
+        def __init__(self):
+            self.borrados = []
+
+        def delete_objects(self, Bucket, Delete):
+            keys = [obj["Key"] for obj in Delete["Objects"]]
+            self.borrados.extend(key for key in keys if key != "b.jpg")
+            return {"Errors": [{"Key": "b.jpg", "Code": "AccessDenied", "Message": "Access Denied"}]}
+
+    servicio = S3Service()
+    servicio.s3_client = FakeDelete()
+
+    assert servicio.delete_files(["a.jpg", "b.jpg", "", "a.jpg"]) == ["b.jpg"]
+    assert servicio.s3_client.borrados == ["a.jpg"]
+    assert servicio.delete_files([]) == []
+
+
+def test_delete_objects_en_lotes_de_mil():
+    class FakeDelete:
+        def __init__(self):
+            self.llamadas = []
+
+        def delete_objects(self, Bucket, Delete):
+            self.llamadas.append(len(Delete["Objects"]))
+            if len(self.llamadas) == 2:
+                raise RuntimeError("S3 no disponible")
+            return {}
+
+    servicio = S3Service()
+    servicio.s3_client = FakeDelete()
+
+    errores = servicio.delete_objects(f"k/{i}.jpg" for i in range(2500))
+
+    assert servicio.s3_client.llamadas == [1000, 1000, 500]
+    # Un lote que falla completo queda como error por key (para reintentarlo)
+    assert set(errores) == {f"k/{i}.jpg" for i in range(1000, 2000)}
+    assert errores["k/1000.jpg"] == "S3 no disponible"
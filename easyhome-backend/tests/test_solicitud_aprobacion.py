@@ -0,0 +1,96 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.endpoints import solicitud
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import identidad_service
+
+
+class CognitoFalso:
+    def __init__(self):
+        self.grupos = {}
+
+    def add_user_to_group(self, username, group_name):
+        self.grupos.setdefault(username, set()).add(group_name)
+        return True
+
+    def remove_user_from_group(self, username, group_name):
+        self.grupos.get(username, set()).discard(group_name)
+        return True
+
+
+@pytest.fixture
+def bd(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'solicitudes.db'}")
+    for modelo in (Usuario, Proveedor_Servicio):
+        modelo.__table__.create(engine)
+
+    cognito = CognitoFalso()
+    monkeypatch.setattr(solicitud, "cognito_service", cognito)
+    monkeypatch.setattr(solicitud.catalogo_service, "refrescar_tarjetas", lambda db, **filtro: 0)
+
+    with Session(engine) as sesion:
+        sesion.add_all([
+            Usuario(id_usuario=1, nombre="Ana", correo_electronico="ana@example.com", contraseña=""),
+            Proveedor_Servicio(id_proveedor=1, nombre_completo="Ana", curp="CURP00000000000001",
+                               años_experiencia=3, estado_solicitud="pendiente"),
+        ])
+        sesion.commit()
+    identidad_service.invalidar_usuario(1)
+    identidad_service.invalidar_proveedor(1)
+
+    sesion = Session(engine)
+    sesion.cognito = cognito
+    yield sesion
+    sesion.close()
+
+
+def test_aprobar_actualiza_bd_y_cognito(bd):
+    respuesta = solicitud.actualizar_estado_solicitud(1, estado="aprobado", db=bd)
+
+    assert respuesta["nuevo_estado"] == "aprobado"
+    assert bd.get(Proveedor_Servicio, 1).estado_solicitud == "aprobado"
+    assert bd.get(Usuario, 1).tipo_usuario == "proveedor"
+    assert bd.cognito.grupos["ana@example.com"] == {"Trabajadores"}
+
+
+def test_fallo_en_la_bd_revierte_y_compensa_cognito(bd, monkeypatch):
+    def fallar(db, **filtro):
+        raise RuntimeError("BD no disponible")
+
+    monkeypatch.setattr(solicitud.catalogo_service, "refrescar_tarjetas", fallar)
+
+    with pytest.raises(HTTPException) as error:
+        solicitud.actualizar_estado_solicitud(1, estado="aprobado", db=bd)
+
+    assert error.value.status_code == 500
+    # Ni la solicitud ni el tipo de usuario cambiaron, y Cognito volvió a su estado
+    bd.expire_all()
+    assert bd.get(Proveedor_Servicio, 1).estado_solicitud == "pendiente"
+    assert bd.get(Usuario, 1).tipo_usuario == "cliente"
+    assert bd.cognito.grupos["ana@example.com"] == set()
+
+    # La aprobación se puede reintentar
+    monkeypatch.setattr(solicitud.catalogo_service, "refrescar_tarjetas", lambda db, **filtro: 0)
+    solicitud.actualizar_estado_solicitud(1, estado="aprobado", db=bd)
+    assert bd.get(Proveedor_Servicio, 1).estado_solicitud == "aprobado"
+    assert bd.cognito.grupos["ana@example.com"] == {"Trabajadores"}
+
+
+def test_fallo_al_registrar_fotos_permite_reintentar_la_solicitud(bd, monkeypatch):
+    # La solicitud pendiente queda en la caché de identidad mientras se suben las fotos
+    assert identidad_service.proveedor_de(bd, 1).estado_solicitud == "pendiente"
+
+    def fallar(tabla):
+        raise RuntimeError("BD no disponible")
+
+    monkeypatch.setattr(solicitud, "insert", fallar)
+
+    with pytest.raises(RuntimeError):
+        solicitud._registrar_fotos_solicitud(bd, 1, ["work-images/a.jpg"])
+
+    assert bd.get(Proveedor_Servicio, 1) is None
+    assert identidad_service.proveedor_de(bd, 1) is None
@@ -0,0 +1,139 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.deps import Principal
+from app.api.v1.endpoints import subidas
+from app.models.eliminacion_s3_pendiente import Eliminacion_S3_Pendiente
+from app.models.foto_trabajo import Foto_Trabajo_Anterior
+from app.models.user import Usuario, Proveedor_Servicio
+
+USUARIO = Principal(id_usuario=1, correo_electronico="pro@example.com", tipo_usuario="proveedor", sub="s")
+MB = subidas.MB
+
+
+@pytest.fixture
+def bd(monkeypatch):
+    engine = create_engine("sqlite://")
+    for modelo in (Usuario, Proveedor_Servicio, Foto_Trabajo_Anterior, Eliminacion_S3_Pendiente):
+        modelo.__table__.create(engine)
+
+    objetos = {
+        "work-images/1/valida.jpg": {"size": 2 * MB, "content_type": "image/jpeg"},
+        "work-images/1/enorme.jpg": {"size": 50 * MB, "content_type": "image/jpeg"},
+        "work-images/1/script.jpg": {"size": 10, "content_type": "text/html"},
+        "work-images/1/sin-etiqueta.jpg": {"size": 10, "content_type": "image/png"},
+    }
+    etiquetas_limpiadas = []
+
+    with Session(engine) as sesion:
+        def head_objects(keys):
+            # Las llamadas a S3 no retienen una conexión del pool
+            sesion.conexiones_durante_s3.append(sesion.in_transaction())
+            return {k: objetos[k] for k in keys if k in objetos}
+
+        def quitar_etiquetas(keys):
+            keys = list(keys)
+            sesion.conexiones_durante_s3.append(sesion.in_transaction())
+            etiquetas_limpiadas.extend(keys)
+            return [key for key in keys if key.endswith("sin-etiqueta.jpg")]
+
+        monkeypatch.setattr(subidas.s3_service, "head_objects", head_objects)
+        monkeypatch.setattr(subidas.s3_service, "delete_object_tags", quitar_etiquetas)
+        monkeypatch.setattr(subidas.imagenes_service, "encolar_variantes", lambda keys: len(keys))
+
+        sesion.add_all([
+            Usuario(id_usuario=1, nombre="Pro", correo_electronico="pro@example.com", contraseña=""),
+            Proveedor_Servicio(id_proveedor=1, nombre_completo="Pro", curp="CURP00000000000001", años_experiencia=5),
+        ])
+        sesion.commit()
+        sesion.etiquetas_limpiadas = etiquetas_limpiadas
+        sesion.conexiones_durante_s3 = []
+        yield sesion
+
+
+def _confirmar(bd, keys):
+    return subidas.confirmar_subidas(
+        subidas.ConfirmarRequest(destino="solicitud", keys=keys), current_user=USUARIO, db=bd,
+    )
+
+
+def test_confirmar_registra_las_validas_y_encola_las_invalidas(bd):
+    respuesta = _confirmar(bd, [
+        "work-images/1/valida.jpg", "work-images/1/enorme.jpg", "work-images/1/script.jpg",
+        "work-images/1/sin-etiqueta.jpg", "work-images/1/nunca-subida.jpg",
+    ])
+
+    assert respuesta["registradas"] == ["work-images/1/valida.jpg", "work-images/1/sin-etiqueta.jpg"]
+    assert sorted(respuesta["invalidas"]) == ["work-images/1/enorme.jpg", "work-images/1/script.jpg"]
+    assert respuesta["faltantes"] == ["work-images/1/nunca-subida.jpg"]
+    # S3 no quitó la etiqueta: queda registrada, pero hay que reintentar la confirmación
+    assert respuesta["pendientes"] == ["work-images/1/sin-etiqueta.jpg"]
+
+    assert bd.scalars(select(Foto_Trabajo_Anterior.url_imagen)).all() == [
+        "work-images/1/valida.jpg", "work-images/1/sin-etiqueta.jpg",
+    ]
+    assert sorted(bd.scalars(select(Eliminacion_S3_Pendiente.s3_key)).all()) == [
+        "work-images/1/enorme.jpg", "work-images/1/script.jpg",
+    ]
+    # Las inválidas nunca pierden la etiqueta de pendiente
+    assert not {"work-images/1/enorme.jpg", "work-images/1/script.jpg"} & set(bd.etiquetas_limpiadas)
+    assert bd.conexiones_durante_s3 == [False, False]
+
+
+def test_reintento_confirma_las_pendientes_sin_duplicar(bd):
+    _confirmar(bd, ["work-images/1/valida.jpg"])
+    respuesta = _confirmar(bd, ["work-images/1/valida.jpg"])
+
+    assert respuesta["registradas"] == []
+    assert respuesta["ya_registradas"] == ["work-images/1/valida.jpg"]
+    assert len(bd.scalars(select(Foto_Trabajo_Anterior.id_foto)).all()) == 1
+
+
+def test_limite_de_imagenes_no_quita_etiquetas(bd, monkeypatch):
+    monkeypatch.setitem(subidas.DESTINOS, "solicitud", {**subidas.DESTINOS["solicitud"], "max_archivos": 0})
+
+    with pytest.raises(HTTPException) as error:
+        _confirmar(bd, ["work-images/1/valida.jpg"])
+
+    assert error.value.status_code == 400
+    # Rechazada: conserva la etiqueta y la regla de ciclo de vida la expira
+    assert bd.etiquetas_limpiadas == []
+
+
+def test_reintento_vuelve_a_quitar_la_etiqueta_de_las_pendientes(bd):
+    _confirmar(bd, ["work-images/1/sin-etiqueta.jpg"])
+    respuesta = _confirmar(bd, ["work-images/1/sin-etiqueta.jpg"])
+
+    assert respuesta["ya_registradas"] == ["work-images/1/sin-etiqueta.jpg"]
+    assert respuesta["pendientes"] == ["work-images/1/sin-etiqueta.jpg"]
+    assert bd.etiquetas_limpiadas == ["work-images/1/sin-etiqueta.jpg"] * 2
+
+
+def test_confirmacion_concurrente_no_duplica_filas(bd, monkeypatch):
+    _confirmar(bd, ["work-images/1/valida.jpg"])
+    # Otra confirmación leyó las imágenes antes de que la primera hiciera commit
+    monkeypatch.setattr(subidas, "_imagenes_actuales", lambda *args: set())
+
+    respuesta = _confirmar(bd, ["work-images/1/valida.jpg"])
+
+    assert respuesta["registradas"] == []
+    assert respuesta["ya_registradas"] == ["work-images/1/valida.jpg"]
+    assert len(bd.scalars(select(Foto_Trabajo_Anterior.id_foto)).all()) == 1
+
+
+def test_error_al_registrar_conserva_las_etiquetas(bd, monkeypatch):
+    def insertar_con_error(*args):
+        raise RuntimeError("fallo de la BD")
+
+    monkeypatch.setattr(subidas, "_insertar_imagenes", insertar_con_error)
+
+    with pytest.raises(HTTPException) as error:
+        _confirmar(bd, ["work-images/1/valida.jpg"])
+
+    assert error.value.status_code == 500
+    # Sin fila ni commit: la regla de ciclo de vida debe poder expirar el objeto
+    assert bd.etiquetas_limpiadas == []
+    assert bd.scalars(select(Foto_Trabajo_Anterior.id_foto)).all() == []
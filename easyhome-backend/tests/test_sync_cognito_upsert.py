@@ -0,0 +1,252 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.endpoints import auth
+from app.models.base import Base
+from app.models.plan_suscripcion import Plan_Suscripcion
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import ultima_sesion_service
+
+
+class SesionFalsa:
+    """Registra las sentencias y responde como lo haría Postgres al upsert."""
+
+    def __init__(self, fila):
+        self.fila = fila
+        self.sentencias = []
+        self.commits = 0
+
+    def execute(self, stmt):
+        self.sentencias.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return SimpleNamespace(first=lambda: self.fila, one=lambda: self.fila, rowcount=1)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def _fila(**datos):
+    base = dict(id_usuario=7, nombre="Ana", numero_telefono=None, tipo_usuario="cliente", insertado=False,
+                id_anterior=7, nombre_anterior="Ana", telefono_anterior=None, tipo_anterior="cliente")
+    base.update(datos)
+    return SimpleNamespace(**base)
+
+
+def _datos(**extra):
+    return auth.CognitoUserSync(email="ana@example.com", cognito_sub="sub-ana", name="Ana", **extra)
+
+
+@pytest.fixture(autouse=True)
+def sesiones_registradas(monkeypatch):
+    registradas = []
+    monkeypatch.setattr(ultima_sesion_service, "registrar", lambda id_usuario, momento: registradas.append(id_usuario))
+    return registradas
+
+
+def test_login_de_cliente_es_una_sola_sentencia(sesiones_registradas):
+    db = SesionFalsa(_fila())
+
+    assert auth._sincronizar_usuario(db, _datos(cognito_groups=["Clientes"])) == (7, False)
+    (sql,) = db.sentencias
+    assert "ON CONFLICT (correo_electronico) DO UPDATE" in sql and "RETURNING" in sql
+    assert "IS DISTINCT FROM" in sql
+    assert db.commits == 1
+    assert sesiones_registradas == [7]
+
+
+def test_login_sin_cambios_solo_registra_la_ultima_sesion(sesiones_registradas, monkeypatch):
+    invalidados = []
+    monkeypatch.setattr(auth, "invalidar_principal", invalidados.append)
+    db = SesionFalsa(_fila(id_usuario=None))
+
+    assert auth._sincronizar_usuario(db, _datos(cognito_groups=["Clientes"])) == (7, False)
+    set_clause = db.sentencias[0].split("DO UPDATE SET", 1)[1].split("RETURNING", 1)[0]
+    assert "ultima_sesion" not in set_clause
+    assert sesiones_registradas == [7]
+    assert invalidados == []
+
+
+def test_proveedor_nuevo_crea_su_registro_en_la_misma_transaccion(sesiones_registradas):
+    db = SesionFalsa(_fila(tipo_usuario="proveedor", insertado=True,
+                           id_anterior=None, nombre_anterior=None, tipo_anterior=None))
+
+    assert auth._sincronizar_usuario(db, _datos(cognito_groups=["Trabajadores"])) == (7, True)
+    assert "INSERT INTO proveedor_servicio" in db.sentencias[-1]
+    assert "ON CONFLICT (id_proveedor) DO NOTHING" in db.sentencias[-1]
+    assert db.commits == 1
+    # Al insertar ya se escribió ultima_sesion
+    assert sesiones_registradas == []
+
+
+def test_sin_grupos_no_se_sobrescribe_el_tipo():
+    db = SesionFalsa(_fila())
+
+    auth._sincronizar_usuario(db, _datos())
+    set_clause = db.sentencias[0].split("DO UPDATE SET", 1)[1].split("RETURNING", 1)[0]
+    assert "tipo_usuario" not in set_clause and "numero_telefono" not in set_clause
+    assert "nombre = excluded.nombre" in set_clause
+
+
+# ── Contra Postgres: las sentencias se ejecutan y se revisan las filas ──
+
+ESQUEMA = "prueba_sync_cognito"
+
+
+@pytest.fixture
+def pg(postgres_url, monkeypatch):
+    """Usuario y Proveedor_Servicio en un esquema propio, recreados en cada prueba."""
+    with create_engine(postgres_url).begin() as conexion:
+        conexion.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE"))
+        conexion.execute(text(f"CREATE SCHEMA {ESQUEMA}"))
+
+    engine = create_engine(postgres_url, connect_args={"options": f"-csearch_path={ESQUEMA}"})
+    tablas = [Plan_Suscripcion.__table__, Usuario.__table__, Proveedor_Servicio.__table__]
+    with engine.begin() as conexion:
+        Base.metadata.create_all(conexion, tables=tablas)
+        # Como en producción (scripts/check_proveedores.py): el alta desde Cognito
+        # crea proveedores sin CURP ni años de experiencia
+        conexion.execute(text(
+            "ALTER TABLE proveedor_servicio ALTER COLUMN curp DROP NOT NULL, "
+            "ALTER COLUMN años_experiencia DROP NOT NULL"
+        ))
+
+    refrescadas = []
+    monkeypatch.setattr(auth.catalogo_service, "refrescar_tarjetas",
+                        lambda db, ids_proveedor: refrescadas.extend(ids_proveedor))
+    fabrica = sessionmaker(bind=engine)
+    fabrica.refrescadas = refrescadas
+    yield fabrica
+    engine.dispose()
+
+
+def _usuarios(fabrica, correo="ana@example.com"):
+    with fabrica() as db:
+        return db.scalars(select(Usuario).where(Usuario.correo_electronico == correo)).all()
+
+
+def _proveedores(fabrica):
+    with fabrica() as db:
+        return db.scalars(select(Proveedor_Servicio)).all()
+
+
+def _crear_ana(fabrica, **datos):
+    with fabrica() as db:
+        db.add(Usuario(id_usuario=7, nombre="Ana", correo_electronico="ana@example.com", contraseña="",
+                       tipo_usuario="cliente", google_id="google-ana", metodo_autenticacion="google", **datos))
+        db.commit()
+
+
+def test_usuario_existente_se_actualiza_sin_duplicarse(pg):
+    _crear_ana(pg)
+
+    with pg() as db:
+        resultado = auth._sincronizar_usuario(
+            db, _datos(phone="+5215550001", cognito_groups=["Clientes"]).model_copy(update={"name": "Ana María"}))
+
+    assert resultado == (7, False)
+    (ana,) = _usuarios(pg)
+    assert (ana.id_usuario, ana.nombre, ana.numero_telefono) == (7, "Ana María", "+5215550001")
+    # Nombre y teléfono aparecen en las tarjetas del proveedor
+    assert pg.refrescadas == [7]
+
+
+def test_google_id_se_conserva(pg):
+    _crear_ana(pg)
+
+    with pg() as db:
+        auth._sincronizar_usuario(db, _datos(cognito_groups=["Trabajadores"]))
+
+    (ana,) = _usuarios(pg)
+    assert ana.tipo_usuario == "proveedor"
+    assert (ana.google_id, ana.metodo_autenticacion) == ("google-ana", "google")
+
+
+def test_usuario_nuevo_se_inserta(pg, sesiones_registradas):
+    with pg() as db:
+        id_usuario, es_nuevo = auth._sincronizar_usuario(db, _datos(cognito_groups=["Clientes"]))
+
+    assert es_nuevo
+    (ana,) = _usuarios(pg)
+    assert (ana.id_usuario, ana.google_id, ana.tipo_usuario) == (id_usuario, "sub-ana", "cliente")
+    assert _proveedores(pg) == []
+    # Al insertar ya se escribió ultima_sesion
+    assert sesiones_registradas == []
+
+
+def test_proveedor_servicio_se_crea_una_sola_vez(pg):
+    _crear_ana(pg)
+    sentencias = []
+    event.listen(pg.kw["bind"], "before_cursor_execute", lambda *args: sentencias.append(args[2]))
+
+    # Como cliente no se crea; al pasar a Trabajadores, sí (auto-aprobado)
+    for grupos in (["Clientes"], ["Trabajadores"]):
+        with pg() as db:
+            auth._sincronizar_usuario(db, _datos(cognito_groups=grupos))
+    (proveedor,) = _proveedores(pg)
+    assert (proveedor.id_proveedor, proveedor.nombre_completo, proveedor.estado_solicitud) == (7, "Ana", "aprobado")
+
+    # Ya era proveedor: aunque el login cambie su nombre, ni siquiera intenta el INSERT
+    sentencias.clear()
+    with pg() as db:
+        auth._sincronizar_usuario(
+            db, _datos(cognito_groups=["Trabajadores"]).model_copy(update={"name": "Ana María"}))
+    assert _usuarios(pg)[0].nombre == "Ana María"
+    assert not any("proveedor_servicio" in sql for sql in sentencias)
+    assert len(_proveedores(pg)) == 1
+
+
+def test_logins_simultaneos_convergen(pg):
+    """
+    El primer login inserta al usuario y espera antes del commit hasta que
+    el segundo queda bloqueado en el índice único del correo: el segundo
+    no falla ni duplica, y devuelve el mismo id.
+    """
+    en_commit, segundo_bloqueado = threading.Event(), threading.Event()
+    resultados = {}
+
+    def login(nombre, esperar):
+        db = pg()
+        if esperar:
+            commit = db.commit
+
+            def commit_demorado():
+                en_commit.set()
+                segundo_bloqueado.wait(10)
+                commit()
+
+            db.commit = commit_demorado
+        try:
+            resultados[nombre] = auth._sincronizar_usuario(db, _datos(cognito_groups=["Trabajadores"]))
+        finally:
+            db.close()
+
+    primero = threading.Thread(target=login, args=("primero", True))
+    primero.start()
+    assert en_commit.wait(10)
+    segundo = threading.Thread(target=login, args=("segundo", False))
+    segundo.start()
+
+    with pg() as db:
+        for _ in range(100):
+            if db.scalar(text("SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock'")):
+                break
+            time.sleep(0.05)
+            db.rollback()
+        else:
+            pytest.fail("El segundo login nunca esperó al primero")
+    segundo_bloqueado.set()
+    primero.join(10)
+    segundo.join(10)
+
+    (ana,) = _usuarios(pg)
+    assert resultados == {"primero": (ana.id_usuario, True), "segundo": (ana.id_usuario, False)}
+    assert [proveedor.id_proveedor for proveedor in _proveedores(pg)] == [ana.id_usuario]
@@ -0,0 +1,163 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+import app.models  # noqa: F401  (registra todos los modelos)
+from app.api.v1.endpoints import perfil_usuario, publicacion
+from app.models.eliminacion_s3_pendiente import Eliminacion_S3_Pendiente
+from app.models.estadistica_proveedor import Estadistica_Proveedor
+from app.models.imagen_variante import Imagen_Variante
+from app.models.property import Publicacion_Servicio, Imagen_Publicacion
+from app.models.reseña_servicio import Reseña_Servicio
+from app.models.tarjeta_catalogo import Tarjeta_Catalogo
+from app.models.user import Usuario, Proveedor_Servicio
+from app.services import catalogo_service, estadisticas_service, identidad_service
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_sqlite(tipo, compilador, **kw):
+    return "TEXT"
+
+
+class SesionRegistro:
+    """Registra las sentencias compiladas para Postgres (refrescar_tarjetas usa jsonb_agg)."""
+
+    def __init__(self):
+        self.sentencias = []
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+    def execute(self, stmt, parametros=None):
+        self.sentencias.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return type("Resultado", (), {"rowcount": 1})()
+
+
+@pytest.mark.parametrize("filtro, condicion", [
+    ({"ids_publicacion": [5]}, "publicacion_servicio.id_publicacion IN"),
+    ({"ids_proveedor": [3]}, "publicacion_servicio.id_proveedor IN"),
+    ({"id_categoria": 2}, "publicacion_servicio.id_categoria ="),
+])
+def test_refrescar_tarjetas_es_un_solo_upsert(filtro, condicion):
+    db = SesionRegistro()
+
+    assert catalogo_service.refrescar_tarjetas(db, **filtro) == 1
+
+    (sql,) = db.sentencias
+    assert sql.startswith("INSERT INTO tarjeta_catalogo")
+    assert "ON CONFLICT (id_publicacion) DO UPDATE" in sql
+    assert condicion in sql
+    # Galería ordenada y datos del proveedor en la misma pasada
+    assert "jsonb_agg(jsonb_build_object(" in sql and "ORDER BY imagen_publicacion.orden" in sql
+    # Los cambios pendientes de la sesión se envían antes de leerlos
+    assert db.flushes == 1
+
+
+def test_refrescar_tarjetas_sin_ids_no_consulta():
+    db = SesionRegistro()
+    assert catalogo_service.refrescar_tarjetas(db, ids_publicacion=[]) == 0
+    assert catalogo_service.refrescar_tarjetas(db, ids_proveedor=iter(())) == 0
+    assert db.sentencias == []
+
+
+@pytest.fixture
+def bd(monkeypatch):
+    engine = create_engine("sqlite://")
+    for modelo in (Usuario, Proveedor_Servicio, Publicacion_Servicio, Imagen_Publicacion, Reseña_Servicio,
+                   Estadistica_Proveedor, Eliminacion_S3_Pendiente, Imagen_Variante):
+        modelo.__table__.create(engine)
+    # tarjeta_catalogo sin el default '[]'::jsonb, que SQLite no entiende
+    tarjetas = Tarjeta_Catalogo.__table__
+    monkeypatch.setattr(tarjetas.c.imagenes, "server_default", None)
+    tarjetas.create(engine)
+
+    # refrescar_tarjetas es SQL de Postgres: aquí se registra qué se refresca
+    # y si ocurre dentro de la transacción que luego se confirma
+    refrescos = []
+
+    def refrescar(db, **filtro):
+        refrescos.append({"filtro": filtro, "en_transaccion": db.in_transaction()})
+        return 1
+
+    monkeypatch.setattr(catalogo_service, "refrescar_tarjetas", refrescar)
+    monkeypatch.setattr(identidad_service, "invalidar_usuario", lambda id_usuario: None)
+
+    with Session(engine) as sesion:
+        sesion.add_all([
+            Usuario(id_usuario=1, nombre="Pro", correo_electronico="pro@example.com", contraseña="",
+                    foto_perfil="profile-images/1_a.jpg"),
+            Proveedor_Servicio(id_proveedor=1, nombre_completo="Pro", curp="CURP00000000000001", años_experiencia=5),
+            Publicacion_Servicio(id_publicacion=1, id_proveedor=1, id_categoria=1, titulo="Plomería",
+                                 descripcion="-", rango_precio_min=Decimal("100"), rango_precio_max=Decimal("300")),
+        ])
+        sesion.flush()
+        sesion.execute(tarjetas.insert().values(
+            id_publicacion=1, id_proveedor=1, id_categoria=1, titulo="Plomería", descripcion="-",
+            rango_precio_min=100, rango_precio_max=300, fecha_publicacion=publicacion.datetime.utcnow(),
+            estado="activo", imagenes="[]", nombre_proveedor="Pro",
+        ))
+        sesion.commit()
+        sesion.refrescos = refrescos
+        sesion.tarjetas = tarjetas
+        yield sesion
+
+
+def test_resena_actualiza_la_calificacion_de_la_tarjeta(bd):
+    def calificacion_tarjeta():
+        return bd.execute(bd.tarjetas.select().with_only_columns(bd.tarjetas.c.calificacion_promedio)).scalar()
+
+    reseñas = [
+        Reseña_Servicio(id_reseña=i, id_servicio_contratado=i, id_cliente=1, id_proveedor=1,
+                        calificacion_general=general, calificacion_puntualidad=general,
+                        calificacion_calidad_servicio=general, calificacion_calidad_precio=general,
+                        recomendacion="Sí", estado="activa")
+        for i, general in ((1, 5), (2, 2))
+    ]
+    for reseña in reseñas:
+        bd.add(reseña)
+        estadisticas_service.aplicar_resena(bd, reseña)
+    bd.commit()
+    assert calificacion_tarjeta() == Decimal("3.50")
+
+    # Al ocultar una reseña la tarjeta sigue al agregado
+    reseñas[1].estado = "inactiva"
+    estadisticas_service.registrar_cambio_estado(bd, reseñas[1], "activa")
+    bd.commit()
+    assert calificacion_tarjeta() == Decimal("5.00")
+
+    # recalcular_estadisticas también sincroniza las tarjetas
+    bd.execute(bd.tarjetas.update().values(calificacion_promedio=1))
+    estadisticas_service.recalcular_estadisticas(bd, id_proveedor=1)
+    bd.commit()
+    assert calificacion_tarjeta() == Decimal("5.00")
+
+
+def test_publicar_fotos_refresca_la_tarjeta(bd):
+    publicacion._registrar_fotos_publicacion(bd, 1, [
+        {"id_publicacion": 1, "url_imagen": "publicaciones/1/a.jpg", "orden": 0},
+    ])
+
+    assert bd.refrescos == [{"filtro": {"ids_publicacion": [1]}, "en_transaccion": True}]
+    assert bd.query(Imagen_Publicacion).count() == 1
+
+
+def test_cambiar_foto_de_perfil_refresca_las_tarjetas_del_proveedor(bd):
+    perfil_usuario._guardar_foto_perfil(bd, 1, "profile-images/1_b.jpg")
+
+    assert bd.refrescos == [{"filtro": {"ids_proveedor": [1]}, "en_transaccion": True}]
+    assert bd.get(Usuario, 1).foto_perfil == "profile-images/1_b.jpg"
+    # La foto anterior quedó en la bandeja de eliminaciones de la misma transacción
+    assert "profile-images/1_a.jpg" in bd.scalars(select(Eliminacion_S3_Pendiente.s3_key)).all()
+
+
+def test_eliminar_foto_de_perfil_refresca_las_tarjetas_del_proveedor(bd):
+    perfil_usuario.eliminar_foto_perfil(1, db=bd)
+
+    assert bd.refrescos == [{"filtro": {"ids_proveedor": [1]}, "en_transaccion": True}]
+    assert bd.get(Usuario, 1).foto_perfil is None
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.ultima_sesion_service import BufferUltimaSesion
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+class SesionFalsa:
+    """Guarda los UPDATE recibidos (SQL y parámetros)."""
+
+    escrituras = []
+    fallar = False
+
+    def execute(self, stmt):
+        if SesionFalsa.fallar:
+            raise RuntimeError("BD no disponible")
+        compilado = stmt.compile(dialect=postgresql.dialect())
+        SesionFalsa.escrituras.append((str(compilado), compilado.params))
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def limpiar():
+    SesionFalsa.escrituras = []
+    SesionFalsa.fallar = False
+
+
+def _pendientes(params):
+    """Pares (id_usuario, ultima_sesion) del VALUES enviado."""
+    valores = [v for _, v in sorted(params.items(), key=lambda kv: int(kv[0].rsplit("_", 1)[1]))]
+    return dict(zip(valores[::2], valores[1::2]))
+
+
+def test_logins_repetidos_se_agrupan_en_un_update():
+    buffer = BufferUltimaSesion(max_pendientes=100, session_factory=SesionFalsa)
+    buffer.registrar(1, T0)
+    buffer.registrar(2, T0)
+    buffer.registrar(1, T0 + timedelta(seconds=5))
+    buffer.registrar(1, T0 + timedelta(seconds=2))
+
+    assert buffer.vaciar() == 2
+    assert buffer.vaciar() == 0
+    (sql, params), = SesionFalsa.escrituras
+    assert sql.startswith("UPDATE usuario SET ultima_sesion=pendientes.ultima_sesion FROM (VALUES")
+    assert "usuario.ultima_sesion < pendientes.ultima_sesion" in sql
+    assert _pendientes(params) == {1: T0 + timedelta(seconds=5), 2: T0}
+
+
+def test_sin_tarea_de_fondo_se_escribe_al_llenarse():
+    buffer = BufferUltimaSesion(max_pendientes=3, session_factory=SesionFalsa)
+    for id_usuario in (1, 2, 3):
+        buffer.registrar(id_usuario, T0)
+
+    assert len(SesionFalsa.escrituras) == 1
+    assert buffer.stats() == {"pendientes": 0, "escrituras": 1, "escritos": 3}
+
+
+def test_error_devuelve_los_pendientes_al_buffer():
+    buffer = BufferUltimaSesion(max_pendientes=100, session_factory=SesionFalsa)
+    buffer.registrar(1, T0)
+    SesionFalsa.fallar = True
+    with pytest.raises(RuntimeError):
+        buffer.vaciar()
+    # Un login más reciente durante el fallo no se pisa
+    buffer.registrar(1, T0 + timedelta(seconds=1))
+
+    SesionFalsa.fallar = False
+    assert buffer.vaciar() == 1
+    assert _pendientes(SesionFalsa.escrituras[0][1]) == {1: T0 + timedelta(seconds=1)}
+
+
+def test_tarea_de_fondo_escribe_por_tamano_y_al_detenerse():
+    buffer = BufferUltimaSesion(max_pendientes=2, session_factory=SesionFalsa)
+
+    async def principal():
+        tarea = asyncio.create_task(buffer.ejecutar(intervalo=60))
+        await asyncio.sleep(0.05)
+        buffer.registrar(1, T0)
+        buffer.registrar(2, T0)  # se llena: despierta a la tarea
+        await asyncio.sleep(0.1)
+        assert len(SesionFalsa.escrituras) == 1
+
+        buffer.registrar(3, T0)
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
+
+    asyncio.run(principal())
+    assert [_pendientes(params) for _, params in SesionFalsa.escrituras] == [{1: T0, 2: T0}, {3: T0}]
@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.core.uploads import recibir_imagen, detectar_tipo_imagen
+
+BOUNDARY = "----easyhome"
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+def cuerpo_multipart(contenido: bytes, campo="file", filename="foto.png") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{campo}"; filename="{filename}"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + contenido + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def crear_request(cuerpo: bytes, chunk=64, declarar_longitud=True):
+    chunks = [cuerpo[i:i + chunk] for i in range(0, len(cuerpo), chunk)]
+    consumidos = []
+
+    async def receive():
+        parte = chunks.pop(0) if chunks else b""
+        consumidos.append(parte)
+        return {"type": "http.request", "body": parte, "more_body": bool(chunks)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if declarar_longitud:
+        headers.append((b"content-length", str(len(cuerpo)).encode()))
+    request = Request({"type": "http", "method": "PUT", "headers": headers}, receive)
+    return request, consumidos
+
+
+def test_detecta_formatos_por_magic_bytes():
+    assert detectar_tipo_imagen(b"\xff\xd8\xff\xe0" + b"0" * 8) == "image/jpeg"
+    assert detectar_tipo_imagen(PNG[:12]) == "image/png"
+    assert detectar_tipo_imagen(b"GIF89a" + b"0" * 6) == "image/gif"
+    assert detectar_tipo_imagen(b"RIFF\x00\x00\x00\x00WEBP") == "image/webp"
+    assert detectar_tipo_imagen(b"%PDF-1.7 ....") is None
+
+
+def test_recibe_imagen_valida():
+    request, _ = crear_request(cuerpo_multipart(PNG))
+    imagen = asyncio.run(recibir_imagen(request, max_bytes=1024))
+    try:
+        assert imagen.content_type == "image/png"
+        assert imagen.filename == "foto.png"
+        assert imagen.tamaño == len(PNG)
+        assert imagen.archivo.read() == PNG
+    finally:
+        imagen.cerrar()
+
+
+def test_rechaza_archivo_grande_sin_leer_todo_el_cuerpo():
+    cuerpo = cuerpo_multipart(PNG + b"\x00" * 10_000)
+    request, consumidos = crear_request(cuerpo, declarar_longitud=False)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(recibir_imagen(request, max_bytes=1024))
+
+    assert exc.value.status_code == 413
+    assert sum(map(len, consumidos)) < len(cuerpo) / 2
+
+
+def test_rechaza_content_length_declarado_excesivo():
+    request, consumidos = crear_request(cuerpo_multipart(PNG + b"\x00" * 100_000))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(recibir_imagen(request, max_bytes=1024))
+
+    assert exc.value.status_code == 413
+    assert consumidos == []
+
+
+def test_rechaza_archivo_que_no_es_imagen():
+    request, _ = crear_request(cuerpo_multipart(b"%PDF-1.7 no soy una imagen"))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(recibir_imagen(request, max_bytes=1024))
+
+    assert exc.value.status_code == 400
+
+
+def test_falta_el_campo():
+    request, _ = crear_request(cuerpo_multipart(PNG, campo="otro"))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(recibir_imagen(request, max_bytes=1024))
+
+    assert exc.value.status_code == 400
+
+
+def test_escrituras_a_disco_fuera_del_event_loop(monkeypatch):
+    import threading
+    import app.core.uploads as uploads
+
+    contenido = PNG + bytes(range(256)) * 40
+    request, _ = crear_request(cuerpo_multipart(contenido), chunk=512)
+    hilos = []
+
+    class Spool(uploads.tempfile.SpooledTemporaryFile):
+        def write(self, datos):
+            hilos.append((threading.current_thread(), self.tell() + len(datos)))
+            return super().write(datos)
+
+    monkeypatch.setattr(uploads.tempfile, "SpooledTemporaryFile", Spool)
+
+    async def recibir():
+        return threading.current_thread(), await recibir_imagen(request, max_bytes=64 * 1024, umbral_disco=2048)
+
+    hilo_loop, imagen = asyncio.run(recibir())
+    try:
+        assert imagen.archivo.read() == contenido
+        assert imagen.archivo._rolled
+    finally:
+        imagen.cerrar()
+
+    # En el loop solo se escribe en memoria (hasta el umbral); lo demás, en el threadpool
+    assert all(hasta <= 2048 for hilo, hasta in hilos if hilo is hilo_loop)
+    assert any(hilo is not hilo_loop for hilo, _ in hilos)
+
+
+def test_foto_de_perfil_no_registrada_se_encola_para_eliminar(monkeypatch):
+    from app.api.v1.endpoints import perfil_usuario
+
+    class Sesion:
+        def __init__(self):
+            self.commits = 0
+
+        def commit(self):
+            self.commits += 1
+
+        def rollback(self):
+            pass
+
+    encoladas = []
+    monkeypatch.setattr(perfil_usuario, "_verificar_usuario", lambda db, id_usuario: None)
+    monkeypatch.setattr(perfil_usuario.s3_service, "upload_file", lambda file_obj, object_name, content_type: object_name)
+    monkeypatch.setattr(perfil_usuario.eliminaciones_service, "encolar_eliminaciones",
+                        lambda db, keys: encoladas.extend(keys))
+
+    def guardar_falla(db, id_usuario, uploaded_key):
+        raise RuntimeError("conexión perdida")
+
+    monkeypatch.setattr(perfil_usuario, "_guardar_foto_perfil", guardar_falla)
+    request, _ = crear_request(cuerpo_multipart(PNG))
+    db = Sesion()
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(perfil_usuario.actualizar_foto_perfil(7, request, db=db))
+
+    assert exc.value.status_code == 500
+    assert len(encoladas) == 1 and encoladas[0].startswith("profile-images/7_")
+    assert db.commits == 1
@@ -1,5 +1,9 @@
 import { useEffect, useState, useCallback } from "react";
-import api from "../config/api";
+import api, { API_BASE_URL } from "../config/api";
+import { userManager } from "../config/authService";
+
+// Espera (ms) antes de reabrir un stream que el servidor cerró (p. ej. token vencido)
+const REABRIR_STREAM_MS = 5000;
 
 export const useAlerts = (userId) => {
   const [alerts, setAlerts] = useState([]);
@@ -12,11 +16,13 @@ export const useAlerts = (userId) => {
     setLoading(true);
 
     try {
+      // Primera página del feed (las más recientes); más páginas con data.next_cursor
       const { data } = await api.get(`/api/v1/alertas/usuario/${userId}`);
+      const alertas = data.alertas;
 
-      setAlerts(data);
+      setAlerts(alertas);
 
-      const unreadAlerts = data.filter((a) => a.leida === false);
+      const unreadAlerts = alertas.filter((a) => a.leida === false);
 
       if (unreadAlerts.length > 0) {
         setLatestAlert(unreadAlerts[0]); 
@@ -35,6 +41,47 @@ export const useAlerts = (userId) => {
     fetchAlerts();
   }, [fetchAlerts]);
 
+  // Alertas en tiempo real: el stream solo avisa; el detalle se lee del feed.
+  // Al reconectarse o recibir "resync" se vuelve a pedir la primera página.
+  // EventSource no envía headers: el token va como query param.
+  useEffect(() => {
+    if (!userId || typeof EventSource === "undefined") return;
+
+    let source = null;
+    let reintento = null;
+    let activo = true;
+    let conectado = false;
+
+    const abrir = async () => {
+      const user = await userManager.getUser();
+      if (!activo || !user || user.expired || !user.access_token) return;
+
+      source = new EventSource(
+        `${API_BASE_URL}/api/v1/alertas/usuario/${userId}/stream?token=${encodeURIComponent(user.access_token)}`
+      );
+      source.onopen = () => {
+        // La primera página ya se pidió al montar; solo se relee al reconectar
+        if (conectado) fetchAlerts();
+        conectado = true;
+      };
+      source.onerror = () => {
+        // Con un 401/403 EventSource no reintenta: se reabre con un token vigente
+        if (source.readyState === EventSource.CLOSED) {
+          reintento = setTimeout(abrir, REABRIR_STREAM_MS);
+        }
+      };
+      source.addEventListener("alerta", () => fetchAlerts());
+      source.addEventListener("resync", () => fetchAlerts());
+    };
+    abrir();
+
+    return () => {
+      activo = false;
+      clearTimeout(reintento);
+      if (source) source.close();
+    };
+  }, [userId, fetchAlerts]);
+
   return {
     alerts,
     latestAlert,
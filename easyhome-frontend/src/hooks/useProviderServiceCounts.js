@@ -0,0 +1,34 @@
+import { useEffect, useState } from "react";
+import api from "../config/api";
+
+/**
+ * Totales públicos de servicios activos y finalizados de un proveedor.
+ * Para perfiles públicos: el dashboard completo solo lo ve el propio proveedor.
+ * @param {number} providerId - El ID del proveedor.
+ */
+export const useProviderServiceCounts = (providerId) => {
+  const [counts, setCounts] = useState({ activos: 0, finalizados: 0 });
+
+  useEffect(() => {
+    if (!providerId) {
+      setCounts({ activos: 0, finalizados: 0 });
+      return;
+    }
+
+    let cancelado = false;
+    api
+      .get(`/api/v1/status-servicio/proveedores/${providerId}/conteos`)
+      .then(({ data }) => {
+        if (!cancelado) setCounts(data);
+      })
+      .catch(() => {
+        if (!cancelado) setCounts({ activos: 0, finalizados: 0 });
+      });
+
+    return () => {
+      cancelado = true;
+    };
+  }, [providerId]);
+
+  return { activeCount: counts.activos, finishedCount: counts.finalizados };
+};
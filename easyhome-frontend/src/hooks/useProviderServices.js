@@ -26,17 +26,24 @@ const mapService = (service) => ({
 export const useProviderServices = (providerId) => {
   const [activeServices, setActiveServices] = useState([]);
   const [finishedServices, setFinishedServices] = useState([]);
+  // Totales y cursores de cada lista (el dashboard trae solo la primera página)
+  const [counts, setCounts] = useState({ activos: 0, finalizados: 0 });
+  const [cursors, setCursors] = useState({ activos: null, finalizados: null });
+  const [stats, setStats] = useState(null);
 
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
 
   /**
-   * Carga todos los servicios del proveedor.
+   * Carga el dashboard del proveedor: conteos, estadísticas y la primera
+   * página de servicios activos y finalizados.
    */
   const fetchServices = useCallback(async () => {
     if (!providerId) {
       setActiveServices([]);
       setFinishedServices([]);
+      setCounts({ activos: 0, finalizados: 0 });
+      setCursors({ activos: null, finalizados: null });
       return;
     }
 
@@ -45,11 +52,17 @@ export const useProviderServices = (providerId) => {
 
     try {
       const { data } = await api.get(
-        `/api/v1/status-servicio/proveedores/${providerId}/servicios`
+        `/api/v1/status-servicio/proveedores/${providerId}/dashboard`
       );
 
-      setActiveServices(data.activos.map(mapService));
-      setFinishedServices(data.finalizados.map(mapService));
+      setActiveServices(data.activos.servicios.map(mapService));
+      setFinishedServices(data.finalizados.servicios.map(mapService));
+      setCounts({ activos: data.activos.total, finalizados: data.finalizados.total });
+      setCursors({
+        activos: data.activos.next_cursor,
+        finalizados: data.finalizados.next_cursor,
+      });
+      setStats(data.estadisticas);
     } catch (err) {
       const detail =
         err.response?.data?.detail ||
@@ -63,6 +76,26 @@ export const useProviderServices = (providerId) => {
     }
   }, [providerId]);
 
+  /**
+   * Carga la siguiente página de una lista ("activos" o "finalizados").
+   */
+  const loadMore = useCallback(
+    async (lista) => {
+      const cursor = cursors[lista];
+      if (!providerId || !cursor) return;
+
+      const { data } = await api.get(
+        `/api/v1/status-servicio/proveedores/${providerId}/dashboard/${lista}`,
+        { params: { cursor } }
+      );
+
+      const setList = lista === "activos" ? setActiveServices : setFinishedServices;
+      setList((prev) => [...prev, ...data.servicios.map(mapService)]);
+      setCursors((prev) => ({ ...prev, [lista]: data.next_cursor }));
+    },
+    [providerId, cursors]
+  );
+
   /**
    * Finaliza un servicio activo.
    * Al hacerlo, lo elimina de 'activos' y lo mueve a 'finalizados'.
@@ -81,6 +114,10 @@ export const useProviderServices = (providerId) => {
       setActiveServices((prev) =>
         prev.filter((srv) => srv.id !== serviceId)
       );
+      setCounts((prev) => ({
+        activos: Math.max(prev.activos - 1, 0),
+        finalizados: prev.finalizados + 1,
+      }));
 
       // Agregarlo a finalizados, con estado actualizado
       if (servicioFinalizado) {
@@ -109,6 +146,12 @@ export const useProviderServices = (providerId) => {
   return {
     activeServices,
     finishedServices,
+    activeCount: counts.activos,
+    finishedCount: counts.finalizados,
+    hasMoreActive: Boolean(cursors.activos),
+    hasMoreFinished: Boolean(cursors.finalizados),
+    stats,
+    loadMore,
     isLoading,
     error,
     fetchServices,
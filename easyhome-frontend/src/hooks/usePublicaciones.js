@@ -1,42 +1,53 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback } from "react";
 import api from "../config/api";
 
 export default function usePublicaciones(filtros = {}) {
   const [publicaciones, setPublicaciones] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
 
+  // Construcción dinámica de query params (el cursor pide la siguiente página)
+  const buildUrl = useCallback((cursor = null) => {
+    const params = new URLSearchParams();
+
+    // 🔹 Categorías (pueden ser varias)
+    if (Array.isArray(filtros.categorias) && filtros.categorias.length > 0) {
+      filtros.categorias.forEach((catId) => {
+        params.append("categorias", catId);
+      });
+    }
+
+    // 🔹 Suscriptores
+    if (filtros.suscriptores === true) {
+      params.append("suscriptores", "true");
+    }
+
+    // 🔹 Ordenar
+    if (filtros.ordenar_por) {
+      params.append("ordenar_por", filtros.ordenar_por);
+    }
+
+    // 🔹 Página siguiente
+    if (cursor) {
+      params.append("cursor", cursor);
+    }
+
+    return `/api/v1/publicaciones?${params.toString()}`;
+  }, [JSON.stringify(filtros)]);
+
   useEffect(() => {
     const fetchData = async () => {
       setIsLoading(true);
       setError(null);
 
       try {
-        // Construcción dinámica de query params
-        const params = new URLSearchParams();
-
-        // 🔹 Categorías (pueden ser varias)
-        if (Array.isArray(filtros.categorias) && filtros.categorias.length > 0) {
-          filtros.categorias.forEach((catId) => {
-            params.append("categorias", catId);
-          });
-        }
-
-        // 🔹 Suscriptores
-        if (filtros.suscriptores === true) {
-          params.append("suscriptores", "true");
-        }
-
-        // 🔹 Ordenar
-        if (filtros.ordenar_por) {
-          params.append("ordenar_por", filtros.ordenar_por);
-        }
-
-        const url = `/api/v1/publicaciones?${params.toString()}`;
+        const url = buildUrl();
         console.log("📌 URL generada:", url);
 
         const response = await api.get(url);
-        setPublicaciones(response.data || []);
+        setPublicaciones(response.data?.publicaciones || []);
+        setNextCursor(response.data?.next_cursor || null);
 
       } catch (err) {
         console.error("❌ Error obteniendo publicaciones:", err);
@@ -47,7 +58,21 @@ export default function usePublicaciones(filtros = {}) {
     };
 
     fetchData();
-  }, [JSON.stringify(filtros)]); // 🔥 Para que se actualice cuando los filtros cambien
+  }, [buildUrl]); // 🔥 Para que se actualice cuando los filtros cambien
+
+  // Agrega la siguiente página al final de la lista actual
+  const cargarMas = useCallback(async () => {
+    if (!nextCursor) return;
+
+    try {
+      const response = await api.get(buildUrl(nextCursor));
+      setPublicaciones((prev) => [...prev, ...(response.data?.publicaciones || [])]);
+      setNextCursor(response.data?.next_cursor || null);
+    } catch (err) {
+      console.error("❌ Error obteniendo más publicaciones:", err);
+      setError("Error al obtener publicaciones");
+    }
+  }, [nextCursor, buildUrl]);
 
-  return { publicaciones, isLoading, error };
+  return { publicaciones, isLoading, error, hayMas: Boolean(nextCursor), cargarMas };
 }
@@ -58,7 +58,7 @@ function Perfil() {
   
   // Hooks para servicios (solo se activan si el usuario tiene el rol correspondiente)
   const { services: clientServices } = useClientServices(userData?.id_usuario);
-  const { finishedServices } = useProviderServices(userData?.id_proveedor);
+  const { finishedCount } = useProviderServices(userData?.id_proveedor);
 
   useEffect(() => {
     const loadProfilePhoto = async () => {
@@ -214,7 +214,7 @@ function Perfil() {
           {isWorker && (
             <>
               <div className="stat-item">
-                <span className="stat-value">{Array.isArray(finishedServices) ? finishedServices.length : 0}</span>
+                <span className="stat-value">{finishedCount}</span>
                 <span className="stat-label">Servicios<br/>finalizados</span>
               </div>
               <div className="stat-item">
@@ -2,7 +2,7 @@ import { useState, useEffect, useMemo } from 'react';
 import PropTypes from 'prop-types';
 import api from '../../config/api';
 import reviewService from '../../services/reseñaservicio';
-import { useProviderServices } from '../../hooks/useProviderServices';
+import { useProviderServiceCounts } from '../../hooks/useProviderServiceCounts';
 
 function AcercaDe({idProveedor, isPublicProfile = false, providerName = ""}) {
   const [proveedorData, setProveedorData] = useState(null);
@@ -11,7 +11,7 @@ function AcercaDe({idProveedor, isPublicProfile = false, providerName = ""}) {
   
   // Estados para estadísticas dinámicas
   const [avgRating, setAvgRating] = useState(null);
-  const { finishedServices } = useProviderServices(idProveedor);
+  const { finishedCount } = useProviderServiceCounts(idProveedor);
 
   useEffect(() => {
     const fetchProveedorData = async () => {
@@ -63,9 +63,8 @@ function AcercaDe({idProveedor, isPublicProfile = false, providerName = ""}) {
     };
   }, [idProveedor]);
   
-  const finishedServicesCount = useMemo(() => {
-    return Array.isArray(finishedServices) ? finishedServices.length : 0;
-  }, [finishedServices]);
+  // Total público de servicios finalizados
+  const finishedServicesCount = finishedCount;
   
   const satisfactionPercent = useMemo(() => {
     if (!Number.isFinite(avgRating)) return null;
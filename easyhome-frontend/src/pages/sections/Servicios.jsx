@@ -16,6 +16,9 @@ function Servicios({ idProveedor }) {
   const {
     activeServices,
     finishedServices,
+    hasMoreActive,
+    hasMoreFinished,
+    loadMore,
     isLoading,
     error,
     finalizarServicio,
@@ -23,6 +26,15 @@ function Servicios({ idProveedor }) {
 
   const [tab, setTab] = useState("activos"); 
 
+  const handleLoadMore = async (lista) => {
+    try {
+      await loadMore(lista);
+    } catch (err) {
+      console.error("Error al cargar más servicios:", err);
+      alert("No se pudieron cargar más servicios. Intenta de nuevo.");
+    }
+  };
+
   const handleFinalizar = async (idServicio) => {
     try {
       const data = await finalizarServicio(idServicio);
@@ -127,6 +139,11 @@ function Servicios({ idProveedor }) {
               </div>
             ))
           )}
+          {hasMoreActive && (
+            <button type="button" className="tab-boton" onClick={() => handleLoadMore("activos")}>
+              Cargar más
+            </button>
+          )}
         </>
       )}
 
@@ -169,6 +186,11 @@ function Servicios({ idProveedor }) {
               </div>
             ))
           )}
+          {hasMoreFinished && (
+            <button type="button" className="tab-boton" onClick={() => handleLoadMore("finalizados")}>
+              Cargar más
+            </button>
+          )}
         </>
       )}
     </div>
@@ -8,7 +8,7 @@ import Resenas from "../sections/Resenas";
 import AgreementAlert from "../cliente/alerta_contratacion";
 import ReportForm from "../trabajador/reporte";
 import reviewService from "../../services/reseñaservicio";
-import { useProviderServices } from "../../hooks/useProviderServices";
+import { useProviderServiceCounts } from "../../hooks/useProviderServiceCounts";
 // AgreementAlert will perform the API call; no direct api import needed here
 
 function ProveedorPublicProfile() {
@@ -19,7 +19,7 @@ function ProveedorPublicProfile() {
 
   const [activeTab, setActiveTab] = useState("acercaDe");
   // Estadísticas dinámicas
-  const { activeServices, finishedServices } = useProviderServices(provider?.id);
+  const { finishedCount } = useProviderServiceCounts(provider?.id);
   const [avgRating, setAvgRating] = useState(null);
   //Estados de alerta
   const [showAlert, setShowAlert] = useState(false); 
@@ -65,9 +65,8 @@ function ProveedorPublicProfile() {
     };
   }, [provider?.id]);
 
-  const finishedServicesCount = useMemo(() => {
-    return Array.isArray(finishedServices) ? finishedServices.length : 0;
-  }, [finishedServices]);
+  // Total público de servicios finalizados
+  const finishedServicesCount = finishedCount;
 
   const satisfactionPercent = useMemo(() => {
     if (!Number.isFinite(avgRating)) return null;
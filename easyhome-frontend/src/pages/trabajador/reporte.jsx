@@ -24,11 +24,8 @@ export default function ReportForm({ isOpen, provider, onClose, onSuccess }) {
         reportado_por: userData?.id_usuario || null
       };
 
-      await api.post('/api/v1/reportes', reportData, {
-        headers: {
-          'X-User-Id': userData?.id_usuario || null
-        }
-      });
+      // El usuario que reporta se obtiene del token (Authorization)
+      await api.post('/api/v1/reportes', reportData);
 
       // Limpiar formulario
       setDetails("");
@@ -0,0 +1,58 @@
+// src/services/directUploadService.js
+
+import axios from 'axios';
+import apiClient from '../config/api';
+
+const directUploadService = {
+
+    /**
+     * Sube imágenes directo a S3 con políticas POST pre-firmadas y las
+     * registra en la API (los bytes no pasan por el backend).
+     * @param {'publicacion'|'solicitud'|'resena'|'perfil'} destino
+     * @param {File[]} archivos
+     * @param {{idRecurso?: number}} opciones
+     * @returns {Promise<{registradas: string[], ya_registradas: string[], faltantes: string[], invalidas: string[], pendientes: string[]}>}
+     */
+    uploadFiles: async (destino, archivos, { idRecurso = null } = {}) => {
+        // La API identifica al usuario por el token (apiClient agrega el Authorization)
+        try {
+            // 1. Pedir una política por archivo
+            const { data } = await apiClient.post('/api/v1/subidas/politicas', {
+                destino,
+                id_recurso: idRecurso,
+                archivos: archivos.map((archivo) => ({
+                    nombre: archivo.name,
+                    content_type: archivo.type,
+                    tamaño: archivo.size,
+                })),
+            });
+
+            // 2. Subir a S3 en paralelo (cliente axios sin token: S3 no lo necesita)
+            await Promise.all(data.politicas.map((politica, index) => {
+                const form = new FormData();
+                Object.entries(politica.fields).forEach(([campo, valor]) => form.append(campo, valor));
+                form.append('file', archivos[index]); // el archivo va al final
+                return axios.post(politica.url, form);
+            }));
+
+            // 3. Confirmar para que la API registre las imágenes
+            const response = await apiClient.post('/api/v1/subidas/confirmar', {
+                destino,
+                id_recurso: idRecurso,
+                keys: data.politicas.map((politica) => politica.key),
+            });
+            return response.data;
+        } catch (error) {
+            console.error('Error en uploadFiles:', error);
+            if (error.response) {
+                throw {
+                    message: error.response.data?.detail || "Error al subir las imágenes",
+                    detail: error.response.data?.detail
+                };
+            }
+            throw new Error(error.message || "Error de conexión con la API.");
+        }
+    },
+};
+
+export default directUploadService;
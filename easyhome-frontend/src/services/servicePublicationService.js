@@ -31,8 +31,17 @@ const servicePublicationService = {
      */
     getAllPublications: async () => {
         try {
-            const response = await apiClient.get('/api/v1/publicaciones/');
-            return response.data;
+            // El catálogo está paginado por cursor: recorrer todas las páginas
+            const publicaciones = [];
+            let cursor = null;
+            do {
+                const params = { limite: 100 };
+                if (cursor) params.cursor = cursor;
+                const response = await apiClient.get('/api/v1/publicaciones/', { params });
+                publicaciones.push(...(response.data?.publicaciones || []));
+                cursor = response.data?.next_cursor;
+            } while (cursor);
+            return publicaciones;
         } catch (error) {
             console.error('Error en getAllPublications:', error);
             if (error.response) {
@@ -45,6 +54,31 @@ const servicePublicationService = {
         }
     },
 
+    /**
+     * Buscar publicaciones por texto (ordenadas por relevancia)
+     * @param {string} q - Texto a buscar
+     * @param {{cursor?: string, limite?: number, categorias?: number[]}} opciones
+     * @returns {Promise<{publicaciones: Array, next_cursor: string|null}>}
+     */
+    searchPublications: async (q, { cursor = null, limite = 20, categorias = [] } = {}) => {
+        try {
+            const params = new URLSearchParams({ q, limite });
+            if (cursor) params.append('cursor', cursor);
+            categorias.forEach((id) => params.append('categorias', id));
+            const response = await apiClient.get('/api/v1/publicaciones/buscar', { params });
+            return response.data;
+        } catch (error) {
+            console.error('Error en searchPublications:', error);
+            if (error.response) {
+                throw {
+                    message: error.response.data?.detail || "Error al buscar publicaciones",
+                    detail: error.response.data?.detail
+                };
+            }
+            throw new Error(error.message || "Error de conexión con la API.");
+        }
+    },
+
     /**
      * Eliminar publicacion
      * @param {number} id_publicacion